@@ -5,13 +5,30 @@ This module handles:
 - Token validation and refresh
 - Authentication header management
 - Token lifecycle and metadata management
+
+Each process keeps the current token in memory, so an OGx call does not read
+Redis. The copy is only trusted while the process is subscribed to
+TOKEN_INVALIDATED_CHANNEL: a process that stores a new token or invalidates the
+current one publishes there, and the others drop their copy and reload it from
+Redis. Usage bookkeeping (last_used, validation_count, last_validated) is
+coalesced in memory and merged into the stored metadata at most every
+OGx_TOKEN_FLUSH_INTERVAL_SECONDS, so processes do not overwrite each other's
+counts.
+
+Token refreshes are single-flight. Within a process, every caller that needs
+a new token waits on the same refresh. Across processes, the refresh takes
+the Redis lock TOKEN_REFRESH_LOCK_KEY for OGx_TOKEN_REFRESH_LOCK_SECONDS. Only
+the holder calls /auth/token; the others poll Redis until the new token is
+stored, and take the lock over if the holder dies without storing one.
 """
 
+import asyncio
 import json
+import sys
 import time
-from typing import Dict, Optional
+import uuid
+from typing import Dict, Final, Optional
 
-import httpx
 from httpx import HTTPError
 from redis.asyncio import Redis
 from redis.exceptions import RedisError
@@ -19,8 +36,53 @@ from redis.exceptions import RedisError
 from Protexis_Command.core.logging.loggers.auth import get_auth_logger
 from Protexis_Command.core.settings.app_settings import Settings, get_settings
 from Protexis_Command.infrastructure.cache.redis import get_redis_client
+from Protexis_Command.infrastructure.http import get_http_client
 from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import OGxProtocolError
 
+TOKEN_INVALIDATED_CHANNEL: Final[str] = "OGx:auth:token:invalidated"
+TOKEN_REFRESH_LOCK_KEY: Final[str] = "OGx:auth:token:refresh_lock"
+# How often a process waiting on another's refresh checks for the new token
+REFRESH_POLL_SECONDS: Final[float] = 0.2
+
+# Release the refresh lock if the caller still holds it.
+# KEYS[1] lock key
+# ARGV[1] lock value of the caller
+# Returns 1 if the lock was released.
+RELEASE_LOCK_SCRIPT: Final[str] = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Merge coalesced usage bookkeeping into the stored metadata if it still describes the token.
+# KEYS[1] metadata key, KEYS[2] token key
+# ARGV[1] token, ARGV[2] last used ('' if unchanged), ARGV[3] validations to add,
+# ARGV[4] last validated ('' if unchanged)
+# Returns 1 if the metadata was updated.
+FLUSH_SCRIPT: Final[str] = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return 0
+end
+local data = cjson.decode(raw)
+if ARGV[2] ~= '' then
+    data.last_used = math.max(tonumber(data.last_used) or 0, tonumber(ARGV[2]))
+end
+data.validation_count = (tonumber(data.validation_count) or 0) + tonumber(ARGV[3])
+if ARGV[4] ~= '' then
+    data.last_validated = math.max(tonumber(data.last_validated) or 0, tonumber(ARGV[4]))
+end
+redis.call('SET', KEYS[1], cjson.encode(data), 'KEEPTTL')
+return 1
+"""
+
+# Shared auth manager instance (module-level)
+_auth_manager: Optional["OGxAuthManager"] = None
+
 
 class TokenMetadata:
     """Token metadata container."""
@@ -74,20 +136,55 @@ class OGxAuthManager:
         self.token_key = "OGx:auth:token"
         self.token_metadata_key = "OGx:auth:token:metadata"
         self.logger = get_auth_logger("auth_manager")
+        self.instance_id = uuid.uuid4().hex
+        self.refresh_margin = settings.OGx_TOKEN_REFRESH_MARGIN_SECONDS
+        self.flush_interval = settings.OGx_TOKEN_FLUSH_INTERVAL_SECONDS
+
+        # Token kept in memory; trusted only while subscribed to invalidations
+        self._cached: Optional[TokenMetadata] = None
+        # Bumped whenever the cached token is dropped
+        self._generation = 0
+        self._subscribed = False
+        self._listener_task: Optional[asyncio.Task] = None
+
+        # Usage bookkeeping for _pending_token not yet written to Redis
+        self._pending_token: Optional[str] = None
+        self._pending_last_used: Optional[float] = None
+        self._pending_validations = 0
+        self._pending_last_validated: Optional[float] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_script = redis.register_script(FLUSH_SCRIPT)
+
+        # Refresh shared by every caller in this process
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.refresh_lock_seconds = settings.OGx_TOKEN_REFRESH_LOCK_SECONDS
+        self.refresh_wait_seconds = settings.OGx_TOKEN_REFRESH_WAIT_SECONDS
+        self._release_lock_script = redis.register_script(RELEASE_LOCK_SCRIPT)
 
     async def get_valid_token(self, force_refresh: bool = False) -> str:
         """Get a valid token, refreshing if necessary or if forced.
 
+        Concurrent refreshes are coalesced, here and across processes; a forced
+        refresh accepts any token other than the current one.
+
         Args:
             force_refresh: If True, always get a new token regardless of current state
+
+        Raises:
+            OGxProtocolError: If another process's refresh stored no token in time
         """
-        if not force_refresh:
-            metadata = await self._get_token_metadata()
-            if metadata and not await self._is_token_expiring_soon(metadata):
-                await self._update_last_used(metadata)
-                return metadata.token
+        metadata = await self._get_cached_metadata()
+        if not force_refresh and metadata and not await self._is_token_expiring_soon(metadata):
+            now = time.time()
+            metadata.last_used = now
+            self._record_usage(metadata.token, last_used=now)
+            return metadata.token
 
-        return await self._acquire_new_token()
+        if self._refresh_task is None or self._refresh_task.done():
+            stale = metadata.token if metadata else None
+            self._refresh_task = asyncio.create_task(self._refresh_token(stale))
+        # Shielded so that a cancelled caller does not cancel the others' refresh
+        return await asyncio.shield(self._refresh_task)
 
     async def get_auth_header(self) -> dict:
         """Get authorization header with valid token.
@@ -113,24 +210,22 @@ class OGxAuthManager:
     async def validate_token(self, auth_header: dict) -> bool:
         """Validate token by calling the info/service endpoint."""
         try:
-            transport = httpx.AsyncHTTPTransport(local_address="0.0.0.0")
-            async with httpx.AsyncClient(transport=transport, verify=False) as client:
-                response = await client.get(
-                    f"{self.settings.OGx_BASE_URL}/info/service",
-                    headers=auth_header,
-                )
-                # If we get a 401, the token is invalid
-                if response.status_code == 401:
-                    return False
+            response = await get_http_client().get(
+                f"{self.settings.OGx_BASE_URL}/info/service",
+                headers=auth_header,
+            )
+            # If we get a 401, the token is invalid
+            if response.status_code == 401:
+                return False
 
-                # Any other error status code indicates a server/network issue
-                if response.status_code >= 400:
-                    response.raise_for_status()
+            # Any other error status code indicates a server/network issue
+            if response.status_code >= 400:
+                response.raise_for_status()
 
-                # If we get here, the token is valid
-                # Update validation metadata
-                await self._update_validation_metadata()
-                return True
+            # If we get here, the token is valid
+            # Update validation metadata
+            await self._update_validation_metadata()
+            return True
 
         except (HTTPError, ValueError) as e:
             self.logger.warning(
@@ -149,10 +244,13 @@ class OGxAuthManager:
             return False
 
     async def invalidate_token(self) -> None:
-        """Invalidate and remove current token."""
+        """Invalidate and remove current token, in this process and all others."""
+        self._drop_cache()
+        self._pending_token = None
         try:
             await self.redis.delete(self.token_metadata_key)
             await self.redis.delete(self.token_key)
+            await self._publish_invalidation()
         except RedisError as e:
             self.logger.error(
                 "Failed to invalidate token",
@@ -168,7 +266,8 @@ class OGxAuthManager:
             )
 
     async def get_token_info(self) -> Optional[Dict]:
-        """Get current token metadata as dictionary."""
+        """Get current token metadata as dictionary, including pending bookkeeping."""
+        await self.flush()
         metadata = await self._get_token_metadata()
         if metadata:
             return {
@@ -182,7 +281,141 @@ class OGxAuthManager:
             }
         return None
 
+    async def flush(self) -> None:
+        """Write usage bookkeeping coalesced since the last flush to Redis.
+
+        Bookkeeping is best effort: a failed write is logged and dropped.
+        """
+        token = self._pending_token
+        if token is None:
+            return
+        last_used, validations, last_validated = (
+            self._pending_last_used,
+            self._pending_validations,
+            self._pending_last_validated,
+        )
+        self._pending_token = None
+        try:
+            await self._flush_script(
+                keys=[self.token_metadata_key, self.token_key],
+                args=[
+                    token,
+                    "" if last_used is None else last_used,
+                    validations,
+                    "" if last_validated is None else last_validated,
+                ],
+            )
+        except RedisError as e:
+            self.logger.warning(
+                "Failed to record token usage",
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "auth_service",
+                    "auth_info": {
+                        "error_type": "storage",
+                        "error_msg": str(e),
+                        "service": "OGx",
+                    },
+                },
+            )
+
+    async def close(self) -> None:
+        """Stop listening for invalidations and write pending bookkeeping."""
+        for task in (self._listener_task, self._flush_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._listener_task = self._flush_task = None
+        await self.flush()
+
     # Private methods for token management
+    async def _get_cached_metadata(self) -> Optional[TokenMetadata]:
+        """Get token metadata from memory, loading it from Redis when not cached."""
+        self._ensure_listener()
+        if self._cached is not None:
+            return self._cached
+        generation = self._generation
+        metadata = await self._get_token_metadata()
+        # Keep it only if no invalidation could have been missed while reading
+        if self._subscribed and generation == self._generation:
+            self._cached = metadata
+        return metadata
+
+    def _drop_cache(self) -> None:
+        """Forget the cached token; the next call reads it from Redis."""
+        self._cached = None
+        self._generation += 1
+
+    def _ensure_listener(self) -> None:
+        """Start listening for invalidations if not already listening."""
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        """Drop the cached token whenever another process replaces or invalidates it."""
+        subscription = self.redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await subscription.subscribe(TOKEN_INVALIDATED_CHANNEL)
+            self._subscribed = True
+            async for message in subscription.listen():
+                if message["data"] != self.instance_id:
+                    self._drop_cache()
+        except RedisError as e:
+            self.logger.warning(
+                "Token invalidations unavailable, reading the token from Redis: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "auth_service",
+                    "auth_info": {
+                        "error_type": "subscription",
+                        "error_msg": str(e),
+                        "service": "OGx",
+                    },
+                },
+            )
+        finally:
+            self._subscribed = False
+            self._drop_cache()
+            try:
+                await subscription.aclose()
+            except RedisError:
+                pass
+
+    async def _publish_invalidation(self) -> None:
+        """Tell other processes to drop their cached token."""
+        await self.redis.publish(TOKEN_INVALIDATED_CHANNEL, self.instance_id)
+
+    def _record_usage(
+        self,
+        token: str,
+        last_used: Optional[float] = None,
+        validations: int = 0,
+        last_validated: Optional[float] = None,
+    ) -> None:
+        """Add usage bookkeeping to the next flush, scheduling one if none is due."""
+        if token != self._pending_token:
+            # Bookkeeping for a replaced token is no longer worth writing
+            self._pending_token = token
+            self._pending_last_used = None
+            self._pending_validations = 0
+            self._pending_last_validated = None
+        if last_used is not None:
+            self._pending_last_used = last_used
+        self._pending_validations += validations
+        if last_validated is not None:
+            self._pending_last_validated = last_validated
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        """Flush bookkeeping after the flush interval."""
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
     async def _get_token_metadata(self) -> Optional[TokenMetadata]:
         """Retrieve token metadata if available."""
         try:
@@ -214,32 +447,28 @@ class OGxAuthManager:
                 },
             )
 
-    async def _update_last_used(self, metadata: TokenMetadata) -> None:
-        """Update token's last used timestamp."""
-        metadata.last_used = time.time()
-        await self._store_token_metadata(metadata)
-
     async def _update_validation_metadata(self) -> None:
         """Update token's validation metadata."""
-        metadata = await self._get_token_metadata()
+        metadata = await self._get_cached_metadata()
         if metadata:
-            metadata.last_validated = time.time()
+            now = time.time()
+            metadata.last_validated = now
             metadata.validation_count += 1
-            await self._store_token_metadata(metadata)
+            self._record_usage(metadata.token, validations=1, last_validated=now)
 
     async def _is_token_expiring_soon(self, metadata: TokenMetadata) -> bool:
         """Check if token needs refresh based on expiry time.
 
         Refreshes token if:
-        - Less than 1 hour remaining
+        - Less than OGx_TOKEN_REFRESH_MARGIN_SECONDS remaining
         - Token is older than max age
         - Token has been used more than max uses
         """
         now = time.time()
         ttl = metadata.expires_at - now
 
-        # Refresh if less than 1 hour remaining
-        if ttl < 3600:
+        # Refresh if less than the refresh margin remaining
+        if ttl < self.refresh_margin:
             return True
 
         # Refresh if token is older than 12 hours
@@ -252,6 +481,63 @@ class OGxAuthManager:
 
         return False
 
+    async def _refresh_token(self, stale: Optional[str]) -> str:
+        """Get a new token, fetching it in only one process across the cluster.
+
+        Args:
+            stale: Token being replaced, not accepted from another process
+
+        Returns:
+            str: The new token
+
+        Raises:
+            OGxProtocolError: If another process's refresh stored no token in time
+        """
+        deadline = time.time() + self.refresh_wait_seconds
+        lock_value = f"{self.instance_id}:{uuid.uuid4().hex[:8]}"
+        while True:
+            try:
+                locked = await self.redis.set(
+                    TOKEN_REFRESH_LOCK_KEY, lock_value, nx=True, ex=self.refresh_lock_seconds
+                )
+            except RedisError as e:
+                self.logger.warning(
+                    "Refresh lock unavailable, fetching a token without it",
+                    extra={
+                        "customer_id": self.settings.CUSTOMER_ID,
+                        "asset_id": "auth_service",
+                        "auth_info": {
+                            "error_type": "storage",
+                            "error_msg": str(e),
+                            "service": "OGx",
+                        },
+                    },
+                )
+                return await self._acquire_new_token()
+
+            if locked:
+                try:
+                    return await self._acquire_new_token()
+                finally:
+                    try:
+                        await self._release_lock_script(
+                            keys=[TOKEN_REFRESH_LOCK_KEY], args=[lock_value]
+                        )
+                    except RedisError:
+                        pass  # The lock expires on its own
+
+            # Another process is refreshing; wait for it to store the new token
+            await asyncio.sleep(REFRESH_POLL_SECONDS)
+            metadata = await self._get_token_metadata()
+            if (
+                metadata
+                and metadata.token != stale
+                and not await self._is_token_expiring_soon(metadata)
+            ):
+                return metadata.token
+            if time.time() >= deadline:
+                raise OGxProtocolError("Timed out waiting for another process to refresh the token")
+
     async def _acquire_new_token(self) -> str:
         """Acquire new token from OGx using client credentials flow."""
         url = f"{self.settings.OGx_BASE_URL}/auth/token"
@@ -262,32 +548,63 @@ class OGxAuthManager:
             "&grant_type=client_credentials"
         )
 
-        # Don't use proxy for localhost
-        transport = httpx.AsyncHTTPTransport(local_address="0.0.0.0")
-        async with httpx.AsyncClient(transport=transport, verify=False) as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                content=data,
-            )
-            if response.status_code >= 400:
-                response.raise_for_status()
-            token_data = response.json()
+        response = await get_http_client().post(
+            url,
+            headers=headers,
+            content=data,
+        )
+        if response.status_code >= 400:
+            response.raise_for_status()
+        token_data = response.json()
 
-            # Store metadata
-            now = time.time()
-            metadata = TokenMetadata(
-                token=token_data["access_token"],
-                created_at=now,
-                expires_at=now + token_data["expires_in"],
-                last_used=now,
+        # Store metadata
+        now = time.time()
+        metadata = TokenMetadata(
+            token=token_data["access_token"],
+            created_at=now,
+            expires_at=now + token_data["expires_in"],
+            last_used=now,
+        )
+        await self._store_token_metadata(metadata)
+        self._drop_cache()
+        if self._subscribed:
+            self._cached = metadata
+        try:
+            await self._publish_invalidation()
+        except RedisError as e:
+            self.logger.warning(
+                "Failed to announce new token",
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "auth_service",
+                    "auth_info": {
+                        "error_type": "storage",
+                        "error_msg": str(e),
+                        "service": "OGx",
+                    },
+                },
             )
-            await self._store_token_metadata(metadata)
-            return metadata.token
+        return metadata.token
 
 
 async def get_auth_manager() -> OGxAuthManager:
-    """Get configured auth manager instance."""
+    """Get the process-wide auth manager, creating it on first use.
+
+    The manager is shared so that its token cache serves every request.
+    """
+    if _auth_manager is not None:
+        return _auth_manager
     settings = get_settings()
     redis = await get_redis_client()
-    return OGxAuthManager(settings=settings, redis=redis)
+    manager = OGxAuthManager(settings=settings, redis=redis)
+    # Set module variable using module name to avoid global statement
+    setattr(sys.modules[__name__], "_auth_manager", manager)
+    return manager
+
+
+async def close_auth_manager() -> None:
+    """Close the process-wide auth manager, if one was created."""
+    manager = _auth_manager
+    if manager is not None:
+        setattr(sys.modules[__name__], "_auth_manager", None)
+        await manager.close()
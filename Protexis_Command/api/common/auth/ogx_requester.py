@@ -1,7 +1,9 @@
 """OGx API requester module.
 
 This module provides a client for making HTTP requests to OGx API endpoints
-with automatic authentication header management.
+with automatic authentication header management. Requests go out over the
+process-wide pooled HTTP client, which resolves endpoint paths against
+OGx_BASE_URL.
 """
 
 import logging
@@ -11,6 +13,7 @@ from httpx import Response
 
 from Protexis_Command.api.common.auth.manager import OGxAuthManager
 from Protexis_Command.api.config.ogx_endpoints import APIEndpoint
+from Protexis_Command.infrastructure.http import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +28,6 @@ class OGxRequester:
             auth_manager: Authentication manager for OGx API to handle tokens
         """
         self.auth_manager = auth_manager
-        self.client = httpx.AsyncClient(timeout=30.0)  # 30 second timeout
 
     async def get(self, endpoint: APIEndpoint, **kwargs) -> Response:
         """Make a GET request to an OGx API endpoint.
@@ -97,7 +99,7 @@ class OGxRequester:
         # Make the request
         logger.debug(f"Making {method} request to {endpoint.value}")
         try:
-            response = await self.client.request(method, endpoint.value, **kwargs)
+            response = await get_http_client().request(method, endpoint.value, **kwargs)
             logger.debug(f"Response status: {response.status_code}")
             return response
         except httpx.RequestError as e:
@@ -1,6 +1,16 @@
 """Common clients for the API."""
 
 from .base import BaseAPIClient
-from .factory import get_OGx_client
+from .factory import OGxClientRegistry, close_OGx_clients, get_OGx_client
+from .throttle import CallBudgetExceeded, CallRateLimiter, CallType, call_type
 
-__all__ = ["BaseAPIClient", "get_OGx_client"]
+__all__ = [
+    "BaseAPIClient",
+    "get_OGx_client",
+    "close_OGx_clients",
+    "OGxClientRegistry",
+    "CallBudgetExceeded",
+    "CallRateLimiter",
+    "CallType",
+    "call_type",
+]
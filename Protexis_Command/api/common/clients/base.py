@@ -1,16 +1,19 @@
 """Base client for OGx API.
 
 This module provides the base client implementation for OGx API interactions.
+Every call waits for a slot of its throttle group's shared budget before it is sent,
+and goes out over the process-wide pooled HTTP client (see infrastructure.http).
 """
 
 from typing import Any, Dict, Optional
 
-import httpx
 from httpx import Response
 
 from Protexis_Command.api.common.auth.manager import OGxAuthManager
+from Protexis_Command.api.common.clients.throttle import CallRateLimiter, call_type
 from Protexis_Command.api.config.http_error_codes import HTTPErrorCode
 from Protexis_Command.core.settings.app_settings import Settings
+from Protexis_Command.infrastructure.http import get_http_client
 from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import OGxProtocolError
 
 
@@ -27,6 +30,7 @@ class BaseAPIClient:
         self.auth_manager = auth_manager
         self.settings = settings
         self.base_url = settings.OGx_BASE_URL
+        self.rate_limiter = CallRateLimiter(auth_manager.redis, settings)
 
     async def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Response:
         """Make authenticated GET request.
@@ -40,14 +44,15 @@ class BaseAPIClient:
 
         Raises:
             httpx.HTTPError: If request fails
+            CallBudgetExceeded: If the call budget has no slot within the maximum wait
         """
+        await self.rate_limiter.acquire(call_type(endpoint))
         headers = await self.auth_manager.get_auth_header()
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}{endpoint}", headers=headers, params=params
-            )
-            response.raise_for_status()
-            return response
+        response = await get_http_client().get(
+            f"{self.base_url}{endpoint}", headers=headers, params=params
+        )
+        response.raise_for_status()
+        return response
 
     async def post(
         self,
@@ -67,19 +72,20 @@ class BaseAPIClient:
 
         Raises:
             httpx.HTTPError: If request fails
+            CallBudgetExceeded: If the call budget has no slot within the maximum wait
         """
+        await self.rate_limiter.acquire(call_type(endpoint))
         headers = await self.auth_manager.get_auth_header()
         if json_data:
             headers["Content-Type"] = "application/json"
         elif data:
             headers["Content-Type"] = "application/x-www-form-urlencoded"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}{endpoint}", headers=headers, json=json_data, data=data
-            )
-            response.raise_for_status()
-            return response
+        response = await get_http_client().post(
+            f"{self.base_url}{endpoint}", headers=headers, json=json_data, data=data
+        )
+        response.raise_for_status()
+        return response
 
     async def handle_response(self, response: Response) -> Dict[str, Any]:
         """Handle API response and check for errors.
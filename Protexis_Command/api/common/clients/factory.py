@@ -1,27 +1,93 @@
-"""Factory functions for creating API clients."""
+"""Factory functions for creating API clients.
 
-from functools import lru_cache
-from typing import Optional
+OGx clients are kept in a process-wide registry, one per OGx account (base URL
+and client ID). A client is built on first use; concurrent first requests share
+a single construction, and later requests get the ready client with no setup.
+Calls go through the shared HTTP client (see infrastructure.http) and every
+client authenticates with the process-wide auth manager (see
+auth.manager.get_auth_manager), so one token cache and one single-flight refresh
+serve them all. Closing the registry drops the clients; the auth manager is
+closed on its own with close_auth_manager.
+"""
 
-from Protexis_Command.api.common.auth.manager import OGxAuthManager
-from Protexis_Command.api.services.ogx_client import OGxClient
+import asyncio
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from Protexis_Command.api.common.auth.manager import get_auth_manager
 from Protexis_Command.core.settings.app_settings import Settings, get_settings
-from Protexis_Command.infrastructure.cache.redis import get_redis_client
 
+if TYPE_CHECKING:
+    from Protexis_Command.api.services.ogx_client import OGxClient
+
+# OGx base URL and client ID
+ClientKey = Tuple[str, str]
+
+
+class OGxClientRegistry:
+    """Lazily built OGx clients, keyed by the OGx account of their settings."""
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._clients: Dict[ClientKey, "OGxClient"] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def key(settings: Settings) -> ClientKey:
+        """Get the registry key for settings."""
+        return settings.OGx_BASE_URL, settings.OGx_CLIENT_ID
+
+    async def get(self, settings: Settings) -> "OGxClient":
+        """Get the client for settings, building it on first use.
+
+        Args:
+            settings: Application settings
+
+        Returns:
+            Shared OGx client for the settings' OGx account
+        """
+        key = self.key(settings)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
 
-@lru_cache
-async def get_OGx_client(settings: Optional[Settings] = None) -> OGxClient:
+        async with self._lock:
+            # Another request may have built it while this one waited
+            client = self._clients.get(key)
+            if client is None:
+                client = await self._create(settings)
+                self._clients[key] = client
+        return client
+
+    async def close(self) -> None:
+        """Drop every client; the next request builds a new one."""
+        async with self._lock:
+            self._clients.clear()
+
+    async def _create(self, settings: Settings) -> "OGxClient":
+        """Build a client on the process-wide auth manager."""
+        # Imported here: api.services loads the OGx services, which import this factory
+        from Protexis_Command.api.services.ogx_client import OGxClient
+
+        return OGxClient(await get_auth_manager(), settings)
+
+
+_registry = OGxClientRegistry()
+
+
+async def get_OGx_client(settings: Optional[Settings] = None) -> "OGxClient":
     """Get configured OGx client instance.
 
     Args:
         settings: Optional settings instance. If not provided, will use default settings.
 
     Returns:
-        Configured OGx client instance
+        Shared OGx client for the settings' OGx account
     """
     if settings is None:
         settings = get_settings()
+    return await _registry.get(settings)
+
 
-    redis = await get_redis_client()
-    auth_manager = OGxAuthManager(settings, redis)
-    return OGxClient(auth_manager, settings)
+async def close_OGx_clients() -> None:
+    """Drop every registered OGx client."""
+    await _registry.close()
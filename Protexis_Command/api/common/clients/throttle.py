@@ -0,0 +1,203 @@
+"""Cluster-wide OGx call budget.
+
+OGx allows DEFAULT_CALLS_PER_MINUTE calls per DEFAULT_WINDOW_SECONDS for each
+throttle group (INFO, GET and SEND) of an account (OGx-1.txt section 3.4) and
+answers HTTP 429 once a group is over its limit. Every API process, worker and
+script shares the account's budget, so the budget is kept in Redis and each
+call reserves its slot before it is sent instead of finding out from a 429.
+
+The limiter uses the generic cell rate algorithm (GCRA): one key per throttle
+group holds the theoretical arrival time (TAT) of the next call. A call may go
+out once the TAT is no more than the burst tolerance ahead of now, and each
+reservation pushes the TAT forward by one emission interval (window / limit).
+Calls that arrive early are not rejected; they are given the delay that lands
+them on their slot, and the caller sleeps for it.
+
+Key layout:
+    OGx:throttle:<customer>:<group>     Theoretical arrival time of the group's next call,
+                                        in Redis server seconds
+
+Times come from the Redis server clock so every host schedules against the same
+clock.
+"""
+
+import asyncio
+from enum import Enum
+from typing import Final, Optional
+
+from redis.asyncio import Redis
+
+from Protexis_Command.core.logging.log_settings import LoggingConfig
+from Protexis_Command.core.logging.loggers import get_protocol_logger
+from Protexis_Command.core.settings.app_settings import Settings
+from Protexis_Command.protocols.ogx.constants.ogx_error_codes import GatewayErrorCode
+from Protexis_Command.protocols.ogx.constants.ogx_limits import DEFAULT_WINDOW_SECONDS
+from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import OGxProtocolError
+
+THROTTLE_PREFIX: Final[str] = "OGx:throttle:"
+
+# Reserve the next call slot of a throttle group.
+# KEYS[1] group TAT key
+# ARGV[1] emission interval (seconds), ARGV[2] burst tolerance (seconds),
+# ARGV[3] maximum delay (seconds)
+# Returns {reserved, delay in milliseconds}. A call whose delay would exceed the
+# maximum is not reserved, so a caller that gives up does not use up budget.
+RESERVE_SCRIPT: Final[str] = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local max_delay = tonumber(ARGV[3])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+
+local delay = tat - tolerance - now
+if delay < 0 then
+    delay = 0
+end
+if delay > max_delay then
+    return {0, math.ceil(delay * 1000)}
+end
+
+local next_tat = tat + interval
+redis.call('SET', KEYS[1], string.format('%.6f', next_tat),
+    'PX', math.ceil((next_tat - now) * 1000))
+return {1, math.ceil(delay * 1000)}
+"""
+
+
+class CallType(str, Enum):
+    """OGx throttle groups; each has its own call budget."""
+
+    INFO = "info"
+    GET = "get"
+    SEND = "send"
+
+
+def call_type(endpoint: str) -> Optional[CallType]:
+    """Get the throttle group of an OGx endpoint.
+
+    Args:
+        endpoint: API endpoint path, such as "/get/re_messages"
+
+    Returns:
+        Optional[CallType]: Throttle group, or None for authentication endpoints,
+            which are not throttled
+    """
+    path = endpoint.lstrip("/")
+    if path.startswith("auth/"):
+        return None
+    if path.startswith("get/"):
+        return CallType.GET
+    if path.startswith("info/"):
+        return CallType.INFO
+    return CallType.SEND
+
+
+class CallBudgetExceeded(OGxProtocolError):
+    """Raised when a call would have to wait longer than the caller allows.
+
+    Attributes:
+        call_type: Throttle group that is out of budget
+        retry_after: Seconds until the group has a free slot
+    """
+
+    def __init__(self, group: CallType, retry_after: float):
+        error_code = (
+            GatewayErrorCode.RETRIEVE_STATUS_RATE_EXCEEDED
+            if group == CallType.GET
+            else GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED
+        )
+        super().__init__(
+            f"Rate limit exceeded for {group.value} calls. Retry after {retry_after:.0f} seconds.",
+            error_code=error_code,
+        )
+        self.call_type = group
+        self.retry_after = retry_after
+
+
+class CallRateLimiter:
+    """Schedules OGx calls against the account's shared per-group budget.
+
+    Args:
+        redis (Redis): Async Redis client shared by every process
+        settings (Settings): Application settings
+        calls_per_minute (Optional[int]): Calls allowed per window and throttle
+            group; defaults to OGx_THROTTLE_CALLS_PER_MINUTE
+    """
+
+    def __init__(self, redis: Redis, settings: Settings, calls_per_minute: Optional[int] = None):
+        self.redis = redis
+        self.settings = settings
+        self.logger = get_protocol_logger(config=LoggingConfig())
+
+        limit = calls_per_minute or settings.OGx_THROTTLE_CALLS_PER_MINUTE
+        if limit <= 0:
+            raise ValueError("Call budget must be a positive number of calls per minute")
+        self.interval = DEFAULT_WINDOW_SECONDS / limit
+        self.tolerance = self.interval * (max(settings.OGx_THROTTLE_BURST, 1) - 1)
+        self.max_wait = settings.OGx_THROTTLE_MAX_WAIT_SECONDS
+
+        self._reserve_script = redis.register_script(RESERVE_SCRIPT)
+
+    def _key(self, group: CallType) -> str:
+        """Get the TAT key of a throttle group."""
+        return f"{THROTTLE_PREFIX}{self.settings.CUSTOMER_ID}:{group.value}"
+
+    async def reserve(self, group: CallType, max_wait: Optional[float] = None) -> float:
+        """Reserve the next call slot of a throttle group without waiting for it.
+
+        Args:
+            group: Throttle group of the call
+            max_wait: Longest acceptable delay; defaults to OGx_THROTTLE_MAX_WAIT_SECONDS
+
+        Returns:
+            float: Seconds until the reserved slot
+
+        Raises:
+            CallBudgetExceeded: If the next free slot is further away than max_wait
+        """
+        limit = self.max_wait if max_wait is None else max_wait
+        reserved, delay_ms = await self._reserve_script(
+            keys=[self._key(group)], args=[self.interval, self.tolerance, limit]
+        )
+        delay = int(delay_ms) / 1000
+        if not int(reserved):
+            raise CallBudgetExceeded(group, delay)
+        return delay
+
+    async def acquire(self, group: Optional[CallType], max_wait: Optional[float] = None) -> float:
+        """Wait for a call slot of a throttle group.
+
+        Args:
+            group: Throttle group of the call; None (authentication) does not wait
+            max_wait: Longest acceptable delay; defaults to OGx_THROTTLE_MAX_WAIT_SECONDS
+
+        Returns:
+            float: Seconds waited
+
+        Raises:
+            CallBudgetExceeded: If the next free slot is further away than max_wait
+        """
+        if group is None:
+            return 0.0
+        try:
+            delay = await self.reserve(group, max_wait)
+        except CallBudgetExceeded as e:
+            self.logger.warning(
+                "OGx call budget exhausted",
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "ogx_client",
+                    "call_type": group.value,
+                    "retry_after": e.retry_after,
+                    "action": "acquire_call_slot",
+                },
+            )
+            raise
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
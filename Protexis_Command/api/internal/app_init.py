@@ -44,9 +44,15 @@ def init_routes(app: FastAPI) -> None:
         app: FastAPI application instance
     """
     from Protexis_Command.api.internal.routes import auth
+    from Protexis_Command.api.internal.routes.dead_letters import router as dead_letters_router
 
     app.include_router(
         auth.auth_router,
         prefix="/api",
         tags=["auth"],
     )
+
+    app.include_router(
+        dead_letters_router,
+        prefix="/api",
+    )
@@ -2,6 +2,7 @@
 This module contains the routes for the API.
 """
 
+from .dead_letters import router as dead_letters_router
 from .messages import router as messages_router
 
-__all__ = ["messages_router"]
+__all__ = ["dead_letters_router", "messages_router"]
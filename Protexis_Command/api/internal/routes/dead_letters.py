@@ -0,0 +1,144 @@
+"""Dead letter queue admin routes.
+
+This module implements administrative endpoints for recovering messages from the
+outbound dead letter queue (see DeadLetterReplayer):
+- Dry-run counts of the messages a filter selects
+- Starting a rate-paced replay in the background
+- Replay progress and cancellation
+
+All endpoints require an admin user. One replay runs at a time per API process.
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import BaseModel, Field
+
+from Protexis_Command.api.common.auth.oauth2 import get_current_admin_user
+from Protexis_Command.api.protocols.ogx.services.ogx_dlq_replay import (
+    DeadLetterFilter,
+    DeadLetterReplayer,
+    ReplayProgress,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_queue_factory import get_message_queue
+from Protexis_Command.core.settings.app_settings import Settings, get_settings
+from Protexis_Command.infrastructure.database.models.user import User
+
+router = APIRouter(prefix="/admin/dead-letters", tags=["dead-letters"])
+
+
+class DeadLetterReplayRequest(BaseModel):
+    """Selection and pacing of a dead letter replay."""
+
+    error_contains: Optional[str] = Field(
+        None, description="Case-insensitive substring of the last delivery error"
+    )
+    destination_id: Optional[str] = Field(None, description="Destination terminal ID")
+    sin: Optional[int] = Field(None, ge=0, le=255, description="Payload SIN")
+    min: Optional[int] = Field(None, ge=0, le=255, description="Payload MIN")
+    min_age_seconds: Optional[float] = Field(
+        None, ge=0, description="Only messages first queued at least this long ago"
+    )
+    max_age_seconds: Optional[float] = Field(
+        None, ge=0, description="Only messages first queued at most this long ago"
+    )
+    rate_per_minute: Optional[int] = Field(
+        None,
+        gt=0,
+        description="Replay rate, capped at OGx_DLQ_REPLAY_RATE_PER_MINUTE",
+    )
+
+    def to_filter(self) -> DeadLetterFilter:
+        """Build the replay filter."""
+        return DeadLetterFilter(
+            error_contains=self.error_contains,
+            destination_id=self.destination_id,
+            sin=self.sin,
+            min=self.min,
+            min_age_seconds=self.min_age_seconds,
+            max_age_seconds=self.max_age_seconds,
+        )
+
+
+async def _get_replayer(request: DeadLetterReplayRequest, settings: Settings) -> DeadLetterReplayer:
+    """Create a replayer for the configured queue backend."""
+    message_queue = await get_message_queue(settings)
+    return DeadLetterReplayer(message_queue, settings, rate_per_minute=request.rate_per_minute)
+
+
+@router.post("/dry-run", response_model=dict)
+async def count_dead_letters(
+    body: DeadLetterReplayRequest,
+    _admin: User = Depends(get_current_admin_user),
+    settings: Settings = Depends(get_settings),
+) -> dict:
+    """Count the dead-lettered messages a replay would select (admin only)."""
+    replayer = await _get_replayer(body, settings)
+    progress = await replayer.count(body.to_filter())
+    return progress.to_dict()
+
+
+@router.post("/replay", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+async def start_replay(
+    body: DeadLetterReplayRequest,
+    request: Request,
+    _admin: User = Depends(get_current_admin_user),
+    settings: Settings = Depends(get_settings),
+) -> dict:
+    """Start replaying the selected dead-lettered messages in the background (admin only)."""
+    task: Optional[asyncio.Task] = getattr(request.app.state, "dead_letter_replay_task", None)
+    if task is not None and not task.done():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A dead letter replay is already running",
+        )
+
+    replayer = await _get_replayer(body, settings)
+    progress = ReplayProgress()
+    request.app.state.dead_letter_replay_progress = progress
+    request.app.state.dead_letter_replay_task = asyncio.create_task(
+        replayer.replay(body.to_filter(), progress=progress)
+    )
+    return progress.to_dict()
+
+
+@router.get("/replay", response_model=dict)
+async def get_replay_progress(
+    request: Request,
+    _admin: User = Depends(get_current_admin_user),
+) -> dict:
+    """Get the progress of the current or last dead letter replay (admin only)."""
+    progress: Optional[ReplayProgress] = getattr(
+        request.app.state, "dead_letter_replay_progress", None
+    )
+    if progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No dead letter replay has been started",
+        )
+    return progress.to_dict()
+
+
+@router.delete("/replay", response_model=dict)
+async def cancel_replay(
+    request: Request,
+    _admin: User = Depends(get_current_admin_user),
+) -> dict:
+    """Cancel the running dead letter replay (admin only).
+
+    Messages already replayed stay in the pending queue.
+    """
+    task: Optional[asyncio.Task] = getattr(request.app.state, "dead_letter_replay_task", None)
+    if task is None or task.done():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No dead letter replay is running",
+        )
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    progress: ReplayProgress = request.app.state.dead_letter_replay_progress
+    return progress.to_dict()
@@ -29,10 +29,19 @@ from fastapi import APIRouter, Depends, HTTPException
 from httpx import HTTPError
 from pydantic import BaseModel, Field
 
-from Protexis_Command.api.common.auth.manager import OGxAuthManager, get_auth_manager
 from Protexis_Command.api.common.clients.factory import get_OGx_client
 from Protexis_Command.api.config import APIEndpoint, TransportType
+from Protexis_Command.api.protocols.ogx.services.ogx_idempotency import (
+    IN_FLIGHT,
+    SubmissionIdempotencyIndex,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_status_tracker import (
+    MessageStatusTracker,
+    get_status_tracker,
+)
+from Protexis_Command.api.services.ogx_client import OGxClient
 from Protexis_Command.core.settings.app_settings import Settings, get_settings
+from Protexis_Command.infrastructure.cache.redis import get_redis_client
 from Protexis_Command.protocols.ogx.constants.ogx_message_states import MessageState
 from Protexis_Command.protocols.ogx.constants.ogx_message_types import MessageType
 from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import (
@@ -43,6 +52,11 @@ from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import
 router = APIRouter()
 
 
+async def get_client(settings: Settings = Depends(get_settings)) -> OGxClient:
+    """Get the shared OGx client, built on the first request only."""
+    return await get_OGx_client(settings)
+
+
 class OGxMessage(BaseModel):
     """OGx message structure as defined in OGx-1.txt Section 5.1."""
 
@@ -100,13 +114,17 @@ class MessageResponse(BaseModel):
 @router.post(APIEndpoint.SUBMIT_MESSAGE, response_model=MessageResponse)
 async def submit_message(
     request: MessageRequest,
-    _auth: OGxAuthManager = Depends(get_auth_manager),
+    client: OGxClient = Depends(get_client),
     settings: Settings = Depends(get_settings),
+    tracker: MessageStatusTracker = Depends(get_status_tracker),
 ) -> MessageResponse:
-    """Submit To-mobile message via OGx (OGx-1.txt Section 5.2)."""
-    try:
-        client = await get_OGx_client(settings)
+    """Submit To-mobile message via OGx (OGx-1.txt Section 5.2).
 
+    Retried submissions (same UserMessageID, or same payload within the hash TTL)
+    return the first submission's message ID and its current status instead of
+    sending the message again (see ogx_idempotency).
+    """
+    try:
         transport_type: Optional[TransportType] = None
         if request.transport_type is not None:
             try:
@@ -116,6 +134,30 @@ async def submit_message(
                     status_code=400, detail=f"Invalid transport type: {str(e)}"
                 ) from e
 
+        submission = request.model_dump(by_alias=True, exclude_none=True)
+        idempotency = SubmissionIdempotencyIndex(await get_redis_client(), settings)
+        existing = await idempotency.claim(submission)
+        if existing is not None:
+            if existing == IN_FLIGHT:
+                raise HTTPException(
+                    status_code=409, detail="An identical submission is already in progress"
+                )
+            status = await tracker.get_status(existing)
+            return MessageResponse(
+                **{
+                    "ID": int(existing),
+                    "Type": MessageType.FORWARD,
+                    # OGx may not report a status for a just-accepted message yet
+                    "State": MessageState.ACCEPTED,
+                    "DestinationID": request.destination_id,
+                    "UserMessageID": request.user_message_id,
+                    **(status or {}),
+                }
+            )
+
+        # Until the message ID is stored, any failure (including cancellation)
+        # releases the claim so the client can retry the submission
+        completed = False
         try:
             response = await client.submit_message(
                 destination_id=request.destination_id,
@@ -124,15 +166,23 @@ async def submit_message(
                 transport_type=transport_type,
             )
 
-            return MessageResponse(
+            message_response = MessageResponse(
                 Type=MessageType.FORWARD,  # Initial state for forward messages
                 State=MessageState.ACCEPTED,
                 **response,
             )
+            # Without a forward message ID there is nothing to replay to a retry
+            if message_response.id is not None:
+                await idempotency.complete(submission, message_response.id)
+                completed = True
         except (HTTPError, OGxProtocolError) as e:
             raise HTTPException(
                 status_code=500, detail=f"Failed to submit message: {str(e)}"
             ) from e
+        finally:
+            if not completed:
+                await idempotency.release(submission)
+        return message_response
 
     except ValidationError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
@@ -143,12 +193,10 @@ async def submit_message(
 @router.get(APIEndpoint.GET_RE_MESSAGES, response_model=List[MessageResponse])
 async def retrieve_messages(
     from_utc: str,
-    _auth: OGxAuthManager = Depends(get_auth_manager),
-    settings: Settings = Depends(get_settings),
+    client: OGxClient = Depends(get_client),
 ) -> List[MessageResponse]:
     """Retrieve From-Mobile messages from OGx (OGx-1.txt Section 5.4)."""
     try:
-        client = await get_OGx_client(settings)
         try:
             messages = await client.get_messages(from_utc=from_utc)
             return [
@@ -175,11 +223,13 @@ async def retrieve_messages(
 @router.get(APIEndpoint.GET_FW_STATUSES + "/{message_id}", response_model=MessageResponse)
 async def get_message_status(
     message_id: int,
-    _auth: OGxAuthManager = Depends(get_auth_manager),
-    settings: Settings = Depends(get_settings),
+    tracker: MessageStatusTracker = Depends(get_status_tracker),
 ) -> MessageResponse:
     """Get status of a specific message (OGx-1.txt Section 5.5).
 
+    Served from the status tracker's local copy; lookups it cannot answer share
+    one batched fw_statuses call (see ogx_status_tracker).
+
     Message States (OGx-1.txt Section 4.3):
     - FW_ACCEPTED: Message accepted by OGx
     - FW_SENDING: Message sending in progress
@@ -192,18 +242,19 @@ async def get_message_status(
     - FW_BROADCAST_SUBMITTED: Broadcast message transmitted
     """
     try:
-        # Get OGx client
-        client = await get_OGx_client(settings)
-
         # Get message status
         try:
-            status = await client.get_message_status([message_id])
-            return MessageResponse(**status)
+            status = await tracker.get_status(message_id)
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Failed to get message status: {str(e)}"
             ) from e
+        if status is None or "State" not in status:
+            raise HTTPException(status_code=404, detail=f"Message {message_id} status not found")
+        return MessageResponse(**{"Type": MessageType.FORWARD, "DestinationID": "", **status})
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to get message status: {str(e)}"
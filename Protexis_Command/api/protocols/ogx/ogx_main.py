@@ -2,38 +2,107 @@
 
 This module initializes and configures the FastAPI application for the OGx Gateway.
 It sets up middleware, routes, and background workers for message handling.
+With OGx_WORKER_SINGLETON set, every process campaigns for the worker's lease
+and only the elected one runs the message worker. With OGx_QUEUE_PARTITIONS
+above 1, every process instead joins the partitioned worker pool and drains its
+share of the queue's partitions.
+
+On shutdown the worker drains (see MessageWorker.drain) rather than being
+cancelled mid-flight. A deploy can start the drain early with POST /worker/drain
+(admin only) and poll /health, which answers 503 with the drain progress until
+the worker has drained.
+
+One process per deployment also runs the status poller (see ogx_status_tracker),
+which reports the final states of accepted messages to the worker's outstanding
+limiter.
 """
 
 import asyncio
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Dict, Optional, cast
 
 # Third-party imports
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 
+from Protexis_Command.api.common.auth.manager import close_auth_manager
+from Protexis_Command.api.common.auth.oauth2 import get_current_admin_user
+from Protexis_Command.api.common.clients.factory import close_OGx_clients
 from Protexis_Command.api.common.middleware.ogx_auth import add_ogx_auth_middleware
 from Protexis_Command.api.protocols.ogx.routes.messages import router as messages_router
 from Protexis_Command.api.protocols.ogx.routes.terminal import router as terminal_router
 from Protexis_Command.api.protocols.ogx.routes.updates import router as updates_router
 from Protexis_Command.api.protocols.ogx.services.ogx_message_worker import get_message_worker
+from Protexis_Command.api.protocols.ogx.services.ogx_status_tracker import (
+    FinalStatusCallback,
+    close_status_tracker,
+    get_status_tracker,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_worker_pool import get_worker_pool
 
 # First-party imports
 from Protexis_Command.core.logging.loggers import get_protocol_logger
+from Protexis_Command.core.settings.app_settings import get_settings
+from Protexis_Command.infrastructure.cache.leader import SingletonTask
+from Protexis_Command.infrastructure.cache.redis import get_redis_client
+from Protexis_Command.infrastructure.database.models.user import User
+from Protexis_Command.infrastructure.http import close_http_client
 
 logger = get_protocol_logger()
 
 
+async def initialize_status_poller(on_final: FinalStatusCallback) -> None:
+    """Start campaigning to run the status poller.
+
+    Args:
+        on_final: Called for each message the poller sees reach a final state
+    """
+    settings = get_settings()
+    tracker = await get_status_tracker()
+    tracker.on_final = on_final
+    election = SingletonTask(
+        await get_redis_client(),
+        "ogx:status_poller",
+        lambda _token: tracker.run(),
+        settings.LEADER_LEASE_TTL_SECONDS,
+    )
+    app.state.status_poller = election
+    await election.start()
+    logger.info("Status poller election started")
+
+
 async def initialize_worker() -> None:
     """Initialize and start the message worker.
 
-    This function creates a new message worker instance and starts it.
-    Any startup errors are logged but not re-raised to prevent application
-    startup failure.
+    This function creates a new message worker instance and starts it, or with
+    OGx_WORKER_SINGLETON starts campaigning to run it. With OGx_QUEUE_PARTITIONS
+    above 1 it joins the partitioned worker pool instead. Any startup errors are
+    logged but not re-raised to prevent application startup failure.
     """
     try:
+        settings = get_settings()
+        if settings.OGx_QUEUE_PARTITIONS > 1:
+            pool = await get_worker_pool()
+            app.state.worker_pool = pool
+            await pool.start()
+            logger.info("Joined partitioned message worker pool")
+            await initialize_status_poller(pool.handle_status_update)
+            return
         worker = await get_message_worker()
         app.state.message_worker = worker
+        await initialize_status_poller(worker.handle_status_update)
+        if settings.OGx_WORKER_SINGLETON:
+            election = SingletonTask(
+                await get_redis_client(),
+                "ogx:message_worker",
+                worker.run,
+                settings.LEADER_LEASE_TTL_SECONDS,
+            )
+            worker.is_current = election.is_current
+            app.state.worker_election = election
+            await election.start()
+            logger.info("Message worker election started")
+            return
         await worker.start()
         logger.info("Message worker started successfully")
     except (ConnectionError, TimeoutError) as e:
@@ -49,13 +118,44 @@ async def initialize_worker() -> None:
         app.state.worker_error = str(e)
 
 
+async def drain_worker() -> None:
+    """Drain the message worker, then release its lease or partitions."""
+    if hasattr(app.state, "worker_pool"):
+        await app.state.worker_pool.stop()
+        return
+    if hasattr(app.state, "message_worker"):
+        await app.state.message_worker.drain()
+    if hasattr(app.state, "worker_election"):
+        await app.state.worker_election.stop()
+
+
+def start_drain() -> asyncio.Task:
+    """Start draining the message worker, once per process."""
+    if not hasattr(app.state, "drain_task"):
+        app.state.drain_task = asyncio.create_task(drain_worker())
+    return cast(asyncio.Task, app.state.drain_task)
+
+
+def get_drain_status() -> Optional[Dict]:
+    """Get drain progress, or None if the worker is not draining."""
+    if not hasattr(app.state, "drain_task"):
+        return None
+    if hasattr(app.state, "worker_pool"):
+        return cast(Dict, app.state.worker_pool.get_status())
+    if hasattr(app.state, "message_worker"):
+        return cast(Dict, app.state.message_worker.get_drain_status())
+    return {"draining": True, "drained": app.state.drain_task.done()}
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Manage application lifespan.
 
     This context manager handles startup and shutdown tasks:
-    - On startup: Initializes the message worker
-    - On shutdown: Gracefully stops the message worker
+    - On startup: Initializes the message worker and the status poller
+    - On shutdown: Drains the message worker and releases its lease, or its
+      partitions in a partitioned worker pool, stops the status poller, then
+      closes the shared status tracker, OGx clients, auth manager and HTTP client
 
     Args:
         app: The FastAPI application instance
@@ -65,8 +165,13 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     yield
     if worker_task:
         await worker_task
-    if hasattr(app.state, "message_worker"):
-        await app.state.message_worker.stop()
+    await start_drain()
+    if hasattr(app.state, "status_poller"):
+        await app.state.status_poller.stop()
+    await close_status_tracker()
+    await close_OGx_clients()
+    await close_auth_manager()
+    await close_http_client()
 
 
 app = FastAPI(
@@ -105,11 +210,40 @@ app.include_router(
 )
 
 
+@app.post("/worker/drain", status_code=status.HTTP_202_ACCEPTED)
+async def drain_message_worker(_admin: User = Depends(get_current_admin_user)) -> dict:
+    """Start draining the message worker ahead of shutdown (admin only).
+
+    The worker stops taking new messages and finishes those in flight; poll
+    /health until it reports "drained".
+
+    Returns:
+        dict: Drain progress
+    """
+    start_drain()
+    return {"status": "draining", "drain": get_drain_status()}
+
+
 @app.get("/health")
-async def health_check() -> dict:
+async def health_check(response: Response) -> dict:
     """Check application health status.
 
+    While the message worker drains, the check answers 503 so load balancers
+    stop routing to this process, with status "draining" until the worker has
+    drained and "drained" after.
+
     Returns:
-        dict: Health check response with status
+        dict: Health check response with status, and the message worker
+            election when the worker runs as a singleton, or the partitions this
+            process drains in a partitioned worker pool
     """
+    drain = get_drain_status()
+    if drain is not None:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        state = "drained" if app.state.drain_task.done() else "draining"
+        return {"status": state, "drain": drain}
+    if hasattr(app.state, "worker_pool"):
+        return {"status": "healthy", "worker_pool": app.state.worker_pool.get_status()}
+    if hasattr(app.state, "worker_election"):
+        return {"status": "healthy", "worker_election": app.state.worker_election.get_status()}
     return {"status": "healthy"}
@@ -1,17 +1,38 @@
 """Services for the OGX protocol."""
 
+from .ogx_dlq_replay import DeadLetterFilter, DeadLetterReplayer, ReplayProgress
 from .ogx_message_processor import MessageProcessor
-from .ogx_message_queue import OGxMessageQueue
+from .ogx_message_queue import MessageQueue, OGxMessageQueue, QueueDepths
 from .ogx_message_receiver import MessageReceiver
 from .ogx_message_sender import MessageSender
 from .ogx_message_submission import submit_OGx_message
 from .ogx_message_worker import MessageWorker
+from .ogx_outstanding_limiter import TerminalOutstandingLimiter
+from .ogx_partitions import PartitionedMessageQueue, partition_for
+from .ogx_queue_factory import create_message_queue, get_message_queue
+from .ogx_status_tracker import MessageStatusTracker, get_status_tracker
+from .ogx_stream_queue import OGxStreamMessageQueue
+from .ogx_worker_pool import PartitionedWorkerPool
 
 __all__ = [
+    "DeadLetterFilter",
+    "DeadLetterReplayer",
+    "ReplayProgress",
     "MessageProcessor",
+    "MessageQueue",
     "OGxMessageQueue",
+    "QueueDepths",
+    "OGxStreamMessageQueue",
+    "PartitionedMessageQueue",
+    "partition_for",
+    "create_message_queue",
+    "get_message_queue",
     "MessageReceiver",
     "MessageSender",
     "submit_OGx_message",
+    "MessageStatusTracker",
+    "get_status_tracker",
     "MessageWorker",
+    "PartitionedWorkerPool",
+    "TerminalOutstandingLimiter",
 ]
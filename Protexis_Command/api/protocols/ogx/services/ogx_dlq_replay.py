@@ -0,0 +1,251 @@
+"""Dead letter queue replay.
+
+Messages that use up their retries are parked in OGx:messages:dead_letter until
+they are replayed or reach the end of the retention period. After an OGx outage
+the dead letter queue can hold thousands of messages. DeadLetterReplayer selects
+them by error, age, destination or SIN/MIN and moves them back to pending in
+chunks, paced so the replay never feeds the worker faster than the OGx submit
+budget (OGx_DLQ_REPLAY_RATE_PER_MINUTE, OGx-1.txt section 3.4).
+
+Used by the dead letter admin routes and the replay_dead_letters script.
+"""
+
+import asyncio
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from redis.exceptions import RedisError
+
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import (
+    MessageQueue,
+    QueuedMessage,
+)
+from Protexis_Command.core.logging.log_settings import LoggingConfig
+from Protexis_Command.core.logging.loggers import get_protocol_logger
+from Protexis_Command.core.settings.app_settings import Settings
+from Protexis_Command.protocols.ogx.constants.ogx_limits import (
+    DEFAULT_WINDOW_SECONDS,
+    MAX_SUBMIT_MESSAGES,
+)
+
+
+@dataclass
+class DeadLetterFilter:
+    """Selects dead-lettered messages for replay.
+
+    Criteria left unset match every message.
+
+    Attributes:
+        error_contains: Case-insensitive substring of the last delivery error
+        destination_id: Destination terminal ID
+        sin: Service identification number of the payload
+        min: Message identification number of the payload
+        min_age_seconds: Only messages first queued at least this long ago
+        max_age_seconds: Only messages first queued at most this long ago
+    """
+
+    error_contains: Optional[str] = None
+    destination_id: Optional[str] = None
+    sin: Optional[int] = None
+    min: Optional[int] = None
+    min_age_seconds: Optional[float] = None
+    max_age_seconds: Optional[float] = None
+
+    def matches(self, message: QueuedMessage, now: Optional[float] = None) -> bool:
+        """Check whether a dead-lettered message meets every criterion."""
+        if self.error_contains and (
+            self.error_contains.lower() not in (message.error or "").lower()
+        ):
+            return False
+        if self.destination_id and message.payload.get("DestinationID") != self.destination_id:
+            return False
+        body = message.payload.get("Payload")
+        if not isinstance(body, dict):
+            body = {}
+        if self.sin is not None and body.get("SIN") != self.sin:
+            return False
+        if self.min is not None and body.get("MIN") != self.min:
+            return False
+        age = (time.time() if now is None else now) - message.created_at
+        if self.min_age_seconds is not None and age < self.min_age_seconds:
+            return False
+        if self.max_age_seconds is not None and age > self.max_age_seconds:
+            return False
+        return True
+
+
+@dataclass
+class ReplayProgress:
+    """Progress of a dead letter replay.
+
+    Attributes:
+        dry_run: True if matching messages are only counted
+        status: "running", "completed", "cancelled" or "failed"
+        scanned: Dead-lettered messages examined
+        matched: Messages selected by the filter
+        replayed: Messages moved back to pending
+        missing: Selected messages that left the dead letter queue before replay
+        started_at: Replay start timestamp
+        finished_at: Replay end timestamp, None while running
+        error: Error that stopped a failed replay
+    """
+
+    dry_run: bool = False
+    status: str = "running"
+    scanned: int = 0
+    matched: int = 0
+    replayed: int = 0
+    missing: int = 0
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def remaining(self) -> int:
+        """Selected messages not yet replayed."""
+        if self.dry_run:
+            return self.matched
+        return self.matched - self.replayed - self.missing
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for API responses."""
+        return {**asdict(self), "remaining": self.remaining}
+
+
+class DeadLetterReplayer:
+    """Replays dead-lettered messages into the pending queue at a bounded rate.
+
+    Matching messages are replayed in chunks of at most chunk_size. After each
+    chunk the replayer waits one submit interval per replayed message, so the
+    worker is never fed more than rate_per_minute messages a minute. Messages
+    rejected because the pending queue is full stay in the dead letter queue and
+    are retried after the worker has had an interval to drain it.
+
+    Args:
+        message_queue (MessageQueue): Queue backend holding the dead letter queue
+        settings (Settings): Application settings
+        rate_per_minute (Optional[int]): Replay rate; capped at
+            OGx_DLQ_REPLAY_RATE_PER_MINUTE, which is also the default
+        chunk_size (Optional[int]): Maximum messages moved per queue call
+    """
+
+    def __init__(
+        self,
+        message_queue: MessageQueue,
+        settings: Settings,
+        rate_per_minute: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ):
+        self.message_queue = message_queue
+        self.settings = settings
+        self.logger = get_protocol_logger(config=LoggingConfig())
+
+        budget = settings.OGx_DLQ_REPLAY_RATE_PER_MINUTE
+        self.rate_per_minute = min(rate_per_minute or budget, budget)
+        if self.rate_per_minute <= 0:
+            raise ValueError("Replay rate must be a positive number of messages per minute")
+        # A chunk never carries more than a minute of submit budget or a full pending queue
+        self.chunk_size = min(chunk_size or MAX_SUBMIT_MESSAGES, self.rate_per_minute)
+        self.interval = DEFAULT_WINDOW_SECONDS / self.rate_per_minute
+
+    async def count(self, selection: DeadLetterFilter) -> ReplayProgress:
+        """Count the dead-lettered messages a replay would select, without moving any."""
+        return await self.replay(selection, dry_run=True)
+
+    async def replay(
+        self,
+        selection: DeadLetterFilter,
+        dry_run: bool = False,
+        progress: Optional[ReplayProgress] = None,
+        on_progress: Optional[Callable[[ReplayProgress], None]] = None,
+    ) -> ReplayProgress:
+        """Replay the dead-lettered messages selected by a filter.
+
+        Args:
+            selection: Messages to replay
+            dry_run: Only count the selected messages
+            progress: Progress record to update, for callers polling a running replay
+            on_progress: Called with the progress after each chunk
+
+        Returns:
+            ReplayProgress: Final progress. Redis failures stop the replay and are
+                reported with status "failed" rather than raised.
+        """
+        if progress is None:
+            progress = ReplayProgress(dry_run=dry_run)
+        seen: Set[str] = set()
+        try:
+            async for messages in self.message_queue.scan_dead_letters():
+                now = time.time()
+                selected: List[str] = []
+                for message in messages:
+                    # HSCAN may return a message more than once
+                    if message.message_id in seen:
+                        continue
+                    seen.add(message.message_id)
+                    progress.scanned += 1
+                    if selection.matches(message, now):
+                        selected.append(message.message_id)
+                progress.matched += len(selected)
+
+                if dry_run:
+                    self._report(progress, on_progress)
+                    continue
+                for start in range(0, len(selected), self.chunk_size):
+                    await self._replay_chunk(selected[start : start + self.chunk_size], progress)
+                    self._report(progress, on_progress)
+            progress.status = "completed"
+        except asyncio.CancelledError:
+            progress.status = "cancelled"
+            raise
+        except (RedisError, ConnectionError, TimeoutError) as e:
+            progress.status = "failed"
+            progress.error = str(e)
+            self.logger.error(
+                "Dead letter replay failed: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "progress": progress.to_dict(),
+                    "error": str(e),
+                    "action": "replay_dead_letters",
+                },
+            )
+        finally:
+            progress.finished_at = time.time()
+
+        self.logger.info(
+            "Dead letter replay %s: %d of %d selected messages replayed",
+            progress.status,
+            progress.replayed,
+            progress.matched,
+            extra={
+                "customer_id": self.settings.CUSTOMER_ID,
+                "asset_id": "message_queue",
+                "progress": progress.to_dict(),
+                "action": "replay_dead_letters",
+            },
+        )
+        return progress
+
+    async def _replay_chunk(self, message_ids: List[str], progress: ReplayProgress) -> None:
+        """Replay one chunk, waiting for pending queue capacity as needed."""
+        remaining = message_ids
+        while remaining:
+            statuses = await self.message_queue.replay_dead_letters(remaining)
+            replayed = sum(1 for status in statuses.values() if status == "accepted")
+            progress.replayed += replayed
+            progress.missing += sum(1 for status in statuses.values() if status == "missing")
+            remaining = [m for m in remaining if statuses.get(m) == "queue_full"]
+            # Replayed messages use up submit budget; a full queue gets an interval to drain
+            await asyncio.sleep(max(replayed, 1 if remaining else 0) * self.interval)
+
+    @staticmethod
+    def _report(
+        progress: ReplayProgress, on_progress: Optional[Callable[[ReplayProgress], None]]
+    ) -> None:
+        """Pass progress to the caller's callback."""
+        if on_progress is not None:
+            on_progress(progress)
@@ -0,0 +1,123 @@
+"""Idempotency index for outbound submissions.
+
+Clients retry HTTP submits on timeouts. Without an idempotency check each retry
+becomes another queue entry and another over-the-air message, wasting satellite
+bytes and the terminal's outstanding message slots.
+
+A submission is identified by the customer and either its UserMessageID (with
+its destination) or, when the client did not set one, a hash of its canonical
+payload. The index maps that identity to the ID of the message the first
+submission created, for OGx_IDEMPOTENCY_TTL_SECONDS (UserMessageID) or
+OGx_IDEMPOTENCY_HASH_TTL_SECONDS (payload hash). Identical commands sent on
+purpose more than the hash TTL apart are queued again.
+
+Key layout:
+    OGx:idempotency:<path>:<customer>:umid:<destination>:<UserMessageID>
+    OGx:idempotency:<path>:<customer>:sha256:<payload hash>
+
+The queue backends check and write the index under the "queue" path inside their
+enqueue scripts, storing the queue message ID. SubmissionIdempotencyIndex covers
+routes that submit to OGx directly under the "direct" path, storing the OGx
+forward message ID. The paths keep the two kinds of entry from colliding when
+the same submission goes both ways.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Final, Optional, Union
+
+from redis.asyncio import Redis
+
+from Protexis_Command.core.settings.app_settings import Settings
+
+IDEMPOTENCY_PREFIX: Final[str] = "OGx:idempotency:"
+QUEUE_IDEMPOTENCY_PREFIX: Final[str] = f"{IDEMPOTENCY_PREFIX}queue:"
+DIRECT_IDEMPOTENCY_PREFIX: Final[str] = f"{IDEMPOTENCY_PREFIX}direct:"
+
+# Placeholder stored while the first submission is on its way to OGx
+IN_FLIGHT: Final[str] = "in_flight"
+
+# Seconds an in-flight claim survives a process that dies before completing it
+IN_FLIGHT_TTL_SECONDS: Final[int] = 60
+
+
+def idempotency_key(
+    customer_id: str, payload: Dict[str, Any], prefix: str = QUEUE_IDEMPOTENCY_PREFIX
+) -> str:
+    """Get the idempotency index key for a submission payload.
+
+    Args:
+        customer_id: Customer the submission belongs to
+        payload: Submission in OGx format (DestinationID, UserMessageID, Payload, ...)
+        prefix: Key prefix of the submission path, queued by default
+
+    Returns:
+        str: Redis key of the submission's index entry
+    """
+    user_message_id = payload.get("UserMessageID")
+    if user_message_id is not None:
+        identity = f"umid:{payload.get('DestinationID', '')}:{user_message_id}"
+    else:
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        identity = f"sha256:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+    return f"{prefix}{customer_id}:{identity}"
+
+
+def idempotency_ttl(settings: Settings, payload: Dict[str, Any]) -> int:
+    """Get how long a submission's index entry is kept, in seconds."""
+    if payload.get("UserMessageID") is not None:
+        return settings.OGx_IDEMPOTENCY_TTL_SECONDS
+    return settings.OGx_IDEMPOTENCY_HASH_TTL_SECONDS
+
+
+class SubmissionIdempotencyIndex:
+    """Idempotency index for submissions sent to OGx without the queue.
+
+    The first request for a submission claims its key before calling OGx and
+    stores the forward message ID once the submission is accepted. Retries get
+    the ID back instead of submitting again, so the caller can report the
+    message's current status. If the submission fails, the claim is released so
+    the client can retry.
+
+    Args:
+        redis (Redis): Async Redis client
+        settings (Settings): Application settings
+    """
+
+    def __init__(self, redis: Redis, settings: Settings):
+        self.redis = redis
+        self.settings = settings
+
+    async def claim(self, payload: Dict[str, Any]) -> Optional[str]:
+        """Claim a submission, or get the message ID recorded for an earlier one.
+
+        Args:
+            payload: Submission in OGx format
+
+        Returns:
+            Optional[str]: None if the caller now owns the submission; otherwise
+                the stored forward message ID, or IN_FLIGHT while the first
+                submission has not completed
+        """
+        key = self._key(payload)
+        if await self.redis.set(key, IN_FLIGHT, nx=True, ex=IN_FLIGHT_TTL_SECONDS):
+            return None
+        existing = await self.redis.get(key)
+        if existing is None:
+            # The earlier claim expired between the two calls; claim again
+            return await self.claim(payload)
+        return str(existing)
+
+    async def complete(self, payload: Dict[str, Any], forward_id: Union[int, str]) -> None:
+        """Record the forward message ID of a claimed submission."""
+        await self.redis.set(
+            self._key(payload), str(forward_id), ex=idempotency_ttl(self.settings, payload)
+        )
+
+    async def release(self, payload: Dict[str, Any]) -> None:
+        """Release a claimed submission that was not accepted."""
+        await self.redis.delete(self._key(payload))
+
+    def _key(self, payload: Dict[str, Any]) -> str:
+        """Get the direct submission index key for a payload."""
+        return idempotency_key(self.settings.CUSTOMER_ID, payload, DIRECT_IDEMPOTENCY_PREFIX)
@@ -3,14 +3,38 @@
 This module handles message queueing and processing for the OGx API.
 """
 
+import asyncio
 import json
+import logging
 import time
-from typing import Dict, List, Optional
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Final, List, Optional, Sequence, Tuple, cast
 
+import msgpack
 from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
 from redis.exceptions import RedisError
 
 from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.models.messages import MessagePriority
+from Protexis_Command.api.protocols.ogx.services.ogx_idempotency import (
+    idempotency_key,
+    idempotency_ttl,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_queue_scripts import (
+    CLAIM_SCRIPT,
+    DEFER_SCRIPT,
+    DELIVER_SCRIPT,
+    ENQUEUE_SCRIPT,
+    FAIL_SCRIPT,
+    HOLD_SCRIPT,
+    PROMOTE_SCRIPT,
+    REAP_SCRIPT,
+    RELEASE_SCRIPT,
+    REPLAY_SCRIPT,
+    RETURN_SCRIPT,
+)
 from Protexis_Command.core.logging.log_settings import LoggingConfig
 from Protexis_Command.core.logging.loggers import get_protocol_logger
 from Protexis_Command.core.settings.app_settings import Settings
@@ -39,6 +63,102 @@ For message format examples and state transitions, see protocols.ogx.constants.m
 For rate limits and batch sizes, see protocols.ogx.constants.limits.
 """
 
+# Namespace of the queue's Redis keys
+KEY_PREFIX: Final[str] = "OGx:messages:"
+
+# Sorted set of message IDs by enqueue time, shared by all queue backends for
+# retention; each partition of a partitioned queue has its own
+EXPIRY_INDEX: Final[str] = "OGx:messages:expiry"
+
+# Pub/sub channel notified whenever messages become ready for workers
+READY_CHANNEL: Final[str] = "OGx:messages:ready"
+
+# Maximum number of expired messages removed per cleanup round trip
+CLEANUP_CHUNK_SIZE: Final[int] = 1000
+
+# Schema version of the binary entry encoding, stored as the entry's first byte.
+# Entries starting with "{" are legacy JSON written before the binary encoding.
+ENTRY_FORMAT_VERSION: Final[int] = 1
+
+# Priority lanes in dequeue order
+LANES: Final[Tuple[MessagePriority, ...]] = (
+    MessagePriority.HIGH,
+    MessagePriority.NORMAL,
+    MessagePriority.LOW,
+)
+
+
+def lane_key(base: str, lane: MessagePriority) -> str:
+    """Get the Redis key for a priority lane.
+
+    The normal lane keeps the unsuffixed key used before lanes existed, so
+    messages queued by earlier versions are served as normal priority.
+    """
+    return base if lane == MessagePriority.NORMAL else f"{base}:{lane.value}"
+
+
+def partition_prefix(partition: Optional[int]) -> str:
+    """Get the key prefix of a queue partition (see ogx_partitions).
+
+    Partition n > 0 keeps its keys under OGx:messages:p<n>:. Partition 0 keeps
+    the unpartitioned keys, so messages queued before partitioning was enabled
+    are served by partition 0.
+    """
+    return f"{KEY_PREFIX}p{partition}:" if partition else KEY_PREFIX
+
+
+def get_lane_weights(settings: Settings) -> Dict[MessagePriority, int]:
+    """Get the dequeue weight of each priority lane from settings."""
+    return {
+        MessagePriority.HIGH: settings.OGx_QUEUE_WEIGHT_HIGH,
+        MessagePriority.NORMAL: settings.OGx_QUEUE_WEIGHT_NORMAL,
+        MessagePriority.LOW: settings.OGx_QUEUE_WEIGHT_LOW,
+    }
+
+
+def allocate_lane_quotas(
+    depths: Dict[MessagePriority, int], batch_size: int, weights: Dict[MessagePriority, int]
+) -> Dict[MessagePriority, int]:
+    """Split a batch between priority lanes by weight.
+
+    Each non-empty lane gets a share of the batch proportional to its weight and
+    at least one slot, so lower priorities are never starved. Slots a lane cannot
+    fill go to the other lanes in priority order. If the batch is smaller than
+    the number of non-empty lanes, the lowest priority lanes give up their slot.
+
+    Args:
+        depths: Number of ready messages per lane
+        batch_size: Total number of messages to fetch
+        weights: Dequeue weight per lane
+
+    Returns:
+        Dict[MessagePriority, int]: Number of messages to fetch from each lane
+    """
+    quotas = {lane: 0 for lane in LANES}
+    active = [lane for lane in LANES if depths.get(lane, 0) > 0]
+    if not active:
+        return quotas
+
+    total_weight = sum(max(weights[lane], 0) for lane in active) or len(active)
+    for lane in active:
+        share = max(1, batch_size * max(weights[lane], 0) // total_weight)
+        quotas[lane] = min(share, depths[lane])
+
+    spare = batch_size - sum(quotas.values())
+    for lane in active:
+        if spare <= 0:
+            break
+        extra = min(spare, depths[lane] - quotas[lane])
+        quotas[lane] += extra
+        spare -= extra
+    for lane in reversed(active):
+        if spare >= 0:
+            break
+        reduction = min(-spare, quotas[lane])
+        quotas[lane] -= reduction
+        spare += reduction
+    return quotas
+
 
 class QueuedMessage:
     """Message in the queue with metadata.
@@ -46,6 +166,10 @@ class QueuedMessage:
     This class encapsulates a message and its metadata for queue processing.
     It tracks the message's state, retry attempts, and error history.
 
+    Queue entries are stored with encode(): a schema version byte followed by the
+    fields as a msgpack array. decode() also reads legacy JSON entries, so queues
+    written before the binary encoding drain without migration.
+
     Attributes:
         message_id (str): Unique identifier for the message
         payload (Dict): The actual message content to be delivered
@@ -53,9 +177,21 @@ class QueuedMessage:
         retry_count (int): Number of delivery attempts made
         last_attempt (Optional[float]): Timestamp of last delivery attempt
         error (Optional[str]): Last error message if failed
+        priority (MessagePriority): Priority lane the message is queued in
         created_at (float): Timestamp when message was first queued
     """
 
+    __slots__ = (
+        "message_id",
+        "payload",
+        "state",
+        "retry_count",
+        "last_attempt",
+        "error",
+        "priority",
+        "created_at",
+    )
+
     def __init__(
         self,
         message_id: str,
@@ -64,6 +200,8 @@ class QueuedMessage:
         retry_count: int = 0,
         last_attempt: Optional[float] = None,
         error: Optional[str] = None,
+        priority: MessagePriority = MessagePriority.NORMAL,
+        created_at: Optional[float] = None,
     ):
         self.message_id = message_id
         self.payload = payload
@@ -71,7 +209,8 @@ class QueuedMessage:
         self.retry_count = retry_count
         self.last_attempt = last_attempt
         self.error = error
-        self.created_at = time.time()
+        self.priority = priority
+        self.created_at = created_at if created_at is not None else time.time()
 
     def to_dict(self) -> Dict:
         """Convert to dictionary for storage."""
@@ -82,9 +221,27 @@ class QueuedMessage:
             "retry_count": self.retry_count,
             "last_attempt": self.last_attempt,
             "error": self.error,
+            "priority": self.priority.value,
             "created_at": self.created_at,
         }
 
+    def apply_metadata(self, metadata: Dict[str, str]) -> None:
+        """Apply delivery metadata stored in the message's metadata hash.
+
+        Args:
+            metadata: Metadata hash contents as returned by HGETALL
+        """
+        if "state" in metadata:
+            self.state = MessageState(int(metadata["state"]))
+        if "retry_count" in metadata:
+            self.retry_count = int(metadata["retry_count"])
+        if "last_attempt" in metadata:
+            self.last_attempt = float(metadata["last_attempt"])
+        if "error" in metadata:
+            self.error = metadata["error"]
+        if "priority" in metadata:
+            self.priority = MessagePriority(metadata["priority"])
+
     @classmethod
     def from_dict(cls, data: Dict) -> "QueuedMessage":
         """Create from dictionary."""
@@ -95,10 +252,598 @@ class QueuedMessage:
             retry_count=data["retry_count"],
             last_attempt=data["last_attempt"],
             error=data["error"],
+            priority=MessagePriority(data.get("priority", MessagePriority.NORMAL)),
+            created_at=data.get("created_at"),
         )
 
+    def encode(self) -> str:
+        """Encode as a queue entry.
+
+        The Redis clients are created with decode_responses=True, so the binary
+        encoding is carried as a latin-1 string, which maps each byte to one
+        character and round-trips exactly. Redis stores that string UTF-8
+        encoded, so each byte at or above 0x80 takes two: about 234 stored bytes
+        per entry for 200 encoded bytes in scripts/benchmarks/queue_encoding.py,
+        against 399 for JSON. Storing the raw bytes needs a client without
+        decode_responses for every queue command.
+
+        Returns:
+            str: Version byte followed by the msgpack-encoded fields
+        """
+        fields = [
+            self.message_id,
+            self.payload,
+            self.state.value,
+            self.retry_count,
+            self.last_attempt,
+            self.error,
+            self.priority.value,
+            self.created_at,
+        ]
+        packed = cast(bytes, msgpack.packb(fields))
+        return (bytes((ENTRY_FORMAT_VERSION,)) + packed).decode("latin-1")
+
+    @classmethod
+    def decode(cls, data: str) -> "QueuedMessage":
+        """Decode a queue entry written by encode() or a legacy JSON entry.
+
+        Args:
+            data: Stored queue entry
+
+        Returns:
+            QueuedMessage: Decoded message
+
+        Raises:
+            ValueError: If the entry is malformed or has an unknown format version
+        """
+        if data.startswith("{"):
+            try:
+                return cls.from_dict(json.loads(data))
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"Invalid legacy queue entry: {e}") from e
+
+        raw = data.encode("latin-1")
+        if not raw or raw[0] != ENTRY_FORMAT_VERSION:
+            raise ValueError(f"Unknown queue entry format version: {raw[:1]!r}")
+        try:
+            (
+                message_id,
+                payload,
+                state,
+                retry_count,
+                last_attempt,
+                error,
+                priority,
+                created_at,
+            ) = msgpack.unpackb(raw[1:])
+            return cls(
+                message_id=message_id,
+                payload=payload,
+                state=MessageState(state),
+                retry_count=retry_count,
+                last_attempt=last_attempt,
+                error=error,
+                priority=MessagePriority(priority),
+                created_at=created_at,
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid queue entry: {e}") from e
+
+
+@dataclass
+class QueueDepths:
+    """Snapshot of how many messages are in each part of the outbound queue.
+
+    Every count is read from a structure the queue transitions already maintain
+    atomically (lane indexes, retry schedules, queue hashes), using only O(1)
+    commands, so a snapshot costs one or two round trips regardless of backlog.
+
+    Attributes:
+        lanes: Messages ready for dispatch per priority lane
+        oldest_ages: Seconds the oldest ready message of each lane has been
+            waiting (0 for an empty lane)
+        scheduled: Retries waiting for their backoff to end
+        held: Messages held for terminals with too many messages outstanding
+        in_progress: Messages claimed by a worker and not yet completed
+        delivered: Delivered messages still within retention
+        dead_letter: Messages that used up their retries
+    """
+
+    lanes: Dict[MessagePriority, int]
+    oldest_ages: Dict[MessagePriority, float]
+    scheduled: int = 0
+    held: int = 0
+    in_progress: int = 0
+    delivered: int = 0
+    dead_letter: int = 0
+
+    @property
+    def pending(self) -> int:
+        """Messages counted against MAX_SUBMIT_MESSAGES."""
+        return sum(self.lanes.values()) + self.scheduled + self.held
+
+    def states(self) -> Dict[str, int]:
+        """Get the number of messages in each queue state."""
+        return {
+            "ready": sum(self.lanes.values()),
+            "scheduled": self.scheduled,
+            "held": self.held,
+            "in_progress": self.in_progress,
+            "delivered": self.delivered,
+            "dead_letter": self.dead_letter,
+        }
+
+
+class MessageQueue(ABC):
+    """Interface for outbound message queue backends.
+
+    Backends are selected with Settings.OGx_QUEUE_BACKEND (see ogx_queue_factory):
+    - OGxMessageQueue: Redis hashes with a FIFO pending index (default)
+    - OGxStreamMessageQueue: Redis Streams consumer group with automatic reclaim
+
+    All backends share the retry policy and the delivered and dead letter queues,
+    so tooling that inspects those queues works regardless of backend.
+
+    Idle workers wait on READY_CHANNEL (see wait_for_messages) instead of polling.
+    Backends publish to it whenever messages become ready: on enqueue, dead letter
+    replay, release of held messages and reclaim of expired leases.
+
+    A backend created for one partition of a partitioned queue (see
+    ogx_partitions) keeps its queues, indexes and ready channel under the
+    partition's key prefix. Message metadata and the idempotency index are
+    shared by all partitions.
+    """
+
+    # Set by every backend; the shared methods below rely on them
+    redis: Redis
+    settings: Settings
+    logger: logging.Logger
+    max_batch_size: int
+    max_submit_size: int
+    scheduled_indexes: Dict[MessagePriority, str]
+
+    partition: Optional[int] = None
+    ready_channel: str = READY_CHANNEL
+    _ready_subscription: Optional[PubSub] = None
+
+    @abstractmethod
+    async def initialize(self) -> None:
+        """Prepare backend structures before the first read.
+
+        Must be safe to call on every worker start.
+        """
+
+    @abstractmethod
+    async def enqueue_many(
+        self,
+        messages: Sequence[Tuple[str, Dict]],
+        priority: MessagePriority = MessagePriority.NORMAL,
+    ) -> Dict[str, str]:
+        """Add a batch of messages to the pending queue in one atomic call.
+
+        Messages are accepted in order until the pending queue reaches
+        MAX_SUBMIT_MESSAGES; the capacity check and the writes happen together,
+        so concurrent callers cannot overshoot the limit. Messages matching an
+        earlier submission in the idempotency index are not queued again.
+
+        Args:
+            messages: (message ID, payload) pairs to enqueue
+            priority: Priority lane for the batch
+
+        Returns:
+            Dict[str, str]: Status per message ID: "accepted", "duplicate" (already
+                pending, or a repeat of an indexed submission) or "queue_full"
+        """
+
+    @abstractmethod
+    async def get_pending_messages(self, batch_size: Optional[int] = None) -> List[QueuedMessage]:
+        """Get batch of pending messages ready for processing.
+
+        Batches are split between priority lanes by weight (see allocate_lane_quotas)
+        and returned highest priority first, oldest first within a lane.
+        """
+
+    @abstractmethod
+    async def get_lane_depths(self) -> Dict[MessagePriority, int]:
+        """Get the number of messages waiting in each priority lane."""
+
+    @abstractmethod
+    async def get_queue_depths(self) -> QueueDepths:
+        """Get the number of messages in each part of the queue in O(1)."""
+
+    @abstractmethod
+    async def get_message_state(self, message_id: str) -> Optional[MessageState]:
+        """Get a message's current state in O(1), or None if it is not known."""
+
+    @abstractmethod
+    async def mark_in_progress_many(self, message_ids: Sequence[str]) -> List[str]:
+        """Mark a batch of messages as in progress.
+
+        Returns:
+            List[str]: IDs claimed by this call
+        """
+
+    @abstractmethod
+    async def mark_delivered_many(self, message_ids: Sequence[str]) -> List[str]:
+        """Mark a batch of messages as delivered.
+
+        Returns:
+            List[str]: IDs moved by this call
+        """
+
+    @abstractmethod
+    async def mark_failed_many(
+        self, message_ids: Sequence[str], error: str, retry_after: Optional[float] = None
+    ) -> Dict[str, str]:
+        """Mark a batch of messages as failed, scheduling a retry or dead-lettering each.
+
+        Retries become eligible again after an exponential backoff, or after
+        retry_after seconds when given (for example from a rate limit response).
+
+        Returns:
+            Dict[str, str]: Target queue ("scheduled" or "dead_letter") per moved message ID
+        """
+
+    @abstractmethod
+    async def defer_many(
+        self, message_ids: Sequence[str], reason: str, retry_after: float
+    ) -> List[str]:
+        """Reschedule claimed messages that were turned away without being sent.
+
+        Used when a rate limit or an exhausted call budget stops a submission
+        before it reaches OGx. Each message is parked in its lane's retry
+        schedule for retry_after seconds and the attempt counted by its claim is
+        undone, so deferrals never use up its retries or dead-letter it.
+
+        Args:
+            message_ids: Claimed messages that were not sent
+            reason: Why the messages were deferred, recorded as their error
+            retry_after: Seconds to wait before the messages are eligible again
+
+        Returns:
+            List[str]: IDs deferred by this call
+        """
+
+    @abstractmethod
+    async def reclaim_expired_leases(self) -> Dict[str, str]:
+        """Return messages whose worker stopped before completing them to dispatch.
+
+        Messages that have used up their retries are dead-lettered instead.
+
+        Returns:
+            Dict[str, str]: Target queue ("pending" or "dead_letter") per reclaimed message ID
+        """
+
+    @abstractmethod
+    async def hold_messages(self, terminal_id: str, messages: Sequence[QueuedMessage]) -> List[str]:
+        """Hold fetched, unclaimed messages until their destination terminal has capacity.
+
+        Held messages are not returned by get_pending_messages until they are
+        released with release_held.
+
+        Args:
+            terminal_id: Destination terminal of the messages
+            messages: Messages returned by get_pending_messages and not claimed
+
+        Returns:
+            List[str]: IDs held by this call
+        """
+
+    @abstractmethod
+    async def release_held(self, terminal_id: str, count: int) -> int:
+        """Return up to count held messages for a terminal to dispatch.
+
+        Messages are released highest priority lane first and oldest first within
+        a lane.
+
+        Returns:
+            int: Number of messages released
+        """
+
+    @abstractmethod
+    async def return_unsubmitted(self, message_ids: Sequence[str]) -> List[str]:
+        """Return fetched messages that were never submitted to dispatch.
+
+        Used by a draining worker for messages it fetched or claimed but did not
+        start. The claim does not count as a delivery attempt, and each message
+        keeps its place in its lane.
+
+        Args:
+            message_ids: Messages returned by get_pending_messages and not submitted
+
+        Returns:
+            List[str]: IDs made available to other workers by this call
+        """
+
+    @abstractmethod
+    def scan_dead_letters(
+        self, count: int = CLEANUP_CHUNK_SIZE
+    ) -> AsyncIterator[List[QueuedMessage]]:
+        """Iterate over the dead letter queue in chunks of about count messages.
+
+        Messages moved in or out of the dead letter queue during the scan may or
+        may not be returned.
+        """
+
+    @abstractmethod
+    async def replay_dead_letters(self, message_ids: Sequence[str]) -> Dict[str, str]:
+        """Return dead-lettered messages to dispatch with a fresh retry budget.
+
+        Messages are replayed into the lane they were queued in, behind the
+        messages already waiting, until the pending queue reaches
+        MAX_SUBMIT_MESSAGES; the capacity check and the moves happen together.
+
+        Returns:
+            Dict[str, str]: Status per message ID: "accepted", "queue_full" or
+                "missing" (no longer in the dead letter queue)
+        """
+
+    @abstractmethod
+    async def cleanup_expired_messages(self) -> int:
+        """Clean up messages older than the retention period.
 
-class OGxMessageQueue:
+        Returns:
+            int: Number of messages removed
+        """
+
+    async def enqueue_message(
+        self,
+        message_id: str,
+        payload: Dict,
+        priority: MessagePriority = MessagePriority.NORMAL,
+    ) -> Tuple[str, Optional[MessageState]]:
+        """Add message to pending queue.
+
+        Enforces MAX_SUBMIT_MESSAGES limit from OGx-1.txt section 2.3. A message
+        that is already pending is left unchanged, and a repeat of an earlier
+        submission (same UserMessageID, or same payload within the hash TTL; see
+        ogx_idempotency) is not queued again.
+
+        Args:
+            message_id (str): Unique identifier for the message
+            payload (Dict): Message content to be delivered
+            priority (MessagePriority): Priority lane for the message
+
+        Returns:
+            Tuple[str, Optional[MessageState]]: ID and state of the message the
+                payload is queued as; for a repeat, the earlier message
+
+        Raises:
+            ValueError: If pending queue has reached MAX_SUBMIT_MESSAGES
+            Exception: If the backend operation fails
+        """
+        statuses = await self.enqueue_many([(message_id, payload)], priority)
+        status = statuses.get(message_id)
+        if status == "queue_full":
+            raise ValueError(
+                f"Cannot enqueue more than {self.max_submit_size} messages. "
+                "Wait for current messages to be processed."
+            )
+        if status == "duplicate":
+            existing_id = cast(
+                Optional[str],
+                await self.redis.get(idempotency_key(self.settings.CUSTOMER_ID, payload)),
+            )
+            if existing_id is not None and existing_id != message_id:
+                self.logger.info(
+                    "Submission is a repeat of message %s",
+                    existing_id,
+                    extra={
+                        "customer_id": self.settings.CUSTOMER_ID,
+                        "asset_id": "message_queue",
+                        "message_id": message_id,
+                        "existing_message_id": existing_id,
+                        "action": "enqueue",
+                    },
+                )
+                return existing_id, await self.get_message_state(existing_id)
+            return message_id, await self.get_message_state(message_id)
+        return message_id, MessageState.ACCEPTED
+
+    def _log_enqueued(self, statuses: Dict[str, str]) -> None:
+        """Log the outcome of a batch enqueue."""
+        accepted = [m for m, status in statuses.items() if status == "accepted"]
+        rejected = [m for m, status in statuses.items() if status == "queue_full"]
+        self.logger.info(
+            "Enqueued %d of %d messages",
+            len(accepted),
+            len(statuses),
+            extra={
+                "customer_id": self.settings.CUSTOMER_ID,
+                "asset_id": "message_queue",
+                "message_ids": accepted,
+                "action": "enqueue",
+            },
+        )
+        if rejected:
+            self.logger.warning(
+                "Rejected %d messages: pending queue is full",
+                len(rejected),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": rejected,
+                    "max_messages": self.max_submit_size,
+                    "action": "enqueue",
+                },
+            )
+
+    def _log_replayed(self, statuses: Dict[str, str]) -> None:
+        """Log the outcome of a dead letter replay."""
+        replayed = [m for m, status in statuses.items() if status == "accepted"]
+        if replayed:
+            self.logger.info(
+                "Replayed %d of %d dead-lettered messages",
+                len(replayed),
+                len(statuses),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": replayed,
+                    "action": "replay_dead_letters",
+                },
+            )
+
+    async def mark_in_progress(self, message_id: str) -> bool:
+        """Mark message as in progress.
+
+        Sets state to SENDING, increments the retry count and records the attempt time.
+
+        Args:
+            message_id (str): Message identifier to mark as in progress
+
+        Returns:
+            bool: True if this call claimed the message, False if it was not pending
+                (for example because another worker already claimed it)
+
+        Raises:
+            Exception: If the backend operation fails
+        """
+        return message_id in await self.mark_in_progress_many([message_id])
+
+    async def mark_delivered(self, message_id: str) -> None:
+        """Mark message as successfully delivered.
+
+        Args:
+            message_id (str): Message identifier to mark as delivered
+
+        Raises:
+            Exception: If the backend operation fails
+
+        Note:
+            Messages in delivered queue can be pruned after retention period
+        """
+        await self.mark_delivered_many([message_id])
+
+    async def mark_failed(
+        self, message_id: str, error: str, retry_after: Optional[float] = None
+    ) -> None:
+        """Mark message as failed and handle retries.
+
+        Schedules the message for retry after its backoff delay, or moves it to the
+        dead letter queue once it has reached max_retries.
+
+        Args:
+            message_id (str): Message identifier to mark as failed
+            error (str): Error message describing the failure
+            retry_after (Optional[float]): Seconds to wait before retrying, overriding
+                the exponential backoff
+
+        Raises:
+            Exception: If the backend operation fails
+
+        Note:
+            Messages in dead_letter queue require manual intervention
+        """
+        await self.mark_failed_many([message_id], error, retry_after)
+
+    async def defer(self, message_id: str, reason: str, retry_after: float) -> None:
+        """Reschedule a claimed message that was turned away without being sent.
+
+        Args:
+            message_id (str): Message identifier to defer
+            reason (str): Why the message was deferred
+            retry_after (float): Seconds to wait before the message is eligible again
+
+        Raises:
+            Exception: If the backend operation fails
+        """
+        await self.defer_many([message_id], reason, retry_after)
+
+    async def notify_ready(self) -> None:
+        """Wake workers waiting for messages.
+
+        A lost notification only delays delivery until the waiting workers'
+        timeout, so publish failures are logged rather than raised.
+        """
+        try:
+            await self.redis.publish(self.ready_channel, "1")
+        except RedisError as e:
+            self.logger.warning(
+                "Failed to notify workers: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "error": str(e),
+                    "action": "notify_ready",
+                },
+            )
+
+    async def wait_for_messages(self, timeout: float) -> bool:
+        """Wait until messages may be ready to fetch.
+
+        Returns when a ready notification arrives, when the earliest scheduled
+        retry comes due, or after timeout seconds, whichever is first. The
+        subscription is kept between calls, so notifications published while the
+        caller was busy are not lost. The first call only subscribes and returns
+        straight away, so messages queued before the subscription existed are
+        fetched without waiting.
+
+        Args:
+            timeout: Longest wait in seconds
+
+        Returns:
+            bool: True if woken by a notification (or by subscribing), False on
+                retry due or timeout
+        """
+        try:
+            if self._ready_subscription is None:
+                self._ready_subscription = self.redis.pubsub(ignore_subscribe_messages=True)
+                await self._ready_subscription.subscribe(*self._ready_channels())
+                return True
+
+            deadline = time.time() + timeout
+            next_retry = await self._next_retry_at()
+            if next_retry is not None:
+                deadline = min(deadline, next_retry)
+
+            while (remaining := deadline - time.time()) > 0:
+                if await self._ready_subscription.get_message(timeout=remaining) is not None:
+                    # Drain notifications already buffered; one fetch serves them all
+                    while await self._ready_subscription.get_message(timeout=0.0) is not None:
+                        pass
+                    return True
+            return False
+        except RedisError as e:
+            self.logger.warning(
+                "Ready notifications unavailable, waiting out the timeout: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "error": str(e),
+                    "action": "wait_for_messages",
+                },
+            )
+            await self.close_wakeup()
+            await asyncio.sleep(timeout)
+            return False
+
+    async def close_wakeup(self) -> None:
+        """Drop the ready notification subscription, if any."""
+        subscription, self._ready_subscription = self._ready_subscription, None
+        if subscription is not None:
+            try:
+                await subscription.aclose()
+            except RedisError:
+                pass
+
+    def _ready_channels(self) -> List[str]:
+        """Channels wait_for_messages listens on."""
+        return [self.ready_channel]
+
+    async def _next_retry_at(self) -> Optional[float]:
+        """Get when the earliest scheduled retry comes due, if any are scheduled."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for lane in LANES:
+                await pipe.zrange(self.scheduled_indexes[lane], 0, 0, withscores=True)
+            results = await pipe.execute()
+        due = [float(entries[0][1]) for entries in results if entries]
+        return min(due) if due else None
+
+
+class OGxMessageQueue(MessageQueue):
     """Manages message queuing and retry logic with Redis persistence.
 
     This provides robust implementation of message queue management with the following features:
@@ -115,12 +860,48 @@ class OGxMessageQueue:
     4. failed_queue: Failed messages that will be retried
     5. dead_letter_queue: Permanently failed messages
 
-    Queue operations are atomic and thread-safe through Redis transactions.
+    Pending messages are additionally tracked in pending_indexes, one sorted set of
+    message IDs scored by enqueue time per priority lane (high, normal, low). Batch
+    fetches split the batch between lanes by weight (OGx_QUEUE_WEIGHT_*), read the
+    oldest IDs from each lane's index and then load only those entries from the
+    pending hash, so the cost of a fetch is O(batch) rather than O(backlog) and
+    messages are FIFO within a lane. Every non-empty lane gets at least one slot per
+    batch, so bulk low priority traffic still drains behind urgent commands.
+
+    Failed messages that will be retried stay in pending_queue but are parked in
+    their lane's scheduled_indexes entry, a sorted set scored by the time their
+    backoff ends, instead of the pending index. Each fetch first promotes due
+    retries back into their lane, so a backing-off message never delays the
+    messages queued behind it.
+
+    Claimed messages hold a lease: lease_index scores each in_progress message by
+    the time its claim expires (OGx_QUEUE_CLAIM_IDLE_SECONDS after the claim). If a
+    worker dies between mark_in_progress and mark_delivered/mark_failed, the
+    lease runs out and reclaim_expired_leases returns the message to its lane, or
+    dead-letters it once its retries are used up.
+
+    Messages fetched for a terminal that already has MAX_OUTSTANDING_MESSAGES_PER_SIZE
+    messages outstanding are moved from the pending index to a per-terminal holding
+    set (see hold_messages) and re-indexed with their original score when one of
+    that terminal's messages reaches a final state (see release_held).
+
+    Every message is also recorded in expiry_index, a sorted set of message IDs
+    scored by enqueue time. Retention cleanup reads only the expired IDs from it
+    and deletes them in bounded pipelined chunks, without decoding any entries.
+
+    Mutable delivery metadata (state, retry count, last attempt, error) is kept in a
+    per-message metadata hash (OGx:messages:meta:<id>) that takes precedence over the
+    values in the stored entry. State transitions run as server-side Lua scripts
+    (see ogx_queue_scripts) that move entries and update metadata in one atomic
+    round trip, so concurrent workers can never claim the same message twice.
+
     Message state transitions are logged for monitoring and debugging.
 
     Args:
         redis (Redis): Async Redis client for persistence
         settings (Settings): Application settings including retry configuration
+        partition (Optional[int]): Partition of a partitioned queue this instance
+            serves; None for an unpartitioned queue
 
     Attributes:
         redis (Redis): Redis client instance
@@ -130,7 +911,7 @@ class OGxMessageQueue:
         retry_delay (int): Base delay between retries in seconds
     """
 
-    def __init__(self, redis: Redis, settings: Settings):
+    def __init__(self, redis: Redis, settings: Settings, partition: Optional[int] = None):
         """Initialize queue manager.
 
         Sets up Redis key prefixes and configures retry policies based on settings.
@@ -139,115 +920,229 @@ class OGxMessageQueue:
         Args:
             redis (Redis): Async Redis client for persistence
             settings (Settings): Application settings including retry configuration
+            partition (Optional[int]): Partition this instance serves, if partitioned
         """
         self.redis = redis
         self.settings = settings
+        self.partition = partition
         self.logger = get_protocol_logger(config=LoggingConfig())
 
         # Redis keys
-        self.pending_queue = "OGx:messages:pending"
-        self.in_progress_queue = "OGx:messages:in_progress"
-        self.delivered_queue = "OGx:messages:delivered"
-        self.failed_queue = "OGx:messages:failed"
-        self.dead_letter_queue = "OGx:messages:dead_letter"
+        prefix = partition_prefix(partition)
+        self.pending_queue = f"{prefix}pending"
+        self.pending_indexes = {lane: lane_key(f"{prefix}pending:index", lane) for lane in LANES}
+        self.scheduled_indexes = {lane: lane_key(f"{prefix}scheduled", lane) for lane in LANES}
+        self.in_progress_queue = f"{prefix}in_progress"
+        self.lease_index = f"{prefix}in_progress:leases"
+        self.delivered_queue = f"{prefix}delivered"
+        self.failed_queue = f"{prefix}failed"
+        self.dead_letter_queue = f"{prefix}dead_letter"
+        self.metadata_prefix = f"{KEY_PREFIX}meta:"
+        self.held_queue = f"{prefix}held"
+        self.held_prefix = f"{prefix}held:"
+        self.expiry_index = f"{prefix}expiry"
+        self.ready_channel = f"{prefix}ready"
 
         # Queue settings from OGx constants
         self.max_retries = DEFAULT_CALLS_PER_MINUTE  # Align with rate limit
         self.retry_delay = DEFAULT_WINDOW_SECONDS  # Use documented window
+        self.max_retry_delay = 300  # Max 5 minutes
         self.message_retention_days = MESSAGE_RETENTION_DAYS
         self.max_batch_size = MAX_MESSAGES_PER_RESPONSE
         self.max_submit_size = MAX_SUBMIT_MESSAGES
+        self.metadata_ttl = self.message_retention_days * 24 * 60 * 60
+        self.cleanup_chunk_size = CLEANUP_CHUNK_SIZE
+        self.lane_weights = get_lane_weights(settings)
+        self.visibility_timeout = settings.OGx_QUEUE_CLAIM_IDLE_SECONDS
+
+        # Atomic state transition scripts
+        self._enqueue_script = redis.register_script(ENQUEUE_SCRIPT)
+        self._claim_script = redis.register_script(CLAIM_SCRIPT)
+        self._deliver_script = redis.register_script(DELIVER_SCRIPT)
+        self._fail_script = redis.register_script(FAIL_SCRIPT)
+        self._promote_script = redis.register_script(PROMOTE_SCRIPT)
+        self._hold_script = redis.register_script(HOLD_SCRIPT)
+        self._release_script = redis.register_script(RELEASE_SCRIPT)
+        self._reap_script = redis.register_script(REAP_SCRIPT)
+        self._replay_script = redis.register_script(REPLAY_SCRIPT)
+        self._return_script = redis.register_script(RETURN_SCRIPT)
+        self._defer_script = redis.register_script(DEFER_SCRIPT)
+
+    def _metadata_key(self, message_id: str) -> str:
+        """Get the metadata hash key for a message."""
+        return f"{self.metadata_prefix}{message_id}"
+
+    def _held_key(self, terminal_id: str, lane: MessagePriority) -> str:
+        """Get the holding set key for a terminal's priority lane."""
+        return lane_key(f"{self.held_prefix}{terminal_id}", lane)
+
+    async def _load_messages(
+        self, queue: str, message_ids: Sequence[str], action: str
+    ) -> Tuple[List[QueuedMessage], List[str]]:
+        """Load entries and delivery metadata for the given message IDs.
+
+        Entries that cannot be decoded are logged and skipped.
 
-    async def enqueue_message(self, message_id: str, payload: Dict) -> None:
-        """Add message to pending queue.
+        Args:
+            queue: Queue hash to read entries from
+            message_ids: IDs of the messages to load
+            action: Calling operation, used for logging
 
-        Creates a new QueuedMessage instance and stores it in the pending queue.
-        Uses atomic Redis operations to ensure message is not lost.
+        Returns:
+            Tuple of the loaded messages (in request order) and the IDs not found in the queue
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            await pipe.hmget(queue, message_ids)
+            for message_id in message_ids:
+                await pipe.hgetall(self._metadata_key(message_id))
+            results = await pipe.execute()
+
+        messages: List[QueuedMessage] = []
+        missing_ids: List[str] = []
+        for message_id, data, metadata in zip(message_ids, results[0], results[1:]):
+            if data is None:
+                missing_ids.append(message_id)
+                continue
+            try:
+                message = QueuedMessage.decode(data)
+                if metadata:
+                    message.apply_metadata(metadata)
+                messages.append(message)
+            except ValueError as e:
+                self.logger.error(
+                    "Failed to decode message %s: %s",
+                    message_id,
+                    str(e),
+                    extra={
+                        "customer_id": self.settings.CUSTOMER_ID,
+                        "asset_id": "message_queue",
+                        "message_id": message_id,
+                        "error": str(e),
+                        "action": action,
+                    },
+                )
+        return messages, missing_ids
+
+    async def enqueue_many(
+        self,
+        messages: Sequence[Tuple[str, Dict]],
+        priority: MessagePriority = MessagePriority.NORMAL,
+    ) -> Dict[str, str]:
+        """Add a batch of messages to the pending queue in one atomic call.
+
+        The enqueue script checks the pending count and the idempotency index and
+        writes each accepted entry, its lane and expiry index entries, its
+        metadata hash and its idempotency index entry in a single round trip.
         Enforces MAX_SUBMIT_MESSAGES limit from OGx-1.txt section 2.3.
 
         Args:
-            message_id (str): Unique identifier for the message
-            payload (Dict): Message content to be delivered
+            messages: (message ID, payload) pairs to enqueue
+            priority: Priority lane for the batch
+
+        Returns:
+            Dict[str, str]: Status per message ID: "accepted", "duplicate" (already
+                pending, or a repeat of an indexed submission) or "queue_full"
 
         Raises:
-            ValueError: If pending queue has reached MAX_SUBMIT_MESSAGES
-            Exception: If Redis operation fails
+            Exception: If the Redis script fails
         """
+        if not messages:
+            return {}
+        queued = [
+            QueuedMessage(message_id=m, payload=payload, priority=priority)
+            for m, payload in messages
+        ]
         try:
-            # Check current pending count
-            pending_count = await self.redis.hlen(self.pending_queue)
-            if pending_count >= self.max_submit_size:
-                raise ValueError(
-                    f"Cannot enqueue more than {self.max_submit_size} messages. "
-                    "Wait for current messages to be processed."
-                )
-
-            message = QueuedMessage(message_id=message_id, payload=payload)
-            await self.redis.hset(self.pending_queue, message_id, json.dumps(message.to_dict()))
-
-            self.logger.info(
-                "Enqueued message %s",
-                message_id,
-                extra={
-                    "customer_id": self.settings.CUSTOMER_ID,
-                    "asset_id": "message_queue",
-                    "message_id": message_id,
-                    "action": "enqueue",
-                },
-            )
-        except ValueError as e:
-            self.logger.warning(
-                str(e),
-                extra={
-                    "msg_id": message_id,
-                    "pending_count": pending_count,
-                    "max_messages": self.max_submit_size,
-                },
+            results = await self._enqueue_script(
+                keys=[
+                    self.pending_queue,
+                    self.pending_indexes[priority],
+                    self.expiry_index,
+                    *(
+                        key
+                        for m in queued
+                        for key in (
+                            self._metadata_key(m.message_id),
+                            idempotency_key(self.settings.CUSTOMER_ID, m.payload),
+                        )
+                    ),
+                ],
+                args=[
+                    self.max_submit_size,
+                    MessageState.ACCEPTED.value,
+                    self.metadata_ttl,
+                    priority.value,
+                    *(
+                        value
+                        for m in queued
+                        for value in (
+                            m.message_id,
+                            m.encode(),
+                            m.created_at,
+                            idempotency_ttl(self.settings, m.payload),
+                        )
+                    ),
+                ],
             )
-            raise
+            statuses = dict(zip(results[0::2], results[1::2]))
+            self._log_enqueued(statuses)
         except Exception as e:
             self.logger.error(
-                "Failed to enqueue message %s: %s",
-                message_id,
+                "Failed to enqueue %d messages: %s",
+                len(queued),
                 str(e),
                 extra={
                     "customer_id": self.settings.CUSTOMER_ID,
                     "asset_id": "message_queue",
-                    "message_id": message_id,
+                    "message_ids": [m.message_id for m in queued],
                     "error": str(e),
                     "action": "enqueue",
                 },
             )
             raise
+        if "accepted" in statuses.values():
+            await self.notify_ready()
+        return statuses
 
     async def get_pending_messages(self, batch_size: Optional[int] = None) -> List[QueuedMessage]:
         """Get batch of pending messages ready for processing.
 
+        Promotes retries whose backoff has elapsed, splits the batch between the
+        priority lanes by weight, then reads the oldest message IDs from each lane's
+        index and loads only those entries from the pending hash. Index entries
+        whose message no longer exists in the pending hash are pruned.
+
         Args:
             batch_size: Optional override for default batch size
+
+        Returns:
+            List of pending messages, highest priority lane first and FIFO within a lane
         """
         try:
             effective_batch_size = batch_size or self.max_batch_size
-            message_data = await self.redis.hgetall(self.pending_queue)
-            messages = []
+            await self.promote_due_retries(effective_batch_size)
+            quotas = allocate_lane_quotas(
+                await self.get_lane_depths(), effective_batch_size, self.lane_weights
+            )
+            lanes = [lane for lane in LANES if quotas[lane]]
+            if not lanes:
+                return []
 
-            for message_id, data in list(message_data.items())[:effective_batch_size]:
-                try:
-                    message = QueuedMessage.from_dict(json.loads(data))
-                    messages.append(message)
-                except (json.JSONDecodeError, KeyError) as e:
-                    self.logger.error(
-                        "Failed to decode message %s: %s",
-                        message_id,
-                        str(e),
-                        extra={
-                            "customer_id": self.settings.CUSTOMER_ID,
-                            "asset_id": "message_queue",
-                            "message_id": message_id,
-                            "error": str(e),
-                            "action": "get_pending",
-                        },
-                    )
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for lane in lanes:
+                    await pipe.zrange(self.pending_indexes[lane], 0, quotas[lane] - 1)
+                lane_ids = await pipe.execute()
+
+            messages, stale_ids = await self._load_messages(
+                self.pending_queue,
+                [message_id for ids in lane_ids for message_id in ids],
+                action="get_pending",
+            )
+            stale = set(stale_ids)
+            for lane, ids in zip(lanes, lane_ids):
+                lane_stale = [message_id for message_id in ids if message_id in stale]
+                if lane_stale:
+                    await self.redis.zrem(self.pending_indexes[lane], *lane_stale)
 
             return messages
 
@@ -264,241 +1159,847 @@ class OGxMessageQueue:
             )
             return []
 
-    async def mark_in_progress(self, message_id: str) -> None:
-        """Mark message as in progress.
+    async def get_lane_depths(self) -> Dict[MessagePriority, int]:
+        """Get the number of messages ready for dispatch in each priority lane.
+
+        Retries still backing off are not counted.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for lane in LANES:
+                await pipe.zcard(self.pending_indexes[lane])
+            depths = await pipe.execute()
+        return dict(zip(LANES, depths))
+
+    async def get_queue_depths(self) -> QueueDepths:
+        """Get queue depths from the lane indexes, retry schedules and queue hashes.
+
+        Lane indexes are scored by enqueue time (or, for retries, the time their
+        backoff ended), so the head of each index is its oldest ready message.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for lane in LANES:
+                await pipe.zcard(self.pending_indexes[lane])
+                await pipe.zrange(self.pending_indexes[lane], 0, 0, withscores=True)
+            for lane in LANES:
+                await pipe.zcard(self.scheduled_indexes[lane])
+            await pipe.hlen(self.held_queue)
+            await pipe.hlen(self.in_progress_queue)
+            await pipe.hlen(self.delivered_queue)
+            await pipe.hlen(self.dead_letter_queue)
+            results = await pipe.execute()
+
+        now = time.time()
+        lanes: Dict[MessagePriority, int] = {}
+        oldest_ages: Dict[MessagePriority, float] = {}
+        for i, lane in enumerate(LANES):
+            lanes[lane] = results[2 * i]
+            head = results[2 * i + 1]
+            oldest_ages[lane] = max(now - float(head[0][1]), 0.0) if head else 0.0
+        scheduled = results[6:9]
+        held, in_progress, delivered, dead_letter = results[9:13]
+        return QueueDepths(
+            lanes=lanes,
+            oldest_ages=oldest_ages,
+            scheduled=sum(scheduled),
+            held=held,
+            in_progress=in_progress,
+            delivered=delivered,
+            dead_letter=dead_letter,
+        )
 
-        Atomically moves message from pending to in_progress queue.
-        Updates message metadata:
-        - Sets state to IN_PROGRESS
-        - Increments retry count
-        - Updates last attempt timestamp
+    async def get_message_state(self, message_id: str) -> Optional[MessageState]:
+        """Get a message's state from its metadata hash."""
+        state = await self.redis.hget(self._metadata_key(message_id), "state")
+        return MessageState(int(state)) if state is not None else None
+
+    async def promote_due_retries(self, limit: Optional[int] = None) -> int:
+        """Move retries whose backoff has elapsed into their lane's pending index.
 
         Args:
-            message_id (str): Message identifier to mark as in progress
+            limit: Maximum number of retries to promote per lane (defaults to
+                max_batch_size)
 
-        Raises:
-            Exception: If Redis transaction fails
-            KeyError: If message not found in pending queue
+        Returns:
+            int: Number of retries promoted
+        """
+        promoted = int(
+            await self._promote_script(
+                keys=[
+                    key
+                    for lane in LANES
+                    for key in (self.scheduled_indexes[lane], self.pending_indexes[lane])
+                ],
+                args=[time.time(), limit or self.max_batch_size],
+            )
+        )
+        if promoted:
+            self.logger.debug(
+                "Promoted %d scheduled retries",
+                promoted,
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "promoted_count": promoted,
+                    "action": "promote_retries",
+                },
+            )
+        return promoted
 
-        Note:
-            Uses Redis transaction to ensure atomic state transition
+    async def initialize(self) -> None:
+        """Prepare the queue for processing by indexing any unindexed entries."""
+        await self.rebuild_pending_index()
+        await self.rebuild_lease_index()
+        if not await self.redis.exists(self.expiry_index):
+            await self.rebuild_expiry_index()
+
+    async def rebuild_lease_index(self) -> int:
+        """Give in_progress messages without a lease a fresh one.
+
+        Messages claimed before leases existed would otherwise stay in progress
+        forever if their worker died. They get a full visibility timeout from now,
+        so a worker still processing one is not interrupted.
+
+        Returns:
+            int: Number of leases added
         """
+        added = 0
+        deadline = time.time() + self.visibility_timeout
         try:
-            # Get message from pending queue
-            message_data = await self.redis.hget(self.pending_queue, message_id)
-            if not message_data:
-                return
-
-            # Update state and move to in progress queue
-            message = QueuedMessage.from_dict(json.loads(message_data))
-            message.state = MessageState.SENDING
-            message.last_attempt = time.time()
-            message.retry_count += 1
-
-            # Atomic operation: remove from pending, add to in progress
-            async with self.redis.pipeline() as pipe:
-                await pipe.hdel(self.pending_queue, message_id)
-                await pipe.hset(self.in_progress_queue, message_id, json.dumps(message.to_dict()))
-                await pipe.execute()
+            async for message_id, _ in self.redis.hscan_iter(self.in_progress_queue):
+                added += int(
+                    await self.redis.zadd(self.lease_index, {message_id: deadline}, nx=True) or 0
+                )
+            if added:
+                self.logger.info(
+                    "Rebuilt lease index",
+                    extra={
+                        "customer_id": self.settings.CUSTOMER_ID,
+                        "asset_id": "message_queue",
+                        "indexed_count": added,
+                        "action": "rebuild_lease_index",
+                    },
+                )
+        except RedisError as e:
+            self.logger.error(
+                "Failed to rebuild lease index: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "error": str(e),
+                    "action": "rebuild_lease_index",
+                },
+            )
+        return added
+
+    async def rebuild_expiry_index(self) -> int:
+        """Index messages that are missing from the expiry index.
+
+        Entries written before the expiry index existed would otherwise never be
+        cleaned up. This walks each queue hash incrementally with HSCAN and adds
+        any unindexed message using its original enqueue time.
+
+        Returns:
+            int: Number of messages added to the index
+        """
+        added = 0
+        try:
+            for queue in self._retained_queues():
+                async for message_id, data in self.redis.hscan_iter(queue):
+                    try:
+                        created_at = QueuedMessage.decode(data).created_at
+                    except ValueError:
+                        created_at = time.time()
+                    added += int(
+                        await self.redis.zadd(self.expiry_index, {message_id: created_at}, nx=True)
+                        or 0
+                    )
 
             self.logger.info(
-                "Message %s marked in progress",
-                message_id,
+                "Rebuilt expiry index",
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "indexed_count": added,
+                    "action": "rebuild_expiry_index",
+                },
+            )
+        except RedisError as e:
+            self.logger.error(
+                "Failed to rebuild expiry index: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "error": str(e),
+                    "action": "rebuild_expiry_index",
+                },
+            )
+        return added
+
+    async def rebuild_pending_index(self) -> int:
+        """Index pending messages that are missing from the pending index.
+
+        Entries written before the pending index existed are only present in the
+        pending hash. This walks the hash incrementally with HSCAN and adds any
+        unindexed message to its lane using its original enqueue time, so FIFO order
+        is kept. Retries parked in a schedule are left for promote_due_retries and
+        messages held for a saturated terminal are left for release_held.
+
+        Returns:
+            int: Number of messages added to the index
+        """
+        added = 0
+        try:
+            async for message_id, data in self.redis.hscan_iter(self.pending_queue):
+                scores = [
+                    await self.redis.zscore(self.scheduled_indexes[lane], message_id)
+                    for lane in LANES
+                ]
+                if any(score is not None for score in scores):
+                    continue
+                if await self.redis.hexists(self.held_queue, message_id):
+                    continue
+                try:
+                    entry = QueuedMessage.decode(data)
+                    created_at, lane = entry.created_at, entry.priority
+                except ValueError:
+                    created_at = time.time()
+                    lane = MessagePriority.NORMAL
+                added += int(
+                    await self.redis.zadd(
+                        self.pending_indexes[lane], {message_id: created_at}, nx=True
+                    )
+                    or 0
+                )
+
+            if added:
+                self.logger.info(
+                    "Rebuilt pending index",
+                    extra={
+                        "customer_id": self.settings.CUSTOMER_ID,
+                        "asset_id": "message_queue",
+                        "indexed_count": added,
+                        "action": "rebuild_pending_index",
+                    },
+                )
+        except RedisError as e:
+            self.logger.error(
+                "Failed to rebuild pending index: %s",
+                str(e),
                 extra={
                     "customer_id": self.settings.CUSTOMER_ID,
                     "asset_id": "message_queue",
-                    "message_id": message_id,
+                    "error": str(e),
+                    "action": "rebuild_pending_index",
+                },
+            )
+        return added
+
+    async def mark_in_progress_many(self, message_ids: Sequence[str]) -> List[str]:
+        """Mark a batch of messages as in progress in one atomic call.
+
+        Each claimed message gets a lease of visibility_timeout seconds; it is
+        reclaimed by reclaim_expired_leases if not completed before then.
+
+        Args:
+            message_ids: Message identifiers to claim
+
+        Returns:
+            List[str]: IDs claimed by this call; IDs no longer pending are omitted
+
+        Raises:
+            Exception: If the Redis script fails
+        """
+        if not message_ids:
+            return []
+        now = time.time()
+        try:
+            claimed = await self._claim_script(
+                keys=[
+                    self.pending_queue,
+                    self.in_progress_queue,
+                    *(self.pending_indexes[lane] for lane in LANES),
+                    self.lease_index,
+                    *(self._metadata_key(message_id) for message_id in message_ids),
+                ],
+                args=[
+                    MessageState.SENDING.value,
+                    now,
+                    self.metadata_ttl,
+                    now + self.visibility_timeout,
+                    *message_ids,
+                ],
+            )
+
+            self.logger.info(
+                "Marked %d of %d messages in progress",
+                len(claimed),
+                len(message_ids),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": list(claimed),
                     "action": "mark_in_progress",
                 },
             )
+            return list(claimed)
         except Exception as e:
             self.logger.error(
-                "Failed to mark message %s in progress: %s",
-                message_id,
+                "Failed to mark messages in progress: %s",
                 str(e),
                 extra={
                     "customer_id": self.settings.CUSTOMER_ID,
                     "asset_id": "message_queue",
-                    "message_id": message_id,
+                    "message_ids": list(message_ids),
                     "error": str(e),
                     "action": "mark_in_progress",
                 },
             )
             raise
 
-    async def mark_delivered(self, message_id: str) -> None:
-        """Mark message as successfully delivered.
-
-        Atomically moves message from in_progress to delivered queue.
-        Updates message state to DELIVERED and preserves delivery metrics.
+    async def mark_delivered_many(self, message_ids: Sequence[str]) -> List[str]:
+        """Mark a batch of messages as delivered in one atomic call.
 
         Args:
-            message_id (str): Message identifier to mark as delivered
+            message_ids: Message identifiers to mark as delivered
 
-        Raises:
-            Exception: If Redis transaction fails
-            KeyError: If message not found in in_progress queue
+        Returns:
+            List[str]: IDs moved by this call; IDs not in progress are omitted
 
-        Note:
-            Messages in delivered queue can be pruned after retention period
+        Raises:
+            Exception: If the Redis script fails
         """
+        if not message_ids:
+            return []
         try:
-            # Get message from in progress queue
-            message_data = await self.redis.hget(self.in_progress_queue, message_id)
-            if not message_data:
-                return
-
-            # Update state and move to delivered queue
-            message = QueuedMessage.from_dict(json.loads(message_data))
-            message.state = MessageState.RECEIVED
-
-            # Atomic operation: remove from in progress, add to delivered
-            async with self.redis.pipeline() as pipe:
-                await pipe.hdel(self.in_progress_queue, message_id)
-                await pipe.hset(self.delivered_queue, message_id, json.dumps(message.to_dict()))
-                await pipe.execute()
+            moved = await self._deliver_script(
+                keys=[
+                    self.in_progress_queue,
+                    self.delivered_queue,
+                    self.lease_index,
+                    *(self._metadata_key(message_id) for message_id in message_ids),
+                ],
+                args=[MessageState.RECEIVED.value, self.metadata_ttl, *message_ids],
+            )
 
             self.logger.info(
-                "Message %s marked delivered",
-                message_id,
+                "Marked %d of %d messages delivered",
+                len(moved),
+                len(message_ids),
                 extra={
                     "customer_id": self.settings.CUSTOMER_ID,
                     "asset_id": "message_queue",
-                    "message_id": message_id,
+                    "message_ids": list(moved),
                     "action": "mark_delivered",
                 },
             )
+            return list(moved)
         except Exception as e:
             self.logger.error(
-                "Failed to mark message %s delivered: %s",
-                message_id,
+                "Failed to mark messages delivered: %s",
                 str(e),
                 extra={
                     "customer_id": self.settings.CUSTOMER_ID,
                     "asset_id": "message_queue",
-                    "message_id": message_id,
+                    "message_ids": list(message_ids),
                     "error": str(e),
                     "action": "mark_delivered",
                 },
             )
             raise
 
-    async def mark_failed(self, message_id: str, error: str) -> None:
-        """Mark message as failed and handle retries.
+    async def mark_failed_many(
+        self, message_ids: Sequence[str], error: str, retry_after: Optional[float] = None
+    ) -> Dict[str, str]:
+        """Mark a batch of messages as failed in one atomic call.
 
-        Processes message failure by:
-        1. Moving message from in_progress queue
-        2. Checking retry count against max_retries
-        3. Moving to either pending (for retry) or dead_letter queue
-        4. Updating error information and metrics
+        Each message is parked in its lane's retry schedule until its backoff ends
+        (retry_delay * 2^(attempts - 1), capped at max_retry_delay, or retry_after
+        when given), or moved to the dead letter queue once its retry count
+        reaches max_retries.
 
         Args:
-            message_id (str): Message identifier to mark as failed
-            error (str): Error message describing the failure
+            message_ids: Message identifiers to mark as failed
+            error: Error message describing the failure
+            retry_after: Seconds to wait before retrying, overriding the backoff
+
+        Returns:
+            Dict[str, str]: Target queue ("scheduled" or "dead_letter") per moved message ID
 
         Raises:
-            Exception: If Redis transaction fails
-            KeyError: If message not found in in_progress queue
+            Exception: If the Redis script fails
+        """
+        if not message_ids:
+            return {}
+        try:
+            results = await self._fail_script(
+                keys=[
+                    self.in_progress_queue,
+                    self.pending_queue,
+                    self.dead_letter_queue,
+                    *(self.scheduled_indexes[lane] for lane in LANES),
+                    self.lease_index,
+                    *(self._metadata_key(message_id) for message_id in message_ids),
+                ],
+                args=[
+                    MessageState.DELIVERY_FAILED.value,
+                    MessageState.TIMED_OUT.value,
+                    self.max_retries,
+                    error,
+                    time.time(),
+                    self.metadata_ttl,
+                    self.retry_delay,
+                    self.max_retry_delay,
+                    "" if retry_after is None else retry_after,
+                    *message_ids,
+                ],
+            )
 
-        Note:
-            Messages in dead_letter queue require manual intervention
+            targets: Dict[str, str] = {}
+            for message_id, target, retry_count in zip(results[0::3], results[1::3], results[2::3]):
+                targets[message_id] = target
+                self.logger.info(
+                    "Message %s marked failed",
+                    message_id,
+                    extra={
+                        "customer_id": self.settings.CUSTOMER_ID,
+                        "asset_id": "message_queue",
+                        "message_id": message_id,
+                        "retry_count": int(retry_count),
+                        "max_retries": self.max_retries,
+                        "target_queue": target,
+                        "error": error,
+                        "action": "mark_failed",
+                    },
+                )
+            return targets
+        except Exception as e:
+            self.logger.error(
+                "Failed to mark messages failed: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": list(message_ids),
+                    "error": str(e),
+                    "action": "mark_failed",
+                },
+            )
+            raise
+
+    async def defer_many(
+        self, message_ids: Sequence[str], reason: str, retry_after: float
+    ) -> List[str]:
+        """Park claimed, unsent messages in their lane's retry schedule in one call.
+
+        Each message becomes eligible again after retry_after seconds with the
+        attempt counted by its claim undone, so it keeps its full retry budget.
+
+        Args:
+            message_ids: Claimed messages that were not sent
+            reason: Why the messages were deferred, recorded as their error
+            retry_after: Seconds to wait before the messages are eligible again
+
+        Returns:
+            List[str]: IDs moved to the retry schedule by this call
+
+        Raises:
+            Exception: If the Redis script fails
         """
+        if not message_ids:
+            return []
         try:
-            # Get message from in progress queue
-            message_data = await self.redis.hget(self.in_progress_queue, message_id)
-            if not message_data:
-                return
-
-            message = QueuedMessage.from_dict(json.loads(message_data))
-            message.error = error
-
-            # Check retry count
-            if message.retry_count >= self.max_retries:
-                # Move to dead letter queue
-                message.state = MessageState.TIMED_OUT
-                target_queue = self.dead_letter_queue
-            else:
-                # Move back to pending for retry
-                message.state = MessageState.DELIVERY_FAILED
-                target_queue = self.pending_queue
-
-            # Atomic operation: remove from in progress, add to target queue
-            async with self.redis.pipeline() as pipe:
-                await pipe.hdel(self.in_progress_queue, message_id)
-                await pipe.hset(target_queue, message_id, json.dumps(message.to_dict()))
-                await pipe.execute()
+            deferred = await self._defer_script(
+                keys=[
+                    self.in_progress_queue,
+                    self.pending_queue,
+                    self.lease_index,
+                    *(self.scheduled_indexes[lane] for lane in LANES),
+                    *(self._metadata_key(message_id) for message_id in message_ids),
+                ],
+                args=[
+                    MessageState.ACCEPTED.value,
+                    MessageState.DELIVERY_FAILED.value,
+                    reason,
+                    time.time() + retry_after,
+                    self.metadata_ttl,
+                    *message_ids,
+                ],
+            )
+            self.logger.info(
+                "Deferred %d messages for %ss",
+                len(deferred),
+                retry_after,
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": list(deferred),
+                    "retry_after": retry_after,
+                    "error": reason,
+                    "action": "defer",
+                },
+            )
+            return list(deferred)
+        except Exception as e:
+            self.logger.error(
+                "Failed to defer messages: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": list(message_ids),
+                    "error": str(e),
+                    "action": "defer",
+                },
+            )
+            raise
+
+    async def reclaim_expired_leases(self) -> Dict[str, str]:
+        """Reclaim in_progress messages whose lease has expired.
+
+        Expired leases are read from the lease index in chunks of
+        cleanup_chunk_size and each chunk is reclaimed in one atomic script call.
+        Messages under max_retries return to their lane's pending index at their
+        original enqueue time; the rest move to the dead letter queue.
+
+        Returns:
+            Dict[str, str]: Target queue ("pending" or "dead_letter") per reclaimed message ID
+        """
+        targets: Dict[str, str] = {}
+        try:
+            while True:
+                now = time.time()
+                message_ids = cast(
+                    List[str],
+                    await self.redis.zrangebyscore(
+                        self.lease_index, "-inf", now, start=0, num=self.cleanup_chunk_size
+                    ),
+                )
+                if not message_ids:
+                    break
+
+                results = await self._reap_script(
+                    keys=[
+                        self.in_progress_queue,
+                        self.pending_queue,
+                        self.dead_letter_queue,
+                        self.lease_index,
+                        self.expiry_index,
+                        *(self.pending_indexes[lane] for lane in LANES),
+                        *(self._metadata_key(message_id) for message_id in message_ids),
+                    ],
+                    args=[
+                        MessageState.DELIVERY_FAILED.value,
+                        MessageState.TIMED_OUT.value,
+                        self.max_retries,
+                        "Visibility timeout expired",
+                        now,
+                        self.metadata_ttl,
+                        *message_ids,
+                    ],
+                )
+                targets.update(zip(results[0::2], results[1::2]))
+
+                if len(message_ids) < self.cleanup_chunk_size:
+                    break
+
+            if "pending" in targets.values():
+                await self.notify_ready()
+            if targets:
+                self.logger.warning(
+                    "Reclaimed %d messages with expired leases",
+                    len(targets),
+                    extra={
+                        "customer_id": self.settings.CUSTOMER_ID,
+                        "asset_id": "message_queue",
+                        "message_ids": list(targets),
+                        "dead_lettered_count": sum(
+                            1 for target in targets.values() if target == "dead_letter"
+                        ),
+                        "action": "reclaim_leases",
+                    },
+                )
+        except RedisError as e:
+            self.logger.error(
+                "Failed to reclaim expired leases: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "error": str(e),
+                    "action": "reclaim_leases",
+                },
+            )
+        return targets
+
+    async def return_unsubmitted(self, message_ids: Sequence[str]) -> List[str]:
+        """Return claimed, unsubmitted messages to their lane's pending index in one call.
+
+        Each message is re-indexed at its original enqueue time and the attempt
+        counted by its claim is undone. Messages fetched but never claimed are
+        still pending and are left alone.
+
+        Args:
+            message_ids: Messages returned by get_pending_messages and not submitted
+
+        Returns:
+            List[str]: IDs moved back to pending by this call
 
+        Raises:
+            Exception: If the Redis script fails
+        """
+        if not message_ids:
+            return []
+        try:
+            returned = await self._return_script(
+                keys=[
+                    self.in_progress_queue,
+                    self.pending_queue,
+                    self.lease_index,
+                    self.expiry_index,
+                    *(self.pending_indexes[lane] for lane in LANES),
+                    *(self._metadata_key(message_id) for message_id in message_ids),
+                ],
+                args=[
+                    MessageState.ACCEPTED.value,
+                    MessageState.DELIVERY_FAILED.value,
+                    time.time(),
+                    self.metadata_ttl,
+                    *message_ids,
+                ],
+            )
+            if returned:
+                await self.notify_ready()
             self.logger.info(
-                "Message %s marked failed",
-                message_id,
+                "Returned %d of %d unsubmitted messages to pending",
+                len(returned),
+                len(message_ids),
                 extra={
                     "customer_id": self.settings.CUSTOMER_ID,
                     "asset_id": "message_queue",
-                    "message_id": message_id,
-                    "retry_count": message.retry_count,
-                    "max_retries": self.max_retries,
-                    "error": error,
-                    "action": "mark_failed",
+                    "message_ids": list(returned),
+                    "action": "return_unsubmitted",
                 },
             )
+            return list(returned)
         except Exception as e:
             self.logger.error(
-                "Failed to mark message %s failed: %s",
-                message_id,
+                "Failed to return unsubmitted messages: %s",
                 str(e),
                 extra={
                     "customer_id": self.settings.CUSTOMER_ID,
                     "asset_id": "message_queue",
-                    "message_id": message_id,
+                    "message_ids": list(message_ids),
                     "error": str(e),
-                    "action": "mark_failed",
+                    "action": "return_unsubmitted",
                 },
             )
             raise
 
-    async def cleanup_expired_messages(self) -> None:
-        """Clean up expired messages from all queues."""
+    async def hold_messages(self, terminal_id: str, messages: Sequence[QueuedMessage]) -> List[str]:
+        """Move fetched messages from the pending index to the terminal's holding set.
+
+        Each message keeps its pending index score, so it is released in its
+        original FIFO position. Messages claimed by another worker in the meantime
+        are no longer indexed and are skipped.
+
+        Args:
+            terminal_id: Destination terminal of the messages
+            messages: Messages returned by get_pending_messages and not claimed
+
+        Returns:
+            List[str]: IDs held by this call
+        """
+        held: List[str] = []
+        for lane in LANES:
+            lane_ids = [m.message_id for m in messages if m.priority == lane]
+            if not lane_ids:
+                continue
+            held.extend(
+                await self._hold_script(
+                    keys=[
+                        self.pending_indexes[lane],
+                        self._held_key(terminal_id, lane),
+                        self.held_queue,
+                    ],
+                    args=[terminal_id, *lane_ids],
+                )
+            )
+        if held:
+            self.logger.info(
+                "Held %d messages for terminal %s",
+                len(held),
+                terminal_id,
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "terminal_id": terminal_id,
+                    "message_ids": held,
+                    "action": "hold",
+                },
+            )
+        return held
+
+    async def release_held(self, terminal_id: str, count: int) -> int:
+        """Move up to count of a terminal's held messages back to their pending index.
+
+        Args:
+            terminal_id: Destination terminal with free capacity
+            count: Maximum number of messages to release
+
+        Returns:
+            int: Number of messages released
+        """
+        if count <= 0:
+            return 0
+        released = int(
+            await self._release_script(
+                keys=[
+                    self.pending_queue,
+                    self.held_queue,
+                    *(
+                        key
+                        for lane in LANES
+                        for key in (self._held_key(terminal_id, lane), self.pending_indexes[lane])
+                    ),
+                ],
+                args=[count],
+            )
+        )
+        if released:
+            await self.notify_ready()
+            self.logger.info(
+                "Released %d held messages for terminal %s",
+                released,
+                terminal_id,
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "terminal_id": terminal_id,
+                    "released_count": released,
+                    "action": "release_held",
+                },
+            )
+        return released
+
+    async def scan_dead_letters(
+        self, count: int = CLEANUP_CHUNK_SIZE
+    ) -> AsyncIterator[List[QueuedMessage]]:
+        """Iterate over the dead letter queue with HSCAN in chunks of about count messages.
+
+        Each chunk's delivery metadata is loaded in one pipelined round trip, so
+        messages carry the error and retry count they were dead-lettered with.
+        """
+        cursor = 0
+        while True:
+            cursor, entries = await self.redis.hscan(self.dead_letter_queue, cursor, count=count)
+            if entries:
+                messages, _ = await self._load_messages(
+                    self.dead_letter_queue, list(cast(Dict[str, str], entries)), "scan_dead_letters"
+                )
+                if messages:
+                    yield messages
+            if not cursor:
+                break
+
+    async def replay_dead_letters(self, message_ids: Sequence[str]) -> Dict[str, str]:
+        """Move dead-lettered messages back to their lane's pending index.
+
+        The replay script checks the pending count, moves each accepted entry
+        unchanged and resets its metadata (state, retry count and error) in a
+        single round trip.
+
+        Args:
+            message_ids: IDs of the dead-lettered messages to replay
+
+        Returns:
+            Dict[str, str]: Status per message ID: "accepted", "queue_full" or "missing"
+        """
+        if not message_ids:
+            return {}
+        results = await self._replay_script(
+            keys=[
+                self.dead_letter_queue,
+                self.pending_queue,
+                self.expiry_index,
+                *(self.pending_indexes[lane] for lane in LANES),
+                *(self._metadata_key(m) for m in message_ids),
+            ],
+            args=[
+                self.max_submit_size,
+                MessageState.ACCEPTED.value,
+                time.time(),
+                self.metadata_ttl,
+                *message_ids,
+            ],
+        )
+        statuses = dict(zip(results[0::2], results[1::2]))
+        self._log_replayed(statuses)
+        if "accepted" in statuses.values():
+            await self.notify_ready()
+        return statuses
+
+    def _retained_queues(self) -> List[str]:
+        """Queue hashes subject to the retention period."""
+        return [
+            self.pending_queue,
+            self.in_progress_queue,
+            self.delivered_queue,
+            self.dead_letter_queue,
+        ]
+
+    async def cleanup_expired_messages(self) -> int:
+        """Clean up expired messages from all queues.
+
+        Expired message IDs are read from the expiry index in chunks of
+        cleanup_chunk_size, and each chunk is removed from every queue, index and
+        metadata hash in one pipelined round trip. Only expired entries are
+        touched and no entries are decoded.
+
+        Returns:
+            int: Number of messages removed
+        """
+        removed = 0
         try:
             cutoff = time.time() - (self.message_retention_days * 24 * 60 * 60)
-            queues = [
-                self.pending_queue,
-                self.in_progress_queue,
-                self.delivered_queue,
-                self.dead_letter_queue,
-            ]
-
-            for queue in queues:
-                message_data = await self.redis.hgetall(queue)
-                for message_id, data in message_data.items():
-                    try:
-                        message = QueuedMessage.from_dict(json.loads(data))
-                        if message.created_at < cutoff:
-                            await self.redis.hdel(queue, message_id)
-                            self.logger.debug(
-                                "Cleaned up expired message",
-                                extra={
-                                    "customer_id": self.settings.CUSTOMER_ID,
-                                    "asset_id": "message_queue",
-                                    "message_id": message_id,
-                                    "queue": queue,
-                                    "age_days": (time.time() - message.created_at) / (24 * 60 * 60),
-                                    "action": "cleanup",
-                                },
-                            )
-                    except (json.JSONDecodeError, KeyError) as e:
-                        self.logger.warning(
-                            "Failed to process message %s during cleanup: %s",
-                            message_id,
-                            str(e),
-                            extra={
-                                "customer_id": self.settings.CUSTOMER_ID,
-                                "asset_id": "message_queue",
-                                "message_id": message_id,
-                                "error": str(e),
-                                "action": "cleanup",
-                            },
-                        )
+            while True:
+                message_ids = cast(
+                    List[str],
+                    await self.redis.zrangebyscore(
+                        self.expiry_index, "-inf", cutoff, start=0, num=self.cleanup_chunk_size
+                    ),
+                )
+                if not message_ids:
+                    break
+
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for queue in self._retained_queues():
+                        await pipe.hdel(queue, *message_ids)
+                    # Holding set entries are dropped when the terminal is released
+                    await pipe.hdel(self.held_queue, *message_ids)
+                    await pipe.zrem(self.lease_index, *message_ids)
+                    for lane in LANES:
+                        await pipe.zrem(self.pending_indexes[lane], *message_ids)
+                        await pipe.zrem(self.scheduled_indexes[lane], *message_ids)
+                    await pipe.delete(*(self._metadata_key(m) for m in message_ids))
+                    await pipe.zrem(self.expiry_index, *message_ids)
+                    results = await pipe.execute()
+                removed += sum(results[: len(self._retained_queues())])
+
+                if len(message_ids) < self.cleanup_chunk_size:
+                    break
 
+            self.logger.info(
+                "Cleaned up %d expired messages",
+                removed,
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "removed_count": removed,
+                    "action": "cleanup",
+                },
+            )
         except RedisError as e:
             self.logger.error(
                 "Failed to cleanup expired messages: %s",
@@ -506,7 +2007,9 @@ class OGxMessageQueue:
                 extra={
                     "customer_id": self.settings.CUSTOMER_ID,
                     "asset_id": "message_queue",
+                    "removed_count": removed,
                     "error": str(e),
                     "action": "cleanup",
                 },
             )
+        return removed
@@ -15,7 +15,7 @@ Implementation Notes:
 """
 
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from Protexis_Command.core.logging.loggers.protocol import get_protocol_logger
 from Protexis_Command.core.settings.app_settings import get_settings
@@ -30,6 +30,11 @@ from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import
     ValidationError,
 )
 
+if TYPE_CHECKING:
+    from Protexis_Command.api.protocols.ogx.services.ogx_status_tracker import (
+        MessageStatusTracker,
+    )
+
 
 class MessageReceiver:
     """Handles message retrieval from OGx.
@@ -41,13 +46,20 @@ class MessageReceiver:
     3. Error handling and recovery
     """
 
-    def __init__(self, protocol_handler: OGxProtocolHandler) -> None:
+    def __init__(
+        self,
+        protocol_handler: OGxProtocolHandler,
+        status_tracker: Optional["MessageStatusTracker"] = None,
+    ) -> None:
         """Initialize message receiver.
 
         Args:
             protocol_handler: OGx protocol handler instance
+            status_tracker: Status tracker that answers status checks with batched
+                fw_statuses calls; checks go to the protocol handler if omitted
         """
         self.protocol_handler = protocol_handler
+        self.status_tracker = status_tracker
         self.logger = get_protocol_logger()  # Pass None to use default config
         self.settings = get_settings()
         self._high_watermarks: Dict[str, str] = {}  # Initialize empty high watermarks dict
@@ -149,6 +161,11 @@ class MessageReceiver:
                 },
             )
 
+            if self.status_tracker is not None:
+                status = await self.status_tracker.get_status(message_id)
+                if status is None:
+                    raise ProtocolError(f"No status returned for message {message_id}")
+                return status
             return await self.protocol_handler.get_message_status(message_id)
 
         except RateLimitError as e:
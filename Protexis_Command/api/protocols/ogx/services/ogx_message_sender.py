@@ -14,9 +14,13 @@ Source of Truth:
     - Development allows simplified recovery
 
 Environment-Specific Behavior:
+Every call waits for a slot of the account's shared call budget (see
+api.common.clients.throttle), so processes sending concurrently stay within
+the limit together. Calls share the process-wide pooled HTTP client (see
+infrastructure.http), so they reuse open connections to OGx.
+
 Development:
     - Uses test credentials (70000934/password)
-    - Local rate limiting simulation
     - Flexible validation rules
     - Simplified retry logic
     - Debug-level logging
@@ -42,19 +46,19 @@ For detailed specifications, see:
 """
 
 import asyncio
-from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, cast
 
 import httpx
 
-from Protexis_Command.api.common.auth.manager import OGxAuthManager
+from Protexis_Command.api.common.auth.manager import OGxAuthManager, get_auth_manager
+from Protexis_Command.api.common.clients.throttle import CallRateLimiter, CallType
 from Protexis_Command.api.config import TransportType
 from Protexis_Command.core.logging.loggers.protocol import get_protocol_logger
 from Protexis_Command.core.settings.app_settings import get_settings
 from Protexis_Command.infrastructure.cache.redis import get_redis_client
+from Protexis_Command.infrastructure.http import get_http_client
 from Protexis_Command.protocols.ogx.constants.ogx_error_codes import GatewayErrorCode
 from Protexis_Command.protocols.ogx.constants.ogx_limits import (
-    DEFAULT_CALLS_PER_MINUTE,
     DEFAULT_WINDOW_SECONDS,
     MAX_SUBMIT_MESSAGES,
 )
@@ -74,14 +78,13 @@ class MessageSender:
 
     def __init__(self) -> None:
         """Initialize message sender."""
-        # Track API call timestamps per group
-        self._rate_limiter: Dict[str, List[datetime]] = {}
         # Track retry attempts per message ID
         self._retry_counts: Dict[int, int] = {}
         self.logger = get_protocol_logger()  # Pass None to use default config
         self.settings = get_settings()
         # Will be initialized in initialize()
         self.auth_manager: Optional[OGxAuthManager] = None
+        self.rate_limiter: Optional[CallRateLimiter] = None
 
     async def initialize(self) -> None:
         """Initialize async components like Redis connection.
@@ -94,7 +97,8 @@ class MessageSender:
         redis = await get_redis_client()
         if not redis:
             raise RuntimeError("Failed to initialize Redis connection")
-        self.auth_manager = OGxAuthManager(self.settings, redis)
+        self.auth_manager = await get_auth_manager()
+        self.rate_limiter = CallRateLimiter(redis, self.settings)
 
     async def send_message(
         self, message: Dict[str, Any], transport: Optional[TransportType] = None
@@ -112,9 +116,10 @@ class MessageSender:
             RuntimeError: If sender not initialized
             OGxProtocolError: If the message fails to send
         """
-        if not self.auth_manager:
+        if not self.auth_manager or not self.rate_limiter:
             raise RuntimeError("MessageSender not initialized. Call initialize() first.")
 
+        await self.rate_limiter.acquire(CallType.SEND)
         try:
             # Add transport type to message if specified
             message_data = message.copy()
@@ -125,14 +130,13 @@ class MessageSender:
             auth_header = await self.auth_manager.get_auth_header()
 
             # Send message
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.settings.OGx_BASE_URL}/submit/messages",
-                    headers={**auth_header, "Content-Type": "application/json"},
-                    json=message_data,
-                )
-                response.raise_for_status()
-                return cast(Dict[str, Any], response.json())
+            response = await get_http_client().post(
+                f"{self.settings.OGx_BASE_URL}/submit/messages",
+                headers={**auth_header, "Content-Type": "application/json"},
+                json=message_data,
+            )
+            response.raise_for_status()
+            return cast(Dict[str, Any], response.json())
 
         except httpx.HTTPError as e:
             raise OGxProtocolError(f"Failed to send message: {str(e)}") from e
@@ -141,7 +145,7 @@ class MessageSender:
         """Submit batch of messages to OGx.
 
         Follows batch limits from OGx-1.txt:
-        - Maximum MAX_SUBMIT_MESSAGES per call
+        - Maximum MAX_SUBMIT_MESSAGES per call, all sent in a single call
         - Subject to DEFAULT_CALLS_PER_MINUTE rate limit
         - Network-specific payload limits apply to each message
 
@@ -149,7 +153,7 @@ class MessageSender:
             messages: List of messages to send (see message_states.py for format)
 
         Returns:
-            List of OGx responses, one per message
+            List of ForwardSubmission results, one per message in request order
 
         Raises:
             ValidationError: If batch size exceeds limit
@@ -157,22 +161,43 @@ class MessageSender:
         """
         if len(messages) > MAX_SUBMIT_MESSAGES:
             raise ValidationError(f"Cannot submit more than {MAX_SUBMIT_MESSAGES} messages")
+        if not messages:
+            return []
+
+        try:
+            response = await self._submit_messages(messages)
+        except OGxProtocolError as e:
+            if getattr(e, "error_code", None) != GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED:
+                raise
+            # Wait and retry once on rate limit
+            await self.handle_rate_limit(GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED)
+            response = await self._submit_messages(messages)
 
-        responses = []
-        for message in messages:
-            try:
-                response = await self.send_message(message)
-                responses.append(response)
-            except OGxProtocolError as e:
-                if getattr(e, "error_code", None) == GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED:
-                    # Wait and retry once on rate limit
-                    await self.handle_rate_limit(GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED)
-                    response = await self.send_message(message)
-                    responses.append(response)
-                else:
-                    raise
-
-        return responses
+        return list(response.get("Submissions") or [])
+
+    async def _submit_messages(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Send a batch of messages to OGx in one call.
+
+        Raises:
+            RuntimeError: If sender not initialized
+            OGxProtocolError: If the call fails
+        """
+        if not self.auth_manager or not self.rate_limiter:
+            raise RuntimeError("MessageSender not initialized. Call initialize() first.")
+
+        await self.rate_limiter.acquire(CallType.SEND)
+        try:
+            auth_header = await self.auth_manager.get_auth_header()
+            response = await get_http_client().post(
+                f"{self.settings.OGx_BASE_URL}/submit/messages",
+                headers={**auth_header, "Content-Type": "application/json"},
+                json={"messages": messages},
+            )
+            response.raise_for_status()
+            return cast(Dict[str, Any], response.json())
+
+        except httpx.HTTPError as e:
+            raise OGxProtocolError(f"Failed to send messages: {str(e)}") from e
 
     async def handle_rate_limit(self, error_code: GatewayErrorCode) -> None:
         """Handle rate limit errors.
@@ -186,13 +211,9 @@ class MessageSender:
             error_code: Error code from OGx
 
         Implementation:
-            - Clears rate limit tracking
             - Implements exponential backoff
             - Logs rate limit events
         """
-        # Clear rate limit tracking
-        self._rate_limiter.clear()
-
         # Log rate limit event
         self.logger.warning(
             "Rate limit encountered",
@@ -227,8 +248,9 @@ class MessageSender:
 
         Raises:
             RuntimeError: If sender not initialized
+            CallBudgetExceeded: If the call budget has no slot within the maximum wait
         """
-        if not self.auth_manager:
+        if not self.auth_manager or not self.rate_limiter:
             raise RuntimeError("MessageSender not initialized. Call initialize() first.")
 
         try:
@@ -252,29 +274,29 @@ class MessageSender:
             # Construct retry URL
             retry_url = f"{self.settings.OGx_BASE_URL}/submit/messages/{message_id}/retry"
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    retry_url,
-                    headers=await self.auth_manager.get_auth_header(),
-                )
-                response.raise_for_status()
-                data: Dict[str, Any] = response.json()
+            await self.rate_limiter.acquire(CallType.SEND)
+            response = await get_http_client().post(
+                retry_url,
+                headers=await self.auth_manager.get_auth_header(),
+            )
+            response.raise_for_status()
+            data: Dict[str, Any] = response.json()
 
-                # Update retry count
-                self._retry_counts[message_id] = retry_count + 1
+            # Update retry count
+            self._retry_counts[message_id] = retry_count + 1
 
-                self.logger.info(
-                    "Message retry successful",
-                    extra={
-                        "customer_id": self.settings.CUSTOMER_ID,
-                        "asset_id": "message_sender",
-                        "message_id": message_id,
-                        "retry_count": retry_count + 1,
-                        "backoff_delay": backoff_delay,
-                    },
-                )
+            self.logger.info(
+                "Message retry successful",
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_sender",
+                    "message_id": message_id,
+                    "retry_count": retry_count + 1,
+                    "backoff_delay": backoff_delay,
+                },
+            )
 
-                return data
+            return data
 
         except httpx.HTTPStatusError as e:
             self.logger.error(
@@ -289,32 +311,3 @@ class MessageSender:
                 },
             )
             return None
-
-    def _can_make_request(self) -> bool:
-        """Check if request can be made within rate limits.
-
-        Implements sliding window rate limiting as specified in OGx-1.txt.
-
-        Returns:
-            bool: True if request allowed, False if would exceed rate limit
-        """
-        now = datetime.utcnow()
-        window_start = now - timedelta(seconds=DEFAULT_WINDOW_SECONDS)
-
-        # Clean up old timestamps
-        for group in self._rate_limiter:
-            self._rate_limiter[group] = [
-                ts for ts in self._rate_limiter[group] if ts > window_start
-            ]
-
-        # Check rate limit
-        group = str(self.settings.CUSTOMER_ID)
-        timestamps = self._rate_limiter.get(group, [])
-        return len(timestamps) < DEFAULT_CALLS_PER_MINUTE
-
-    def _record_request(self) -> None:
-        """Record a successful API request for rate limiting."""
-        group = str(self.settings.CUSTOMER_ID)
-        if group not in self._rate_limiter:
-            self._rate_limiter[group] = []
-        self._rate_limiter[group].append(datetime.utcnow())
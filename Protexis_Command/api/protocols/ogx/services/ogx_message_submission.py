@@ -5,7 +5,7 @@ It handles:
 - Message submission
 - Response validation
 - Error handling
-- Rate limiting (via server response headers)
+- Rate limiting (shared call budget, and server rate limit responses)
 
 Development vs Production:
 - Development: Uses test credentials, local rate limiting, flexible validation
@@ -16,11 +16,14 @@ For rate limiting details, see OGx-1.txt section 3.2.
 For error codes and handling, see OGx-1.txt section 4.
 """
 
-from typing import Dict
+from typing import Dict, List
 
 from Protexis_Command.api.common.clients.factory import get_OGx_client
+from Protexis_Command.api.common.clients.throttle import CallBudgetExceeded
 from Protexis_Command.core.logging.loggers import get_protocol_logger
 from Protexis_Command.core.settings.app_settings import get_settings
+from Protexis_Command.protocols.ogx.constants.ogx_error_codes import GatewayErrorCode
+from Protexis_Command.protocols.ogx.constants.ogx_limits import MAX_SUBMIT_MESSAGES
 from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import (
     OGxProtocolError,
     ValidationError,
@@ -81,7 +84,78 @@ async def submit_OGx_message(payload: Dict) -> Dict:
 
         return data
 
+    except CallBudgetExceeded as e:
+        return _budget_exceeded(e)
     except (ValidationError, OGxProtocolError, ConnectionError, TimeoutError) as e:
         error_msg = f"Error submitting message: {str(e)}"
         logger.error(error_msg, extra={"error": str(e), "customer_id": settings.CUSTOMER_ID})
         return {"ErrorID": 500, "ErrorMessage": error_msg}
+
+
+async def submit_OGx_messages(payloads: List[Dict]) -> Dict:
+    """Submit a batch of messages to OGx in one call.
+
+    Args:
+        payloads: Up to MAX_SUBMIT_MESSAGES message payloads
+
+    Returns:
+        Dict containing response data with at least:
+        - ErrorID (int): 0 if the call succeeded, non-zero for failure
+        - ErrorMessage (str): Description if error occurred
+        - Submissions (List[Dict]): One ForwardSubmission per payload, in request
+          order, each with its own ErrorID and ForwardMessageID
+    """
+    try:
+        if not payloads or len(payloads) > MAX_SUBMIT_MESSAGES:
+            raise ValidationError(f"Batch must hold 1 to {MAX_SUBMIT_MESSAGES} messages")
+
+        client = await get_OGx_client()
+
+        response = await client.post("/messages", json_data={"messages": payloads})
+        data = await client.handle_response(response)
+
+        if data.get("ErrorID", 1) == 0:
+            submissions = data.get("Submissions") or []
+            logger.info(
+                "Batch of %d messages submitted",
+                len(payloads),
+                extra={
+                    "accepted": sum(1 for s in submissions if s.get("ErrorID", 1) == 0),
+                    "customer_id": settings.CUSTOMER_ID,
+                },
+            )
+        else:
+            logger.warning(
+                "Batch submission failed",
+                extra={
+                    "error_id": data.get("ErrorID"),
+                    "error_message": data.get("ErrorMessage"),
+                    "customer_id": settings.CUSTOMER_ID,
+                },
+            )
+
+        return data
+
+    except CallBudgetExceeded as e:
+        return _budget_exceeded(e)
+    except (ValidationError, OGxProtocolError, ConnectionError, TimeoutError) as e:
+        error_msg = f"Error submitting messages: {str(e)}"
+        logger.error(error_msg, extra={"error": str(e), "customer_id": settings.CUSTOMER_ID})
+        return {"ErrorID": 500, "ErrorMessage": error_msg}
+
+
+def _budget_exceeded(error: CallBudgetExceeded) -> Dict:
+    """Report an exhausted call budget the way OGx reports a rate limit.
+
+    Callers then reschedule the submission for when the budget has a free slot
+    instead of counting it as a failure.
+    """
+    logger.warning(
+        "Submission deferred, call budget exhausted",
+        extra={"retry_after": error.retry_after, "customer_id": settings.CUSTOMER_ID},
+    )
+    return {
+        "ErrorID": GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED,
+        "ErrorMessage": str(error),
+        "RetryAfter": error.retry_after,
+    }
@@ -1,10 +1,15 @@
 """Background worker for processing message queue.
 
 This module provides:
-- Asynchronous message processing
+- Asynchronous message processing, woken by enqueue notifications when idle
 - Automatic retry handling with exponential backoff
 - Error recovery with dead letter queue
-- Health monitoring and metrics
+- Concurrent submission bounded by MAX_CONCURRENT_REQUESTS, in order per terminal
+- Batched submission of up to MAX_SUBMIT_MESSAGES messages per call
+- Per-terminal outstanding message limits
+- Reclaiming messages left in progress by a worker that died
+- Health monitoring and metrics, including queue depths published on a timer
+- Draining on shutdown, so deploys neither cut submissions short nor burn retries
 
 Development vs Production:
 - Development: Simplified retry logic, all logging levels, mock responses
@@ -16,15 +21,38 @@ For error handling, see OGx-1.txt section 4.2.
 
 import asyncio
 import time
-from typing import Dict, Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
 
-from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import OGxMessageQueue
-from Protexis_Command.api.protocols.ogx.services.ogx_message_submission import submit_OGx_message
+from redis.exceptions import RedisError
+
+from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import (
+    MessageQueue,
+    QueueDepths,
+    QueuedMessage,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_message_submission import (
+    submit_OGx_message,
+    submit_OGx_messages,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_outstanding_limiter import (
+    TerminalOutstandingLimiter,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_queue_factory import get_message_queue
+from Protexis_Command.api.protocols.ogx.services.ogx_status_tracker import (
+    MessageStatusTracker,
+    get_status_tracker,
+)
 from Protexis_Command.core.logging.loggers import get_infra_logger
 from Protexis_Command.core.settings.app_settings import Settings, get_settings
 from Protexis_Command.infrastructure.cache.redis import get_redis_client
+from Protexis_Command.infrastructure.metrics import MessageMetrics
+from Protexis_Command.infrastructure.metrics.backends import PrometheusBackend
 from Protexis_Command.protocols.ogx.constants.ogx_error_codes import GatewayErrorCode
-from Protexis_Command.protocols.ogx.constants.ogx_limits import DEFAULT_WINDOW_SECONDS
+from Protexis_Command.protocols.ogx.constants.ogx_limits import (
+    MAX_CONCURRENT_REQUESTS,
+    MAX_SUBMIT_MESSAGES,
+)
 from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import OGxProtocolError
 
 
@@ -33,52 +61,148 @@ class MessageWorker:
 
     Features:
     - Asynchronous processing with configurable batch size
-    - Exponential backoff for retries
+    - An idle worker waits for the queue's ready notification (or the next
+      scheduled retry) instead of polling, falling back to a poll every
+      OGx_WORKER_IDLE_TIMEOUT_SECONDS
+    - Up to OGx_WORKER_CONCURRENCY submissions in flight at once (capped at
+      MAX_CONCURRENT_REQUESTS), with each terminal's messages still submitted
+      one at a time in queue order
+    - Optional batching of up to OGx_SUBMIT_BATCH_SIZE messages per submit call,
+      with each ForwardSubmission result applied to its own message
+    - Exponential backoff for retries, scheduled by the queue so a backing-off
+      message never blocks the messages behind it
     - Health monitoring via metrics
     - Dead letter queue for failed messages
     - Rate limit compliance
+    - Messages for a terminal with MAX_OUTSTANDING_MESSAGES_PER_SIZE messages
+      outstanding are held in the queue instead of being submitted, and released
+      by handle_status_update when one of that terminal's messages completes
+    - Forward IDs of accepted messages are handed to the status tracker, whose
+      batched fw_statuses polls report their final states
+    - A reaper task that returns messages whose claim expired (their worker died
+      mid-flight) to the queue, or to the dead letter queue once out of retries
+    - A metrics task that publishes queue depths and backlog age every
+      OGx_QUEUE_METRICS_INTERVAL_SECONDS
+    - A drain mode (see drain) that stops fetching, lets in-flight submissions
+      finish within OGx_WORKER_DRAIN_TIMEOUT_SECONDS and returns fetched messages
+      that were never started to the queue without counting an attempt
+    - When run under a leader lease, the fencing token is checked before each
+      batch, and a worker whose term has passed to another process stops
     """
 
-    def __init__(self, settings: Settings, message_queue: OGxMessageQueue):
+    def __init__(
+        self,
+        settings: Settings,
+        message_queue: MessageQueue,
+        limiter: Optional[TerminalOutstandingLimiter] = None,
+        metrics: Optional[MessageMetrics] = None,
+        status_tracker: Optional[MessageStatusTracker] = None,
+    ):
         """Initialize worker.
 
         Args:
             settings: Application settings
             message_queue: Message queue manager
+            limiter: Per-terminal outstanding message limiter; no limit if omitted.
+                Accepted messages only stay outstanding with a status_tracker,
+                as nothing else reports the final states that free their slots
+            metrics: Message metrics collector; metrics are not published if omitted
+            status_tracker: Tracker polling the status of accepted messages; their
+                status is not tracked if omitted
         """
         self.settings = settings
         self.message_queue = message_queue
+        self.limiter = limiter
+        self.metrics = metrics
+        self.status_tracker = status_tracker
         self.logger = get_infra_logger()
         self.running = False
         self.current_task: Optional[asyncio.Task] = None
+        self.reaper_task: Optional[asyncio.Task] = None
+        self.metrics_task: Optional[asyncio.Task] = None
+        self.fencing_token: Optional[int] = None
+        # Checks the fencing token against the lease; set by the lease's owner
+        self.is_current: Optional[Callable[[int], Awaitable[bool]]] = None
+
+        # Drain state; a draining worker takes no new batches and is not restarted
+        self.draining = False
+        self.drain_deadline: Optional[float] = None
+        self.drain_timeout = settings.OGx_WORKER_DRAIN_TIMEOUT_SECONDS
+        self._idle = False
 
         # Health metrics
         self.last_successful_process = 0.0
         self.processed_count = 0
         self.error_count = 0
         self.retry_count = 0
+        self.held_count = 0
+        self.reclaimed_count = 0
+        self.reclaimed_dead_letter_count = 0
+        self.in_flight_count = 0
+        self.returned_count = 0
+
+        # Bounds submissions in flight across all terminals (OGx-1.txt section 3.4)
+        self.concurrency = max(1, min(settings.OGx_WORKER_CONCURRENCY, MAX_CONCURRENT_REQUESTS))
+        self.dispatch_slots = asyncio.Semaphore(self.concurrency)
+
+        # Messages per submit call, and how long a partial batch waits to fill up
+        self.submit_batch_size = max(1, min(settings.OGx_SUBMIT_BATCH_SIZE, MAX_SUBMIT_MESSAGES))
+        self.submit_linger = settings.OGx_SUBMIT_LINGER_MS / 1000
+
+        # Fallback poll interval while no ready notification arrives
+        self.idle_timeout = settings.OGx_WORKER_IDLE_TIMEOUT_SECONDS
+
+        # Metrics label of the queue; each partition of a partitioned queue has its own
+        partition = message_queue.partition
+        self.queue_name = "outbound" if partition is None else f"outbound:{partition}"
 
     async def start(self) -> None:
         """Start the worker process."""
-        if self.running:
+        if self.running or self.draining:
             return
 
         self.running = True
+        await self.message_queue.initialize()
         self.current_task = asyncio.create_task(self._process_queue())
+        self.reaper_task = asyncio.create_task(self._reap_expired_leases())
+        if self.metrics:
+            self.metrics_task = asyncio.create_task(self._publish_queue_metrics())
         self.logger.info(
             "Message worker started",
             extra={"customer_id": self.settings.CUSTOMER_ID, "worker_id": id(self)},
         )
 
+    async def run(self, fencing_token: Optional[int] = None) -> None:
+        """Run the worker until cancelled or its processing loop exits.
+
+        Used as the loop of a SingletonTask, so that one process per deployment
+        runs the worker (OGx_WORKER_SINGLETON).
+
+        Args:
+            fencing_token: Fencing token of the leader term the worker runs in
+        """
+        self.fencing_token = fencing_token
+        await self.start()
+        if not self.running:
+            # Draining; a new term does not restart the worker
+            return
+        try:
+            if self.current_task:
+                await self.current_task
+        finally:
+            await self.stop()
+
     async def stop(self) -> None:
         """Stop the worker process."""
         self.running = False
-        if self.current_task:
-            self.current_task.cancel()
-            try:
-                await self.current_task
-            except asyncio.CancelledError:
-                pass
+        for task in (self.current_task, self.reaper_task, self.metrics_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        await self.message_queue.close_wakeup()
         self.logger.info(
             "Message worker stopped",
             extra={
@@ -89,6 +213,71 @@ class MessageWorker:
             },
         )
 
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Finish in-flight work, then stop the worker.
+
+        The processing loop stops fetching batches. Submissions already in flight
+        run to completion, and fetched messages that were not started are
+        returned to the queue without counting an attempt (see
+        MessageQueue.return_unsubmitted). An idle worker stops at once. Whatever
+        is still in flight at the deadline is cancelled as stop() would, and
+        retried.
+
+        Args:
+            timeout: Seconds to wait for in-flight submissions; defaults to
+                OGx_WORKER_DRAIN_TIMEOUT_SECONDS
+
+        Returns:
+            bool: True if everything in flight finished before the deadline
+        """
+        timeout = self.drain_timeout if timeout is None else timeout
+        if not self.draining:
+            self.draining = True
+            self.drain_deadline = time.time() + timeout
+            self.logger.info(
+                "Draining message worker",
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "worker_id": id(self),
+                    "in_flight_count": self.in_flight_count,
+                    "drain_timeout": timeout,
+                },
+            )
+
+        drained = True
+        task = self.current_task
+        if task and not task.done():
+            if self._idle:
+                # Waiting for messages, nothing in flight
+                task.cancel()
+            else:
+                remaining = max(0.0, (self.drain_deadline or 0.0) - time.time())
+                done, _ = await asyncio.wait({task}, timeout=remaining)
+                if not done:
+                    drained = False
+                    self.logger.warning(
+                        "Drain deadline passed, cancelling in-flight submissions",
+                        extra={
+                            "customer_id": self.settings.CUSTOMER_ID,
+                            "worker_id": id(self),
+                            "in_flight_count": self.in_flight_count,
+                        },
+                    )
+        await self.stop()
+        return drained
+
+    def get_drain_status(self) -> Dict:
+        """Get drain progress for health endpoints."""
+        return {
+            "draining": self.draining,
+            "drained": self.draining and not self.running,
+            "in_flight_count": self.in_flight_count,
+            "returned_count": self.returned_count,
+            "deadline_in": (
+                max(0.0, self.drain_deadline - time.time()) if self.drain_deadline else None
+            ),
+        }
+
     def get_health_metrics(self) -> Dict:
         """Get current health metrics."""
         return {
@@ -97,111 +286,69 @@ class MessageWorker:
             "processed_count": self.processed_count,
             "error_count": self.error_count,
             "retry_count": self.retry_count,
+            "held_count": self.held_count,
+            "reclaimed_count": self.reclaimed_count,
+            "reclaimed_dead_letter_count": self.reclaimed_dead_letter_count,
+            "concurrency": self.concurrency,
+            "in_flight_count": self.in_flight_count,
+            "fencing_token": self.fencing_token,
+            "returned_count": self.returned_count,
+            "draining": self.draining,
             "uptime": (
                 time.time() - self.last_successful_process if self.last_successful_process else 0
             ),
         }
 
     async def _process_queue(self) -> None:
-        """Main processing loop with retry and error handling."""
-        while self.running:
-            try:
-                # Get batch of pending messages
-                messages = await self.message_queue.get_pending_messages()
+        """Main processing loop with retry and error handling.
 
-                for message in messages:
-                    if not self.running:
-                        break
+        With OGx_SUBMIT_BATCH_SIZE above 1, ready messages are submitted in
+        batches (see _collect_batch). Otherwise each batch is split by destination
+        terminal. Terminals are dispatched concurrently while each terminal's
+        messages are submitted one after another in queue order; the next batch
+        is fetched once every terminal of the current one is done. When nothing
+        is ready the loop waits for the queue's ready notification. Under a
+        leader lease, each batch starts with a fencing token check.
 
-                    try:
-                        # Mark as in progress
-                        await self.message_queue.mark_in_progress(message.message_id)
-
-                        # Calculate retry delay with exponential backoff
-                        retry_delay = 0
-                        if message.retry_count > 0:
-                            retry_delay = min(
-                                DEFAULT_WINDOW_SECONDS * (2 ** (message.retry_count - 1)),
-                                300,  # Max 5 minutes
-                            )
-                            await asyncio.sleep(retry_delay)
-
-                        # Submit to OGx
-                        response = await submit_OGx_message(message.payload)
-
-                        # Handle rate limiting using existing error code
-                        if response.get("ErrorID") == GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED:
-                            retry_after = response.get("RetryAfter", 60)
-                            self.logger.warning(
-                                "Rate limited, will retry",
-                                extra={
-                                    "message_id": message.message_id,
-                                    "retry_after": retry_after,
-                                    "retry_count": message.retry_count,
-                                },
-                            )
-                            await asyncio.sleep(retry_after)
-                            await self.message_queue.mark_failed(
-                                message.message_id, f"Rate limited. Retry after {retry_after}s"
-                            )
-                            self.retry_count += 1
-                            continue
-
-                        # Check response
-                        if response.get("ErrorID", 1) == 0:
-                            await self.message_queue.mark_delivered(message.message_id)
-                            self.processed_count += 1
-                            self.last_successful_process = time.time()
-                        else:
-                            error = response.get("ErrorMessage", "Unknown error")
-                            await self.message_queue.mark_failed(message.message_id, error)
-                            self.error_count += 1
-                            self.logger.error(
-                                "Message processing failed",
-                                extra={
-                                    "message_id": message.message_id,
-                                    "error": error,
-                                    "retry_count": message.retry_count,
-                                },
+        Once draining, the loop exits after the current batch instead of fetching
+        another.
+        """
+        while self.running and not self.draining:
+            try:
+                if not await self._holds_term():
+                    self.logger.warning(
+                        "Leader term has passed to another process, stopping message worker",
+                        extra={
+                            "customer_id": self.settings.CUSTOMER_ID,
+                            "fencing_token": self.fencing_token,
+                        },
+                    )
+                    self.running = False
+                    break
+                if self.submit_batch_size > 1:
+                    fetched, batch = await self._collect_batch()
+                    if batch and self.draining:
+                        # Drain started while the batch lingered; it was never sent
+                        for message in batch:
+                            await self._release_slot(
+                                message.payload.get("DestinationID"), message.message_id
                             )
+                        await self._return_unsubmitted(batch)
+                    elif batch:
+                        await self._submit_batch(batch)
+                else:
+                    # Get batch of pending messages
+                    messages = await self.message_queue.get_pending_messages()
+                    fetched = len(messages)
+                    await self._dispatch_concurrently(messages)
 
-                    except asyncio.CancelledError:
-                        self.logger.info("Message processing cancelled")
-                        await self.message_queue.mark_failed(
-                            message.message_id, "Processing cancelled"
-                        )
-                        raise
-                    except OGxProtocolError as e:
-                        self.error_count += 1
-                        await self.message_queue.mark_failed(
-                            message.message_id, f"Protocol error: {str(e)}"
-                        )
-                        self.logger.error(
-                            "Protocol error processing message",
-                            extra={
-                                "message_id": message.message_id,
-                                "error": str(e),
-                                "error_code": e.error_code,
-                                "retry_count": message.retry_count,
-                            },
-                        )
-                    except (ConnectionError, TimeoutError) as e:
-                        self.error_count += 1
-                        await self.message_queue.mark_failed(
-                            message.message_id, f"Network error: {str(e)}"
-                        )
-                        self.logger.error(
-                            "Network error processing message",
-                            extra={
-                                "message_id": message.message_id,
-                                "error": str(e),
-                                "retry_count": message.retry_count,
-                            },
-                        )
-
-                # Sleep if no messages to prevent tight loop
-                if not messages:
-                    await asyncio.sleep(5)
+                # Wait for new messages instead of polling
+                if not fetched and not self.draining:
+                    self._idle = True
+                    try:
+                        await self.message_queue.wait_for_messages(self.idle_timeout)
+                    finally:
+                        self._idle = False
 
             except asyncio.CancelledError:
                 self.logger.info("Message processing loop cancelled")
@@ -218,7 +365,8 @@ class MessageWorker:
                     },
                 )
                 await asyncio.sleep(5)
-            except (ConnectionError, TimeoutError) as e:
+            except (RedisError, ConnectionError, TimeoutError) as e:
+                # RedisError does not derive from the builtin ConnectionError
                 self.error_count += 1
                 self.logger.error(
                     "Network error in message processing loop",
@@ -226,10 +374,517 @@ class MessageWorker:
                 )
                 await asyncio.sleep(5)
 
+    async def _holds_term(self) -> bool:
+        """Check that the worker's lease term is still the latest one."""
+        if self.fencing_token is None or self.is_current is None:
+            return True
+        return await self.is_current(self.fencing_token)
+
+    async def _dispatch_concurrently(self, messages: List[QueuedMessage]) -> None:
+        """Submit a batch one message per call, terminals in parallel."""
+        by_terminal: Dict[Optional[str], List[QueuedMessage]] = {}
+        for message in messages:
+            by_terminal.setdefault(message.payload.get("DestinationID"), []).append(message)
+
+        held: Dict[str, List[QueuedMessage]] = {}
+        unstarted: List[QueuedMessage] = []
+        results = await asyncio.gather(
+            *(
+                self._dispatch_terminal(terminal_id, terminal_messages, held, unstarted)
+                for terminal_id, terminal_messages in by_terminal.items()
+            ),
+            return_exceptions=True,
+        )
+
+        for terminal_id, terminal_messages in held.items():
+            await self._hold(terminal_id, terminal_messages)
+        if unstarted:
+            await self._return_unsubmitted(unstarted)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def _collect_batch(self) -> Tuple[int, List[QueuedMessage]]:
+        """Claim up to OGx_SUBMIT_BATCH_SIZE ready messages for one submit call.
+
+        If the first read does not fill the batch, the worker lingers for
+        OGx_SUBMIT_LINGER_MS and tops it up once, trading a little latency for
+        fewer calls against the SEND throttle group.
+
+        Returns:
+            Tuple[int, List[QueuedMessage]]: Number of messages read, and the
+                claimed messages in queue order
+        """
+        saturated: Set[Optional[str]] = set()
+        fetched, batch = await self._claim_batch(self.submit_batch_size, saturated)
+        if batch and len(batch) < self.submit_batch_size and self.submit_linger > 0:
+            await asyncio.sleep(self.submit_linger)
+            more_fetched, more = await self._claim_batch(
+                self.submit_batch_size - len(batch), saturated
+            )
+            fetched += more_fetched
+            batch.extend(more)
+        return fetched, batch
+
+    async def _claim_batch(
+        self, limit: int, saturated: Set[Optional[str]]
+    ) -> Tuple[int, List[QueuedMessage]]:
+        """Read and claim ready messages, holding those for saturated terminals.
+
+        Once a terminal is saturated, all of its later messages are held too, so
+        messages read after the linger cannot overtake held ones.
+
+        Args:
+            limit: Maximum number of messages to read
+            saturated: Terminals found saturated while collecting this batch
+
+        Returns:
+            Tuple[int, List[QueuedMessage]]: Number of messages read, and the
+                claimed messages
+        """
+        messages = await self.message_queue.get_pending_messages(batch_size=limit)
+        acquired: List[QueuedMessage] = []
+        held: Dict[str, List[QueuedMessage]] = {}
+        for message in messages:
+            terminal_id = message.payload.get("DestinationID")
+            if terminal_id in saturated or not await self._acquire_slot(
+                terminal_id, message.message_id
+            ):
+                # Only messages with a destination can saturate a terminal
+                assert terminal_id is not None
+                saturated.add(terminal_id)
+                held.setdefault(terminal_id, []).append(message)
+                continue
+            acquired.append(message)
+
+        claimed_ids: Set[str] = set()
+        try:
+            for terminal_id, terminal_messages in held.items():
+                await self._hold(terminal_id, terminal_messages)
+            if acquired:
+                claimed_ids = set(
+                    await self.message_queue.mark_in_progress_many([m.message_id for m in acquired])
+                )
+        finally:
+            # Messages another worker got there first for, or every message if the
+            # claim failed, do not keep their slot
+            for message in acquired:
+                if message.message_id not in claimed_ids:
+                    await self._release_slot(
+                        message.payload.get("DestinationID"), message.message_id
+                    )
+        return len(messages), [m for m in acquired if m.message_id in claimed_ids]
+
+    async def _submit_batch(self, messages: List[QueuedMessage]) -> None:
+        """Submit claimed messages in one OGx call and record each outcome."""
+        message_ids = [message.message_id for message in messages]
+        outstanding: Set[str] = set()
+        try:
+            response = await submit_OGx_messages([message.payload for message in messages])
+
+            if response.get("ErrorID") == GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED:
+                retry_after = response.get("RetryAfter", 60)
+                self.logger.warning(
+                    "Rate limited, will retry",
+                    extra={
+                        "message_ids": message_ids,
+                        "retry_after": retry_after,
+                    },
+                )
+                # Nothing was sent, so the deferral does not use up a retry
+                await self.message_queue.defer_many(
+                    message_ids, f"Rate limited. Retry after {retry_after}s", retry_after
+                )
+                self.retry_count += len(message_ids)
+                return
+
+            if response.get("ErrorID", 1) != 0:
+                error = response.get("ErrorMessage", "Unknown error")
+                await self.message_queue.mark_failed_many(message_ids, error)
+                self.error_count += len(message_ids)
+                self.logger.error(
+                    "Batch submission failed",
+                    extra={"message_ids": message_ids, "error": error},
+                )
+                return
+
+            outstanding = await self._apply_submissions(messages, response.get("Submissions") or [])
+
+        except asyncio.CancelledError:
+            self.logger.info("Batch submission cancelled")
+            await self.message_queue.mark_failed_many(message_ids, "Processing cancelled")
+            raise
+        except OGxProtocolError as e:
+            self.error_count += len(message_ids)
+            await self.message_queue.mark_failed_many(message_ids, f"Protocol error: {str(e)}")
+            self.logger.error(
+                "Protocol error submitting batch",
+                extra={"message_ids": message_ids, "error": str(e), "error_code": e.error_code},
+            )
+        except (ConnectionError, TimeoutError) as e:
+            self.error_count += len(message_ids)
+            await self.message_queue.mark_failed_many(message_ids, f"Network error: {str(e)}")
+            self.logger.error(
+                "Network error submitting batch",
+                extra={"message_ids": message_ids, "error": str(e)},
+            )
+        finally:
+            # Only accepted submissions count against the terminal
+            for message in messages:
+                if message.message_id not in outstanding:
+                    await self._release_slot(
+                        message.payload.get("DestinationID"), message.message_id
+                    )
+
+    async def _apply_submissions(
+        self, messages: List[QueuedMessage], submissions: List[Dict]
+    ) -> Set[str]:
+        """Map a batch's ForwardSubmission results back to its messages.
+
+        OGx returns one ForwardSubmission per submitted message, in request order.
+        Accepted messages are marked delivered; rejected ones, and any without a
+        result, are failed with their submission error.
+
+        Args:
+            messages: Submitted messages, in request order
+            submissions: Submissions array of the OGx response
+
+        Returns:
+            Set[str]: IDs of messages whose slot stays outstanding
+        """
+        outstanding: Set[str] = set()
+        delivered: List[str] = []
+        forward_ids: List[Union[int, str]] = []
+        rejected: Dict[str, List[str]] = {}
+        for index, message in enumerate(messages):
+            submission = submissions[index] if index < len(submissions) else None
+            if submission is None:
+                rejected.setdefault("No submission result returned", []).append(message.message_id)
+            elif submission.get("ErrorID", 1) == 0:
+                if await self._bind_slot(
+                    message.payload.get("DestinationID"),
+                    message.message_id,
+                    submission.get("ForwardMessageID"),
+                ):
+                    outstanding.add(message.message_id)
+                if submission.get("ForwardMessageID") is not None:
+                    forward_ids.append(submission["ForwardMessageID"])
+                delivered.append(message.message_id)
+            else:
+                error = f"Submission rejected with ErrorID {submission.get('ErrorID')}"
+                rejected.setdefault(error, []).append(message.message_id)
+
+        if delivered:
+            await self.message_queue.mark_delivered_many(delivered)
+            self.processed_count += len(delivered)
+            self.last_successful_process = time.time()
+        if forward_ids:
+            await self._track_statuses(forward_ids)
+        for error, message_ids in rejected.items():
+            await self.message_queue.mark_failed_many(message_ids, error)
+            self.error_count += len(message_ids)
+            self.logger.error(
+                "Message processing failed",
+                extra={"message_ids": message_ids, "error": error},
+            )
+        return outstanding
+
+    async def _dispatch_terminal(
+        self,
+        terminal_id: Optional[str],
+        messages: List[QueuedMessage],
+        held: Dict[str, List[QueuedMessage]],
+        unstarted: List[QueuedMessage],
+    ) -> None:
+        """Submit one terminal's messages in order.
+
+        Once the terminal is saturated, the message and every later one are held,
+        so a slot freed mid-batch cannot let a later message overtake an earlier one.
+        Once the worker is draining, the messages not yet started are left over.
+
+        Args:
+            terminal_id: Destination terminal of the messages
+            messages: The terminal's messages from the batch, in queue order
+            held: Messages to hold per terminal, filled in by this call
+            unstarted: Messages left over by a drain, filled in by this call
+        """
+        for index, message in enumerate(messages):
+            if not self.running:
+                break
+            if self.draining:
+                unstarted.extend(messages[index:])
+                break
+            if not await self._acquire_slot(terminal_id, message.message_id):
+                assert terminal_id is not None
+                held[terminal_id] = messages[index:]
+                break
+            async with self.dispatch_slots:
+                if self.draining:
+                    # Drain started while waiting for a dispatch slot
+                    await self._release_slot(terminal_id, message.message_id)
+                    unstarted.extend(messages[index:])
+                    break
+                self.in_flight_count += 1
+                try:
+                    await self._dispatch(terminal_id, message)
+                finally:
+                    self.in_flight_count -= 1
+
+    async def _dispatch(self, terminal_id: Optional[str], message: QueuedMessage) -> None:
+        """Claim and submit one message and record the outcome."""
+        submitted = False
+        try:
+            # Claim the message; skip it if another worker got there first
+            if not await self.message_queue.mark_in_progress(message.message_id):
+                return
+
+            # Submit to OGx
+            response = await submit_OGx_message(message.payload)
+
+            # Handle rate limiting using existing error code
+            if response.get("ErrorID") == GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED:
+                retry_after = response.get("RetryAfter", 60)
+                self.logger.warning(
+                    "Rate limited, will retry",
+                    extra={
+                        "message_id": message.message_id,
+                        "retry_after": retry_after,
+                        "retry_count": message.retry_count,
+                    },
+                )
+                # Nothing was sent, so the deferral does not use up a retry
+                await self.message_queue.defer(
+                    message.message_id, f"Rate limited. Retry after {retry_after}s", retry_after
+                )
+                self.retry_count += 1
+                return
+
+            # Check response
+            if response.get("ErrorID", 1) == 0:
+                submitted = await self._bind_slot(
+                    terminal_id, message.message_id, response.get("MessageID")
+                )
+                await self.message_queue.mark_delivered(message.message_id)
+                self.processed_count += 1
+                self.last_successful_process = time.time()
+                if response.get("MessageID") is not None:
+                    await self._track_statuses([response["MessageID"]])
+            else:
+                error = response.get("ErrorMessage", "Unknown error")
+                await self.message_queue.mark_failed(message.message_id, error)
+                self.error_count += 1
+                self.logger.error(
+                    "Message processing failed",
+                    extra={
+                        "message_id": message.message_id,
+                        "error": error,
+                        "retry_count": message.retry_count,
+                    },
+                )
+
+        except asyncio.CancelledError:
+            self.logger.info("Message processing cancelled")
+            await self.message_queue.mark_failed(message.message_id, "Processing cancelled")
+            raise
+        except OGxProtocolError as e:
+            self.error_count += 1
+            await self.message_queue.mark_failed(message.message_id, f"Protocol error: {str(e)}")
+            self.logger.error(
+                "Protocol error processing message",
+                extra={
+                    "message_id": message.message_id,
+                    "error": str(e),
+                    "error_code": e.error_code,
+                    "retry_count": message.retry_count,
+                },
+            )
+        except (ConnectionError, TimeoutError) as e:
+            self.error_count += 1
+            await self.message_queue.mark_failed(message.message_id, f"Network error: {str(e)}")
+            self.logger.error(
+                "Network error processing message",
+                extra={
+                    "message_id": message.message_id,
+                    "error": str(e),
+                    "retry_count": message.retry_count,
+                },
+            )
+        finally:
+            # Only accepted submissions count against the terminal
+            if not submitted:
+                await self._release_slot(terminal_id, message.message_id)
+
+    async def reclaim_expired_leases(self) -> Dict[str, str]:
+        """Reclaim messages whose claim expired and record the outcome.
+
+        Returns:
+            Dict[str, str]: Target queue ("pending" or "dead_letter") per reclaimed message ID
+        """
+        targets = await self.message_queue.reclaim_expired_leases()
+        if targets:
+            dead_lettered = sum(1 for target in targets.values() if target == "dead_letter")
+            self.reclaimed_count += len(targets)
+            self.reclaimed_dead_letter_count += dead_lettered
+            if self.metrics:
+                await self.metrics.record_messages_reclaimed(
+                    self.queue_name, targets, customer_id=self.settings.CUSTOMER_ID
+                )
+        return targets
+
+    async def _reap_expired_leases(self) -> None:
+        """Periodically reclaim messages whose claim expired."""
+        while self.running:
+            try:
+                await self.reclaim_expired_leases()
+            except asyncio.CancelledError:
+                raise
+            except (ConnectionError, TimeoutError) as e:
+                self.error_count += 1
+                self.logger.error(
+                    "Network error reclaiming expired leases",
+                    extra={"error": str(e), "customer_id": self.settings.CUSTOMER_ID},
+                )
+            await asyncio.sleep(self.settings.OGx_QUEUE_REAP_INTERVAL_SECONDS)
+
+    async def publish_queue_metrics(self) -> QueueDepths:
+        """Publish the queue's current depths through the metrics collector.
+
+        Returns:
+            QueueDepths: The published snapshot
+        """
+        depths = await self.message_queue.get_queue_depths()
+        if self.metrics:
+            customer_id = self.settings.CUSTOMER_ID
+            await self.metrics.update_queue_metrics(
+                self.queue_name, depths.pending, depths.in_progress, customer_id=customer_id
+            )
+            await self.metrics.update_lane_metrics(
+                self.queue_name,
+                {lane.value: depth for lane, depth in depths.lanes.items()},
+                customer_id=customer_id,
+            )
+            await self.metrics.update_queue_depth_metrics(
+                self.queue_name,
+                depths.states(),
+                {lane.value: age for lane, age in depths.oldest_ages.items()},
+                customer_id=customer_id,
+            )
+        return depths
+
+    async def _publish_queue_metrics(self) -> None:
+        """Periodically publish queue depths."""
+        while self.running:
+            try:
+                await self.publish_queue_metrics()
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, ConnectionError, TimeoutError) as e:
+                self.logger.error(
+                    "Network error publishing queue metrics",
+                    extra={"error": str(e), "customer_id": self.settings.CUSTOMER_ID},
+                )
+            await asyncio.sleep(self.settings.OGx_QUEUE_METRICS_INTERVAL_SECONDS)
+
+    async def handle_status_update(
+        self, forward_id: Union[int, str], state: Union[MessageState, int]
+    ) -> bool:
+        """Free a terminal's outstanding slot when a forward message reaches a final state.
+
+        One of the terminal's held messages is released back to the queue for each
+        free slot.
+
+        Args:
+            forward_id: OGx forward message ID from the status update
+            state: Reported message state
+
+        Returns:
+            bool: True if a slot was freed
+        """
+        if not self.limiter:
+            return False
+        terminal_id = await self.limiter.handle_status(forward_id, state)
+        if terminal_id is None:
+            return False
+        await self.message_queue.release_held(
+            terminal_id, await self.limiter.available(terminal_id)
+        )
+        return True
+
+    async def _acquire_slot(self, terminal_id: Optional[str], message_id: str) -> bool:
+        """Reserve an outstanding slot for a message; always succeeds without a limiter."""
+        if not self.limiter or not terminal_id:
+            return True
+        return await self.limiter.acquire(terminal_id, message_id)
+
+    async def _bind_slot(
+        self, terminal_id: Optional[str], message_id: str, forward_id: Optional[Union[int, str]]
+    ) -> bool:
+        """Bind an accepted message's slot to its forward ID.
+
+        Without a status tracker no final status would ever free the slot, so
+        the caller releases it instead.
+
+        Returns:
+            bool: True if the slot stays outstanding until a final status is seen
+        """
+        if not self.limiter or not self.status_tracker or not terminal_id or forward_id is None:
+            return False
+        await self.limiter.bind(terminal_id, message_id, forward_id)
+        return True
+
+    async def _track_statuses(self, forward_ids: List[Union[int, str]]) -> None:
+        """Hand accepted messages to the status tracker, if there is one."""
+        if not self.status_tracker:
+            return
+        try:
+            await self.status_tracker.track(forward_ids)
+        except RedisError as e:
+            # The messages are delivered; only their status polling is lost
+            self.logger.error(
+                "Failed to track message statuses",
+                extra={"forward_ids": forward_ids, "error": str(e)},
+            )
+
+    async def _release_slot(self, terminal_id: Optional[str], message_id: str) -> None:
+        """Release the slot of a message that is not outstanding at OGx."""
+        if self.limiter and terminal_id:
+            await self.limiter.release(terminal_id, message_id)
+
+    async def _return_unsubmitted(self, messages: List[QueuedMessage]) -> None:
+        """Return messages a drain left unstarted to the queue."""
+        await self.message_queue.return_unsubmitted([m.message_id for m in messages])
+        self.returned_count += len(messages)
+        self.logger.info(
+            "Draining, returned unstarted messages to the queue",
+            extra={
+                "customer_id": self.settings.CUSTOMER_ID,
+                "worker_id": id(self),
+                "returned_count": len(messages),
+            },
+        )
+
+    async def _hold(self, terminal_id: str, messages: List[QueuedMessage]) -> None:
+        """Hold messages for a saturated terminal until it has free slots."""
+        held = await self.message_queue.hold_messages(terminal_id, messages)
+        self.held_count += len(held)
+        # A slot may have been freed while the messages were being held
+        free = await self.limiter.available(terminal_id) if self.limiter else 0
+        if free:
+            await self.message_queue.release_held(terminal_id, free)
+        self.logger.info(
+            "Terminal saturated, holding messages",
+            extra={
+                "customer_id": self.settings.CUSTOMER_ID,
+                "terminal_id": terminal_id,
+                "held_count": len(held),
+            },
+        )
+
 
 async def get_message_worker() -> MessageWorker:
     """Get configured message worker instance."""
     settings = get_settings()
-    redis = await get_redis_client()
-    message_queue = OGxMessageQueue(redis, settings)
-    return MessageWorker(settings, message_queue)
+    message_queue = await get_message_queue(settings)
+    limiter = TerminalOutstandingLimiter(await get_redis_client(), settings)
+    metrics = MessageMetrics(PrometheusBackend())
+    return MessageWorker(settings, message_queue, limiter, metrics, await get_status_tracker())
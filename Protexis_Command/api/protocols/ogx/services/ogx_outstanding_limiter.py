@@ -0,0 +1,169 @@
+"""Per-terminal outstanding message limiter.
+
+OGx rejects forward messages to a terminal that already has
+MAX_OUTSTANDING_MESSAGES_PER_SIZE messages outstanding (OGx-1.txt section 4.3).
+This limiter tracks the messages submitted to each terminal that have not yet
+reached a final state, so the worker can hold further messages for a saturated
+terminal instead of submitting them and burning retries and rate limit budget
+on rejections.
+
+Key layout:
+    OGx:outstanding:<terminal>          Sorted set of queue message IDs by submission time
+    OGx:outstanding:forward:<id>        "<terminal> <message ID>" for an OGx forward ID
+
+Slots are shared by every worker through Redis. A slot whose final status is
+never seen is dropped after MESSAGE_TIMEOUT_DAYS, when OGx itself closes the
+message.
+"""
+
+import time
+from typing import FrozenSet, Optional, Union, cast
+
+from redis.asyncio import Redis
+
+from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.services.ogx_queue_scripts import (
+    OUTSTANDING_ACQUIRE_SCRIPT,
+)
+from Protexis_Command.core.logging.log_settings import LoggingConfig
+from Protexis_Command.core.logging.loggers import get_protocol_logger
+from Protexis_Command.core.settings.app_settings import Settings
+from Protexis_Command.protocols.ogx.constants.ogx_limits import (
+    MAX_OUTSTANDING_MESSAGES_PER_SIZE,
+    MESSAGE_TIMEOUT_DAYS,
+)
+
+# States after which a forward message no longer counts against its terminal
+FINAL_MESSAGE_STATES: FrozenSet[MessageState] = frozenset(
+    {
+        MessageState.RECEIVED,
+        MessageState.ERROR,
+        MessageState.DELIVERY_FAILED,
+        MessageState.TIMED_OUT,
+        MessageState.CANCELLED,
+        MessageState.BROADCAST_SUBMITTED,
+    }
+)
+
+
+class TerminalOutstandingLimiter:
+    """Limits the number of outstanding forward messages per destination terminal.
+
+    A slot is acquired before a message is submitted and bound to the forward
+    message ID assigned by OGx once the submission is accepted. The slot is
+    released when a status update reports a final state for that forward
+    message, or straight away if the submission is not accepted.
+
+    Args:
+        redis (Redis): Async Redis client shared by all workers
+        settings (Settings): Application settings
+        limit (int): Maximum outstanding messages per terminal
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        settings: Settings,
+        limit: int = MAX_OUTSTANDING_MESSAGES_PER_SIZE,
+    ):
+        self.redis = redis
+        self.settings = settings
+        self.logger = get_protocol_logger(config=LoggingConfig())
+        self.limit = limit
+        self.stale_seconds = MESSAGE_TIMEOUT_DAYS * 24 * 60 * 60
+
+        # Redis keys
+        self.outstanding_prefix = "OGx:outstanding:"
+        self.forward_prefix = "OGx:outstanding:forward:"
+
+        self._acquire_script = redis.register_script(OUTSTANDING_ACQUIRE_SCRIPT)
+
+    def _outstanding_key(self, terminal_id: str) -> str:
+        """Get the outstanding set key for a terminal."""
+        return f"{self.outstanding_prefix}{terminal_id}"
+
+    def _forward_key(self, forward_id: Union[int, str]) -> str:
+        """Get the binding key for an OGx forward message ID."""
+        return f"{self.forward_prefix}{forward_id}"
+
+    async def acquire(self, terminal_id: str, message_id: str) -> bool:
+        """Reserve an outstanding slot on a terminal for a message.
+
+        Acquiring a slot the message already holds succeeds without using another.
+
+        Args:
+            terminal_id: Destination terminal ID
+            message_id: Queue message ID
+
+        Returns:
+            bool: True if the message may be submitted, False if the terminal is saturated
+        """
+        acquired = await self._acquire_script(
+            keys=[self._outstanding_key(terminal_id)],
+            args=[self.limit, time.time(), self.stale_seconds, message_id],
+        )
+        return bool(acquired)
+
+    async def available(self, terminal_id: str) -> int:
+        """Get the number of free outstanding slots on a terminal."""
+        outstanding = await self.redis.zcount(
+            self._outstanding_key(terminal_id), time.time() - self.stale_seconds, "+inf"
+        )
+        return max(self.limit - outstanding, 0)
+
+    async def bind(self, terminal_id: str, message_id: str, forward_id: Union[int, str]) -> None:
+        """Associate a slot with the forward message ID assigned by OGx.
+
+        Args:
+            terminal_id: Destination terminal ID
+            message_id: Queue message ID holding the slot
+            forward_id: Forward message ID returned by the submission
+        """
+        await self.redis.set(
+            self._forward_key(forward_id), f"{terminal_id} {message_id}", ex=self.stale_seconds
+        )
+
+    async def release(self, terminal_id: str, message_id: str) -> bool:
+        """Release a message's slot on a terminal.
+
+        Returns:
+            bool: True if the message held a slot
+        """
+        return bool(await self.redis.zrem(self._outstanding_key(terminal_id), message_id))
+
+    async def handle_status(
+        self, forward_id: Union[int, str], state: Union[MessageState, int]
+    ) -> Optional[str]:
+        """Release the slot of a forward message that reached a final state.
+
+        Each binding is consumed by the first update that reports a final state,
+        so repeated status updates release the slot only once.
+
+        Args:
+            forward_id: OGx forward message ID from the status update
+            state: Reported message state
+
+        Returns:
+            Optional[str]: Terminal ID whose slot was released, or None
+        """
+        if MessageState(state) not in FINAL_MESSAGE_STATES:
+            return None
+        binding = cast(Optional[str], await self.redis.getdel(self._forward_key(forward_id)))
+        if not binding:
+            return None
+        terminal_id, message_id = binding.split(" ", 1)
+        await self.release(terminal_id, message_id)
+        self.logger.debug(
+            "Released outstanding slot on terminal %s",
+            terminal_id,
+            extra={
+                "customer_id": self.settings.CUSTOMER_ID,
+                "asset_id": "message_queue",
+                "terminal_id": terminal_id,
+                "message_id": message_id,
+                "forward_id": forward_id,
+                "state": MessageState(state).name,
+                "action": "release_outstanding",
+            },
+        )
+        return terminal_id
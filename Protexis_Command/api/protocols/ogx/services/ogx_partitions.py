@@ -0,0 +1,287 @@
+"""Terminal-hash partitioning of the outbound message queue.
+
+With OGx_QUEUE_PARTITIONS above 1 the queue is split into that many partitions.
+Each partition is a complete queue backend with its own keys (see
+partition_prefix), and every message goes to the partition of its destination
+terminal. All of a terminal's messages therefore live in one partition, and a
+partition is drained by one worker at a time (see ogx_worker_pool), which keeps
+per-terminal ordering while partitions are processed in parallel by different
+processes and hosts.
+
+PartitionedMessageQueue presents the partitions as a single MessageQueue for
+code that does not care about partitions: enqueueing routes each message to its
+partition, while depths, state lookups, dead letter tooling and cleanup span all
+partitions.
+
+Each partition enforces MAX_SUBMIT_MESSAGES on its own pending queue.
+"""
+
+import asyncio
+import zlib
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.models.messages import MessagePriority
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import (
+    CLEANUP_CHUNK_SIZE,
+    LANES,
+    MessageQueue,
+    QueueDepths,
+    QueuedMessage,
+)
+from Protexis_Command.core.logging.log_settings import LoggingConfig
+from Protexis_Command.core.logging.loggers import get_protocol_logger
+from Protexis_Command.core.settings.app_settings import Settings
+
+
+def partition_for(terminal_id: Optional[str], partitions: int) -> int:
+    """Get the partition of a destination terminal.
+
+    Uses CRC32 rather than hash(), which is salted per process, so every process
+    and host maps a terminal to the same partition.
+
+    Args:
+        terminal_id: Destination terminal (DestinationID) of a message
+        partitions: Number of partitions
+
+    Returns:
+        int: Partition number, from 0 to partitions - 1
+    """
+    if partitions <= 1:
+        return 0
+    return zlib.crc32((terminal_id or "").encode("utf-8")) % partitions
+
+
+class PartitionedMessageQueue(MessageQueue):
+    """Presents the partitions of a partitioned queue as one queue.
+
+    Messages fetched through this queue are remembered with their partition
+    until they are completed, held or found already claimed; as with the stream
+    backend, only messages fetched through an instance can be completed through it.
+
+    Args:
+        partitions (Sequence[MessageQueue]): Queue backend of each partition, in
+            partition order
+        settings (Settings): Application settings
+    """
+
+    def __init__(self, partitions: Sequence[MessageQueue], settings: Settings):
+        if not partitions:
+            raise ValueError("A partitioned queue needs at least one partition")
+        self.partitions = list(partitions)
+        self.settings = settings
+        self.redis = self.partitions[0].redis
+        self.logger = get_protocol_logger(config=LoggingConfig())
+        self.max_batch_size = self.partitions[0].max_batch_size
+        self.max_submit_size = self.partitions[0].max_submit_size
+
+        # Partition of each message fetched and not yet completed
+        self._owners: Dict[str, MessageQueue] = {}
+        # Partition the next fetch starts from, so no partition is always served last
+        self._next_partition = 0
+
+    def partition_of(self, terminal_id: Optional[str]) -> MessageQueue:
+        """Get the partition holding a destination terminal's messages."""
+        return self.partitions[partition_for(terminal_id, len(self.partitions))]
+
+    async def initialize(self) -> None:
+        """Prepare every partition for processing."""
+        for partition in self.partitions:
+            await partition.initialize()
+
+    async def enqueue_many(
+        self,
+        messages: Sequence[Tuple[str, Dict]],
+        priority: MessagePriority = MessagePriority.NORMAL,
+    ) -> Dict[str, str]:
+        """Enqueue each message in its destination terminal's partition.
+
+        The batch is split by partition and each part is enqueued in one atomic
+        call; the parts are enqueued concurrently.
+
+        Returns:
+            Dict[str, str]: Status per message ID, in batch order
+        """
+        by_partition: Dict[int, List[Tuple[str, Dict]]] = {}
+        for message_id, payload in messages:
+            index = partition_for(payload.get("DestinationID"), len(self.partitions))
+            by_partition.setdefault(index, []).append((message_id, payload))
+
+        results = await asyncio.gather(
+            *(
+                self.partitions[index].enqueue_many(part, priority)
+                for index, part in by_partition.items()
+            )
+        )
+        statuses: Dict[str, str] = {}
+        for result in results:
+            statuses.update(result)
+        return {message_id: statuses[message_id] for message_id, _ in messages}
+
+    async def get_pending_messages(self, batch_size: Optional[int] = None) -> List[QueuedMessage]:
+        """Fill a batch from the partitions in turn, starting one further each call."""
+        limit = batch_size or self.max_batch_size
+        start = self._next_partition
+        self._next_partition = (start + 1) % len(self.partitions)
+
+        messages: List[QueuedMessage] = []
+        for offset in range(len(self.partitions)):
+            if len(messages) >= limit:
+                break
+            partition = self.partitions[(start + offset) % len(self.partitions)]
+            fetched = await partition.get_pending_messages(batch_size=limit - len(messages))
+            for message in fetched:
+                self._owners[message.message_id] = partition
+            messages.extend(fetched)
+        return messages
+
+    async def get_lane_depths(self) -> Dict[MessagePriority, int]:
+        """Get the number of waiting messages per lane across all partitions."""
+        depths = await asyncio.gather(*(p.get_lane_depths() for p in self.partitions))
+        return {lane: sum(d.get(lane, 0) for d in depths) for lane in LANES}
+
+    async def get_queue_depths(self) -> QueueDepths:
+        """Get queue depths summed over all partitions, with each lane's oldest age."""
+        depths = await asyncio.gather(*(p.get_queue_depths() for p in self.partitions))
+        return QueueDepths(
+            lanes={lane: sum(d.lanes.get(lane, 0) for d in depths) for lane in LANES},
+            oldest_ages={lane: max(d.oldest_ages.get(lane, 0.0) for d in depths) for lane in LANES},
+            scheduled=sum(d.scheduled for d in depths),
+            held=sum(d.held for d in depths),
+            in_progress=sum(d.in_progress for d in depths),
+            delivered=sum(d.delivered for d in depths),
+            dead_letter=sum(d.dead_letter for d in depths),
+        )
+
+    async def get_message_state(self, message_id: str) -> Optional[MessageState]:
+        """Get a message's state from the first partition that knows it."""
+        for partition in self.partitions:
+            state = await partition.get_message_state(message_id)
+            if state is not None:
+                return state
+        return None
+
+    async def mark_in_progress_many(self, message_ids: Sequence[str]) -> List[str]:
+        """Claim fetched messages in their partitions."""
+        claimed: List[str] = []
+        for partition, ids in self._by_owner(message_ids).items():
+            claimed.extend(await partition.mark_in_progress_many(ids))
+        # Messages another worker claimed first are no longer ours to complete
+        claimed_ids = set(claimed)
+        for message_id in message_ids:
+            if message_id not in claimed_ids:
+                self._owners.pop(message_id, None)
+        return claimed
+
+    async def mark_delivered_many(self, message_ids: Sequence[str]) -> List[str]:
+        """Mark fetched messages as delivered in their partitions."""
+        delivered: List[str] = []
+        for partition, ids in self._by_owner(message_ids).items():
+            delivered.extend(await partition.mark_delivered_many(ids))
+        self._forget(message_ids)
+        return delivered
+
+    async def mark_failed_many(
+        self, message_ids: Sequence[str], error: str, retry_after: Optional[float] = None
+    ) -> Dict[str, str]:
+        """Mark fetched messages as failed in their partitions."""
+        targets: Dict[str, str] = {}
+        for partition, ids in self._by_owner(message_ids).items():
+            targets.update(await partition.mark_failed_many(ids, error, retry_after))
+        self._forget(message_ids)
+        return targets
+
+    async def defer_many(
+        self, message_ids: Sequence[str], reason: str, retry_after: float
+    ) -> List[str]:
+        """Defer fetched messages in their partitions."""
+        deferred: List[str] = []
+        for partition, ids in self._by_owner(message_ids).items():
+            deferred.extend(await partition.defer_many(ids, reason, retry_after))
+        self._forget(message_ids)
+        return deferred
+
+    async def reclaim_expired_leases(self) -> Dict[str, str]:
+        """Reclaim expired leases in every partition."""
+        targets: Dict[str, str] = {}
+        for result in await asyncio.gather(*(p.reclaim_expired_leases() for p in self.partitions)):
+            targets.update(result)
+        return targets
+
+    async def return_unsubmitted(self, message_ids: Sequence[str]) -> List[str]:
+        """Return unsubmitted messages in the partitions they were fetched from."""
+        returned: List[str] = []
+        for partition, ids in self._by_owner(message_ids).items():
+            returned.extend(await partition.return_unsubmitted(ids))
+        self._forget(message_ids)
+        return returned
+
+    async def hold_messages(self, terminal_id: str, messages: Sequence[QueuedMessage]) -> List[str]:
+        """Hold messages in their terminal's partition."""
+        self._forget([m.message_id for m in messages])
+        return await self.partition_of(terminal_id).hold_messages(terminal_id, messages)
+
+    async def release_held(self, terminal_id: str, count: int) -> int:
+        """Release held messages in their terminal's partition."""
+        return await self.partition_of(terminal_id).release_held(terminal_id, count)
+
+    async def scan_dead_letters(
+        self, count: int = CLEANUP_CHUNK_SIZE
+    ) -> AsyncIterator[List[QueuedMessage]]:
+        """Iterate over the dead letter queue of each partition in turn."""
+        for partition in self.partitions:
+            async for messages in partition.scan_dead_letters(count):
+                yield messages
+
+    async def replay_dead_letters(self, message_ids: Sequence[str]) -> Dict[str, str]:
+        """Replay dead-lettered messages from whichever partition holds them.
+
+        Each partition reports the messages it does not hold as "missing", so
+        the IDs are offered to the partitions in turn until every one is found.
+        """
+        statuses: Dict[str, str] = {}
+        remaining = list(message_ids)
+        for partition in self.partitions:
+            if not remaining:
+                break
+            for message_id, status in (await partition.replay_dead_letters(remaining)).items():
+                if status != "missing":
+                    statuses[message_id] = status
+            remaining = [m for m in remaining if m not in statuses]
+        return {message_id: statuses.get(message_id, "missing") for message_id in message_ids}
+
+    async def cleanup_expired_messages(self) -> int:
+        """Clean up expired messages in every partition."""
+        return sum(await asyncio.gather(*(p.cleanup_expired_messages() for p in self.partitions)))
+
+    async def notify_ready(self) -> None:
+        """Wake the workers of every partition."""
+        for partition in self.partitions:
+            await partition.notify_ready()
+
+    def _ready_channels(self) -> List[str]:
+        """Listen on the ready channel of every partition."""
+        return [p.ready_channel for p in self.partitions]
+
+    async def _next_retry_at(self) -> Optional[float]:
+        """Get when the earliest scheduled retry of any partition comes due."""
+        due = [
+            at
+            for at in await asyncio.gather(*(p._next_retry_at() for p in self.partitions))
+            if at is not None
+        ]
+        return min(due) if due else None
+
+    def _by_owner(self, message_ids: Sequence[str]) -> Dict[MessageQueue, List[str]]:
+        """Group fetched message IDs by the partition they were fetched from."""
+        by_owner: Dict[MessageQueue, List[str]] = {}
+        for message_id in message_ids:
+            owner = self._owners.get(message_id)
+            if owner is not None:
+                by_owner.setdefault(owner, []).append(message_id)
+        return by_owner
+
+    def _forget(self, message_ids: Sequence[str]) -> None:
+        """Drop completed messages from the fetched message map."""
+        for message_id in message_ids:
+            self._owners.pop(message_id, None)
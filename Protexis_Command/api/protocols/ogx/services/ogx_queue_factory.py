@@ -0,0 +1,78 @@
+"""Factory functions for the outbound message queue.
+
+The queue backend is selected with Settings.OGx_QUEUE_BACKEND:
+- "hash": OGxMessageQueue, Redis hashes with a FIFO pending index (default)
+- "stream": OGxStreamMessageQueue, Redis Streams consumer group
+
+With OGx_QUEUE_PARTITIONS above 1 the queue is split into partitions by
+destination terminal, each served by its own backend instance (see ogx_partitions).
+"""
+
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import (
+    MessageQueue,
+    OGxMessageQueue,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_partitions import PartitionedMessageQueue
+from Protexis_Command.api.protocols.ogx.services.ogx_stream_queue import OGxStreamMessageQueue
+from Protexis_Command.core.settings.app_settings import Settings, get_settings
+from Protexis_Command.infrastructure.cache.redis import get_redis_client
+
+QUEUE_BACKENDS = {
+    "hash": OGxMessageQueue,
+    "stream": OGxStreamMessageQueue,
+}
+
+
+def create_message_queue(
+    redis: Redis, settings: Settings, partition: Optional[int] = None
+) -> MessageQueue:
+    """Create the message queue backend configured in settings.
+
+    Args:
+        redis: Async Redis client for persistence
+        settings: Application settings
+        partition: Partition to create the backend for. By default a partitioned
+            queue is created as a PartitionedMessageQueue over all its partitions.
+
+    Returns:
+        Configured message queue backend
+
+    Raises:
+        ValueError: If OGx_QUEUE_BACKEND names an unknown backend, or
+            OGx_QUEUE_PARTITIONS is not positive
+    """
+    backend = settings.OGx_QUEUE_BACKEND.lower()
+    if backend not in QUEUE_BACKENDS:
+        raise ValueError(
+            f"Unknown OGx_QUEUE_BACKEND '{settings.OGx_QUEUE_BACKEND}'. "
+            f"Expected one of: {', '.join(QUEUE_BACKENDS)}"
+        )
+    partitions = settings.OGx_QUEUE_PARTITIONS
+    if partitions < 1:
+        raise ValueError(f"OGx_QUEUE_PARTITIONS must be at least 1, got {partitions}")
+    if partitions == 1:
+        return QUEUE_BACKENDS[backend](redis, settings)
+    if partition is not None:
+        return QUEUE_BACKENDS[backend](redis, settings, partition)
+    return PartitionedMessageQueue(
+        [QUEUE_BACKENDS[backend](redis, settings, p) for p in range(partitions)], settings
+    )
+
+
+async def get_message_queue(settings: Optional[Settings] = None) -> MessageQueue:
+    """Get configured message queue instance.
+
+    Args:
+        settings: Optional settings instance. If not provided, will use default settings.
+
+    Returns:
+        Configured message queue backend
+    """
+    if settings is None:
+        settings = get_settings()
+    redis = await get_redis_client()
+    return create_message_queue(redis, settings)
@@ -0,0 +1,591 @@
+"""Server-side Lua scripts for OGx message queue state transitions.
+
+Each script moves one or more messages between queue hashes and updates their
+delivery metadata in a single atomic call, so a transition costs one round trip
+and two workers can never claim the same message.
+
+Queue entries are moved unchanged. Mutable delivery metadata (state, retry count,
+last attempt and last error) lives in a per-message metadata hash, so the scripts
+never re-encode the message payload. Entries written before metadata hashes
+existed are seeded from the stored entry on their first transition; those
+entries are always legacy JSON, so the scripts never decode the binary entry
+format (see QueuedMessage.encode).
+
+Key layout (see OGxMessageQueue):
+    OGx:messages:<queue>                Hash of message ID -> encoded QueuedMessage
+    OGx:messages:pending:index[:<lane>] Sorted set per priority lane of pending message
+                                        IDs by enqueue time
+    OGx:messages:scheduled[:<lane>]     Sorted set per priority lane of retrying message
+                                        IDs by next eligible time
+    OGx:messages:meta:<id>              Hash of mutable delivery metadata for one message
+    OGx:messages:in_progress:leases     Sorted set of in_progress message IDs by lease deadline
+    OGx:messages:held                   Hash of held message ID -> destination terminal
+    OGx:messages:held:<terminal>[:<lane>]
+                                        Sorted set per priority lane of message IDs held
+                                        for a saturated terminal, by enqueue time
+    OGx:outstanding:<terminal>          Sorted set of message IDs submitted to a terminal
+                                        and not yet in a final state, by submission time
+    OGx:idempotency:queue:<customer>:<id>
+                                        Message ID queued for a submission identity
+                                        (see ogx_idempotency)
+
+The normal lane keeps the unsuffixed key names used before lanes existed. Lane
+keys are always passed in high, normal, low order. Partition n > 0 of a
+partitioned queue has the same keys under OGx:messages:p<n>: except the
+metadata hashes, which all partitions share.
+"""
+
+from typing import Final
+
+# Shared helper: create the metadata hash from a legacy entry if it is missing.
+_SEED_METADATA: Final[str] = """
+local function seed_metadata(meta_key, entry)
+    if redis.call('EXISTS', meta_key) == 1 then
+        return
+    end
+    local ok, decoded = pcall(cjson.decode, entry)
+    local retry_count = 0
+    if ok and type(decoded) == 'table' then
+        retry_count = tonumber(decoded['retry_count']) or 0
+        if type(decoded['error']) == 'string' then
+            redis.call('HSET', meta_key, 'error', decoded['error'])
+        end
+        if type(decoded['priority']) == 'string' then
+            redis.call('HSET', meta_key, 'priority', decoded['priority'])
+        end
+    end
+    redis.call('HSET', meta_key, 'retry_count', retry_count)
+end
+"""
+
+CLAIM_SCRIPT: Final[str] = _SEED_METADATA + """
+-- Move pending messages to in_progress, incrementing their retry count, and give
+-- each a lease that REAP_SCRIPT enforces.
+-- KEYS[1] pending hash, KEYS[2] in_progress hash, KEYS[3..5] pending index per lane,
+-- KEYS[6] lease index, KEYS[7..] metadata hash per message
+-- ARGV[1] state, ARGV[2] now, ARGV[3] metadata ttl, ARGV[4] lease deadline,
+-- ARGV[5..] message IDs
+-- Returns the IDs that were claimed by this call.
+local claimed = {}
+for i = 5, #ARGV do
+    local message_id = ARGV[i]
+    local meta_key = KEYS[i + 2]
+    local entry = redis.call('HGET', KEYS[1], message_id)
+    if entry then
+        seed_metadata(meta_key, entry)
+        redis.call('HDEL', KEYS[1], message_id)
+        for lane = 3, 5 do
+            redis.call('ZREM', KEYS[lane], message_id)
+        end
+        redis.call('HSET', KEYS[2], message_id, entry)
+        redis.call('ZADD', KEYS[6], ARGV[4], message_id)
+        redis.call('HINCRBY', meta_key, 'retry_count', 1)
+        redis.call('HSET', meta_key, 'state', ARGV[1], 'last_attempt', ARGV[2])
+        redis.call('EXPIRE', meta_key, ARGV[3])
+        claimed[#claimed + 1] = message_id
+    end
+end
+return claimed
+"""
+
+DELIVER_SCRIPT: Final[str] = _SEED_METADATA + """
+-- Move in_progress messages to delivered.
+-- KEYS[1] in_progress hash, KEYS[2] delivered hash, KEYS[3] lease index,
+-- KEYS[4..] metadata hash per message
+-- ARGV[1] state, ARGV[2] metadata ttl, ARGV[3..] message IDs
+-- Returns the IDs that were moved by this call.
+local moved = {}
+for i = 3, #ARGV do
+    local message_id = ARGV[i]
+    local meta_key = KEYS[i + 1]
+    local entry = redis.call('HGET', KEYS[1], message_id)
+    if entry then
+        seed_metadata(meta_key, entry)
+        redis.call('HDEL', KEYS[1], message_id)
+        redis.call('ZREM', KEYS[3], message_id)
+        redis.call('HSET', KEYS[2], message_id, entry)
+        redis.call('HSET', meta_key, 'state', ARGV[1])
+        redis.call('EXPIRE', meta_key, ARGV[2])
+        moved[#moved + 1] = message_id
+    end
+end
+return moved
+"""
+
+FAIL_SCRIPT: Final[str] = _SEED_METADATA + """
+-- Park in_progress messages in the retry schedule, or move them to the dead letter
+-- queue once they have used up their retries.
+-- Parked messages stay in the pending hash but are not indexed until they are due;
+-- PROMOTE_SCRIPT moves them into the pending index.
+-- Each retry is parked in the schedule of its priority lane.
+-- KEYS[1] in_progress hash, KEYS[2] pending hash, KEYS[3] dead_letter hash,
+-- KEYS[4..6] retry schedule per lane, KEYS[7] lease index, KEYS[8..] metadata hash
+-- per message
+-- ARGV[1] retry state, ARGV[2] dead letter state, ARGV[3] max retries,
+-- ARGV[4] error, ARGV[5] now, ARGV[6] metadata ttl, ARGV[7] base retry delay,
+-- ARGV[8] max retry delay, ARGV[9] retry after override ('' for backoff),
+-- ARGV[10..] message IDs
+-- Returns a flat list of message ID, target ('scheduled' or 'dead_letter'), retry count.
+local schedules = {high = KEYS[4], normal = KEYS[5], low = KEYS[6]}
+local results = {}
+local max_retries = tonumber(ARGV[3])
+local now = tonumber(ARGV[5])
+local retry_after = tonumber(ARGV[9])
+for i = 10, #ARGV do
+    local message_id = ARGV[i]
+    local meta_key = KEYS[i - 2]
+    local entry = redis.call('HGET', KEYS[1], message_id)
+    if entry then
+        seed_metadata(meta_key, entry)
+        local retry_count = tonumber(redis.call('HGET', meta_key, 'retry_count')) or 0
+        redis.call('HDEL', KEYS[1], message_id)
+        redis.call('ZREM', KEYS[7], message_id)
+        local target = 'scheduled'
+        if retry_count >= max_retries then
+            target = 'dead_letter'
+            redis.call('HSET', KEYS[3], message_id, entry)
+            redis.call('HSET', meta_key, 'state', ARGV[2])
+        else
+            local delay = retry_after
+            if not delay then
+                -- Exponential backoff: base * 2^(attempts - 1), capped
+                delay = tonumber(ARGV[7]) * 2 ^ math.max(retry_count - 1, 0)
+                delay = math.min(delay, tonumber(ARGV[8]))
+            end
+            local lane = redis.call('HGET', meta_key, 'priority')
+            redis.call('HSET', KEYS[2], message_id, entry)
+            redis.call('ZADD', schedules[lane] or KEYS[5], now + delay, message_id)
+            redis.call('HSET', meta_key, 'state', ARGV[1])
+        end
+        redis.call('HSET', meta_key, 'error', ARGV[4])
+        redis.call('EXPIRE', meta_key, ARGV[6])
+        results[#results + 1] = message_id
+        results[#results + 1] = target
+        results[#results + 1] = retry_count
+    end
+end
+return results
+"""
+
+REAP_SCRIPT: Final[str] = _SEED_METADATA + """
+-- Return in_progress messages whose lease has expired (their worker died or hung
+-- between claiming and completing them) to their lane's pending index, or move them
+-- to the dead letter queue once they have used up their retries.
+-- Each lease is re-checked here, so a message completed or re-claimed after the
+-- caller read the lease index is left alone.
+-- KEYS[1] in_progress hash, KEYS[2] pending hash, KEYS[3] dead_letter hash,
+-- KEYS[4] lease index, KEYS[5] expiry index, KEYS[6..8] pending index per lane,
+-- KEYS[9..] metadata hash per message
+-- ARGV[1] retry state, ARGV[2] dead letter state, ARGV[3] max retries, ARGV[4] error,
+-- ARGV[5] now, ARGV[6] metadata ttl, ARGV[7..] message IDs
+-- Returns a flat list of message ID, target ('pending' or 'dead_letter').
+local indexes = {high = KEYS[6], normal = KEYS[7], low = KEYS[8]}
+local results = {}
+local max_retries = tonumber(ARGV[3])
+local now = tonumber(ARGV[5])
+for i = 7, #ARGV do
+    local message_id = ARGV[i]
+    local meta_key = KEYS[i + 2]
+    local deadline = tonumber(redis.call('ZSCORE', KEYS[4], message_id))
+    if deadline and deadline <= now then
+        redis.call('ZREM', KEYS[4], message_id)
+        local entry = redis.call('HGET', KEYS[1], message_id)
+        if entry then
+            seed_metadata(meta_key, entry)
+            local retry_count = tonumber(redis.call('HGET', meta_key, 'retry_count')) or 0
+            redis.call('HDEL', KEYS[1], message_id)
+            local target = 'pending'
+            if retry_count >= max_retries then
+                target = 'dead_letter'
+                redis.call('HSET', KEYS[3], message_id, entry)
+                redis.call('HSET', meta_key, 'state', ARGV[2])
+            else
+                -- Requeue at its enqueue time, ahead of messages queued after it
+                local score = redis.call('ZSCORE', KEYS[5], message_id) or now
+                local lane = redis.call('HGET', meta_key, 'priority')
+                redis.call('HSET', KEYS[2], message_id, entry)
+                redis.call('ZADD', indexes[lane] or KEYS[7], score, message_id)
+                redis.call('HSET', meta_key, 'state', ARGV[1])
+            end
+            redis.call('HSET', meta_key, 'error', ARGV[4])
+            redis.call('EXPIRE', meta_key, ARGV[6])
+            results[#results + 1] = message_id
+            results[#results + 1] = target
+        end
+    end
+end
+return results
+"""
+
+RETURN_SCRIPT: Final[str] = _SEED_METADATA + """
+-- Return claimed messages that were never submitted (a draining worker stopped before
+-- sending them) to their lane's pending index, undoing the attempt CLAIM_SCRIPT counted.
+-- KEYS[1] in_progress hash, KEYS[2] pending hash, KEYS[3] lease index,
+-- KEYS[4] expiry index, KEYS[5..7] pending index per lane, KEYS[8..] metadata hash
+-- per message
+-- ARGV[1] first attempt state, ARGV[2] retry state, ARGV[3] now, ARGV[4] metadata ttl,
+-- ARGV[5..] message IDs
+-- Returns the IDs that were returned by this call.
+local indexes = {high = KEYS[5], normal = KEYS[6], low = KEYS[7]}
+local returned = {}
+for i = 5, #ARGV do
+    local message_id = ARGV[i]
+    local meta_key = KEYS[i + 3]
+    local entry = redis.call('HGET', KEYS[1], message_id)
+    if entry then
+        seed_metadata(meta_key, entry)
+        redis.call('HDEL', KEYS[1], message_id)
+        redis.call('ZREM', KEYS[3], message_id)
+        -- Requeue at its enqueue time, ahead of messages queued after it
+        local score = redis.call('ZSCORE', KEYS[4], message_id) or ARGV[3]
+        local lane = redis.call('HGET', meta_key, 'priority')
+        redis.call('HSET', KEYS[2], message_id, entry)
+        redis.call('ZADD', indexes[lane] or KEYS[6], score, message_id)
+        local retry_count = tonumber(redis.call('HGET', meta_key, 'retry_count')) or 1
+        retry_count = math.max(retry_count - 1, 0)
+        local state = ARGV[2]
+        if retry_count == 0 then
+            state = ARGV[1]
+        end
+        redis.call('HSET', meta_key, 'state', state, 'retry_count', retry_count)
+        redis.call('EXPIRE', meta_key, ARGV[4])
+        returned[#returned + 1] = message_id
+    end
+end
+return returned
+"""
+
+DEFER_SCRIPT: Final[str] = _SEED_METADATA + """
+-- Park claimed messages that were turned away unsent (a rate limit or an exhausted
+-- call budget) in their lane's retry schedule until a given time, undoing the
+-- attempt CLAIM_SCRIPT counted so deferrals never use up a message's retries.
+-- KEYS[1] in_progress hash, KEYS[2] pending hash, KEYS[3] lease index,
+-- KEYS[4..6] retry schedule per lane, KEYS[7..] metadata hash per message
+-- ARGV[1] first attempt state, ARGV[2] retry state, ARGV[3] error, ARGV[4] due time,
+-- ARGV[5] metadata ttl, ARGV[6..] message IDs
+-- Returns the IDs that were deferred by this call.
+local schedules = {high = KEYS[4], normal = KEYS[5], low = KEYS[6]}
+local deferred = {}
+for i = 6, #ARGV do
+    local message_id = ARGV[i]
+    local meta_key = KEYS[i + 1]
+    local entry = redis.call('HGET', KEYS[1], message_id)
+    if entry then
+        seed_metadata(meta_key, entry)
+        redis.call('HDEL', KEYS[1], message_id)
+        redis.call('ZREM', KEYS[3], message_id)
+        local lane = redis.call('HGET', meta_key, 'priority')
+        redis.call('HSET', KEYS[2], message_id, entry)
+        redis.call('ZADD', schedules[lane] or KEYS[5], ARGV[4], message_id)
+        local retry_count = tonumber(redis.call('HGET', meta_key, 'retry_count')) or 1
+        retry_count = math.max(retry_count - 1, 0)
+        local state = ARGV[2]
+        if retry_count == 0 then
+            state = ARGV[1]
+        end
+        redis.call('HSET', meta_key, 'state', state, 'retry_count', retry_count)
+        redis.call('HSET', meta_key, 'error', ARGV[3])
+        redis.call('EXPIRE', meta_key, ARGV[5])
+        deferred[#deferred + 1] = message_id
+    end
+end
+return deferred
+"""
+
+PROMOTE_SCRIPT: Final[str] = """
+-- Move retries whose backoff has elapsed from each lane's retry schedule to the
+-- lane's pending index.
+-- KEYS pairs of retry schedule, pending index (one pair per lane)
+-- ARGV[1] now, ARGV[2] maximum number of messages to move per lane
+-- Returns the number of messages moved.
+local moved = 0
+for k = 1, #KEYS, 2 do
+    local due = redis.call(
+        'ZRANGEBYSCORE', KEYS[k], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2]
+    )
+    for i = 1, #due, 2 do
+        -- Index by due time so retries queue behind messages enqueued before them
+        redis.call('ZADD', KEYS[k + 1], due[i + 1], due[i])
+        redis.call('ZREM', KEYS[k], due[i])
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+STREAM_PROMOTE_SCRIPT: Final[str] = """
+-- Re-add retries whose backoff has elapsed to their lane's stream (OGxStreamMessageQueue).
+-- KEYS[1] parked retry entries hash, KEYS[2..] pairs of retry schedule, stream per lane
+-- ARGV[1] now, ARGV[2] maximum number of messages to move per lane
+-- Returns the number of messages moved.
+local moved = 0
+for k = 2, #KEYS, 2 do
+    local due = redis.call('ZRANGEBYSCORE', KEYS[k], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+    for _, message_id in ipairs(due) do
+        local entry = redis.call('HGET', KEYS[1], message_id)
+        if entry then
+            redis.call('XADD', KEYS[k + 1], '*', 'message_id', message_id, 'entry', entry)
+            redis.call('HDEL', KEYS[1], message_id)
+            moved = moved + 1
+        end
+        redis.call('ZREM', KEYS[k], message_id)
+    end
+end
+return moved
+"""
+
+ENQUEUE_SCRIPT: Final[str] = """
+-- Add a batch of messages to the pending queue, enforcing the pending limit atomically.
+-- Messages are accepted in order until the pending hash reaches the limit. A message
+-- whose idempotency key is already indexed is a duplicate of an earlier submission
+-- and is not queued again (see ogx_idempotency).
+-- KEYS[1] pending hash, KEYS[2] pending index of the batch's lane, KEYS[3] expiry index,
+-- KEYS[4..] pairs of metadata hash, idempotency key per message
+-- ARGV[1] max pending, ARGV[2] state, ARGV[3] metadata ttl, ARGV[4] priority lane,
+-- ARGV[5..] message ID, encoded entry, enqueue time, idempotency ttl per message
+-- Returns a flat list of message ID, status ('accepted', 'duplicate' or 'queue_full').
+local results = {}
+local max_pending = tonumber(ARGV[1])
+local pending = redis.call('HLEN', KEYS[1])
+local n = 0
+for i = 5, #ARGV, 4 do
+    local message_id = ARGV[i]
+    local meta_key = KEYS[4 + n]
+    local idempotency_key = KEYS[5 + n]
+    n = n + 2
+    local status = 'accepted'
+    if redis.call('HEXISTS', KEYS[1], message_id) == 1 then
+        status = 'duplicate'
+    elseif redis.call('EXISTS', idempotency_key) == 1 then
+        status = 'duplicate'
+    elseif pending >= max_pending then
+        status = 'queue_full'
+    else
+        redis.call('HSET', KEYS[1], message_id, ARGV[i + 1])
+        redis.call('ZADD', KEYS[2], 'NX', ARGV[i + 2], message_id)
+        redis.call('ZADD', KEYS[3], 'NX', ARGV[i + 2], message_id)
+        redis.call('HSET', meta_key, 'state', ARGV[2], 'retry_count', 0, 'priority', ARGV[4])
+        redis.call('EXPIRE', meta_key, ARGV[3])
+        redis.call('SET', idempotency_key, message_id, 'EX', ARGV[i + 3])
+        pending = pending + 1
+    end
+    results[#results + 1] = message_id
+    results[#results + 1] = status
+end
+return results
+"""
+
+STREAM_ENQUEUE_SCRIPT: Final[str] = """
+-- Append a batch of messages to its lane's stream (OGxStreamMessageQueue), enforcing
+-- the pending limit atomically across every lane's stream and retry schedule and the
+-- messages held for saturated terminals. Duplicates of an earlier submission are
+-- skipped as in ENQUEUE_SCRIPT.
+-- KEYS[1] stream of the batch's lane, KEYS[2] expiry index, KEYS[3] held entries hash,
+-- KEYS[4..9] pairs of stream, retry schedule per lane, KEYS[10..] idempotency key
+-- per message
+-- ARGV[1] max pending, ARGV[2..] message ID, encoded entry, enqueue time,
+-- idempotency ttl per message
+-- Returns a flat list of message ID, status ('accepted', 'duplicate' or 'queue_full').
+local results = {}
+local max_pending = tonumber(ARGV[1])
+local pending = redis.call('HLEN', KEYS[3])
+for k = 4, 9, 2 do
+    pending = pending + redis.call('XLEN', KEYS[k]) + redis.call('ZCARD', KEYS[k + 1])
+end
+local n = 0
+for i = 2, #ARGV, 4 do
+    local message_id = ARGV[i]
+    local idempotency_key = KEYS[10 + n]
+    n = n + 1
+    local status = 'accepted'
+    if redis.call('EXISTS', idempotency_key) == 1 then
+        status = 'duplicate'
+    elseif pending >= max_pending then
+        status = 'queue_full'
+    else
+        redis.call('XADD', KEYS[1], '*', 'message_id', message_id, 'entry', ARGV[i + 1])
+        redis.call('ZADD', KEYS[2], 'NX', ARGV[i + 2], message_id)
+        redis.call('SET', idempotency_key, message_id, 'EX', ARGV[i + 3])
+        pending = pending + 1
+    end
+    results[#results + 1] = message_id
+    results[#results + 1] = status
+end
+return results
+"""
+
+REPLAY_SCRIPT: Final[str] = _SEED_METADATA + """
+-- Move dead-lettered messages back to their lane's pending index with a fresh retry
+-- budget, enforcing the pending limit as ENQUEUE_SCRIPT does.
+-- Replayed messages are indexed at the replay time, behind the messages already
+-- waiting, and get a fresh retention period.
+-- KEYS[1] dead_letter hash, KEYS[2] pending hash, KEYS[3] expiry index,
+-- KEYS[4..6] pending index per lane, KEYS[7..] metadata hash per message
+-- ARGV[1] max pending, ARGV[2] state, ARGV[3] now, ARGV[4] metadata ttl,
+-- ARGV[5..] message IDs
+-- Returns a flat list of message ID, status ('accepted', 'queue_full' or 'missing').
+local indexes = {high = KEYS[4], normal = KEYS[5], low = KEYS[6]}
+local results = {}
+local max_pending = tonumber(ARGV[1])
+local pending = redis.call('HLEN', KEYS[2])
+for i = 5, #ARGV do
+    local message_id = ARGV[i]
+    local meta_key = KEYS[i + 2]
+    local entry = redis.call('HGET', KEYS[1], message_id)
+    local status = 'accepted'
+    if not entry then
+        status = 'missing'
+    elseif pending >= max_pending then
+        status = 'queue_full'
+    else
+        seed_metadata(meta_key, entry)
+        local lane = redis.call('HGET', meta_key, 'priority')
+        redis.call('HDEL', KEYS[1], message_id)
+        redis.call('HSET', KEYS[2], message_id, entry)
+        redis.call('ZADD', indexes[lane] or KEYS[5], ARGV[3], message_id)
+        redis.call('ZADD', KEYS[3], ARGV[3], message_id)
+        redis.call('HDEL', meta_key, 'error', 'last_attempt')
+        redis.call('HSET', meta_key, 'state', ARGV[2], 'retry_count', 0)
+        redis.call('EXPIRE', meta_key, ARGV[4])
+        pending = pending + 1
+    end
+    results[#results + 1] = message_id
+    results[#results + 1] = status
+end
+return results
+"""
+
+STREAM_REPLAY_SCRIPT: Final[str] = """
+-- Append dead-lettered messages to their lane's stream (OGxStreamMessageQueue),
+-- enforcing the pending limit as STREAM_ENQUEUE_SCRIPT does. The caller re-encodes
+-- each entry with a fresh retry budget; an entry is only appended if it is still
+-- in the dead letter queue, so concurrent replays cannot duplicate a message.
+-- KEYS[1] dead_letter hash, KEYS[2] expiry index, KEYS[3] held entries hash,
+-- KEYS[4..] pairs of stream, retry schedule per lane
+-- ARGV[1] max pending, ARGV[2] now, ARGV[3..] message ID, encoded entry, lane
+-- per message
+-- Returns a flat list of message ID, status ('accepted', 'queue_full' or 'missing').
+local streams = {high = KEYS[4], normal = KEYS[6], low = KEYS[8]}
+local results = {}
+local max_pending = tonumber(ARGV[1])
+local pending = redis.call('HLEN', KEYS[3])
+for k = 4, #KEYS, 2 do
+    pending = pending + redis.call('XLEN', KEYS[k]) + redis.call('ZCARD', KEYS[k + 1])
+end
+for i = 3, #ARGV, 3 do
+    local message_id = ARGV[i]
+    local status = 'accepted'
+    if redis.call('HEXISTS', KEYS[1], message_id) == 0 then
+        status = 'missing'
+    elseif pending >= max_pending then
+        status = 'queue_full'
+    else
+        redis.call('HDEL', KEYS[1], message_id)
+        redis.call(
+            'XADD', streams[ARGV[i + 2]] or KEYS[6], '*',
+            'message_id', message_id, 'entry', ARGV[i + 1]
+        )
+        redis.call('ZADD', KEYS[2], ARGV[2], message_id)
+        pending = pending + 1
+    end
+    results[#results + 1] = message_id
+    results[#results + 1] = status
+end
+return results
+"""
+
+HOLD_SCRIPT: Final[str] = """
+-- Move fetched pending messages from their lane's pending index to their destination
+-- terminal's holding set while that terminal has too many messages outstanding.
+-- Held messages stay in the pending hash; RELEASE_SCRIPT re-indexes them.
+-- KEYS[1] pending index of the lane, KEYS[2] holding set of the terminal's lane,
+-- KEYS[3] held hash
+-- ARGV[1] terminal ID, ARGV[2..] message IDs
+-- Returns the IDs that were held by this call.
+local held = {}
+for i = 2, #ARGV do
+    local message_id = ARGV[i]
+    local score = redis.call('ZSCORE', KEYS[1], message_id)
+    if score then
+        redis.call('ZREM', KEYS[1], message_id)
+        redis.call('ZADD', KEYS[2], score, message_id)
+        redis.call('HSET', KEYS[3], message_id, ARGV[1])
+        held[#held + 1] = message_id
+    end
+end
+return held
+"""
+
+RELEASE_SCRIPT: Final[str] = """
+-- Move a terminal's held messages back to their lane's pending index, highest
+-- priority lane first and oldest first within a lane.
+-- KEYS[1] pending hash, KEYS[2] held hash,
+-- KEYS[3..] pairs of holding set, pending index per lane
+-- ARGV[1] maximum number of messages to release
+-- Returns the number of messages released.
+local released = 0
+local limit = tonumber(ARGV[1])
+for k = 3, #KEYS, 2 do
+    while released < limit do
+        local head = redis.call('ZRANGE', KEYS[k], 0, 0, 'WITHSCORES')
+        if #head == 0 then
+            break
+        end
+        redis.call('ZREM', KEYS[k], head[1])
+        redis.call('HDEL', KEYS[2], head[1])
+        -- Skip messages removed by retention cleanup while held
+        if redis.call('HEXISTS', KEYS[1], head[1]) == 1 then
+            redis.call('ZADD', KEYS[k + 1], head[2], head[1])
+            released = released + 1
+        end
+    end
+end
+return released
+"""
+
+STREAM_RELEASE_SCRIPT: Final[str] = """
+-- Re-add a terminal's held messages to their lane's stream (OGxStreamMessageQueue),
+-- highest priority lane first and oldest first within a lane.
+-- KEYS[1] held entries hash, KEYS[2..] pairs of holding set, stream per lane
+-- ARGV[1] maximum number of messages to release
+-- Returns the number of messages released.
+local released = 0
+local limit = tonumber(ARGV[1])
+for k = 2, #KEYS, 2 do
+    while released < limit do
+        local head = redis.call('ZRANGE', KEYS[k], 0, 0)
+        if #head == 0 then
+            break
+        end
+        local message_id = head[1]
+        redis.call('ZREM', KEYS[k], message_id)
+        local entry = redis.call('HGET', KEYS[1], message_id)
+        if entry then
+            redis.call('XADD', KEYS[k + 1], '*', 'message_id', message_id, 'entry', entry)
+            redis.call('HDEL', KEYS[1], message_id)
+            released = released + 1
+        end
+    end
+end
+return released
+"""
+
+OUTSTANDING_ACQUIRE_SCRIPT: Final[str] = """
+-- Reserve one of a terminal's outstanding message slots (TerminalOutstandingLimiter).
+-- Slots older than the stale age are dropped first, so a message whose final
+-- status was never seen cannot hold a slot forever.
+-- KEYS[1] outstanding set of the terminal
+-- ARGV[1] limit, ARGV[2] now, ARGV[3] stale age in seconds, ARGV[4] message ID
+-- Returns 1 if the message holds a slot, 0 if the terminal is saturated.
+local now = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - tonumber(ARGV[3]))
+if redis.call('ZSCORE', KEYS[1], ARGV[4]) then
+    return 1
+end
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
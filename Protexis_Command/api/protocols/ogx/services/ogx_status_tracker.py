@@ -0,0 +1,425 @@
+"""Batched forward message status tracking.
+
+OGx answers fw_statuses for up to MAX_STATUS_IDS_PER_REQUEST message IDs per call,
+and every call spends the GET throttle budget (OGx-1.txt section 3.4). Instead of
+one call per status check, the tracker keeps the forward message IDs that have not
+reached a final state and polls them in full chunks every
+OGx_STATUS_POLL_INTERVAL_SECONDS. Each chunk's results are written to the state
+store in one bulk update, and final states are passed to a callback that frees the
+terminal's outstanding slot (see MessageWorker.handle_status_update).
+
+Every fetched record is also written to a copy in Redis shared by every
+process, so processes other than the poller see its results. Status checks are
+answered from the tracker's local copy. A check for a message the copy does not
+hold, or holds a non-final status older than the poll interval for, waits for
+the next lookup shared by every check made within OGx_STATUS_LOOKUP_LINGER_MS.
+The lookup reads the shared copy first and makes one fw_statuses call for the
+messages it does not hold.
+
+Key layout:
+    OGx:status:pending      Set of forward message IDs not yet in a final state
+    OGx:status:record:<id>  Latest fw_statuses record and when it was fetched;
+                            open records expire after two poll intervals, final
+                            ones after OGx_STATUS_FINAL_TTL_SECONDS
+
+Workers add the forward IDs of accepted submissions to the pending set, and one
+process per deployment polls it (run under a SingletonTask).
+"""
+
+import asyncio
+import bisect
+import json
+import sys
+import time
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from httpx import HTTPError
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from Protexis_Command.api.common.clients.factory import get_OGx_client
+from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.services.ogx_outstanding_limiter import (
+    FINAL_MESSAGE_STATES,
+)
+from Protexis_Command.api.services.session.ogx_state_store import (
+    DynamoDBMessageStateStore,
+    MessageStateStore,
+    RedisMessageStateStore,
+)
+from Protexis_Command.core.logging.log_settings import LoggingConfig
+from Protexis_Command.core.logging.loggers import get_protocol_logger
+from Protexis_Command.core.settings.app_settings import Settings, get_settings
+from Protexis_Command.infrastructure.cache.redis import get_redis_client
+from Protexis_Command.protocols.ogx.constants.ogx_limits import MAX_STATUS_IDS_PER_REQUEST
+from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import (
+    OGxProtocolError,
+)
+
+if TYPE_CHECKING:
+    from Protexis_Command.api.services.ogx_client import OGxClient
+
+# Called with the forward ID and state of each message that reaches a final state
+FinalStatusCallback = Callable[[int, MessageState], Awaitable[Any]]
+
+_tracker: Optional["MessageStatusTracker"] = None
+
+
+def is_final(record: Dict) -> bool:
+    """Check whether a fw_statuses record will not change any more.
+
+    A record with no State carries the ErrorID of an ID OGx could not look up;
+    it is final too, so the ID is not polled forever.
+    """
+    if record.get("IsClosed") or "State" not in record:
+        return True
+    return record["State"] in FINAL_MESSAGE_STATES
+
+
+class MessageStatusTracker:
+    """Tracks forward message statuses with batched fw_statuses calls.
+
+    Args:
+        client (OGxClient): OGx client for fw_statuses calls
+        redis (Redis): Async Redis client shared by every process
+        settings (Settings): Application settings
+        state_store (Optional[MessageStateStore]): Store that receives each state
+            change; states are only kept locally if omitted
+        on_final (Optional[FinalStatusCallback]): Called for each message that
+            reaches a final state
+        chunk_size (int): Message IDs per fw_statuses call, up to
+            MAX_STATUS_IDS_PER_REQUEST
+    """
+
+    def __init__(
+        self,
+        client: "OGxClient",
+        redis: Redis,
+        settings: Settings,
+        state_store: Optional[MessageStateStore] = None,
+        on_final: Optional[FinalStatusCallback] = None,
+        chunk_size: int = MAX_STATUS_IDS_PER_REQUEST,
+    ):
+        self.client = client
+        self.redis = redis
+        self.settings = settings
+        self.state_store = state_store
+        self.on_final = on_final
+        self.logger = get_protocol_logger(config=LoggingConfig())
+
+        self.chunk_size = max(1, min(chunk_size, MAX_STATUS_IDS_PER_REQUEST))
+        self.poll_interval = settings.OGx_STATUS_POLL_INTERVAL_SECONDS
+        self.lookup_linger = settings.OGx_STATUS_LOOKUP_LINGER_MS / 1000
+        self.max_entries = settings.OGx_STATUS_CACHE_MAX_ENTRIES
+        # The poller rewrites open records every poll interval, so they outlive
+        # one missed round before lookups fall back to OGx
+        self.open_record_ttl = 2 * self.poll_interval
+        self.final_record_ttl = settings.OGx_STATUS_FINAL_TTL_SECONDS
+
+        # Redis keys
+        self.pending_key = "OGx:status:pending"
+        self.record_prefix = "OGx:status:record"
+
+        # Local copy: forward ID -> (status record, monotonic time it was fetched),
+        # oldest first
+        self._statuses: "OrderedDict[int, Tuple[Dict, float]]" = OrderedDict()
+        # Checks waiting for the next batched fetch, by forward ID
+        self._lookups: Dict[int, asyncio.Future] = {}
+        self._lookup_task: Optional[asyncio.Task] = None
+        # A round stopped by an error resumes after the last ID it polled, so the
+        # IDs at the end of the set are not starved by a short throttle budget
+        self._resume_after = 0
+
+        # fw_statuses calls made
+        self.request_count = 0
+
+    async def track(self, forward_ids: Iterable[Union[int, str]]) -> None:
+        """Start polling the status of accepted forward messages.
+
+        Args:
+            forward_ids: OGx forward message IDs
+        """
+        ids = [int(forward_id) for forward_id in forward_ids]
+        if ids:
+            await self.redis.sadd(self.pending_key, *ids)
+
+    async def get_status(self, forward_id: Union[int, str]) -> Optional[Dict]:
+        """Get the status of a forward message.
+
+        Answered from the local copy when it holds a final status, or one fetched
+        within the poll interval; otherwise the message joins the next batched
+        lookup of the shared copy, and of OGx for messages it does not hold.
+
+        Args:
+            forward_id: OGx forward message ID
+
+        Returns:
+            Optional[Dict]: fw_statuses record of the message, or None if OGx
+                returned none
+
+        Raises:
+            HTTPError: If the fw_statuses call fails
+            OGxProtocolError: If OGx rejects the fw_statuses call
+        """
+        forward_id = int(forward_id)
+        entry = self._statuses.get(forward_id)
+        if entry is not None:
+            record, fetched_at = entry
+            if is_final(record) or time.monotonic() - fetched_at < self.poll_interval:
+                return record
+
+        future = self._lookups.get(forward_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._lookups[forward_id] = future
+            if self._lookup_task is None or self._lookup_task.done():
+                self._lookup_task = asyncio.create_task(self._fetch_lookups())
+        # Shielded: a cancelled caller must not cancel the check other callers share
+        return await asyncio.shield(future)
+
+    async def poll(self) -> int:
+        """Poll every pending message once, in chunks of chunk_size IDs.
+
+        A round stops at the first failed call; the next round resumes there.
+
+        Returns:
+            int: Number of messages polled
+        """
+        ids = sorted(int(forward_id) for forward_id in await self.redis.smembers(self.pending_key))
+        start = bisect.bisect_right(ids, self._resume_after)
+        ids = ids[start:] + ids[:start]
+
+        polled = 0
+        for i in range(0, len(ids), self.chunk_size):
+            chunk = ids[i : i + self.chunk_size]
+            try:
+                await self._apply(await self._fetch(chunk))
+            except (HTTPError, OGxProtocolError, RedisError) as e:
+                self.logger.warning(
+                    "Status poll stopped after %d of %d messages: %s",
+                    polled,
+                    len(ids),
+                    str(e),
+                    extra={"customer_id": self.settings.CUSTOMER_ID, "action": "poll_statuses"},
+                )
+                return polled
+            polled += len(chunk)
+            self._resume_after = chunk[-1]
+        self._resume_after = 0
+        return polled
+
+    async def run(self) -> None:
+        """Poll the pending messages every poll interval until cancelled.
+
+        Used as the loop of a SingletonTask, so that one process per deployment
+        spends the GET budget on polling.
+        """
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except RedisError as e:
+                self.logger.error(
+                    "Failed to read pending message statuses",
+                    extra={"error": str(e), "customer_id": self.settings.CUSTOMER_ID},
+                )
+            await asyncio.sleep(self.poll_interval)
+
+    async def close(self) -> None:
+        """Fail pending checks and stop the batched fetch, if one is running."""
+        if self._lookup_task is not None:
+            self._lookup_task.cancel()
+            try:
+                await self._lookup_task
+            except asyncio.CancelledError:
+                pass
+            self._lookup_task = None
+        for future in self._lookups.values():
+            future.cancel()
+        self._lookups.clear()
+
+    async def _fetch_lookups(self) -> None:
+        """Answer the waiting checks with batched lookups until none are left."""
+        while self._lookups:
+            # Give concurrent checks time to join the fetch
+            await asyncio.sleep(self.lookup_linger)
+            lookups = dict(list(self._lookups.items())[: self.chunk_size])
+            for forward_id in lookups:
+                del self._lookups[forward_id]
+
+            try:
+                by_id = await self._read_shared(list(lookups))
+                missing = [forward_id for forward_id in lookups if forward_id not in by_id]
+                if missing:
+                    records = await self._fetch(missing)
+                    await self._apply(records, track=True)
+                    by_id.update(
+                        (int(record["ID"]), record)
+                        for record in records
+                        if record.get("ID") is not None
+                    )
+            except Exception as e:  # pylint: disable=broad-except
+                # Every waiting check gets the error rather than waiting forever
+                for future in lookups.values():
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for forward_id, future in lookups.items():
+                if not future.done():
+                    future.set_result(by_id.get(forward_id))
+
+    async def _fetch(self, forward_ids: List[int]) -> List[Dict]:
+        """Fetch the fw_statuses records of up to chunk_size messages in one call."""
+        self.request_count += 1
+        response = await self.client.get_message_status(forward_ids)
+        return response.get("Statuses") or []
+
+    async def _read_shared(self, forward_ids: List[int]) -> Dict[int, Dict]:
+        """Read the records the shared copy holds and add them to the local copy.
+
+        Returns:
+            Dict[int, Dict]: Record by forward ID; an unreadable shared copy
+                holds none
+        """
+        try:
+            values = await self.redis.mget([self._record_key(i) for i in forward_ids])
+        except RedisError as e:
+            self.logger.warning("Failed to read shared message statuses: %s", str(e))
+            return {}
+
+        now, wall_now = time.monotonic(), time.time()
+        records: Dict[int, Dict] = {}
+        for forward_id, value in zip(forward_ids, values):
+            if value is None:
+                continue
+            entry = json.loads(value)
+            # Keep the record's age, so the local copy does not serve it for longer
+            self._remember(
+                forward_id, entry["record"], now - max(0.0, wall_now - entry["fetched_at"])
+            )
+            records[forward_id] = entry["record"]
+        return records
+
+    async def _write_shared(self, records: Dict[int, Dict]) -> None:
+        """Write fetched records to the copy shared by every process."""
+        fetched_at = time.time()
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for forward_id, record in records.items():
+                    pipe.set(
+                        self._record_key(forward_id),
+                        json.dumps({"record": record, "fetched_at": fetched_at}),
+                        ex=self.final_record_ttl if is_final(record) else self.open_record_ttl,
+                    )
+                await pipe.execute()
+        except RedisError as e:
+            # Other processes fall back to fetching the statuses themselves
+            self.logger.warning("Failed to share %d message statuses: %s", len(records), str(e))
+
+    def _record_key(self, forward_id: int) -> str:
+        """Get the shared copy key of a forward message's record."""
+        return f"{self.record_prefix}:{forward_id}"
+
+    async def _apply(self, records: List[Dict], track: bool = False) -> None:
+        """Apply fetched records to the local and shared copies, state store and pending set.
+
+        Args:
+            records: fw_statuses records
+            track: Add messages that are not final to the pending set
+        """
+        now = time.monotonic()
+        changed: Dict[int, Tuple[MessageState, Optional[Dict]]] = {}
+        closed: List[int] = []
+        open_ids: List[int] = []
+        finished: List[Tuple[int, MessageState]] = []
+        by_id: Dict[int, Dict] = {}
+        for record in records:
+            if record.get("ID") is None:
+                continue
+            forward_id = int(record["ID"])
+            by_id[forward_id] = record
+            previous = self._statuses.get(forward_id)
+            self._remember(forward_id, record, now)
+
+            state: Optional[MessageState] = None
+            if record.get("State") is not None:
+                try:
+                    state = MessageState(record["State"])
+                except ValueError:
+                    self.logger.warning(
+                        "Unknown state %s for message %d", record["State"], forward_id
+                    )
+            if state is not None and (previous is None or previous[0].get("State") != state):
+                changed[forward_id] = (state, record)
+
+            if is_final(record):
+                closed.append(forward_id)
+                if state is not None:
+                    finished.append((forward_id, state))
+            else:
+                open_ids.append(forward_id)
+
+        if by_id:
+            await self._write_shared(by_id)
+        if changed and self.state_store is not None:
+            await self.state_store.update_states(changed)
+        if closed:
+            await self.redis.srem(self.pending_key, *closed)
+        if track and open_ids:
+            await self.redis.sadd(self.pending_key, *open_ids)
+        if self.on_final is not None:
+            for forward_id, state in finished:
+                await self.on_final(forward_id, state)
+
+    def _remember(self, forward_id: int, record: Dict, fetched_at: float) -> None:
+        """Store a record in the local copy, dropping the oldest beyond max_entries."""
+        self._statuses[forward_id] = (record, fetched_at)
+        self._statuses.move_to_end(forward_id)
+        while len(self._statuses) > self.max_entries:
+            self._statuses.popitem(last=False)
+
+
+async def get_status_tracker() -> MessageStatusTracker:
+    """Get the process-wide status tracker, creating it on first use.
+
+    The tracker is shared so that its local copy serves every status check.
+    """
+    if _tracker is not None:
+        return _tracker
+    settings = get_settings()
+    redis = await get_redis_client()
+    client = await get_OGx_client(settings)
+    state_store: MessageStateStore
+    if settings.ENVIRONMENT == "production":
+        state_store = DynamoDBMessageStateStore(settings.DYNAMODB_TABLE_NAME)
+    else:
+        state_store = RedisMessageStateStore(redis)
+    if _tracker is not None:
+        # Another caller created it while this one waited
+        return _tracker
+    tracker = MessageStatusTracker(client, redis, settings, state_store)
+    # Set module variable using module name to avoid global statement
+    setattr(sys.modules[__name__], "_tracker", tracker)
+    return tracker
+
+
+async def close_status_tracker() -> None:
+    """Close the process-wide status tracker, if one was created."""
+    tracker = _tracker
+    if tracker is not None:
+        setattr(sys.modules[__name__], "_tracker", None)
+        await tracker.close()
@@ -0,0 +1,1103 @@
+"""Redis Streams backend for the OGx outbound message queue.
+
+This backend stores pending messages in a Redis stream consumed through a
+consumer group, which gives every in-flight message an owner:
+- XREADGROUP hands each message to exactly one consumer, with blocking reads
+  that cost O(batch)
+- XACK/XDEL remove a message once it is delivered or re-queued
+- XAUTOCLAIM reclaims messages whose consumer died mid-flight once they have
+  been idle longer than OGx_QUEUE_CLAIM_IDLE_SECONDS
+
+Several MessageWorker processes can therefore share one queue safely, and a
+crashed worker's messages are picked up again instead of being stranded.
+
+Each priority lane has its own stream, and batches are split between lanes by
+weight as in OGxMessageQueue. Retries are parked in a per-lane schedule sorted
+by the time their backoff ends and are re-added to their lane's stream with
+their updated retry count once due. Messages for a terminal with too many
+messages outstanding are parked the same way in a per-terminal holding set
+until release_held re-adds them. The delivered and dead letter queues are the
+same hashes used by OGxMessageQueue.
+
+Select this backend with OGx_QUEUE_BACKEND=stream.
+"""
+
+import os
+import socket
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, cast
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+
+from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.models.messages import MessagePriority
+from Protexis_Command.api.protocols.ogx.services.ogx_idempotency import (
+    idempotency_key,
+    idempotency_ttl,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import (
+    CLEANUP_CHUNK_SIZE,
+    LANES,
+    MessageQueue,
+    QueueDepths,
+    QueuedMessage,
+    allocate_lane_quotas,
+    get_lane_weights,
+    lane_key,
+    partition_prefix,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_queue_scripts import (
+    STREAM_ENQUEUE_SCRIPT,
+    STREAM_PROMOTE_SCRIPT,
+    STREAM_RELEASE_SCRIPT,
+    STREAM_REPLAY_SCRIPT,
+)
+from Protexis_Command.core.logging.log_settings import LoggingConfig
+from Protexis_Command.core.logging.loggers import get_protocol_logger
+from Protexis_Command.core.settings.app_settings import Settings
+from Protexis_Command.protocols.ogx.constants.ogx_limits import (
+    DEFAULT_CALLS_PER_MINUTE,
+    DEFAULT_WINDOW_SECONDS,
+    MAX_MESSAGES_PER_RESPONSE,
+    MAX_SUBMIT_MESSAGES,
+    MESSAGE_RETENTION_DAYS,
+)
+
+# Stream entry read by XREADGROUP / XAUTOCLAIM: (stream, entry ID, fields)
+StreamEntry = Tuple[str, str, Optional[Dict[str, str]]]
+
+
+class OGxStreamMessageQueue(MessageQueue):
+    """Message queue backed by a Redis stream and consumer group.
+
+    Messages read by this consumer are tracked locally until they are
+    acknowledged by mark_delivered_many or mark_failed_many. Only the consumer
+    that read a message can complete it; messages owned by a consumer that
+    stops responding are reclaimed by the others through XAUTOCLAIM.
+
+    Args:
+        redis (Redis): Async Redis client for persistence
+        settings (Settings): Application settings including stream configuration
+        partition (Optional[int]): Partition of a partitioned queue this instance
+            serves; None for an unpartitioned queue
+    """
+
+    def __init__(self, redis: Redis, settings: Settings, partition: Optional[int] = None):
+        """Initialize stream queue.
+
+        Args:
+            redis (Redis): Async Redis client for persistence
+            settings (Settings): Application settings including stream configuration
+            partition (Optional[int]): Partition this instance serves, if partitioned
+        """
+        self.redis = redis
+        self.settings = settings
+        self.partition = partition
+        self.logger = get_protocol_logger(config=LoggingConfig())
+
+        # Redis keys
+        prefix = partition_prefix(partition)
+        self.streams = {lane: lane_key(f"{prefix}stream", lane) for lane in LANES}
+        self.scheduled_indexes = {
+            lane: lane_key(f"{prefix}stream:scheduled", lane) for lane in LANES
+        }
+        self.scheduled_queue = f"{prefix}stream:retries"
+        self.held_queue = f"{prefix}stream:held"
+        self.held_prefix = f"{prefix}stream:held:"
+        self.delivered_queue = f"{prefix}delivered"
+        self.dead_letter_queue = f"{prefix}dead_letter"
+        self.expiry_index = f"{prefix}expiry"
+        self.ready_channel = f"{prefix}ready"
+
+        # Consumer group membership
+        self.group = settings.OGx_QUEUE_CONSUMER_GROUP
+        self.consumer = settings.OGx_QUEUE_CONSUMER_NAME or f"{socket.gethostname()}-{os.getpid()}"
+        self.claim_idle_ms = settings.OGx_QUEUE_CLAIM_IDLE_SECONDS * 1000
+        self.block_ms = settings.OGx_QUEUE_BLOCK_MS
+
+        # Queue settings from OGx constants
+        self.max_retries = DEFAULT_CALLS_PER_MINUTE  # Align with rate limit
+        self.retry_delay = DEFAULT_WINDOW_SECONDS  # Use documented window
+        self.max_retry_delay = 300  # Max 5 minutes
+        self.message_retention_days = MESSAGE_RETENTION_DAYS
+        self.max_batch_size = MAX_MESSAGES_PER_RESPONSE
+        self.max_submit_size = MAX_SUBMIT_MESSAGES
+        self.cleanup_chunk_size = CLEANUP_CHUNK_SIZE
+        self.lane_weights = get_lane_weights(settings)
+
+        # Messages read by this consumer and not yet acknowledged:
+        # message ID -> (stream, entry ID, message)
+        self._inflight: Dict[str, Tuple[str, str, QueuedMessage]] = {}
+
+        self._enqueue_script = redis.register_script(STREAM_ENQUEUE_SCRIPT)
+        self._promote_script = redis.register_script(STREAM_PROMOTE_SCRIPT)
+        self._release_script = redis.register_script(STREAM_RELEASE_SCRIPT)
+        self._replay_script = redis.register_script(STREAM_REPLAY_SCRIPT)
+
+    async def initialize(self) -> None:
+        """Create the lane streams and consumer groups if they do not exist yet."""
+        for stream in self.streams.values():
+            try:
+                await self.redis.xgroup_create(stream, self.group, id="0", mkstream=True)
+                self.logger.info(
+                    "Created consumer group %s",
+                    self.group,
+                    extra={
+                        "customer_id": self.settings.CUSTOMER_ID,
+                        "asset_id": "message_queue",
+                        "stream": stream,
+                        "action": "initialize",
+                    },
+                )
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    async def enqueue_many(
+        self,
+        messages: Sequence[Tuple[str, Dict]],
+        priority: MessagePriority = MessagePriority.NORMAL,
+    ) -> Dict[str, str]:
+        """Append a batch of messages to its lane's stream in one atomic call.
+
+        The enqueue script checks the length of every lane's stream plus parked
+        retries and held messages against MAX_SUBMIT_MESSAGES, skips repeats of
+        indexed submissions and appends and indexes each accepted message in a
+        single round trip.
+
+        Args:
+            messages: (message ID, payload) pairs to enqueue
+            priority: Priority lane for the batch
+
+        Returns:
+            Dict[str, str]: Status per message ID: "accepted", "duplicate" (a repeat
+                of an indexed submission) or "queue_full"
+
+        Raises:
+            Exception: If the Redis script fails
+        """
+        if not messages:
+            return {}
+        queued = [
+            QueuedMessage(message_id=m, payload=payload, priority=priority)
+            for m, payload in messages
+        ]
+        try:
+            results = await self._enqueue_script(
+                keys=[
+                    self.streams[priority],
+                    self.expiry_index,
+                    self.held_queue,
+                    *(
+                        key
+                        for lane in LANES
+                        for key in (self.streams[lane], self.scheduled_indexes[lane])
+                    ),
+                    *(idempotency_key(self.settings.CUSTOMER_ID, m.payload) for m in queued),
+                ],
+                args=[
+                    self.max_submit_size,
+                    *(
+                        value
+                        for m in queued
+                        for value in (
+                            m.message_id,
+                            self._encode(m)["entry"],
+                            m.created_at,
+                            idempotency_ttl(self.settings, m.payload),
+                        )
+                    ),
+                ],
+            )
+            statuses = dict(zip(results[0::2], results[1::2]))
+            self._log_enqueued(statuses)
+        except Exception as e:
+            self.logger.error(
+                "Failed to enqueue %d messages: %s",
+                len(queued),
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": [m.message_id for m in queued],
+                    "error": str(e),
+                    "action": "enqueue",
+                },
+            )
+            raise
+        if "accepted" in statuses.values():
+            await self.notify_ready()
+        return statuses
+
+    async def get_pending_messages(self, batch_size: Optional[int] = None) -> List[QueuedMessage]:
+        """Read a batch of messages for this consumer.
+
+        Retries whose backoff has elapsed are re-added to their stream and messages
+        abandoned by other consumers are reclaimed first. New messages are then
+        read from each lane by weight (see allocate_lane_quotas); if none are ready
+        the read blocks on every lane for up to OGx_QUEUE_BLOCK_MS.
+
+        Args:
+            batch_size: Optional override for default batch size
+
+        Returns:
+            List of messages now owned by this consumer, highest priority lane first
+        """
+        try:
+            effective_batch_size = batch_size or self.max_batch_size
+            await self.promote_due_retries(effective_batch_size)
+            entries = await self._reclaim_idle(effective_batch_size)
+            deliveries = await self._delivery_counts([(e[0], e[1]) for e in entries])
+
+            remaining = effective_batch_size - len(entries)
+            if remaining > 0:
+                quotas = allocate_lane_quotas(
+                    await self.get_lane_depths(), remaining, self.lane_weights
+                )
+                lanes = [lane for lane in LANES if quotas[lane]]
+                if lanes:
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        for lane in lanes:
+                            await pipe.xreadgroup(
+                                self.group,
+                                self.consumer,
+                                {self.streams[lane]: ">"},
+                                count=quotas[lane],
+                            )
+                        responses = await pipe.execute()
+                    for response in responses:
+                        entries.extend(self._flatten(response))
+
+            if not entries:
+                response = await self.redis.xreadgroup(
+                    self.group,
+                    self.consumer,
+                    {stream: ">" for stream in self.streams.values()},
+                    count=effective_batch_size,
+                    block=self.block_ms,
+                )
+                entries.extend(self._flatten(response))
+
+            messages = self._track_entries(entries)
+            if deliveries:
+                messages = await self._count_interrupted_attempts(messages, deliveries)
+            return sorted(messages, key=lambda message: LANES.index(message.priority))
+
+        except RedisError as e:
+            self.logger.error(
+                "Failed to get pending messages: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "error": str(e),
+                    "action": "get_pending",
+                },
+            )
+            return []
+
+    async def get_lane_depths(self) -> Dict[MessagePriority, int]:
+        """Get the number of entries in each lane's stream.
+
+        Entries read but not yet acknowledged are included; parked retries are not.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for lane in LANES:
+                await pipe.xlen(self.streams[lane])
+            depths = await pipe.execute()
+        return dict(zip(LANES, depths))
+
+    async def get_queue_depths(self) -> QueueDepths:
+        """Get queue depths from the consumer group, streams and queue hashes.
+
+        Acknowledged entries are deleted from their stream, so each stream holds
+        the lane's ready messages plus the ones read and not yet acknowledged
+        (the group's pending entries list). The oldest ready message is the first
+        entry after the group's last delivered ID, whose ID carries the time it
+        was added to the stream.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for lane in LANES:
+                await pipe.xlen(self.streams[lane])
+                await pipe.xinfo_groups(self.streams[lane])
+            await pipe.hlen(self.scheduled_queue)
+            await pipe.hlen(self.held_queue)
+            await pipe.hlen(self.delivered_queue)
+            await pipe.hlen(self.dead_letter_queue)
+            results = await pipe.execute()
+
+        lanes: Dict[MessagePriority, int] = {}
+        last_delivered: Dict[MessagePriority, str] = {}
+        in_progress = 0
+        for i, lane in enumerate(LANES):
+            group = next((g for g in results[2 * i + 1] if g["name"] == self.group), None)
+            pending = group["pending"] if group else 0
+            in_progress += pending
+            lanes[lane] = max(results[2 * i] - pending, 0)
+            if lanes[lane]:
+                last_delivered[lane] = group["last-delivered-id"] if group else "0-0"
+
+        oldest_ages = {lane: 0.0 for lane in LANES}
+        if last_delivered:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for lane, entry_id in last_delivered.items():
+                    await pipe.xrange(self.streams[lane], min=f"({entry_id}", count=1)
+                heads = await pipe.execute()
+            now = time.time()
+            for lane, head in zip(last_delivered, heads):
+                if head:
+                    added_at = int(head[0][0].split("-")[0]) / 1000
+                    oldest_ages[lane] = max(now - added_at, 0.0)
+
+        scheduled, held, delivered, dead_letter = results[6:10]
+        return QueueDepths(
+            lanes=lanes,
+            oldest_ages=oldest_ages,
+            scheduled=scheduled,
+            held=held,
+            in_progress=in_progress,
+            delivered=delivered,
+            dead_letter=dead_letter,
+        )
+
+    async def get_message_state(self, message_id: str) -> Optional[MessageState]:
+        """Get a message's state from the queue holding it.
+
+        Messages still in a stream, retry schedule or holding set are reported
+        as ACCEPTED; stream entries have no per-message state to look up.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            await pipe.hexists(self.delivered_queue, message_id)
+            await pipe.hexists(self.dead_letter_queue, message_id)
+            await pipe.zscore(self.expiry_index, message_id)
+            delivered, dead_lettered, indexed = await pipe.execute()
+        if delivered:
+            return MessageState.RECEIVED
+        if dead_lettered:
+            return MessageState.TIMED_OUT
+        return MessageState.ACCEPTED if indexed is not None else None
+
+    async def promote_due_retries(self, limit: Optional[int] = None) -> int:
+        """Re-add retries whose backoff has elapsed to their lane's stream.
+
+        Args:
+            limit: Maximum number of retries to promote per lane (defaults to
+                max_batch_size)
+
+        Returns:
+            int: Number of retries promoted
+        """
+        promoted = int(
+            await self._promote_script(
+                keys=[
+                    self.scheduled_queue,
+                    *(
+                        key
+                        for lane in LANES
+                        for key in (self.scheduled_indexes[lane], self.streams[lane])
+                    ),
+                ],
+                args=[time.time(), limit or self.max_batch_size],
+            )
+        )
+        if promoted:
+            self.logger.debug(
+                "Promoted %d scheduled retries",
+                promoted,
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "promoted_count": promoted,
+                    "action": "promote_retries",
+                },
+            )
+        return promoted
+
+    async def mark_in_progress_many(self, message_ids: Sequence[str]) -> List[str]:
+        """Start delivery attempts for messages owned by this consumer.
+
+        Ownership was taken when the messages were read, so this only updates
+        the attempt bookkeeping carried with the message.
+
+        Args:
+            message_ids: Message identifiers to start
+
+        Returns:
+            List[str]: IDs owned by this consumer; other IDs are omitted
+        """
+        claimed = []
+        now = time.time()
+        for message_id in message_ids:
+            if message_id not in self._inflight:
+                continue
+            _, _, message = self._inflight[message_id]
+            message.state = MessageState.SENDING
+            message.retry_count += 1
+            message.last_attempt = now
+            claimed.append(message_id)
+        return claimed
+
+    async def mark_delivered_many(self, message_ids: Sequence[str]) -> List[str]:
+        """Acknowledge delivered messages and record them in the delivered queue.
+
+        Args:
+            message_ids: Message identifiers to mark as delivered
+
+        Returns:
+            List[str]: IDs acknowledged by this call
+
+        Raises:
+            Exception: If the Redis transaction fails
+        """
+        owned = [m for m in message_ids if m in self._inflight]
+        if not owned:
+            return []
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for message_id in owned:
+                    stream, entry_id, message = self._inflight[message_id]
+                    message.state = MessageState.RECEIVED
+                    await pipe.hset(self.delivered_queue, message_id, message.encode())
+                    await pipe.xack(stream, self.group, entry_id)
+                    await pipe.xdel(stream, entry_id)
+                await pipe.execute()
+
+            for message_id in owned:
+                del self._inflight[message_id]
+
+            self.logger.info(
+                "Marked %d messages delivered",
+                len(owned),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": owned,
+                    "action": "mark_delivered",
+                },
+            )
+            return owned
+        except Exception as e:
+            self.logger.error(
+                "Failed to mark messages delivered: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": owned,
+                    "error": str(e),
+                    "action": "mark_delivered",
+                },
+            )
+            raise
+
+    async def mark_failed_many(
+        self, message_ids: Sequence[str], error: str, retry_after: Optional[float] = None
+    ) -> Dict[str, str]:
+        """Schedule retries for or dead-letter failed messages owned by this consumer.
+
+        Messages under max_retries are parked in their lane's retry schedule with their
+        updated retry count until their backoff ends; the rest move to the dead
+        letter queue. The original stream entries are acknowledged in the same
+        transaction.
+
+        Args:
+            message_ids: Message identifiers to mark as failed
+            error: Error message describing the failure
+            retry_after: Seconds to wait before retrying, overriding the backoff
+
+        Returns:
+            Dict[str, str]: Target queue ("scheduled" or "dead_letter") per moved message ID
+
+        Raises:
+            Exception: If the Redis transaction fails
+        """
+        owned = [m for m in message_ids if m in self._inflight]
+        if not owned:
+            return {}
+        targets: Dict[str, str] = {}
+        now = time.time()
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for message_id in owned:
+                    stream, entry_id, message = self._inflight[message_id]
+                    message.error = error
+                    if message.retry_count >= self.max_retries:
+                        message.state = MessageState.TIMED_OUT
+                        await pipe.hset(self.dead_letter_queue, message_id, message.encode())
+                        targets[message_id] = "dead_letter"
+                    else:
+                        message.state = MessageState.DELIVERY_FAILED
+                        delay = self._backoff(message.retry_count, retry_after)
+                        await pipe.hset(self.scheduled_queue, message_id, message.encode())
+                        await pipe.zadd(
+                            self.scheduled_indexes[message.priority], {message_id: now + delay}
+                        )
+                        targets[message_id] = "scheduled"
+                    await pipe.xack(stream, self.group, entry_id)
+                    await pipe.xdel(stream, entry_id)
+                await pipe.execute()
+
+            for message_id in owned:
+                _, _, message = self._inflight.pop(message_id)
+                self.logger.info(
+                    "Message %s marked failed",
+                    message_id,
+                    extra={
+                        "customer_id": self.settings.CUSTOMER_ID,
+                        "asset_id": "message_queue",
+                        "message_id": message_id,
+                        "retry_count": message.retry_count,
+                        "max_retries": self.max_retries,
+                        "target_queue": targets[message_id],
+                        "error": error,
+                        "action": "mark_failed",
+                    },
+                )
+            return targets
+        except Exception as e:
+            self.logger.error(
+                "Failed to mark messages failed: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": owned,
+                    "error": str(e),
+                    "action": "mark_failed",
+                },
+            )
+            raise
+
+    async def defer_many(
+        self, message_ids: Sequence[str], reason: str, retry_after: float
+    ) -> List[str]:
+        """Park unsent messages owned by this consumer in their lane's retry schedule.
+
+        The attempt started by mark_in_progress_many is undone before the entry
+        is re-encoded, so the message keeps its full retry budget. The original
+        stream entries are acknowledged in the same transaction.
+
+        Args:
+            message_ids: Claimed messages that were not sent
+            reason: Why the messages were deferred, recorded as their error
+            retry_after: Seconds to wait before the messages are eligible again
+
+        Returns:
+            List[str]: IDs moved to the retry schedule by this call
+
+        Raises:
+            Exception: If the Redis transaction fails
+        """
+        owned = [m for m in message_ids if m in self._inflight]
+        if not owned:
+            return []
+        due = time.time() + retry_after
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for message_id in owned:
+                    stream, entry_id, message = self._inflight[message_id]
+                    message.retry_count = max(message.retry_count - 1, 0)
+                    message.state = (
+                        MessageState.DELIVERY_FAILED
+                        if message.retry_count
+                        else MessageState.ACCEPTED
+                    )
+                    message.error = reason
+                    await pipe.hset(self.scheduled_queue, message_id, message.encode())
+                    await pipe.zadd(self.scheduled_indexes[message.priority], {message_id: due})
+                    await pipe.xack(stream, self.group, entry_id)
+                    await pipe.xdel(stream, entry_id)
+                await pipe.execute()
+
+            for message_id in owned:
+                del self._inflight[message_id]
+            self.logger.info(
+                "Deferred %d messages for %ss",
+                len(owned),
+                retry_after,
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": owned,
+                    "retry_after": retry_after,
+                    "error": reason,
+                    "action": "defer",
+                },
+            )
+            return owned
+        except Exception as e:
+            self.logger.error(
+                "Failed to defer messages: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_ids": owned,
+                    "error": str(e),
+                    "action": "defer",
+                },
+            )
+            raise
+
+    async def reclaim_expired_leases(self) -> Dict[str, str]:
+        """Reclaim messages whose consumer stopped before completing them.
+
+        The consumer group already tracks ownership: entries idle longer than
+        OGx_QUEUE_CLAIM_IDLE_SECONDS are taken over by XAUTOCLAIM at the start of
+        every get_pending_messages call, so there is nothing to reap here.
+
+        Returns:
+            Dict[str, str]: Always empty
+        """
+        return {}
+
+    async def return_unsubmitted(self, message_ids: Sequence[str]) -> List[str]:
+        """Hand unsubmitted messages owned by this consumer back to the group.
+
+        A consumer group cannot un-deliver an entry, so each entry stays pending
+        and its idle time is set to OGx_QUEUE_CLAIM_IDLE_SECONDS with XCLAIM.
+        The next XAUTOCLAIM of any consumer then takes it over straight away.
+        The stored entry is unchanged and the entry's delivery count is wound
+        back by one, so the attempt started by mark_in_progress_many is not
+        counted, here or as an interrupted attempt on reclaim.
+
+        Args:
+            message_ids: Messages returned by get_pending_messages and not submitted
+
+        Returns:
+            List[str]: IDs handed back by this call
+        """
+        owned = [m for m in message_ids if m in self._inflight]
+        if not owned:
+            return []
+        entries = [self._inflight[message_id][:2] for message_id in owned]
+        deliveries = await self._delivery_counts(entries)
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream, entry_id in entries:
+                await pipe.xclaim(
+                    stream,
+                    self.group,
+                    self.consumer,
+                    min_idle_time=0,
+                    message_ids=[entry_id],
+                    idle=self.claim_idle_ms,
+                    retrycount=max(deliveries.get((stream, entry_id), 1) - 1, 0),
+                    justid=True,
+                )
+            await pipe.execute()
+
+        for message_id in owned:
+            del self._inflight[message_id]
+        await self.notify_ready()
+        self.logger.info(
+            "Returned %d unsubmitted messages to the consumer group",
+            len(owned),
+            extra={
+                "customer_id": self.settings.CUSTOMER_ID,
+                "asset_id": "message_queue",
+                "consumer": self.consumer,
+                "message_ids": owned,
+                "action": "return_unsubmitted",
+            },
+        )
+        return owned
+
+    async def hold_messages(self, terminal_id: str, messages: Sequence[QueuedMessage]) -> List[str]:
+        """Park messages owned by this consumer in the terminal's holding set.
+
+        The stream entries are acknowledged in the same transaction, as when a
+        retry is scheduled.
+
+        Args:
+            terminal_id: Destination terminal of the messages
+            messages: Messages returned by get_pending_messages and not claimed
+
+        Returns:
+            List[str]: IDs held by this call
+        """
+        owned = [m.message_id for m in messages if m.message_id in self._inflight]
+        if not owned:
+            return []
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for message_id in owned:
+                stream, entry_id, message = self._inflight[message_id]
+                await pipe.hset(self.held_queue, message_id, self._encode(message)["entry"])
+                await pipe.zadd(
+                    self._held_key(terminal_id, message.priority),
+                    {message_id: message.created_at},
+                )
+                await pipe.xack(stream, self.group, entry_id)
+                await pipe.xdel(stream, entry_id)
+            await pipe.execute()
+
+        for message_id in owned:
+            del self._inflight[message_id]
+        self.logger.info(
+            "Held %d messages for terminal %s",
+            len(owned),
+            terminal_id,
+            extra={
+                "customer_id": self.settings.CUSTOMER_ID,
+                "asset_id": "message_queue",
+                "terminal_id": terminal_id,
+                "message_ids": owned,
+                "action": "hold",
+            },
+        )
+        return owned
+
+    async def release_held(self, terminal_id: str, count: int) -> int:
+        """Re-add up to count of a terminal's held messages to their lane's stream.
+
+        Args:
+            terminal_id: Destination terminal with free capacity
+            count: Maximum number of messages to release
+
+        Returns:
+            int: Number of messages released
+        """
+        if count <= 0:
+            return 0
+        released = int(
+            await self._release_script(
+                keys=[
+                    self.held_queue,
+                    *(
+                        key
+                        for lane in LANES
+                        for key in (self._held_key(terminal_id, lane), self.streams[lane])
+                    ),
+                ],
+                args=[count],
+            )
+        )
+        if released:
+            await self.notify_ready()
+            self.logger.info(
+                "Released %d held messages for terminal %s",
+                released,
+                terminal_id,
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "terminal_id": terminal_id,
+                    "released_count": released,
+                    "action": "release_held",
+                },
+            )
+        return released
+
+    async def scan_dead_letters(
+        self, count: int = CLEANUP_CHUNK_SIZE
+    ) -> AsyncIterator[List[QueuedMessage]]:
+        """Iterate over the dead letter queue with HSCAN in chunks of about count messages.
+
+        Dead-lettered entries carry their final error and retry count.
+        """
+        cursor = 0
+        while True:
+            cursor, entries = await self.redis.hscan(self.dead_letter_queue, cursor, count=count)
+            messages = []
+            for message_id, data in cast(Dict[str, str], entries).items():
+                message = self._decode_dead_letter(message_id, data)
+                if message is not None:
+                    messages.append(message)
+            if messages:
+                yield messages
+            if not cursor:
+                break
+
+    async def replay_dead_letters(self, message_ids: Sequence[str]) -> Dict[str, str]:
+        """Re-add dead-lettered messages to their lane's stream.
+
+        Entries are re-encoded with a fresh retry budget and appended by one
+        script call that checks the pending limit and removes each accepted
+        message from the dead letter queue.
+
+        Args:
+            message_ids: IDs of the dead-lettered messages to replay
+
+        Returns:
+            Dict[str, str]: Status per message ID: "accepted", "queue_full" or "missing"
+        """
+        if not message_ids:
+            return {}
+        entries = cast(
+            List[Optional[str]], await self.redis.hmget(self.dead_letter_queue, list(message_ids))
+        )
+        statuses: Dict[str, str] = {}
+        replayed: List[QueuedMessage] = []
+        for message_id, data in zip(message_ids, entries):
+            message = self._decode_dead_letter(message_id, data) if data is not None else None
+            if message is None:
+                statuses[message_id] = "missing"
+                continue
+            message.state = MessageState.ACCEPTED
+            message.retry_count = 0
+            message.last_attempt = None
+            message.error = None
+            replayed.append(message)
+        if replayed:
+            results = await self._replay_script(
+                keys=[
+                    self.dead_letter_queue,
+                    self.expiry_index,
+                    self.held_queue,
+                    *(
+                        key
+                        for lane in LANES
+                        for key in (self.streams[lane], self.scheduled_indexes[lane])
+                    ),
+                ],
+                args=[
+                    self.max_submit_size,
+                    time.time(),
+                    *(
+                        value
+                        for m in replayed
+                        for value in (m.message_id, self._encode(m)["entry"], m.priority.value)
+                    ),
+                ],
+            )
+            statuses.update(zip(results[0::2], results[1::2]))
+        self._log_replayed(statuses)
+        if "accepted" in statuses.values():
+            await self.notify_ready()
+        return statuses
+
+    async def cleanup_expired_messages(self) -> int:
+        """Remove messages older than the retention period.
+
+        Stream entry IDs start with their creation time in milliseconds, so
+        XTRIM MINID removes expired entries without reading them. Expired
+        delivered, dead-lettered, parked retry and held entries are found through
+        the expiry index and deleted in pipelined chunks of cleanup_chunk_size.
+
+        Returns:
+            int: Number of messages removed
+        """
+        removed = 0
+        try:
+            cutoff = time.time() - self.message_retention_days * 24 * 60 * 60
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for stream in self.streams.values():
+                    await pipe.xtrim(stream, minid=f"{int(cutoff * 1000)}-0", approximate=False)
+                removed += sum(await pipe.execute())
+
+            while True:
+                message_ids = await self.redis.zrangebyscore(
+                    self.expiry_index, "-inf", cutoff, start=0, num=self.cleanup_chunk_size
+                )
+                if not message_ids:
+                    break
+
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    await pipe.hdel(self.delivered_queue, *message_ids)
+                    await pipe.hdel(self.dead_letter_queue, *message_ids)
+                    await pipe.hdel(self.scheduled_queue, *message_ids)
+                    await pipe.hdel(self.held_queue, *message_ids)
+                    for lane in LANES:
+                        await pipe.zrem(self.scheduled_indexes[lane], *message_ids)
+                    await pipe.zrem(self.expiry_index, *message_ids)
+                    results = await pipe.execute()
+                # Trimmed stream entries are already counted above
+                removed += sum(results[:4])
+
+                if len(message_ids) < self.cleanup_chunk_size:
+                    break
+
+            self.logger.info(
+                "Cleaned up %d expired messages",
+                removed,
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "removed_count": removed,
+                    "action": "cleanup",
+                },
+            )
+        except RedisError as e:
+            self.logger.error(
+                "Failed to cleanup expired messages: %s",
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "removed_count": removed,
+                    "error": str(e),
+                    "action": "cleanup",
+                },
+            )
+        return removed
+
+    async def _reclaim_idle(self, count: int) -> List[StreamEntry]:
+        """Take ownership of messages idle in other consumers for too long.
+
+        Args:
+            count: Maximum number of messages to reclaim from each lane
+
+        Returns:
+            Reclaimed stream entries, highest priority lane first
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for lane in LANES:
+                await pipe.xautoclaim(
+                    self.streams[lane],
+                    self.group,
+                    self.consumer,
+                    min_idle_time=self.claim_idle_ms,
+                    start_id="0-0",
+                    count=count,
+                )
+            responses = await pipe.execute()
+
+        entries: List[StreamEntry] = []
+        for lane, response in zip(LANES, responses):
+            if response:
+                stream = self.streams[lane]
+                entries.extend((stream, entry_id, fields) for entry_id, fields in response[1])
+        if entries:
+            self.logger.warning(
+                "Reclaimed %d idle messages",
+                len(entries),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "consumer": self.consumer,
+                    "action": "reclaim",
+                },
+            )
+        return entries
+
+    async def _delivery_counts(
+        self, entries: Sequence[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], int]:
+        """Get how many times pending stream entries have been delivered.
+
+        Args:
+            entries: (stream, entry ID) pairs pending in the consumer group
+
+        Returns:
+            Delivery count per (stream, entry ID); entries no longer pending are omitted
+        """
+        if not entries:
+            return {}
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream, entry_id in entries:
+                await pipe.xpending_range(stream, self.group, min=entry_id, max=entry_id, count=1)
+            responses = await pipe.execute()
+        return {
+            entry: int(response[0]["times_delivered"])
+            for entry, response in zip(entries, responses)
+            if response
+        }
+
+    async def _count_interrupted_attempts(
+        self, messages: List[QueuedMessage], deliveries: Dict[Tuple[str, str], int]
+    ) -> List[QueuedMessage]:
+        """Count the attempts reclaimed messages lost to consumer failures.
+
+        A stream entry is immutable, so its retry count only covers attempts on
+        earlier entries of the message. Every earlier delivery of a reclaimed
+        entry was an attempt whose consumer stopped before completing it; those
+        are added to the retry count, and messages left without retries go to
+        the dead letter queue instead of being submitted again.
+
+        Args:
+            messages: Messages just read or reclaimed by this consumer
+            deliveries: Delivery count per (stream, entry ID) of the reclaimed entries
+
+        Returns:
+            The messages that still have retries left
+        """
+        exhausted = []
+        for message in messages:
+            stream, entry_id, _ = self._inflight[message.message_id]
+            delivered = deliveries.get((stream, entry_id))
+            if not delivered:
+                continue
+            message.retry_count += delivered - 1
+            if message.retry_count >= self.max_retries:
+                exhausted.append(message.message_id)
+        if not exhausted:
+            return messages
+        await self.mark_failed_many(exhausted, "Delivery interrupted by consumer failures")
+        return [m for m in messages if m.message_id not in exhausted]
+
+    @staticmethod
+    def _flatten(response: Any) -> List[StreamEntry]:
+        """Flatten an XREADGROUP response into stream entries."""
+        return [
+            (stream, entry_id, fields)
+            for stream, stream_entries in response or []
+            for entry_id, fields in stream_entries
+        ]
+
+    def _track_entries(self, entries: Sequence[StreamEntry]) -> List[QueuedMessage]:
+        """Decode stream entries and record them as owned by this consumer."""
+        messages = []
+        for stream, entry_id, fields in entries:
+            if not fields:
+                # Entry was trimmed while pending
+                continue
+            try:
+                message = self._decode(fields)
+            except (KeyError, ValueError) as e:
+                self.logger.error(
+                    "Failed to decode stream entry %s: %s",
+                    entry_id,
+                    str(e),
+                    extra={
+                        "customer_id": self.settings.CUSTOMER_ID,
+                        "asset_id": "message_queue",
+                        "stream": stream,
+                        "entry_id": entry_id,
+                        "error": str(e),
+                        "action": "get_pending",
+                    },
+                )
+                continue
+            self._inflight[message.message_id] = (stream, entry_id, message)
+            messages.append(message)
+        return messages
+
+    def _held_key(self, terminal_id: str, lane: MessagePriority) -> str:
+        """Get the holding set key for a terminal's priority lane."""
+        return lane_key(f"{self.held_prefix}{terminal_id}", lane)
+
+    def _backoff(self, retry_count: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before the next attempt of a message."""
+        if retry_after is not None:
+            return retry_after
+        return float(min(self.retry_delay * 2 ** max(retry_count - 1, 0), self.max_retry_delay))
+
+    @staticmethod
+    def _encode(message: QueuedMessage) -> Dict[str, Any]:
+        """Encode message as stream entry fields."""
+        return {"message_id": message.message_id, "entry": message.encode()}
+
+    def _decode_dead_letter(self, message_id: str, data: str) -> Optional[QueuedMessage]:
+        """Decode a dead letter queue entry, logging entries that cannot be decoded."""
+        try:
+            return QueuedMessage.decode(data)
+        except ValueError as e:
+            self.logger.error(
+                "Failed to decode message %s: %s",
+                message_id,
+                str(e),
+                extra={
+                    "customer_id": self.settings.CUSTOMER_ID,
+                    "asset_id": "message_queue",
+                    "message_id": message_id,
+                    "error": str(e),
+                    "action": "scan_dead_letters",
+                },
+            )
+            return None
+
+    @staticmethod
+    def _decode(fields: Dict[str, str]) -> QueuedMessage:
+        """Decode stream entry fields into a message."""
+        return QueuedMessage.decode(fields["entry"])
@@ -0,0 +1,339 @@
+"""Partitioned outbound message workers.
+
+With OGx_QUEUE_PARTITIONS above 1 every process runs a PartitionedWorkerPool
+instead of a single MessageWorker. The pools share the partitions of the queue
+(see ogx_partitions) through one Redis lease per partition and run a
+MessageWorker for each partition they hold. A partition is drained by exactly
+one worker, which keeps each terminal's messages in order, while different
+partitions are drained by different processes and hosts.
+
+Pools register in a membership set and renew it with their leases every third of
+LEADER_LEASE_TTL_SECONDS. Each pool aims to hold its fair share of the
+partitions, ceil(partitions / live pools):
+- a pool holding more than its share releases the surplus for newer members
+- a pool holding less takes free partitions
+- a pool that stops drains its workers (see MessageWorker.drain) and then
+  releases its partitions straight away
+- a pool that dies drops out of the membership set and loses its leases once
+  they expire, and the others take its partitions over
+
+Rebalancing therefore settles within a few renewal intervals of a pool joining
+or leaving. Each partition worker runs with the fencing token of its lease.
+
+Key layout:
+    OGx:workers:members         Sorted set of live pools by last heartbeat (Redis time)
+    leader:ogx:partition:<n>    Lease of partition n (see infrastructure.cache.leader)
+"""
+
+import asyncio
+import time
+import zlib
+from typing import Dict, Final, Optional, Set, Union
+
+from redis.exceptions import RedisError
+
+from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.services.ogx_message_worker import MessageWorker
+from Protexis_Command.api.protocols.ogx.services.ogx_outstanding_limiter import (
+    TerminalOutstandingLimiter,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_partitions import PartitionedMessageQueue
+from Protexis_Command.api.protocols.ogx.services.ogx_queue_factory import create_message_queue
+from Protexis_Command.api.protocols.ogx.services.ogx_status_tracker import (
+    MessageStatusTracker,
+    get_status_tracker,
+)
+from Protexis_Command.core.logging.loggers import get_infra_logger
+from Protexis_Command.core.settings.app_settings import Settings, get_settings
+from Protexis_Command.infrastructure.cache.leader import LeaderLease, default_holder
+from Protexis_Command.infrastructure.cache.redis import get_redis_client
+from Protexis_Command.infrastructure.metrics import MessageMetrics
+from Protexis_Command.infrastructure.metrics.backends import PrometheusBackend
+
+MEMBERS_KEY: Final[str] = "OGx:workers:members"
+
+# Record a pool's heartbeat and drop pools that missed theirs.
+# KEYS[1] membership set
+# ARGV[1] member, ARGV[2] heartbeat timeout (seconds)
+# Returns the number of live pools.
+HEARTBEAT_SCRIPT: Final[str] = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local timeout = tonumber(ARGV[2])
+redis.call('ZADD', KEYS[1], now, ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - timeout)
+redis.call('PEXPIRE', KEYS[1], math.ceil(timeout * 1000))
+return redis.call('ZCARD', KEYS[1])
+"""
+
+
+def fair_share(partitions: int, members: int) -> int:
+    """Get how many partitions each of members pools should hold."""
+    return -(-partitions // max(members, 1))
+
+
+class PartitionedWorkerPool:
+    """Runs a MessageWorker for each queue partition this process holds.
+
+    Args:
+        settings (Settings): Application settings
+        message_queue (PartitionedMessageQueue): The partitioned queue; each
+            worker drains one of its partitions
+        limiter (Optional[TerminalOutstandingLimiter]): Per-terminal outstanding
+            message limiter shared by the workers; no limit if omitted
+        metrics (Optional[MessageMetrics]): Message metrics collector shared by the
+            workers; metrics are not published if omitted
+        status_tracker (Optional[MessageStatusTracker]): Status tracker shared by
+            the workers; the status of accepted messages is not tracked if omitted
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        message_queue: PartitionedMessageQueue,
+        limiter: Optional[TerminalOutstandingLimiter] = None,
+        metrics: Optional[MessageMetrics] = None,
+        status_tracker: Optional[MessageStatusTracker] = None,
+    ):
+        self.settings = settings
+        self.message_queue = message_queue
+        self.limiter = limiter
+        self.metrics = metrics
+        self.status_tracker = status_tracker
+        self.redis = message_queue.redis
+        self.logger = get_infra_logger()
+
+        self.partition_count = len(message_queue.partitions)
+        self.ttl_seconds = settings.LEADER_LEASE_TTL_SECONDS
+        self.rebalance_interval = self.ttl_seconds / 3
+        self.holder = default_holder()
+        self.leases = [
+            LeaderLease(self.redis, f"ogx:partition:{p}", self.ttl_seconds, self.holder)
+            for p in range(self.partition_count)
+        ]
+        # Pools try partitions from their own offset, so they do not all contend
+        # for the same free partition
+        self.offset = zlib.crc32(self.holder.encode("utf-8")) % self.partition_count
+
+        self.workers: Dict[int, MessageWorker] = {}
+        self.members = 0
+        self.draining = False
+        # Workers of released partitions that are still draining
+        self.draining_workers: Dict[int, MessageWorker] = {}
+        self._releases: Set[asyncio.Task] = set()
+        self._heartbeat_script = self.redis.register_script(HEARTBEAT_SCRIPT)
+        self._rebalance_task: Optional[asyncio.Task] = None
+        # Monotonic time at which the held leases expire unless they are renewed
+        self.leases_expire_at = 0.0
+
+    async def start(self) -> None:
+        """Join the pool and start taking partitions."""
+        if self._rebalance_task is None:
+            self._rebalance_task = asyncio.create_task(self._rebalance_loop())
+
+    async def stop(self) -> None:
+        """Drain every partition worker and hand the partitions to the other pools.
+
+        The workers drain concurrently, so the pool stops within one
+        OGx_WORKER_DRAIN_TIMEOUT_SECONDS.
+        """
+        self.draining = True
+        if self._rebalance_task is not None:
+            self._rebalance_task.cancel()
+            try:
+                await self._rebalance_task
+            except asyncio.CancelledError:
+                pass
+            self._rebalance_task = None
+        for partition in sorted(self.workers):
+            self._start_release(partition)
+        await asyncio.gather(*self._releases)
+        try:
+            await self.redis.zrem(MEMBERS_KEY, self.holder)
+        except RedisError as e:
+            self.logger.warning("Failed to leave worker pool, membership expires: %s", str(e))
+
+    async def rebalance(self) -> None:
+        """Renew the held partitions and move toward the fair share.
+
+        Raises:
+            RedisError: If Redis is unavailable
+        """
+        self.members = int(
+            await self._heartbeat_script(keys=[MEMBERS_KEY], args=[self.holder, self.ttl_seconds])
+        )
+        share = fair_share(self.partition_count, self.members)
+
+        for partition in sorted(self.workers):
+            worker = self.workers[partition]
+            token = await self.leases[partition].acquire()
+            if token != worker.fencing_token:
+                self.logger.warning(
+                    "Lease of partition %d lapsed, stopping its worker",
+                    partition,
+                    extra={"partition": partition, "fencing_token": worker.fencing_token},
+                )
+                await self._stop_worker(partition)
+            elif worker.current_task is not None and worker.current_task.done():
+                self.logger.error("Worker of partition %d exited, restarting", partition)
+                await self._stop_worker(partition)
+
+        # Hand surplus partitions to pools that joined since they were taken
+        while len(self.workers) > share:
+            self._start_release(max(self.workers))
+
+        for step in range(self.partition_count):
+            if len(self.workers) >= share:
+                break
+            partition = (self.offset + step) % self.partition_count
+            if partition in self.workers or partition in self.draining_workers:
+                continue
+            token = await self.leases[partition].acquire()
+            if token is not None:
+                await self._start_worker(partition, token)
+
+    async def handle_status_update(
+        self, forward_id: Union[int, str], state: Union[MessageState, int]
+    ) -> bool:
+        """Free a terminal's outstanding slot and release its held messages.
+
+        Held messages are released in the terminal's partition, whichever pool
+        holds it (see MessageWorker.handle_status_update).
+
+        Returns:
+            bool: True if a slot was freed
+        """
+        if not self.limiter:
+            return False
+        terminal_id = await self.limiter.handle_status(forward_id, state)
+        if terminal_id is None:
+            return False
+        await self.message_queue.release_held(
+            terminal_id, await self.limiter.available(terminal_id)
+        )
+        return True
+
+    def get_status(self) -> Dict:
+        """Get pool membership and per-partition worker health for health endpoints."""
+        return {
+            "holder": self.holder,
+            "members": self.members,
+            "partitions": self.partition_count,
+            "fair_share": fair_share(self.partition_count, self.members),
+            "draining": self.draining,
+            "drained": self.draining and not self.workers and not self.draining_workers,
+            "draining_workers": {
+                str(partition): worker.get_drain_status()
+                for partition, worker in sorted(self.draining_workers.items())
+            },
+            "workers": {
+                str(partition): worker.get_health_metrics()
+                for partition, worker in sorted(self.workers.items())
+            },
+        }
+
+    async def _rebalance_loop(self) -> None:
+        """Rebalance every renewal interval.
+
+        If Redis cannot be reached the leases cannot be renewed either. As with
+        SingletonTask, the workers keep running until the leases would have
+        expired, and are stopped only if no round succeeds before then.
+        """
+        while True:
+            attempted_at = time.monotonic()
+            try:
+                await self.rebalance()
+                self.leases_expire_at = attempted_at + self.ttl_seconds
+            except RedisError as e:
+                self.logger.error("Failed to rebalance worker partitions: %s", str(e))
+                remaining = self.leases_expire_at - time.monotonic()
+                if self.workers and remaining > 0:
+                    await asyncio.sleep(min(self.rebalance_interval, remaining))
+                    continue
+                for partition in sorted(self.workers):
+                    await self._stop_worker(partition)
+            await asyncio.sleep(self.rebalance_interval)
+
+    async def _start_worker(self, partition: int, token: int) -> None:
+        """Start draining a partition under the given lease term."""
+        worker = MessageWorker(
+            self.settings,
+            self.message_queue.partitions[partition],
+            self.limiter,
+            self.metrics,
+            self.status_tracker,
+        )
+        worker.fencing_token = token
+        worker.is_current = self.leases[partition].is_current
+        await worker.start()
+        self.workers[partition] = worker
+        self.logger.info(
+            "Took partition %d",
+            partition,
+            extra={"partition": partition, "holder": self.holder, "fencing_token": token},
+        )
+
+    async def _stop_worker(self, partition: int) -> None:
+        """Stop a partition's worker, keeping its lease."""
+        worker = self.workers.pop(partition)
+        await worker.stop()
+
+    def _start_release(self, partition: int) -> None:
+        """Release a partition in the background, so rebalancing is not held up."""
+        worker = self.draining_workers[partition] = self.workers.pop(partition)
+        task = asyncio.create_task(self._release(partition, worker))
+        self._releases.add(task)
+        task.add_done_callback(self._releases.discard)
+
+    async def _release(self, partition: int, worker: MessageWorker) -> None:
+        """Drain a partition's worker, then give up its lease.
+
+        The lease is renewed while the worker drains, so no other pool takes the
+        partition while its last submissions are in flight.
+        """
+        drain = asyncio.create_task(worker.drain())
+        try:
+            while True:
+                done, _ = await asyncio.wait({drain}, timeout=self.rebalance_interval)
+                if done:
+                    break
+                try:
+                    await self.leases[partition].acquire()
+                except RedisError as e:
+                    self.logger.warning(
+                        "Failed to renew partition %d while draining: %s", partition, str(e)
+                    )
+            await drain
+        finally:
+            del self.draining_workers[partition]
+        try:
+            await self.leases[partition].release()
+        except RedisError as e:
+            self.logger.warning(
+                "Failed to release partition %d, its lease expires on its own: %s",
+                partition,
+                str(e),
+            )
+        self.logger.info(
+            "Released partition %d",
+            partition,
+            extra={"partition": partition, "holder": self.holder},
+        )
+
+
+async def get_worker_pool() -> PartitionedWorkerPool:
+    """Get configured partitioned worker pool instance.
+
+    Raises:
+        ValueError: If OGx_QUEUE_PARTITIONS is not above 1
+    """
+    settings = get_settings()
+    redis = await get_redis_client()
+    message_queue = create_message_queue(redis, settings)
+    if not isinstance(message_queue, PartitionedMessageQueue):
+        raise ValueError("Partitioned workers need OGx_QUEUE_PARTITIONS above 1")
+    limiter = TerminalOutstandingLimiter(redis, settings)
+    metrics = MessageMetrics(PrometheusBackend())
+    return PartitionedWorkerPool(
+        settings, message_queue, limiter, metrics, await get_status_tracker()
+    )
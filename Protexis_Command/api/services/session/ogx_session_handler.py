@@ -5,7 +5,7 @@ It handles:
 1. Session creation and validation
 2. Token management and refresh
 3. Concurrent session limits
-4. Session cleanup and expiry
+4. Session cleanup and expiry, run by one process per deployment
 """
 
 import asyncio
@@ -17,6 +17,8 @@ from redis.asyncio import Redis
 from redis.exceptions import RedisError
 
 from Protexis_Command.core.logging.loggers import get_protocol_logger
+from Protexis_Command.core.settings.app_settings import get_settings
+from Protexis_Command.infrastructure.cache.leader import SingletonTask
 from Protexis_Command.infrastructure.cache.redis import get_redis_client
 from Protexis_Command.protocols.ogx.ogx_protocol_handler import OGxProtocolHandler
 from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import (
@@ -70,7 +72,7 @@ class SessionHandler:
 
     Attributes:
         redis: Redis client for session storage
-        _cleanup_task: Background task for session cleanup
+        _cleanup_task: Session cleanup loop, elected to run in a single process
         _protocol_handler: OGx protocol handler for authentication
     """
 
@@ -81,7 +83,7 @@ class SessionHandler:
             protocol_handler_cls: OGx protocol handler class to use for authentication
         """
         self.redis: Optional[Redis] = None
-        self._cleanup_task: Optional[asyncio.Task] = None
+        self._cleanup_task: Optional[SingletonTask] = None
         self._protocol_handler: Optional[OGxProtocolHandler] = None
         self._protocol_handler_cls = protocol_handler_cls
         logger.debug(
@@ -105,9 +107,15 @@ class SessionHandler:
             self._protocol_handler = self._protocol_handler_cls()
             logger.debug("Protocol handler initialized")
 
-            # Start cleanup task
+            # Start cleanup task; only the elected process runs it
             if self._cleanup_task is None:
-                self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+                self._cleanup_task = SingletonTask(
+                    self.redis,
+                    "ogx:session_cleanup",
+                    lambda _token: self._cleanup_loop(),
+                    get_settings().LEADER_LEASE_TTL_SECONDS,
+                )
+                await self._cleanup_task.start()
                 logger.debug("Cleanup task started")
 
         except (RedisError, IOError, RuntimeError) as e:
@@ -527,12 +535,8 @@ class SessionHandler:
         logger.info("Shutting down SessionHandler")
 
         if self._cleanup_task:
-            self._cleanup_task.cancel()
-            try:
-                await self._cleanup_task
-                logger.debug("Cleanup task cancelled")
-            except asyncio.CancelledError:
-                pass
+            await self._cleanup_task.stop()
+            logger.debug("Cleanup task stopped")
             self._cleanup_task = None
 
         # Redis client is managed by infrastructure, no need to close it here
@@ -30,7 +30,7 @@ Environment Handling:
 
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import boto3
 
@@ -58,6 +58,21 @@ class MessageStateStore(ABC):
     ) -> None:
         """Update message state."""
 
+    async def update_states(self, updates: Dict[int, Tuple[MessageState, Optional[Dict]]]) -> None:
+        """Update the states of several messages.
+
+        Stores that can batch writes override this; by default each message is
+        updated in turn.
+
+        Args:
+            updates: New state and metadata by message ID
+
+        Raises:
+            OGxProtocolError: If an update fails
+        """
+        for message_id, (new_state, metadata) in updates.items():
+            await self.update_state(message_id, new_state, metadata)
+
     @abstractmethod
     async def get_state(self, message_id: int) -> Optional[Dict]:
         """Get current message state.
@@ -169,6 +184,66 @@ class RedisMessageStateStore(MessageStateStore):
             )
             raise OGxProtocolError(error_msg) from e
 
+    async def update_states(self, updates: Dict[int, Tuple[MessageState, Optional[Dict]]]) -> None:
+        """Update several states in Redis in two pipelined round trips."""
+        if not updates:
+            return
+        message_ids = list(updates)
+        timestamp = datetime.utcnow().isoformat()
+
+        try:
+            # Get current states
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for message_id in message_ids:
+                    pipe.hgetall(f"OGx:messages:{message_id}:state")
+                currents = await pipe.execute()
+
+            # Move current states to history and write the new ones
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for message_id, current in zip(message_ids, currents):
+                    key = f"OGx:messages:{message_id}"
+                    if current:
+                        history_entry = {
+                            "state": current["state"],
+                            "timestamp": current["timestamp"],
+                            "metadata": decode_metadata(current.get("metadata", "{}")),
+                        }
+                        pipe.rpush(f"{key}:history", encode_state(history_entry))
+                    new_state, metadata = updates[message_id]
+                    pipe.hset(
+                        f"{key}:state",
+                        mapping={
+                            "state": new_state.value,
+                            "timestamp": timestamp,
+                            "metadata": encode_metadata(metadata),
+                        },
+                    )
+                await pipe.execute()
+
+            self.logger.info(
+                "Updated %d message states",
+                len(message_ids),
+                extra={
+                    "message_count": len(message_ids),
+                    "timestamp": timestamp,
+                    "component": "state_store",
+                    "action": "update_states",
+                },
+            )
+
+        except Exception as e:
+            error_msg = f"Failed to update {len(message_ids)} message states: {str(e)}"
+            self.logger.error(
+                error_msg,
+                extra={
+                    "message_count": len(message_ids),
+                    "error": str(e),
+                    "component": "state_store",
+                    "action": "update_states",
+                },
+            )
+            raise OGxProtocolError(error_msg) from e
+
     async def get_state(self, message_id: int) -> Optional[Dict]:
         """Get current message state from Redis."""
         key = f"OGx:messages:{message_id}"
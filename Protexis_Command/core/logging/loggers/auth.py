@@ -28,7 +28,8 @@ def get_auth_logger(
     )
 
     if name:
-        logger = logging.getLogger(f"{logger.name}.{name}")
-        logger.parent = logger
+        parent = logger
+        logger = logging.getLogger(f"{parent.name}.{name}")
+        logger.parent = parent
 
     return logger
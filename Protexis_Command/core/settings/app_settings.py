@@ -99,6 +99,22 @@ class Settings(BaseSettings):
     OGx_CLIENT_SECRET: str = "password"
     OGx_BASE_URL: str = "https://OGx.swlab.ca/api/v1.0"
     OGx_TOKEN_EXPIRY: int = 31536000
+    # Tokens are refreshed once less than this much lifetime remains
+    OGx_TOKEN_REFRESH_MARGIN_SECONDS: int = 3600
+    # How often token usage bookkeeping is written to Redis
+    OGx_TOKEN_FLUSH_INTERVAL_SECONDS: float = 5.0
+    # One process across the deployment refreshes the token, under a lock held for
+    # at most this long; the others wait up to the wait time for its new token
+    OGx_TOKEN_REFRESH_LOCK_SECONDS: int = 15
+    OGx_TOKEN_REFRESH_WAIT_SECONDS: int = 30
+    # Shared OGx HTTP client (see infrastructure.http). HTTP/2 needs httpx[http2].
+    OGx_HTTP2: bool = False
+    OGx_HTTP_MAX_CONNECTIONS: int = 20
+    OGx_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    OGx_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    OGx_HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    OGx_HTTP_TIMEOUT_SECONDS: float = 30.0  # Read, write and pool wait timeout
+    OGx_HTTP_VERIFY_TLS: bool = True  # Disable only for a local mock with a self-signed certificate
 
     # Customer identification - required in production
     CUSTOMER_ID: str = "test_customer"
@@ -109,6 +125,61 @@ class Settings(BaseSettings):
     REDIS_DB: int = 0
     REDIS_TEST_DB: int = 15  # Separate DB for testing
     REDIS_PASSWORD: str = ""
+    # Lease TTL for singleton background loops; a crashed leader is replaced within
+    # about this long (see infrastructure.cache.leader)
+    LEADER_LEASE_TTL_SECONDS: int = 15
+
+    # Outbound message queue settings
+    # Backend is "hash" (Redis hashes, default) or "stream" (Redis Streams consumer group)
+    OGx_QUEUE_BACKEND: str = "hash"
+    OGx_QUEUE_CONSUMER_GROUP: str = "OGx:workers"
+    OGx_QUEUE_CONSUMER_NAME: str = ""  # Defaults to <hostname>-<pid>
+    OGx_QUEUE_CLAIM_IDLE_SECONDS: int = 300  # Reclaim in-progress messages idle this long
+    OGx_QUEUE_REAP_INTERVAL_SECONDS: int = 30  # How often expired claims are reclaimed
+    OGx_QUEUE_BLOCK_MS: int = 1000  # Blocking read timeout for the stream backend
+    OGx_QUEUE_METRICS_INTERVAL_SECONDS: int = 15  # How often queue depths are published
+    # Longest an idle worker waits for a ready notification before polling anyway
+    OGx_WORKER_IDLE_TIMEOUT_SECONDS: int = 60
+    # Submissions a worker keeps in flight; capped at MAX_CONCURRENT_REQUESTS (3),
+    # 1 submits serially. Each terminal's messages are always submitted in order.
+    OGx_WORKER_CONCURRENCY: int = 3
+    # Run the outbound worker in one process per deployment, elected through Redis
+    OGx_WORKER_SINGLETON: bool = True
+    # On shutdown, how long in-flight submissions get to finish before they are cancelled
+    OGx_WORKER_DRAIN_TIMEOUT_SECONDS: int = 30
+    # Partitions of the outbound queue, by hash of the destination terminal. Above 1,
+    # worker processes share the partitions through Redis leases instead of electing
+    # a single worker. Changing it re-routes terminals; drain the queue first.
+    OGx_QUEUE_PARTITIONS: int = 1
+    # Messages per submit call, up to MAX_SUBMIT_MESSAGES (100); 1 submits each message
+    # on its own. A partial batch waits up to the linger time for more messages.
+    OGx_SUBMIT_BATCH_SIZE: int = 1
+    OGx_SUBMIT_LINGER_MS: int = 500
+    # Dequeue weights for the priority lanes; each non-empty lane gets at least one slot
+    OGx_QUEUE_WEIGHT_HIGH: int = 6
+    OGx_QUEUE_WEIGHT_NORMAL: int = 3
+    OGx_QUEUE_WEIGHT_LOW: int = 1
+    # Dead letter replay pace; the worker submits one message per SEND call, and the
+    # SEND throttle group allows 5 calls per minute (OGx-1.txt section 3.4)
+    OGx_DLQ_REPLAY_RATE_PER_MINUTE: int = 5
+    # How long a submission is remembered for duplicate detection, keyed by its
+    # UserMessageID, or by its payload hash when the client did not set one
+    OGx_IDEMPOTENCY_TTL_SECONDS: int = 86400
+    OGx_IDEMPOTENCY_HASH_TTL_SECONDS: int = 600
+    # Shared OGx call budget per throttle group (INFO, GET, SEND). A burst above 1
+    # lets idle budget be spent at once but can exceed a strict sliding window.
+    # Calls that would wait longer than the maximum fail instead of waiting.
+    OGx_THROTTLE_CALLS_PER_MINUTE: int = 5
+    OGx_THROTTLE_BURST: int = 1
+    OGx_THROTTLE_MAX_WAIT_SECONDS: int = 30
+    # Forward message status tracking. Messages not yet in a final state are polled
+    # in fw_statuses calls of up to MAX_STATUS_IDS_PER_REQUEST (100) IDs; lookups the
+    # local copy cannot answer wait up to the linger time to share one call.
+    OGx_STATUS_POLL_INTERVAL_SECONDS: int = 60
+    OGx_STATUS_LOOKUP_LINGER_MS: int = 200
+    OGx_STATUS_CACHE_MAX_ENTRIES: int = 10000
+    # How long final statuses stay in the copy shared by every process
+    OGx_STATUS_FINAL_TTL_SECONDS: int = 86400
 
     # DynamoDB settings
     DYNAMODB_TABLE_NAME: str = "OGx_message_states"
@@ -1,5 +1,6 @@
 """Infrastructure for caching."""
 
+from .leader import LeaderLease, SingletonTask
 from .redis import get_redis_client, get_redis_url
 
-__all__ = ["get_redis_client", "get_redis_url"]
+__all__ = ["LeaderLease", "SingletonTask", "get_redis_client", "get_redis_url"]
@@ -0,0 +1,286 @@
+"""Redis lease-based leader election.
+
+Some background loops must run once per deployment rather than once per
+process: the outbound message worker, session cleanup, retention cleanup and
+OGx polling all multiply Redis scans and OGx calls when every uvicorn worker
+and replica runs its own copy. SingletonTask runs such a loop only in the
+process currently holding the loop's lease.
+
+A lease is a Redis key with a TTL that names its holder. The holder renews it
+every third of the TTL; if the holder dies, the key expires and a standby
+takes over on its next attempt, so failover takes at most TTL plus one renewal
+interval. A graceful stop releases the lease straight away. A holder whose
+renewals fail keeps running until the lease would have expired, so a brief
+Redis error does not interrupt the loop.
+
+Each time the lease changes hands a fencing token is drawn from a counter that
+only increases. A loop that writes shared state checks its token with
+LeaderLease.is_current before acting (the message worker does so before each
+batch), so a paused former leader whose lease has already passed to another
+process cannot overwrite the new leader's work.
+
+Key layout:
+    leader:<name>           "<fencing token>:<holder>" with the lease TTL
+    leader:<name>:fence     Last fencing token issued for the lease
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Any, Callable, Coroutine, Final, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from Protexis_Command.core.logging.loggers import get_infra_logger
+
+LEADER_PREFIX: Final[str] = "leader:"
+
+# Take the lease if it is free, or renew it if the caller already holds it.
+# KEYS[1] lease key, KEYS[2] fencing counter
+# ARGV[1] holder, ARGV[2] lease TTL (milliseconds)
+# Returns the holder's fencing token, or nil if another process holds the lease.
+ACQUIRE_SCRIPT: Final[str] = """
+local current = redis.call('GET', KEYS[1])
+if current then
+    local token, holder = string.match(current, '^(%d+):(.*)$')
+    if holder == ARGV[1] then
+        redis.call('PEXPIRE', KEYS[1], ARGV[2])
+        return tonumber(token)
+    end
+    return nil
+end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], token .. ':' .. ARGV[1], 'PX', ARGV[2])
+return token
+"""
+
+# Release the lease if the caller still holds it.
+# KEYS[1] lease key
+# ARGV[1] holder
+# Returns 1 if the lease was released.
+RELEASE_SCRIPT: Final[str] = """
+local current = redis.call('GET', KEYS[1])
+if current and string.match(current, '^%d+:(.*)$') == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def default_holder() -> str:
+    """Get a lease holder ID unique to this process and call."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    """A named Redis lease held by at most one process at a time.
+
+    Args:
+        redis (Redis): Async Redis client shared by every process
+        name (str): Lease name, one per singleton loop
+        ttl_seconds (float): How long the lease outlives its holder's last renewal
+        holder (Optional[str]): Holder ID; unique per instance by default
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        name: str,
+        ttl_seconds: float = 15,
+        holder: Optional[str] = None,
+    ):
+        self.redis = redis
+        self.name = name
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.holder = holder or default_holder()
+
+        # Redis keys
+        self.lease_key = f"{LEADER_PREFIX}{name}"
+        self.fence_key = f"{LEADER_PREFIX}{name}:fence"
+
+        self._acquire_script = redis.register_script(ACQUIRE_SCRIPT)
+        self._release_script = redis.register_script(RELEASE_SCRIPT)
+
+    async def acquire(self) -> Optional[int]:
+        """Take or renew the lease.
+
+        Returns:
+            Optional[int]: Fencing token of the current term, or None if another
+                process holds the lease. A token different from the one returned
+                by the previous call means the lease lapsed in between.
+        """
+        token = await self._acquire_script(
+            keys=[self.lease_key, self.fence_key], args=[self.holder, self.ttl_ms]
+        )
+        return None if token is None else int(token)
+
+    async def release(self) -> bool:
+        """Give up the lease if this holder has it.
+
+        Returns:
+            bool: True if the lease was released
+        """
+        return bool(await self._release_script(keys=[self.lease_key], args=[self.holder]))
+
+    async def is_current(self, token: int) -> bool:
+        """Check that a fencing token belongs to the latest term of the lease."""
+        latest = await self.redis.get(self.fence_key)
+        return latest is not None and int(latest) == token
+
+
+class SingletonTask:
+    """Runs a background loop in exactly one process across the deployment.
+
+    Every process starts a SingletonTask; each one campaigns for the lease and
+    only the holder runs the loop, passing it the fencing token of its term. The
+    loop is cancelled as soon as the term changes, or once renewals have failed
+    until the lease's TTL has passed since the last successful one, and is
+    restarted if it exits while the process still holds the lease.
+
+    Args:
+        redis (Redis): Async Redis client shared by every process
+        name (str): Lease name, the same in every process running this loop
+        run (Callable[[int], Coroutine[Any, Any, None]]): Loop to run while leader; called
+            with the fencing token of the term
+        ttl_seconds (float): Lease TTL; a crashed leader is replaced within about
+            this long
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        name: str,
+        run: Callable[[int], Coroutine[Any, Any, None]],
+        ttl_seconds: float = 15,
+    ):
+        self.lease = LeaderLease(redis, name, ttl_seconds)
+        self.name = name
+        self.run = run
+        self.ttl_seconds = ttl_seconds
+        self.renew_interval = ttl_seconds / 3
+        self.logger = get_infra_logger()
+
+        self.token: Optional[int] = None
+        self.elected_at = 0.0
+        # Monotonic time at which the lease expires unless it is renewed
+        self.lease_expires_at = 0.0
+        self._campaign_task: Optional[asyncio.Task] = None
+        self._run_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this process currently runs the loop."""
+        return self.token is not None
+
+    async def start(self) -> None:
+        """Start campaigning for the lease."""
+        if self._campaign_task is None:
+            self._campaign_task = asyncio.create_task(self._campaign())
+
+    async def stop(self) -> None:
+        """Stop the loop and hand the lease to a standby straight away."""
+        if self._campaign_task is not None:
+            self._campaign_task.cancel()
+            try:
+                await self._campaign_task
+            except asyncio.CancelledError:
+                pass
+            self._campaign_task = None
+        was_leader = self.is_leader
+        await self._step_down()
+        if was_leader:
+            try:
+                await self.lease.release()
+            except RedisError as e:
+                self.logger.warning(
+                    "Failed to release lease %s, it expires on its own: %s", self.name, str(e)
+                )
+
+    async def is_current(self, token: int) -> bool:
+        """Check a fencing token before acting on shared state (see LeaderLease.is_current)."""
+        return await self.lease.is_current(token)
+
+    def get_status(self) -> dict:
+        """Get leadership status for health endpoints."""
+        return {
+            "name": self.name,
+            "leader": self.is_leader,
+            "holder": self.lease.holder,
+            "fencing_token": self.token,
+            "leader_for_seconds": time.time() - self.elected_at if self.is_leader else 0,
+        }
+
+    async def _campaign(self) -> None:
+        """Take or renew the lease every renewal interval and follow the result.
+
+        A failed renewal keeps the current term: the lease is still held until
+        its TTL passes from the last successful renewal, so the loop is only
+        cancelled if no renewal gets through before then.
+        """
+        while True:
+            # The TTL runs from when Redis received the renewal, so count from
+            # before the call
+            attempted_at = time.monotonic()
+            try:
+                token = await self.lease.acquire()
+            except RedisError as e:
+                self.logger.error("Failed to renew lease %s: %s", self.name, str(e))
+                remaining = self.lease_expires_at - time.monotonic()
+                if self.is_leader and remaining > 0:
+                    await asyncio.sleep(min(self.renew_interval, remaining))
+                    continue
+                token = None
+            if token is not None:
+                self.lease_expires_at = attempted_at + self.ttl_seconds
+
+            if token != self.token:
+                await self._step_down()
+                if token is not None:
+                    self._elect(token)
+            elif token is not None and self._run_task is not None and self._run_task.done():
+                self._report_exit(self._run_task)
+                self._run_task = asyncio.create_task(self.run(token))
+
+            await asyncio.sleep(self.renew_interval)
+
+    def _elect(self, token: int) -> None:
+        """Start the loop for a new term."""
+        self.token = token
+        self.elected_at = time.time()
+        self._run_task = asyncio.create_task(self.run(token))
+        self.logger.info(
+            "Elected leader for %s",
+            self.name,
+            extra={"lease": self.name, "holder": self.lease.holder, "fencing_token": token},
+        )
+
+    async def _step_down(self) -> None:
+        """Cancel the loop of the current term, if any."""
+        token, self.token = self.token, None
+        task, self._run_task = self._run_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:  # pylint: disable=broad-except
+                self.logger.error("Singleton loop %s failed: %s", self.name, str(e))
+        if token is not None:
+            self.logger.info(
+                "Stepped down as leader for %s",
+                self.name,
+                extra={"lease": self.name, "holder": self.lease.holder, "fencing_token": token},
+            )
+
+    def _report_exit(self, task: asyncio.Task) -> None:
+        """Log a loop that exited while this process held the lease."""
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error(
+                "Singleton loop %s failed, restarting: %s", self.name, str(task.exception())
+            )
+        else:
+            self.logger.warning("Singleton loop %s exited, restarting", self.name)
@@ -0,0 +1,5 @@
+"""Infrastructure for outbound HTTP."""
+
+from .client import close_http_client, get_http_client
+
+__all__ = ["close_http_client", "get_http_client"]
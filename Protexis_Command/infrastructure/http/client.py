@@ -0,0 +1,85 @@
+"""Shared HTTP client for OGx calls.
+
+Every OGx call of a process goes through one httpx.AsyncClient, so calls reuse
+pooled keep-alive connections instead of paying a TCP connect and TLS handshake
+each time. The client is created on first use and closed by the application
+lifespan; a call after close_http_client creates a new one.
+
+HTTP/2 (OGx_HTTP2) multiplexes concurrent calls over one connection. It needs
+the h2 package (pip install "httpx[http2]"); without it the client falls back
+to HTTP/1.1 with a warning.
+
+Relative URLs resolve against OGx_BASE_URL.
+"""
+
+import importlib.util
+import sys
+from typing import Optional
+
+import httpx
+
+from Protexis_Command.core.logging.loggers import get_infra_logger
+from Protexis_Command.core.settings.app_settings import Settings, get_settings
+
+logger = get_infra_logger()
+
+# HTTP client instance (module-level)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client(settings: Settings) -> httpx.AsyncClient:
+    """Create a pooled HTTP client configured from settings.
+
+    Args:
+        settings: Application settings
+
+    Returns:
+        httpx.AsyncClient: New client; the caller closes it
+    """
+    http2 = settings.OGx_HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning(
+            'OGx_HTTP2 is set but h2 is not installed (pip install "httpx[http2]"); using HTTP/1.1'
+        )
+        http2 = False
+
+    return httpx.AsyncClient(
+        base_url=settings.OGx_BASE_URL,
+        http2=http2,
+        verify=settings.OGx_HTTP_VERIFY_TLS,
+        limits=httpx.Limits(
+            max_connections=settings.OGx_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OGx_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OGx_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            settings.OGx_HTTP_TIMEOUT_SECONDS,
+            connect=settings.OGx_HTTP_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the process-wide HTTP client, creating it on first use.
+
+    Returns:
+        httpx.AsyncClient: Shared client; callers must not close it
+    """
+    if _http_client is not None and not _http_client.is_closed:
+        return _http_client
+
+    client = create_http_client(get_settings())
+    # Set module variable using module name to avoid global statement
+    setattr(sys.modules[__name__], "_http_client", client)
+    logger.info("Created shared OGx HTTP client")
+    return client
+
+
+async def close_http_client() -> None:
+    """Close the process-wide HTTP client and its pooled connections."""
+    client = _http_client
+    if client is None:
+        return
+    setattr(sys.modules[__name__], "_http_client", None)
+    await client.aclose()
+    logger.info("Closed shared OGx HTTP client")
@@ -97,3 +97,76 @@ class MessageMetrics:
         # Update queue metrics
         await self.backend.gauge("message_queue_size", queue_size, tags)
         await self.backend.gauge("messages_in_progress", in_progress, tags)
+
+    async def update_lane_metrics(
+        self,
+        queue_name: str,
+        lane_depths: Dict[str, int],
+        customer_id: Optional[str] = None,
+    ) -> None:
+        """Update per-priority-lane queue depth metrics.
+
+        Args:
+            queue_name: Name of the queue
+            lane_depths: Number of waiting messages per priority lane name
+            customer_id: Optional customer ID
+        """
+        for lane, depth in lane_depths.items():
+            tags: Dict[str, str] = {"queue": queue_name, "lane": lane}
+            if customer_id:
+                tags["customer_id"] = customer_id
+
+            await self.backend.gauge("message_queue_lane_depth", depth, tags)
+
+    async def update_queue_depth_metrics(
+        self,
+        queue_name: str,
+        state_depths: Dict[str, int],
+        oldest_ages: Dict[str, float],
+        customer_id: Optional[str] = None,
+    ) -> None:
+        """Update per-state queue depth and backlog age metrics.
+
+        Args:
+            queue_name: Name of the queue
+            state_depths: Number of messages per queue state name
+            oldest_ages: Seconds the oldest waiting message has waited, per lane name
+            customer_id: Optional customer ID
+        """
+        for state, depth in state_depths.items():
+            tags: Dict[str, str] = {"queue": queue_name, "state": state}
+            if customer_id:
+                tags["customer_id"] = customer_id
+
+            await self.backend.gauge("message_queue_state_depth", depth, tags)
+
+        for lane, age in oldest_ages.items():
+            tags = {"queue": queue_name, "lane": lane}
+            if customer_id:
+                tags["customer_id"] = customer_id
+
+            await self.backend.gauge("message_queue_oldest_age_seconds", age, tags)
+
+    async def record_messages_reclaimed(
+        self,
+        queue_name: str,
+        targets: Dict[str, str],
+        customer_id: Optional[str] = None,
+    ) -> None:
+        """Record messages reclaimed from workers that stopped before completing them.
+
+        Args:
+            queue_name: Name of the queue
+            targets: Target queue ("pending" or "dead_letter") per reclaimed message ID
+            customer_id: Optional customer ID
+        """
+        counts: Dict[str, int] = {}
+        for target in targets.values():
+            counts[target] = counts.get(target, 0) + 1
+
+        for target, count in counts.items():
+            tags: Dict[str, str] = {"queue": queue_name, "target": target}
+            if customer_id:
+                tags["customer_id"] = customer_id
+
+            await self.backend.increment("messages_reclaimed_total", count, tags)
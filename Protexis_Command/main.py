@@ -3,9 +3,14 @@
 This module initializes and configures the FastAPI application.
 """
 
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from Protexis_Command.api.common.auth.manager import close_auth_manager
+from Protexis_Command.api.common.clients.factory import close_OGx_clients
 from Protexis_Command.api.common.middleware.rate_limit import add_rate_limit_middleware
 from Protexis_Command.api.common.middleware.validation import add_validation_middleware
 from Protexis_Command.api.internal.routes.auth import user
@@ -14,19 +19,37 @@ from Protexis_Command.api.internal.routes.messages import router as protexis_rou
 from Protexis_Command.api.internal.routes.test_roles import router as test_roles_router
 from Protexis_Command.api.protocols.ogx.routes import auth, messages
 from Protexis_Command.api.protocols.ogx.routes.api import router as ogx_router
+from Protexis_Command.api.protocols.ogx.services.ogx_status_tracker import close_status_tracker
 from Protexis_Command.core.logging.log_settings import LoggingConfig
 from Protexis_Command.core.logging.loggers import get_app_logger
 from Protexis_Command.infrastructure.cache.redis import get_redis_url
+from Protexis_Command.infrastructure.http import close_http_client
 
 # Initialize logging
 config = LoggingConfig()
 logger = get_app_logger(config)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """Close the shared status tracker, OGx clients, auth manager and HTTP client on shutdown.
+
+    Args:
+        app: The FastAPI application instance
+    """
+    yield
+    await close_status_tracker()
+    await close_OGx_clients()
+    await close_auth_manager()
+    await close_http_client()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="OGx Gateway API",
     description="API for OGx message handling",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
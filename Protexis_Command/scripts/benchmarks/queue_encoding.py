@@ -0,0 +1,106 @@
+"""Queue entry encoding benchmark.
+
+Compares the legacy JSON queue entry (json.dumps of QueuedMessage.to_dict) with
+the versioned binary entry (QueuedMessage.encode) for encode time, decode time,
+the characters of each entry and the bytes Redis stores for them. A binary entry
+has one character per encoded byte, but Redis stores bytes at or above 0x80 as
+two UTF-8 bytes.
+
+Usage:
+    poetry run python -m Protexis_Command.scripts.benchmarks.queue_encoding
+    poetry run python -m Protexis_Command.scripts.benchmarks.queue_encoding --sizes 1000 10000
+"""
+
+import argparse
+import json
+import time
+from typing import Callable, List, Sequence
+
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import QueuedMessage
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+def build_messages(count: int) -> List[QueuedMessage]:
+    """Build representative forward messages."""
+    return [
+        QueuedMessage(
+            message_id=f"msg-{i:08d}",
+            payload={
+                "DestinationID": "01008988SKY5909",
+                "UserMessageID": i,
+                "TransportType": 0,
+                "Payload": {
+                    "Name": "getTerminalStatus",
+                    "SIN": 16,
+                    "MIN": 2,
+                    "IsForward": True,
+                    "Fields": [{"Name": "field1", "Value": str(i), "Type": "unsignedint"}],
+                },
+            },
+            retry_count=i % 3,
+        )
+        for i in range(count)
+    ]
+
+
+def encode_json(message: QueuedMessage) -> str:
+    """Encode a message as a legacy JSON entry."""
+    return json.dumps(message.to_dict())
+
+
+def decode_json(entry: str) -> QueuedMessage:
+    """Decode a legacy JSON entry."""
+    return QueuedMessage.from_dict(json.loads(entry))
+
+
+def run_format(
+    messages: Sequence[QueuedMessage],
+    encode: Callable[[QueuedMessage], str],
+    decode: Callable[[str], QueuedMessage],
+) -> List[float]:
+    """Time one format.
+
+    Returns:
+        Encode seconds, decode seconds, and mean characters and stored bytes per entry
+    """
+    start = time.perf_counter()
+    entries = [encode(message) for message in messages]
+    encode_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for entry in entries:
+        decode(entry)
+    decode_seconds = time.perf_counter() - start
+
+    characters = sum(len(entry) for entry in entries)
+    # Redis stores the UTF-8 bytes sent by the client
+    stored = sum(len(entry.encode("utf-8")) for entry in entries)
+    return [encode_seconds, decode_seconds, characters / len(entries), stored / len(entries)]
+
+
+def main(argv: Sequence[str] = ()) -> None:
+    """Run the benchmark and print one row per format and size."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    args = parser.parse_args(argv or None)
+
+    print(
+        f"{'messages':>9} {'format':>7} {'encode ms':>10} {'decode ms':>10} "
+        f"{'chars/msg':>10} {'bytes/msg':>10}"
+    )
+    for size in args.sizes:
+        messages = build_messages(size)
+        results = {
+            "json": run_format(messages, encode_json, decode_json),
+            "binary": run_format(messages, QueuedMessage.encode, QueuedMessage.decode),
+        }
+        for name, (encode_seconds, decode_seconds, entry_chars, entry_bytes) in results.items():
+            print(
+                f"{size:>9} {name:>7} {encode_seconds * 1000:>10.1f} "
+                f"{decode_seconds * 1000:>10.1f} {entry_chars:>10.1f} {entry_bytes:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
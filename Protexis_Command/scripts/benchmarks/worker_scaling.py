@@ -0,0 +1,180 @@
+"""Partitioned worker throughput benchmark.
+
+Drains a fixed backlog of forward messages with 1 to 8 worker processes against
+a mock OGx, splitting the queue partitions between the processes the way
+PartitionedWorkerPool settles on them (fair_share, by lease order). Per message
+each process does the GIL-bound work of a real worker: decoding the queue entry,
+validating the payload and serializing the submit request body. The mock OGx
+answers each submit after a fixed latency, with at most --concurrency calls in
+flight per process as in MessageWorker.
+
+Each process drains its partitions one terminal at a time in queue order, and
+the benchmark checks that every terminal's messages were submitted in order.
+
+Usage:
+    poetry run python -m Protexis_Command.scripts.benchmarks.worker_scaling
+    poetry run python -m Protexis_Command.scripts.benchmarks.worker_scaling --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import QueuedMessage
+from Protexis_Command.api.protocols.ogx.services.ogx_partitions import partition_for
+from Protexis_Command.api.protocols.ogx.services.ogx_worker_pool import fair_share
+from Protexis_Command.protocols.ogx.validation.message.field_validator import (
+    OGxStructureValidator,
+)
+
+DEFAULT_WORKERS = (1, 2, 4, 8)
+DEFAULT_MESSAGES = 20_000
+DEFAULT_TERMINALS = 500
+DEFAULT_PARTITIONS = 16
+# Mock OGx submit latency, in seconds
+DEFAULT_LATENCY = 0.005
+
+
+def build_entries(count: int, terminals: int) -> List[Tuple[str, str]]:
+    """Build encoded queue entries for representative forward messages.
+
+    Returns:
+        (destination terminal, queue entry) pairs in enqueue order
+    """
+    entries = []
+    for i in range(count):
+        terminal_id = f"01008988SKY{i % terminals:04d}"
+        message = QueuedMessage(
+            message_id=f"msg-{i:08d}",
+            payload={
+                "DestinationID": terminal_id,
+                "UserMessageID": i,
+                "TransportType": 0,
+                "Payload": {
+                    "Name": "getTerminalStatus",
+                    "SIN": 16,
+                    "MIN": 2,
+                    "IsForward": True,
+                    "Fields": [{"Name": "field1", "Value": str(i), "Type": "unsignedint"}],
+                },
+            },
+        )
+        entries.append((terminal_id, message.encode()))
+    return entries
+
+
+def assign_partitions(partitions: int, workers: int) -> List[List[int]]:
+    """Split the partitions between workers, each taking its fair share in turn."""
+    share = fair_share(partitions, workers)
+    return [list(range(p, min(p + share, partitions))) for p in range(0, partitions, share)]
+
+
+async def mock_submit(body: str, latency: float) -> Dict:
+    """Answer a submit call as OGx would after its round trip."""
+    await asyncio.sleep(latency)
+    return {"ErrorID": 0, "Submissions": [{"ErrorID": 0, "UserMessageID": len(body)}]}
+
+
+async def drain(
+    entries: Sequence[Tuple[str, str]], latency: float, concurrency: int
+) -> Dict[str, List[int]]:
+    """Drain one worker's entries, in order per terminal.
+
+    Returns:
+        Submitted UserMessageIDs per terminal, in submission order
+    """
+    validator = OGxStructureValidator()
+    by_terminal: Dict[str, List[str]] = {}
+    for terminal_id, entry in entries:
+        by_terminal.setdefault(terminal_id, []).append(entry)
+
+    slots = asyncio.Semaphore(concurrency)
+    submitted: Dict[str, List[int]] = {}
+
+    async def drain_terminal(terminal_id: str, terminal_entries: List[str]) -> None:
+        for entry in terminal_entries:
+            message = QueuedMessage.decode(entry)
+            validator.validate(message.payload["Payload"])
+            body = json.dumps(message.payload)
+            async with slots:
+                await mock_submit(body, latency)
+            submitted.setdefault(terminal_id, []).append(message.payload["UserMessageID"])
+
+    await asyncio.gather(*(drain_terminal(t, e) for t, e in by_terminal.items()))
+    return submitted
+
+
+def run_worker(
+    entries: Sequence[Tuple[str, str]], latency: float, concurrency: int
+) -> Tuple[float, Dict[str, List[int]]]:
+    """Process entry point of one worker.
+
+    Returns:
+        Seconds to drain the entries, excluding process start-up, and the
+        submitted UserMessageIDs per terminal
+    """
+    start = time.perf_counter()
+    submitted = asyncio.run(drain(entries, latency, concurrency))
+    return time.perf_counter() - start, submitted
+
+
+def run_workers(
+    entries: Sequence[Tuple[str, str]],
+    workers: int,
+    partitions: int,
+    latency: float,
+    concurrency: int,
+) -> float:
+    """Drain the backlog with a number of worker processes.
+
+    Returns:
+        Seconds until the slowest worker drained its partitions
+
+    Raises:
+        AssertionError: If a terminal's messages were submitted out of order
+    """
+    by_partition: Dict[int, List[Tuple[str, str]]] = {}
+    for terminal_id, entry in entries:
+        by_partition.setdefault(partition_for(terminal_id, partitions), []).append(
+            (terminal_id, entry)
+        )
+    shards = [
+        [entry for p in held for entry in by_partition.get(p, [])]
+        for held in assign_partitions(partitions, workers)
+    ]
+
+    with multiprocessing.get_context("spawn").Pool(len(shards)) as pool:
+        results = pool.starmap(run_worker, [(s, latency, concurrency) for s in shards])
+
+    for _, submitted in results:
+        for ids in submitted.values():
+            assert ids == sorted(ids), "terminal messages submitted out of order"
+    return max(seconds for seconds, _ in results)
+
+
+def main(argv: Sequence[str] = ()) -> None:
+    """Run the benchmark and print one row per worker count."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=list(DEFAULT_WORKERS))
+    parser.add_argument("--messages", type=int, default=DEFAULT_MESSAGES)
+    parser.add_argument("--terminals", type=int, default=DEFAULT_TERMINALS)
+    parser.add_argument("--partitions", type=int, default=DEFAULT_PARTITIONS)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args(argv or None)
+
+    entries = build_entries(args.messages, args.terminals)
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>8} {'msgs/s':>10} {'speedup':>8}")
+    for workers in args.workers:
+        seconds = run_workers(entries, workers, args.partitions, args.latency, args.concurrency)
+        rate = len(entries) / seconds
+        baseline = baseline or rate
+        print(f"{workers:>8} {seconds:>8.2f} {rate:>10.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Dead letter replay script.
+
+Moves messages from the outbound dead letter queue back to pending, paced to the
+OGx submit budget (see DeadLetterReplayer). Prints one progress line per chunk.
+
+Usage:
+    poetry run python -m Protexis_Command.scripts.queue.replay_dead_letters --dry-run
+    poetry run python -m Protexis_Command.scripts.queue.replay_dead_letters \\
+        --error "rate limit" --older-than 3600 --sin 16 --min 2
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import Sequence
+
+from Protexis_Command.api.protocols.ogx.services.ogx_dlq_replay import (
+    DeadLetterFilter,
+    DeadLetterReplayer,
+    ReplayProgress,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_queue_factory import get_message_queue
+from Protexis_Command.core.settings.app_settings import get_settings
+
+
+def parse_args(argv: Sequence[str] = ()) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--error", help="Case-insensitive substring of the last delivery error")
+    parser.add_argument("--destination", help="Destination terminal ID")
+    parser.add_argument("--sin", type=int, help="Payload SIN")
+    parser.add_argument("--min", type=int, help="Payload MIN")
+    parser.add_argument(
+        "--older-than", type=float, help="Only messages first queued at least this many seconds ago"
+    )
+    parser.add_argument(
+        "--newer-than", type=float, help="Only messages first queued at most this many seconds ago"
+    )
+    parser.add_argument(
+        "--rate", type=int, help="Messages per minute, capped at OGx_DLQ_REPLAY_RATE_PER_MINUTE"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only count the messages that would be replayed"
+    )
+    return parser.parse_args(argv or None)
+
+
+def print_progress(progress: ReplayProgress) -> None:
+    """Print one progress line."""
+    print(
+        f"scanned={progress.scanned} matched={progress.matched} "
+        f"replayed={progress.replayed} missing={progress.missing} "
+        f"remaining={progress.remaining}",
+        flush=True,
+    )
+
+
+async def main(argv: Sequence[str] = ()) -> int:
+    """Run the replay and return the process exit code."""
+    args = parse_args(argv)
+    settings = get_settings()
+    message_queue = await get_message_queue(settings)
+    replayer = DeadLetterReplayer(message_queue, settings, rate_per_minute=args.rate)
+    selection = DeadLetterFilter(
+        error_contains=args.error,
+        destination_id=args.destination,
+        sin=args.sin,
+        min=args.min,
+        min_age_seconds=args.older_than,
+        max_age_seconds=args.newer_than,
+    )
+
+    if not args.dry_run:
+        print(
+            f"Replaying at up to {replayer.rate_per_minute} messages per minute "
+            f"in chunks of {replayer.chunk_size}",
+            flush=True,
+        )
+    progress = await replayer.replay(selection, dry_run=args.dry_run, on_progress=print_progress)
+    print(f"Replay {progress.status}:", end=" ")
+    print_progress(progress)
+    if progress.error:
+        print(f"Error: {progress.error}", file=sys.stderr)
+    return 0 if progress.status == "completed" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
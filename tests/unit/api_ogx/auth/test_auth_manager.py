@@ -0,0 +1,267 @@
+"""Unit tests for the OGx auth manager token cache."""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from Protexis_Command.api.common.auth.manager import (
+    TOKEN_INVALIDATED_CHANNEL,
+    TOKEN_REFRESH_LOCK_KEY,
+    OGxAuthManager,
+    TokenMetadata,
+)
+from Protexis_Command.core.settings.app_settings import Settings
+from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import OGxProtocolError
+
+MANAGER = "Protexis_Command.api.common.auth.manager"
+
+
+class FakeSubscription:
+    """Pub/sub subscription whose messages are pushed by the test."""
+
+    def __init__(self) -> None:
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.channels: List[str] = []
+
+    async def subscribe(self, *channels: str) -> None:
+        self.channels.extend(channels)
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+    async def aclose(self) -> None:
+        pass
+
+
+def stored_metadata(token: str = "token-1", **overrides: Any) -> str:
+    """Token metadata as stored in Redis."""
+    now = time.time()
+    data: Dict[str, Any] = TokenMetadata(
+        token=token, created_at=now, expires_at=now + 86400, last_used=now
+    ).to_dict()
+    data.update(overrides)
+    return json.dumps(data)
+
+
+@pytest.fixture
+def settings() -> Settings:
+    """Create settings with a short bookkeeping flush interval."""
+    return Settings(DATABASE_URL="sqlite://", OGx_TOKEN_FLUSH_INTERVAL_SECONDS=0.01)
+
+
+@pytest.fixture
+def subscription() -> FakeSubscription:
+    """Create the invalidation subscription handed out by the mock Redis client."""
+    return FakeSubscription()
+
+
+@pytest.fixture
+def mock_redis(subscription: FakeSubscription) -> AsyncMock:
+    """Create a mock Redis client holding a valid token."""
+    redis = AsyncMock()
+    redis.register_script = MagicMock(side_effect=lambda script: AsyncMock())
+    redis.pubsub = MagicMock(return_value=subscription)
+    redis.get.return_value = stored_metadata()
+    return redis
+
+
+@pytest.fixture
+async def manager(settings: Settings, mock_redis: AsyncMock):
+    """Create an auth manager that is already listening for invalidations."""
+    manager = OGxAuthManager(settings, mock_redis)
+    manager._ensure_listener()
+    await asyncio.sleep(0)
+    yield manager
+    await manager.close()
+
+
+class TestTokenCache:
+    """Test serving the token from memory."""
+
+    async def test_token_served_from_memory(
+        self, manager: OGxAuthManager, mock_redis: AsyncMock
+    ) -> None:
+        """Only the first call reads Redis, and no call rewrites the metadata."""
+        tokens = [await manager.get_valid_token() for _ in range(3)]
+
+        assert tokens == ["token-1"] * 3
+        mock_redis.get.assert_awaited_once_with(manager.token_metadata_key)
+        mock_redis.setex.assert_not_awaited()
+
+    async def test_usage_flushed_once(self, manager: OGxAuthManager) -> None:
+        """Usage from many calls is written to Redis in one coalesced script call."""
+        for _ in range(3):
+            await manager.get_valid_token()
+        await asyncio.sleep(0.05)
+
+        manager._flush_script.assert_awaited_once()
+        kwargs = manager._flush_script.await_args.kwargs
+        assert kwargs["keys"] == [manager.token_metadata_key, manager.token_key]
+        token, last_used, validations, last_validated = kwargs["args"]
+        assert token == "token-1"
+        assert last_used == manager._cached.last_used
+        assert (validations, last_validated) == (0, "")
+
+    async def test_validations_are_counted(self, manager: OGxAuthManager) -> None:
+        """Validations add up in memory until the next flush."""
+        await manager._update_validation_metadata()
+        await manager._update_validation_metadata()
+
+        await manager.flush()
+
+        args = manager._flush_script.await_args.kwargs["args"]
+        assert args[2] == 2
+        assert manager._cached.validation_count == 2
+
+    async def test_expiring_token_is_refreshed(
+        self, manager: OGxAuthManager, mock_redis: AsyncMock
+    ) -> None:
+        """A cached token inside the refresh margin is not served."""
+        mock_redis.get.return_value = stored_metadata(expires_at=time.time() + 60)
+        manager._acquire_new_token = AsyncMock(return_value="token-2")
+
+        assert await manager.get_valid_token() == "token-2"
+
+
+class TestInvalidation:
+    """Test keeping the cache in step across processes."""
+
+    async def test_invalidation_from_other_process(
+        self, manager: OGxAuthManager, mock_redis: AsyncMock, subscription: FakeSubscription
+    ) -> None:
+        """Another process's announcement makes the next call reload the token."""
+        await manager.get_valid_token()
+        mock_redis.get.return_value = stored_metadata("token-2")
+
+        await subscription.messages.put({"channel": TOKEN_INVALIDATED_CHANNEL, "data": "other"})
+        await asyncio.sleep(0)
+
+        assert await manager.get_valid_token() == "token-2"
+        assert subscription.channels == [TOKEN_INVALIDATED_CHANNEL]
+
+    async def test_own_announcement_ignored(
+        self, manager: OGxAuthManager, mock_redis: AsyncMock, subscription: FakeSubscription
+    ) -> None:
+        """A process keeps its cache when it hears its own announcement."""
+        await manager.get_valid_token()
+
+        await subscription.messages.put(
+            {"channel": TOKEN_INVALIDATED_CHANNEL, "data": manager.instance_id}
+        )
+        await asyncio.sleep(0)
+
+        await manager.get_valid_token()
+        mock_redis.get.assert_awaited_once()
+
+    async def test_invalidate_token_announces(
+        self, manager: OGxAuthManager, mock_redis: AsyncMock
+    ) -> None:
+        """Invalidating deletes the token and tells the other processes."""
+        await manager.get_valid_token()
+
+        await manager.invalidate_token()
+
+        assert manager._cached is None
+        mock_redis.publish.assert_awaited_once_with(TOKEN_INVALIDATED_CHANNEL, manager.instance_id)
+
+    async def test_no_cache_without_subscription(
+        self, settings: Settings, mock_redis: AsyncMock, subscription: FakeSubscription
+    ) -> None:
+        """Without invalidations the token is read from Redis on every call."""
+        subscription.subscribe = AsyncMock(side_effect=RedisConnectionError("down"))
+        manager = OGxAuthManager(settings, mock_redis)
+
+        await manager.get_valid_token()
+        await asyncio.sleep(0)
+        await manager.get_valid_token()
+
+        assert mock_redis.get.await_count == 2
+        assert manager._cached is None
+        await manager.close()
+
+
+class TestSingleFlightRefresh:
+    """Test coalescing token refreshes."""
+
+    @pytest.fixture
+    def expiring(self, mock_redis: AsyncMock) -> None:
+        """Store a token inside the refresh margin."""
+        mock_redis.get.return_value = stored_metadata(expires_at=time.time() + 60)
+
+    async def test_concurrent_callers_share_refresh(
+        self, manager: OGxAuthManager, mock_redis: AsyncMock, expiring: None
+    ) -> None:
+        """Callers needing a new token at once wait on a single fetch."""
+
+        async def fetch() -> str:
+            await asyncio.sleep(0.01)
+            return "token-2"
+
+        manager._acquire_new_token = AsyncMock(side_effect=fetch)
+        mock_redis.set.return_value = True
+
+        tokens = await asyncio.gather(*(manager.get_valid_token() for _ in range(5)))
+
+        assert tokens == ["token-2"] * 5
+        manager._acquire_new_token.assert_awaited_once()
+        mock_redis.set.assert_awaited_once()
+        assert mock_redis.set.await_args.args[0] == TOKEN_REFRESH_LOCK_KEY
+        assert mock_redis.set.await_args.kwargs == {"nx": True, "ex": manager.refresh_lock_seconds}
+        lock_value = mock_redis.set.await_args.args[1]
+        manager._release_lock_script.assert_awaited_once_with(
+            keys=[TOKEN_REFRESH_LOCK_KEY], args=[lock_value]
+        )
+
+    async def test_waits_for_other_process(
+        self, manager: OGxAuthManager, mock_redis: AsyncMock
+    ) -> None:
+        """Without the lock, the token stored by the lock holder is used."""
+        mock_redis.get.side_effect = [
+            stored_metadata("token-1"),
+            stored_metadata("token-1"),
+            stored_metadata("token-2"),
+        ]
+        mock_redis.set.return_value = None
+        manager._acquire_new_token = AsyncMock()
+
+        with patch(f"{MANAGER}.REFRESH_POLL_SECONDS", 0):
+            assert await manager.get_valid_token(force_refresh=True) == "token-2"
+
+        manager._acquire_new_token.assert_not_awaited()
+
+    async def test_takes_over_lapsed_lock(
+        self, manager: OGxAuthManager, mock_redis: AsyncMock, expiring: None
+    ) -> None:
+        """A holder that dies without storing a token loses the lock to a waiter."""
+        mock_redis.set.side_effect = [None, True]
+        manager._acquire_new_token = AsyncMock(return_value="token-2")
+
+        with patch(f"{MANAGER}.REFRESH_POLL_SECONDS", 0):
+            assert await manager.get_valid_token() == "token-2"
+
+        assert mock_redis.set.await_count == 2
+
+    async def test_gives_up_waiting(
+        self, manager: OGxAuthManager, mock_redis: AsyncMock, expiring: None
+    ) -> None:
+        """Waiting ends with an error once the wait time has passed."""
+        mock_redis.set.return_value = None
+        manager.refresh_wait_seconds = 0
+
+        with patch(f"{MANAGER}.REFRESH_POLL_SECONDS", 0), pytest.raises(OGxProtocolError):
+            await manager.get_valid_token()
+
+    async def test_fetches_without_lock_when_redis_fails(
+        self, manager: OGxAuthManager, mock_redis: AsyncMock, expiring: None
+    ) -> None:
+        """A refresh does not fail because the lock cannot be taken."""
+        mock_redis.set.side_effect = RedisConnectionError("down")
+        manager._acquire_new_token = AsyncMock(return_value="token-2")
+
+        assert await manager.get_valid_token() == "token-2"
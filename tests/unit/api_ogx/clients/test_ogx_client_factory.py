@@ -0,0 +1,109 @@
+"""Unit tests for the OGx client registry."""
+
+import asyncio
+from typing import Iterator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from Protexis_Command.api.common.clients import factory
+from Protexis_Command.api.common.clients.factory import OGxClientRegistry, get_OGx_client
+from Protexis_Command.core.settings.app_settings import Settings
+
+AUTH_MANAGER = "Protexis_Command.api.common.clients.factory.get_auth_manager"
+
+
+@pytest.fixture
+def settings() -> Settings:
+    """Create application settings for tests."""
+    return Settings(DATABASE_URL="sqlite://")
+
+
+@pytest.fixture
+def auth_manager() -> AsyncMock:
+    """Create the process-wide auth manager."""
+    return AsyncMock(redis=MagicMock())
+
+
+@pytest.fixture
+def get_manager(auth_manager: AsyncMock) -> Iterator[AsyncMock]:
+    """Patch the auth manager lookup the registry awaits while building a client."""
+
+    async def slow_manager() -> AsyncMock:
+        await asyncio.sleep(0)
+        return auth_manager
+
+    with patch(AUTH_MANAGER, AsyncMock(side_effect=slow_manager)) as get_manager:
+        yield get_manager
+
+
+class TestOGxClientRegistry:
+    """Test building and sharing clients."""
+
+    async def test_client_is_reused(self, settings: Settings, get_manager: AsyncMock) -> None:
+        """Repeated requests get the same client, built once."""
+        registry = OGxClientRegistry()
+
+        client = await registry.get(settings)
+
+        assert await registry.get(settings) is client
+        assert client.settings is settings
+        get_manager.assert_awaited_once()
+
+    async def test_concurrent_first_requests_build_once(
+        self, settings: Settings, get_manager: AsyncMock
+    ) -> None:
+        """Requests racing for a missing client share one construction."""
+        registry = OGxClientRegistry()
+
+        clients = await asyncio.gather(*(registry.get(settings) for _ in range(5)))
+
+        assert all(client is clients[0] for client in clients)
+        get_manager.assert_awaited_once()
+
+    async def test_clients_keyed_by_account(
+        self, settings: Settings, get_manager: AsyncMock
+    ) -> None:
+        """Settings for another OGx account get their own client."""
+        registry = OGxClientRegistry()
+        other = Settings(DATABASE_URL="sqlite://", OGx_CLIENT_ID="70000935")
+
+        assert await registry.get(settings) is not await registry.get(other)
+        # Equal account settings share a client even as separate instances
+        assert await registry.get(Settings(DATABASE_URL="sqlite://")) is await registry.get(
+            settings
+        )
+
+    async def test_clients_share_auth_manager(
+        self, settings: Settings, get_manager: AsyncMock, auth_manager: AsyncMock
+    ) -> None:
+        """Every client authenticates with the process-wide auth manager."""
+        registry = OGxClientRegistry()
+        other = Settings(DATABASE_URL="sqlite://", OGx_CLIENT_ID="70000935")
+
+        assert (await registry.get(settings)).auth_manager is auth_manager
+        assert (await registry.get(other)).auth_manager is auth_manager
+
+    async def test_close_drops_clients(
+        self, settings: Settings, get_manager: AsyncMock, auth_manager: AsyncMock
+    ) -> None:
+        """After close the next request builds a new client; the auth manager stays open."""
+        registry = OGxClientRegistry()
+        client = await registry.get(settings)
+
+        await registry.close()
+
+        assert await registry.get(settings) is not client
+        auth_manager.close.assert_not_awaited()
+
+    async def test_get_OGx_client_uses_default_settings(
+        self, settings: Settings, get_manager: AsyncMock
+    ) -> None:
+        """Without settings the module registry uses the application settings."""
+        registry = OGxClientRegistry()
+        with (
+            patch.object(factory, "_registry", registry),
+            patch.object(factory, "get_settings", return_value=settings),
+        ):
+            client = await get_OGx_client()
+            assert await get_OGx_client(settings) is client
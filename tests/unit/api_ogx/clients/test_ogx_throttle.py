@@ -0,0 +1,111 @@
+"""Unit tests for the shared OGx call budget."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from Protexis_Command.api.common.clients.throttle import (
+    CallBudgetExceeded,
+    CallRateLimiter,
+    CallType,
+    call_type,
+)
+from Protexis_Command.api.config.ogx_endpoints import APIEndpoint
+from Protexis_Command.api.protocols.ogx.services import ogx_message_submission
+from Protexis_Command.core.settings.app_settings import Settings
+from Protexis_Command.protocols.ogx.constants.ogx_error_codes import GatewayErrorCode
+
+SLEEP = "Protexis_Command.api.common.clients.throttle.asyncio.sleep"
+
+
+@pytest.fixture
+def settings() -> Settings:
+    """Create application settings for tests."""
+    return Settings(DATABASE_URL="sqlite://", OGx_THROTTLE_BURST=2)
+
+
+@pytest.fixture
+def limiter(settings: Settings) -> CallRateLimiter:
+    """Create a limiter bound to a mock Redis client."""
+    redis = AsyncMock()
+    redis.register_script = MagicMock(side_effect=lambda script: AsyncMock())
+    return CallRateLimiter(redis, settings)
+
+
+class TestCallType:
+    """Test endpoint classification."""
+
+    @pytest.mark.parametrize(
+        "endpoint, expected",
+        [
+            (APIEndpoint.GET_RE_MESSAGES, CallType.GET),
+            (APIEndpoint.GET_FW_STATUSES, CallType.GET),
+            (APIEndpoint.GET_SERVICE_INFO, CallType.INFO),
+            (APIEndpoint.SUBMIT_MESSAGE, CallType.SEND),
+            ("/messages", CallType.SEND),
+            (APIEndpoint.AUTH_TOKEN, None),
+        ],
+    )
+    def test_endpoint_groups(self, endpoint: str, expected: CallType) -> None:
+        """Endpoints map to their throttle group; authentication is not throttled."""
+        assert call_type(endpoint) == expected
+
+
+class TestCallRateLimiter:
+    """Test slot reservation."""
+
+    def test_interval_and_tolerance(self, limiter: CallRateLimiter) -> None:
+        """Five calls a minute are spaced 12s apart, with one call of burst."""
+        assert limiter.interval == 12
+        assert limiter.tolerance == 12
+
+    async def test_reserve_runs_script_for_group(self, limiter: CallRateLimiter) -> None:
+        """A reservation is one script call on the customer's group key."""
+        limiter._reserve_script.return_value = [1, 4500]
+
+        assert await limiter.reserve(CallType.SEND) == 4.5
+
+        kwargs = limiter._reserve_script.await_args.kwargs
+        assert kwargs["keys"] == [f"OGx:throttle:{limiter.settings.CUSTOMER_ID}:send"]
+        assert kwargs["args"] == [12, 12, limiter.max_wait]
+
+    async def test_acquire_sleeps_until_slot(self, limiter: CallRateLimiter) -> None:
+        """Acquiring waits out the reserved delay."""
+        limiter._reserve_script.return_value = [1, 2000]
+
+        with patch(SLEEP, AsyncMock()) as sleep:
+            assert await limiter.acquire(CallType.GET) == 2
+
+        sleep.assert_awaited_once_with(2)
+
+    async def test_acquire_rejects_long_waits(self, limiter: CallRateLimiter) -> None:
+        """A slot beyond the maximum wait raises instead of sleeping."""
+        limiter._reserve_script.return_value = [0, 48000]
+
+        with patch(SLEEP, AsyncMock()) as sleep, pytest.raises(CallBudgetExceeded) as raised:
+            await limiter.acquire(CallType.GET, max_wait=5)
+
+        assert raised.value.retry_after == 48
+        assert raised.value.error_code == GatewayErrorCode.RETRIEVE_STATUS_RATE_EXCEEDED
+        assert limiter._reserve_script.await_args.kwargs["args"][2] == 5
+        sleep.assert_not_awaited()
+
+    async def test_authentication_is_not_throttled(self, limiter: CallRateLimiter) -> None:
+        """Calls without a throttle group do not touch the budget."""
+        assert await limiter.acquire(None) == 0
+        limiter._reserve_script.assert_not_awaited()
+
+
+class TestSubmissionBudget:
+    """Test how submissions report an exhausted budget."""
+
+    async def test_exhausted_budget_reads_as_rate_limit(self) -> None:
+        """The worker gets a rate limit response it reschedules, not a failure."""
+        client = AsyncMock()
+        client.post.side_effect = CallBudgetExceeded(CallType.SEND, 36)
+
+        with patch.object(ogx_message_submission, "get_OGx_client", AsyncMock(return_value=client)):
+            response = await ogx_message_submission.submit_OGx_messages([{"DestinationID": "T"}])
+
+        assert response["ErrorID"] == GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED
+        assert response["RetryAfter"] == 36
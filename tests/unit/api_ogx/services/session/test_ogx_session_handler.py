@@ -170,6 +170,8 @@ def mock_redis(redis_data: RedisMockData) -> AsyncMock:
     mock.expire = AsyncMock(return_value=True)
     mock.srem = AsyncMock(return_value=1)
     mock.hincrby = AsyncMock(return_value=1)
+    # Lease scripts: this process is always elected to run the cleanup loop
+    mock.register_script = MagicMock(side_effect=lambda script: AsyncMock(return_value=1))
 
     # Create a pipeline mock
     pipeline_mock = AsyncMock()
@@ -0,0 +1,167 @@
+"""Unit tests for dead letter queue replay."""
+
+import time
+from typing import List
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from Protexis_Command.api.protocols.ogx.services.ogx_dlq_replay import (
+    DeadLetterFilter,
+    DeadLetterReplayer,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import QueuedMessage
+from Protexis_Command.core.settings.app_settings import Settings
+
+SLEEP = "Protexis_Command.api.protocols.ogx.services.ogx_dlq_replay.asyncio.sleep"
+
+
+def dead_letter(message_id: str, error: str = "Rate limit exceeded", **payload) -> QueuedMessage:
+    """Build a dead-lettered message."""
+    return QueuedMessage(
+        message_id=message_id,
+        payload={
+            "DestinationID": payload.get("destination", "01008988SKY5909"),
+            "Payload": {"SIN": payload.get("sin", 16), "MIN": payload.get("min", 2)},
+        },
+        error=error,
+        created_at=payload.get("created_at", time.time() - 60),
+    )
+
+
+def scan(*chunks: List[QueuedMessage]):
+    """Make a scan_dead_letters replacement yielding the given chunks."""
+
+    async def scan_dead_letters(count: int = 1000):
+        for chunk in chunks:
+            yield chunk
+
+    return scan_dead_letters
+
+
+@pytest.fixture
+def settings() -> Settings:
+    """Create application settings for tests."""
+    return Settings(DATABASE_URL="sqlite://", OGx_DLQ_REPLAY_RATE_PER_MINUTE=2)
+
+
+@pytest.fixture
+def message_queue() -> AsyncMock:
+    """Create a mock message queue."""
+    return AsyncMock()
+
+
+class TestDeadLetterFilter:
+    """Test message selection."""
+
+    def test_empty_filter_matches_everything(self) -> None:
+        """Unset criteria match every message."""
+        assert DeadLetterFilter().matches(dead_letter("msg-1"))
+
+    def test_error_substring_is_case_insensitive(self) -> None:
+        """Errors are matched by case-insensitive substring."""
+        selection = DeadLetterFilter(error_contains="RATE LIMIT")
+
+        assert selection.matches(dead_letter("msg-1"))
+        assert not selection.matches(dead_letter("msg-2", error="Invalid payload"))
+        assert not selection.matches(dead_letter("msg-3", error=None))
+
+    def test_destination_and_sin_min(self) -> None:
+        """Destination and payload SIN/MIN must all match when set."""
+        selection = DeadLetterFilter(destination_id="TERM1", sin=16, min=2)
+
+        assert selection.matches(dead_letter("msg-1", destination="TERM1"))
+        assert not selection.matches(dead_letter("msg-2", destination="TERM2"))
+        assert not selection.matches(dead_letter("msg-3", destination="TERM1", min=3))
+
+    def test_age_window(self) -> None:
+        """Age is measured from when the message was first queued."""
+        now = 10_000.0
+        selection = DeadLetterFilter(min_age_seconds=60, max_age_seconds=3600)
+
+        assert selection.matches(dead_letter("msg-1", created_at=now - 120), now)
+        assert not selection.matches(dead_letter("msg-2", created_at=now - 30), now)
+        assert not selection.matches(dead_letter("msg-3", created_at=now - 7200), now)
+
+
+class TestDeadLetterReplayer:
+    """Test chunked, paced replay."""
+
+    def test_rate_is_capped_at_budget(self, settings: Settings, message_queue: AsyncMock) -> None:
+        """Requested rates above the submit budget are capped, and so are chunks."""
+        replayer = DeadLetterReplayer(message_queue, settings, rate_per_minute=100)
+
+        assert replayer.rate_per_minute == 2
+        assert replayer.chunk_size == 2
+        assert replayer.interval == 30
+
+    async def test_dry_run_counts_without_replaying(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """A dry run reports matches and moves nothing."""
+        message_queue.scan_dead_letters = scan(
+            [dead_letter("msg-1"), dead_letter("msg-2", error="Invalid payload")],
+            [dead_letter("msg-3")],
+        )
+        replayer = DeadLetterReplayer(message_queue, settings)
+
+        progress = await replayer.count(DeadLetterFilter(error_contains="rate limit"))
+
+        assert progress.status == "completed"
+        assert (progress.scanned, progress.matched, progress.remaining) == (3, 2, 2)
+        message_queue.replay_dead_letters.assert_not_awaited()
+
+    async def test_replay_is_chunked_and_paced(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """Matches are replayed in chunks with one interval per replayed message."""
+        message_queue.scan_dead_letters = scan([dead_letter(f"msg-{i}") for i in range(3)])
+        message_queue.replay_dead_letters.side_effect = lambda ids: {m: "accepted" for m in ids}
+        replayer = DeadLetterReplayer(message_queue, settings)
+        reports = []
+
+        with patch(SLEEP, AsyncMock()) as sleep:
+            progress = await replayer.replay(
+                DeadLetterFilter(), on_progress=lambda p: reports.append(p.replayed)
+            )
+
+        assert [c.args[0] for c in message_queue.replay_dead_letters.await_args_list] == [
+            ["msg-0", "msg-1"],
+            ["msg-2"],
+        ]
+        assert [c.args[0] for c in sleep.await_args_list] == [60, 30]
+        assert reports == [2, 3]
+        assert progress.replayed == 3
+        assert progress.remaining == 0
+
+    async def test_full_queue_is_retried(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """Messages rejected by a full pending queue are retried after an interval."""
+        message_queue.scan_dead_letters = scan([dead_letter("msg-1"), dead_letter("msg-2")])
+        message_queue.replay_dead_letters.side_effect = [
+            {"msg-1": "accepted", "msg-2": "queue_full"},
+            {"msg-2": "missing"},
+        ]
+        replayer = DeadLetterReplayer(message_queue, settings)
+
+        with patch(SLEEP, AsyncMock()):
+            progress = await replayer.replay(DeadLetterFilter())
+
+        assert message_queue.replay_dead_letters.await_args_list[1].args[0] == ["msg-2"]
+        assert (progress.replayed, progress.missing, progress.remaining) == (1, 1, 0)
+
+    async def test_redis_failure_is_reported(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """A Redis failure stops the replay with a failed status."""
+        message_queue.scan_dead_letters = scan([dead_letter("msg-1")])
+        message_queue.replay_dead_letters.side_effect = RedisConnectionError("down")
+        replayer = DeadLetterReplayer(message_queue, settings)
+
+        progress = await replayer.replay(DeadLetterFilter())
+
+        assert progress.status == "failed"
+        assert progress.error == "down"
+        assert progress.finished_at is not None
@@ -0,0 +1,113 @@
+"""Unit tests for the outbound submission idempotency index."""
+
+from unittest.mock import AsyncMock
+
+import pytest
+
+from Protexis_Command.api.protocols.ogx.services.ogx_idempotency import (
+    DIRECT_IDEMPOTENCY_PREFIX,
+    IN_FLIGHT,
+    IN_FLIGHT_TTL_SECONDS,
+    QUEUE_IDEMPOTENCY_PREFIX,
+    SubmissionIdempotencyIndex,
+    idempotency_key,
+    idempotency_ttl,
+)
+from Protexis_Command.core.settings.app_settings import Settings
+
+SUBMISSION = {
+    "DestinationID": "01008988SKY5909",
+    "UserMessageID": 7,
+    "Payload": {"SIN": 16, "MIN": 2},
+}
+
+
+@pytest.fixture
+def settings() -> Settings:
+    """Create application settings for tests."""
+    return Settings(DATABASE_URL="sqlite://")
+
+
+@pytest.fixture
+def mock_redis() -> AsyncMock:
+    """Create a mock Redis client."""
+    return AsyncMock()
+
+
+class TestIdempotencyKey:
+    """Test submission identity."""
+
+    def test_user_message_id_key(self) -> None:
+        """Submissions with a UserMessageID are keyed by destination and ID."""
+        key = idempotency_key("cust", SUBMISSION)
+
+        assert key == f"{QUEUE_IDEMPOTENCY_PREFIX}cust:umid:01008988SKY5909:7"
+        assert key == idempotency_key("cust", {**SUBMISSION, "Payload": {"SIN": 16, "MIN": 3}})
+        assert key != idempotency_key("cust", {**SUBMISSION, "DestinationID": "OTHER"})
+        assert key != idempotency_key("other", SUBMISSION)
+
+    def test_payload_hash_key_is_canonical(self) -> None:
+        """Without a UserMessageID the key hashes the payload regardless of key order."""
+        first = {"DestinationID": "T1", "Payload": {"SIN": 16, "MIN": 2}}
+        second = {"Payload": {"MIN": 2, "SIN": 16}, "DestinationID": "T1"}
+
+        assert idempotency_key("cust", first) == idempotency_key("cust", second)
+        assert idempotency_key("cust", first).startswith(f"{QUEUE_IDEMPOTENCY_PREFIX}cust:sha256:")
+        assert idempotency_key("cust", first) != idempotency_key(
+            "cust", {**first, "DestinationID": "T2"}
+        )
+
+    def test_paths_use_separate_keys(self) -> None:
+        """Queued and direct submissions of the same payload do not share an entry."""
+        direct = idempotency_key("cust", SUBMISSION, DIRECT_IDEMPOTENCY_PREFIX)
+
+        assert direct == f"{DIRECT_IDEMPOTENCY_PREFIX}cust:umid:01008988SKY5909:7"
+        assert direct != idempotency_key("cust", SUBMISSION)
+
+    def test_ttl_depends_on_identity(self, settings: Settings) -> None:
+        """Payload hash entries are kept for the shorter hash TTL."""
+        assert idempotency_ttl(settings, SUBMISSION) == settings.OGx_IDEMPOTENCY_TTL_SECONDS
+        assert idempotency_ttl(settings, {"DestinationID": "T1"}) == (
+            settings.OGx_IDEMPOTENCY_HASH_TTL_SECONDS
+        )
+
+
+class TestSubmissionIdempotencyIndex:
+    """Test claim, complete and release for direct submissions."""
+
+    async def test_first_claim_owns_submission(
+        self, settings: Settings, mock_redis: AsyncMock
+    ) -> None:
+        """The first claim sets an expiring in-flight marker."""
+        mock_redis.set.return_value = True
+        index = SubmissionIdempotencyIndex(mock_redis, settings)
+
+        assert await index.claim(SUBMISSION) is None
+        mock_redis.set.assert_awaited_once_with(
+            idempotency_key(settings.CUSTOMER_ID, SUBMISSION, DIRECT_IDEMPOTENCY_PREFIX),
+            IN_FLIGHT,
+            nx=True,
+            ex=IN_FLIGHT_TTL_SECONDS,
+        )
+
+    async def test_retry_gets_stored_message_id(
+        self, settings: Settings, mock_redis: AsyncMock
+    ) -> None:
+        """Later claims return the in-flight marker or the recorded message ID."""
+        mock_redis.set.return_value = None
+        mock_redis.get.side_effect = [IN_FLIGHT, "42"]
+        index = SubmissionIdempotencyIndex(mock_redis, settings)
+
+        assert await index.claim(SUBMISSION) == IN_FLIGHT
+        assert await index.claim(SUBMISSION) == "42"
+
+    async def test_complete_and_release(self, settings: Settings, mock_redis: AsyncMock) -> None:
+        """Completing stores the message ID for the TTL; releasing deletes the claim."""
+        index = SubmissionIdempotencyIndex(mock_redis, settings)
+        key = idempotency_key(settings.CUSTOMER_ID, SUBMISSION, DIRECT_IDEMPOTENCY_PREFIX)
+
+        await index.complete(SUBMISSION, 42)
+        await index.release(SUBMISSION)
+
+        mock_redis.set.assert_awaited_once_with(key, "42", ex=settings.OGx_IDEMPOTENCY_TTL_SECONDS)
+        mock_redis.delete.assert_awaited_once_with(key)
@@ -0,0 +1,859 @@
+"""Unit tests for the OGx message queue.
+
+Tests queue bookkeeping against a mocked Redis client so that the Redis commands
+issued for each operation can be asserted directly.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.models.messages import MessagePriority
+from Protexis_Command.api.protocols.ogx.services.ogx_idempotency import idempotency_key
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import (
+    ENTRY_FORMAT_VERSION,
+    LANES,
+    READY_CHANNEL,
+    OGxMessageQueue,
+    QueuedMessage,
+    allocate_lane_quotas,
+)
+from Protexis_Command.core.settings.app_settings import Settings
+
+
+def encode_message(message_id: str, created_at: float = 1.0, **overrides: Any) -> str:
+    """Encode a legacy JSON queue entry, as written before the binary encoding."""
+    data: Dict[str, Any] = {
+        "message_id": message_id,
+        "payload": {"DestinationID": "01008988SKY5909"},
+        "state": MessageState.ACCEPTED.value,
+        "retry_count": 0,
+        "last_attempt": None,
+        "error": None,
+        "created_at": created_at,
+    }
+    data.update(overrides)
+    return json.dumps(data)
+
+
+@pytest.fixture
+def mock_pipeline() -> MagicMock:
+    """Create a mock Redis pipeline usable as an async context manager."""
+    pipe = MagicMock()
+    pipe.__aenter__ = AsyncMock(return_value=pipe)
+    pipe.__aexit__ = AsyncMock(return_value=None)
+    for command in (
+        "hset",
+        "hdel",
+        "zadd",
+        "zrem",
+        "zcard",
+        "zrange",
+        "expire",
+        "hmget",
+        "hgetall",
+        "hlen",
+        "delete",
+    ):
+        setattr(pipe, command, AsyncMock())
+    pipe.execute = AsyncMock(return_value=[])
+    return pipe
+
+
+@pytest.fixture
+def mock_redis(mock_pipeline: MagicMock) -> AsyncMock:
+    """Create a mock Redis client returning the mock pipeline."""
+    redis = AsyncMock()
+    redis.pipeline = MagicMock(return_value=mock_pipeline)
+    redis.register_script = MagicMock(side_effect=lambda script: AsyncMock())
+    redis.hlen.return_value = 0
+    redis.zscore.return_value = None
+    redis.hexists.return_value = False
+    return redis
+
+
+@pytest.fixture
+def queue(mock_redis: AsyncMock) -> OGxMessageQueue:
+    """Create a message queue bound to the mock Redis client."""
+    settings = Settings(DATABASE_URL="sqlite://")
+    queue = OGxMessageQueue(mock_redis, settings)
+    queue._promote_script.return_value = 0
+    return queue
+
+
+def fetch_results(depths, lane_ids, entries, metadata=None):
+    """Pipeline results for one get_pending_messages call.
+
+    Args:
+        depths: Ready message count per lane (high, normal, low)
+        lane_ids: Index read results for each lane with a non-zero quota
+        entries: HMGET result for the loaded IDs
+        metadata: Metadata hashes for the loaded IDs (empty by default)
+    """
+    return [depths, lane_ids, [entries, *(metadata or [{} for _ in entries])]]
+
+
+class TestPendingIndex:
+    """Test FIFO pending index maintenance."""
+
+    async def test_enqueue_many_single_round_trip(self, queue: OGxMessageQueue) -> None:
+        """A batch is written by one script call covering every message's keys."""
+        queue._enqueue_script.return_value = ["msg-1", "accepted", "msg-2", "accepted"]
+
+        statuses = await queue.enqueue_many([("msg-1", {"a": 1}), ("msg-2", {"b": 2})])
+
+        assert statuses == {"msg-1": "accepted", "msg-2": "accepted"}
+        queue._enqueue_script.assert_awaited_once()
+        kwargs = queue._enqueue_script.await_args.kwargs
+        assert kwargs["keys"] == [
+            queue.pending_queue,
+            queue.pending_indexes[MessagePriority.NORMAL],
+            queue.expiry_index,
+            queue._metadata_key("msg-1"),
+            idempotency_key(queue.settings.CUSTOMER_ID, {"a": 1}),
+            queue._metadata_key("msg-2"),
+            idempotency_key(queue.settings.CUSTOMER_ID, {"b": 2}),
+        ]
+        args = kwargs["args"]
+        assert args[:4] == [
+            queue.max_submit_size,
+            MessageState.ACCEPTED.value,
+            queue.metadata_ttl,
+            MessagePriority.NORMAL.value,
+        ]
+        message_id, entry, created_at, idempotency_ttl = args[4:8]
+        assert message_id == "msg-1"
+        assert QueuedMessage.decode(entry).payload == {"a": 1}
+        assert created_at == QueuedMessage.decode(entry).created_at
+        assert idempotency_ttl == queue.settings.OGx_IDEMPOTENCY_HASH_TTL_SECONDS
+        assert args[8] == "msg-2"
+
+    async def test_enqueue_many_uses_priority_lane(self, queue: OGxMessageQueue) -> None:
+        """A batch is indexed in the lane of its priority."""
+        queue._enqueue_script.return_value = ["msg-1", "accepted"]
+
+        await queue.enqueue_many([("msg-1", {})], priority=MessagePriority.HIGH)
+
+        kwargs = queue._enqueue_script.await_args.kwargs
+        assert kwargs["keys"][1] == queue.pending_indexes[MessagePriority.HIGH]
+        assert kwargs["args"][3] == "high"
+        assert QueuedMessage.decode(kwargs["args"][5]).priority == MessagePriority.HIGH
+
+    async def test_enqueue_many_reports_rejections(self, queue: OGxMessageQueue) -> None:
+        """Per-message statuses report duplicates and capacity rejections."""
+        queue._enqueue_script.return_value = [
+            "msg-1",
+            "duplicate",
+            "msg-2",
+            "accepted",
+            "msg-3",
+            "queue_full",
+        ]
+
+        statuses = await queue.enqueue_many([("msg-1", {}), ("msg-2", {}), ("msg-3", {})])
+
+        assert statuses == {"msg-1": "duplicate", "msg-2": "accepted", "msg-3": "queue_full"}
+
+    async def test_enqueue_many_empty(self, queue: OGxMessageQueue) -> None:
+        """An empty batch does not call Redis."""
+        assert await queue.enqueue_many([]) == {}
+        queue._enqueue_script.assert_not_awaited()
+
+    async def test_enqueue_message_rejects_when_full(self, queue: OGxMessageQueue) -> None:
+        """Single enqueue raises when the capacity check rejects the message."""
+        queue._enqueue_script.return_value = ["msg-1", "queue_full"]
+
+        with pytest.raises(ValueError):
+            await queue.enqueue_message("msg-1", {})
+
+    async def test_enqueue_message_returns_accepted(self, queue: OGxMessageQueue) -> None:
+        """A new submission is queued under its own ID."""
+        queue._enqueue_script.return_value = ["msg-1", "accepted"]
+
+        assert await queue.enqueue_message("msg-1", {}) == ("msg-1", MessageState.ACCEPTED)
+
+    async def test_enqueue_message_returns_existing_submission(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock
+    ) -> None:
+        """A repeated UserMessageID returns the earlier message and its state."""
+        payload = {"DestinationID": "01008988SKY5909", "UserMessageID": 7}
+        queue._enqueue_script.return_value = ["msg-2", "duplicate"]
+        mock_redis.get.return_value = "msg-1"
+        mock_redis.hget.return_value = str(MessageState.SENDING.value)
+
+        result = await queue.enqueue_message("msg-2", payload)
+
+        assert result == ("msg-1", MessageState.SENDING)
+        mock_redis.get.assert_awaited_once_with(
+            idempotency_key(queue.settings.CUSTOMER_ID, payload)
+        )
+        mock_redis.hget.assert_awaited_once_with(queue._metadata_key("msg-1"), "state")
+
+    async def test_get_pending_reads_only_batch(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """A batch fetch loads only the indexed IDs it returns, in index order."""
+        mock_pipeline.execute.side_effect = fetch_results(
+            [0, 5, 0], [["msg-2", "msg-1"]], [encode_message("msg-2"), encode_message("msg-1")]
+        )
+
+        messages = await queue.get_pending_messages(batch_size=2)
+
+        assert [m.message_id for m in messages] == ["msg-2", "msg-1"]
+        mock_pipeline.zrange.assert_awaited_once_with(
+            queue.pending_indexes[MessagePriority.NORMAL], 0, 1
+        )
+        mock_pipeline.hmget.assert_awaited_once_with(queue.pending_queue, ["msg-2", "msg-1"])
+        mock_redis.hgetall.assert_not_awaited()
+
+    async def test_get_pending_weights_lanes(
+        self, queue: OGxMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """Each non-empty lane is read by weight and returned highest priority first."""
+        mock_pipeline.execute.side_effect = fetch_results(
+            [50, 50, 50],
+            [["high-1"], ["normal-1"], ["low-1"]],
+            [encode_message("high-1"), encode_message("normal-1"), encode_message("low-1")],
+        )
+
+        messages = await queue.get_pending_messages(batch_size=10)
+
+        assert [m.message_id for m in messages] == ["high-1", "normal-1", "low-1"]
+        reads = {c.args[0]: c.args[2] + 1 for c in mock_pipeline.zrange.await_args_list}
+        assert reads == {
+            queue.pending_indexes[MessagePriority.HIGH]: 6,
+            queue.pending_indexes[MessagePriority.NORMAL]: 3,
+            queue.pending_indexes[MessagePriority.LOW]: 1,
+        }
+
+    async def test_get_pending_applies_metadata(
+        self, queue: OGxMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """Delivery metadata takes precedence over values in the stored entry."""
+        mock_pipeline.execute.side_effect = fetch_results(
+            [0, 1, 0],
+            [["msg-1"]],
+            [encode_message("msg-1")],
+            [{"state": "3", "retry_count": "2", "last_attempt": "10.5", "error": "Timeout"}],
+        )
+
+        (message,) = await queue.get_pending_messages()
+
+        assert message.state == MessageState.DELIVERY_FAILED
+        assert message.retry_count == 2
+        assert message.last_attempt == 10.5
+        assert message.error == "Timeout"
+
+    async def test_get_pending_prunes_stale_index_entries(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """Index entries without a pending entry are removed from their lane's index."""
+        mock_pipeline.execute.side_effect = fetch_results(
+            [2, 0, 0], [["gone", "msg-1"]], [None, encode_message("msg-1")]
+        )
+
+        messages = await queue.get_pending_messages()
+
+        assert [m.message_id for m in messages] == ["msg-1"]
+        mock_redis.zrem.assert_awaited_once_with(
+            queue.pending_indexes[MessagePriority.HIGH], "gone"
+        )
+
+    async def test_get_pending_skips_undecodable_entries(
+        self, queue: OGxMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """A corrupt entry is skipped without dropping the rest of the batch."""
+        mock_pipeline.execute.side_effect = fetch_results(
+            [0, 2, 0], [["bad", "msg-1"]], ["{not json", encode_message("msg-1")]
+        )
+
+        messages = await queue.get_pending_messages()
+
+        assert [m.message_id for m in messages] == ["msg-1"]
+
+    async def test_get_pending_promotes_due_retries_first(
+        self, queue: OGxMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """Due retries are moved into their lane's index before the lanes are read."""
+        mock_pipeline.execute.return_value = [0, 0, 0]
+
+        await queue.get_pending_messages(batch_size=10)
+
+        kwargs = queue._promote_script.await_args.kwargs
+        assert kwargs["keys"] == [
+            key
+            for lane in LANES
+            for key in (queue.scheduled_indexes[lane], queue.pending_indexes[lane])
+        ]
+        assert kwargs["args"][1] == 10
+
+    async def test_get_pending_empty_index(
+        self, queue: OGxMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """Empty lanes return no messages without touching the hash."""
+        mock_pipeline.execute.return_value = [0, 0, 0]
+
+        assert await queue.get_pending_messages() == []
+        mock_pipeline.zrange.assert_not_awaited()
+        mock_pipeline.hmget.assert_not_awaited()
+
+    async def test_get_lane_depths(self, queue: OGxMessageQueue, mock_pipeline: MagicMock) -> None:
+        """Lane depths are read with one pipelined ZCARD per lane."""
+        mock_pipeline.execute.return_value = [1, 2, 3]
+
+        depths = await queue.get_lane_depths()
+
+        assert depths == {
+            MessagePriority.HIGH: 1,
+            MessagePriority.NORMAL: 2,
+            MessagePriority.LOW: 3,
+        }
+
+    async def test_get_queue_depths(self, queue: OGxMessageQueue, mock_pipeline: MagicMock) -> None:
+        """Depths come from one pipeline of O(1) cardinality reads."""
+        now = time.time()
+        mock_pipeline.execute.return_value = [
+            *(1, [("high-1", now - 30)]),
+            *(0, []),
+            *(2, [("low-1", now - 90)]),
+            *(0, 4, 1),
+            *(3, 5, 7, 2),
+        ]
+
+        depths = await queue.get_queue_depths()
+
+        assert depths.lanes == {
+            MessagePriority.HIGH: 1,
+            MessagePriority.NORMAL: 0,
+            MessagePriority.LOW: 2,
+        }
+        assert depths.oldest_ages[MessagePriority.HIGH] == pytest.approx(30, abs=1)
+        assert depths.oldest_ages[MessagePriority.NORMAL] == 0
+        assert depths.oldest_ages[MessagePriority.LOW] == pytest.approx(90, abs=1)
+        assert depths.pending == 1 + 2 + 5 + 3
+        assert depths.states() == {
+            "ready": 3,
+            "scheduled": 5,
+            "held": 3,
+            "in_progress": 5,
+            "delivered": 7,
+            "dead_letter": 2,
+        }
+        mock_pipeline.hlen.assert_any_await(queue.in_progress_queue)
+
+    async def test_rebuild_pending_index(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock
+    ) -> None:
+        """Unindexed pending entries are indexed with their original enqueue time."""
+
+        async def hscan_iter(key: str):
+            assert key == queue.pending_queue
+            yield "legacy", encode_message("legacy", created_at=42.0)
+
+        mock_redis.hscan_iter = hscan_iter
+        mock_redis.zadd.return_value = 1
+
+        assert await queue.rebuild_pending_index() == 1
+        mock_redis.zadd.assert_awaited_once_with(
+            queue.pending_indexes[MessagePriority.NORMAL], {"legacy": 42.0}, nx=True
+        )
+
+    async def test_rebuild_pending_index_skips_scheduled_retries(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock
+    ) -> None:
+        """Retries still backing off are not indexed early."""
+
+        async def hscan_iter(key: str):
+            yield "retrying", encode_message("retrying")
+
+        mock_redis.hscan_iter = hscan_iter
+        mock_redis.zscore.side_effect = [None, 1000.0, None]
+
+        assert await queue.rebuild_pending_index() == 0
+        mock_redis.zadd.assert_not_awaited()
+
+
+class TestStateTransitions:
+    """Test scripted atomic state transitions."""
+
+    async def test_mark_in_progress_claims_message(self, queue: OGxMessageQueue) -> None:
+        """A claim runs the claim script once with the message's keys."""
+        queue._claim_script.return_value = ["msg-1"]
+
+        assert await queue.mark_in_progress("msg-1") is True
+
+        queue._claim_script.assert_awaited_once()
+        kwargs = queue._claim_script.await_args.kwargs
+        assert kwargs["keys"] == [
+            queue.pending_queue,
+            queue.in_progress_queue,
+            *(queue.pending_indexes[lane] for lane in LANES),
+            queue.lease_index,
+            queue._metadata_key("msg-1"),
+        ]
+        assert kwargs["args"][0] == MessageState.SENDING.value
+        # The lease runs for the visibility timeout from the claim
+        assert kwargs["args"][3] == kwargs["args"][1] + queue.visibility_timeout
+        assert kwargs["args"][-1] == "msg-1"
+
+    async def test_mark_in_progress_already_claimed(self, queue: OGxMessageQueue) -> None:
+        """A message claimed elsewhere is reported as not claimed."""
+        queue._claim_script.return_value = []
+
+        assert await queue.mark_in_progress("msg-1") is False
+
+    async def test_mark_in_progress_many(self, queue: OGxMessageQueue) -> None:
+        """A batch claim moves all IDs in a single script call."""
+        queue._claim_script.return_value = ["msg-1", "msg-3"]
+
+        claimed = await queue.mark_in_progress_many(["msg-1", "msg-2", "msg-3"])
+
+        assert claimed == ["msg-1", "msg-3"]
+        queue._claim_script.assert_awaited_once()
+        assert queue._claim_script.await_args.kwargs["args"][-3:] == ["msg-1", "msg-2", "msg-3"]
+
+    async def test_mark_in_progress_many_empty(self, queue: OGxMessageQueue) -> None:
+        """An empty batch does not call Redis."""
+        assert await queue.mark_in_progress_many([]) == []
+        queue._claim_script.assert_not_awaited()
+
+    async def test_mark_delivered_many(self, queue: OGxMessageQueue) -> None:
+        """Delivery moves messages with the RECEIVED state."""
+        queue._deliver_script.return_value = ["msg-1"]
+
+        assert await queue.mark_delivered_many(["msg-1"]) == ["msg-1"]
+        kwargs = queue._deliver_script.await_args.kwargs
+        assert kwargs["keys"][:2] == [queue.in_progress_queue, queue.delivered_queue]
+        assert kwargs["args"][0] == MessageState.RECEIVED.value
+
+    async def test_mark_failed_many_reports_targets(self, queue: OGxMessageQueue) -> None:
+        """Failure results map each message to its retry or dead letter target."""
+        queue._fail_script.return_value = ["msg-1", "scheduled", 1, "msg-2", "dead_letter", 5]
+
+        targets = await queue.mark_failed_many(["msg-1", "msg-2"], "Network error")
+
+        assert targets == {"msg-1": "scheduled", "msg-2": "dead_letter"}
+        kwargs = queue._fail_script.await_args.kwargs
+        assert kwargs["keys"][3:6] == [queue.scheduled_indexes[lane] for lane in LANES]
+        args = kwargs["args"]
+        assert args[2] == queue.max_retries
+        assert args[3] == "Network error"
+        # Backoff is computed by the script from retry_delay and max_retry_delay
+        assert args[6:9] == [queue.retry_delay, queue.max_retry_delay, ""]
+
+    async def test_mark_failed_with_retry_after(self, queue: OGxMessageQueue) -> None:
+        """An explicit retry_after overrides the exponential backoff."""
+        queue._fail_script.return_value = ["msg-1", "scheduled", 1]
+
+        await queue.mark_failed("msg-1", "Rate limited", retry_after=30)
+
+        assert queue._fail_script.await_args.kwargs["args"][8] == 30
+
+    async def test_transition_error_is_raised(self, queue: OGxMessageQueue) -> None:
+        """Redis failures propagate to the caller."""
+        queue._deliver_script.side_effect = RuntimeError("connection lost")
+
+        with pytest.raises(RuntimeError):
+            await queue.mark_delivered("msg-1")
+
+    async def test_return_unsubmitted_reindexes_claims(self, queue: OGxMessageQueue) -> None:
+        """Unsubmitted claims return to their lane's pending index."""
+        queue._return_script.return_value = ["msg-1"]
+
+        assert await queue.return_unsubmitted(["msg-1", "msg-2"]) == ["msg-1"]
+
+        kwargs = queue._return_script.await_args.kwargs
+        assert kwargs["keys"][:4] == [
+            queue.in_progress_queue,
+            queue.pending_queue,
+            queue.lease_index,
+            queue.expiry_index,
+        ]
+        assert kwargs["keys"][4:7] == [queue.pending_indexes[lane] for lane in LANES]
+        assert kwargs["keys"][7:] == [queue._metadata_key("msg-1"), queue._metadata_key("msg-2")]
+        assert kwargs["args"][:2] == [
+            MessageState.ACCEPTED.value,
+            MessageState.DELIVERY_FAILED.value,
+        ]
+        assert kwargs["args"][4:] == ["msg-1", "msg-2"]
+
+    async def test_defer_parks_claims_without_a_retry(self, queue: OGxMessageQueue) -> None:
+        """Deferred claims are parked in their lane's retry schedule until retry_after."""
+        queue._defer_script.return_value = ["msg-1"]
+
+        assert await queue.defer_many(["msg-1"], "Rate limited", 30) == ["msg-1"]
+
+        kwargs = queue._defer_script.await_args.kwargs
+        assert kwargs["keys"][:3] == [
+            queue.in_progress_queue,
+            queue.pending_queue,
+            queue.lease_index,
+        ]
+        assert kwargs["keys"][3:6] == [queue.scheduled_indexes[lane] for lane in LANES]
+        assert kwargs["keys"][6:] == [queue._metadata_key("msg-1")]
+        args = kwargs["args"]
+        assert args[:3] == [
+            MessageState.ACCEPTED.value,
+            MessageState.DELIVERY_FAILED.value,
+            "Rate limited",
+        ]
+        assert args[3] >= time.time() + 29
+        assert args[5:] == ["msg-1"]
+
+    async def test_return_unsubmitted_empty(self, queue: OGxMessageQueue) -> None:
+        """Returning nothing does not call Redis."""
+        assert await queue.return_unsubmitted([]) == []
+        queue._return_script.assert_not_awaited()
+
+    async def test_hold_messages_by_lane(self, queue: OGxMessageQueue) -> None:
+        """Held messages move to the terminal's holding set for their lane."""
+        queue._hold_script.side_effect = [["urgent"], ["bulk"]]
+        messages = [
+            QueuedMessage("bulk", {}, priority=MessagePriority.LOW),
+            QueuedMessage("urgent", {}, priority=MessagePriority.HIGH),
+        ]
+
+        assert await queue.hold_messages("TERM1", messages) == ["urgent", "bulk"]
+
+        high_call, low_call = queue._hold_script.await_args_list
+        assert high_call.kwargs["keys"] == [
+            queue.pending_indexes[MessagePriority.HIGH],
+            "OGx:messages:held:TERM1:high",
+            queue.held_queue,
+        ]
+        assert high_call.kwargs["args"] == ["TERM1", "urgent"]
+        assert low_call.kwargs["keys"][1] == "OGx:messages:held:TERM1:low"
+
+    async def test_release_held_reindexes_by_lane(self, queue: OGxMessageQueue) -> None:
+        """Released messages return to their lane's pending index."""
+        queue._release_script.return_value = 2
+
+        assert await queue.release_held("TERM1", 3) == 2
+        assert await queue.release_held("TERM1", 0) == 0
+
+        kwargs = queue._release_script.await_args.kwargs
+        assert kwargs["keys"][:2] == [queue.pending_queue, queue.held_queue]
+        assert kwargs["keys"][2:4] == [
+            "OGx:messages:held:TERM1:high",
+            queue.pending_indexes[MessagePriority.HIGH],
+        ]
+        assert kwargs["args"] == [3]
+        queue._release_script.assert_awaited_once()
+
+
+class TestLeaseReaper:
+    """Test reclaiming in_progress messages whose lease expired."""
+
+    async def test_reclaim_expired_leases(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock
+    ) -> None:
+        """Expired leases are reclaimed by one script call per chunk."""
+        mock_redis.zrangebyscore.side_effect = [["stuck-1", "stuck-2"]]
+        queue._reap_script.return_value = ["stuck-1", "pending", "stuck-2", "dead_letter"]
+
+        targets = await queue.reclaim_expired_leases()
+
+        assert targets == {"stuck-1": "pending", "stuck-2": "dead_letter"}
+        assert mock_redis.zrangebyscore.await_args.args[0] == queue.lease_index
+        kwargs = queue._reap_script.await_args.kwargs
+        assert kwargs["keys"] == [
+            queue.in_progress_queue,
+            queue.pending_queue,
+            queue.dead_letter_queue,
+            queue.lease_index,
+            queue.expiry_index,
+            *(queue.pending_indexes[lane] for lane in LANES),
+            queue._metadata_key("stuck-1"),
+            queue._metadata_key("stuck-2"),
+        ]
+        assert kwargs["args"][2] == queue.max_retries
+        assert kwargs["args"][6:] == ["stuck-1", "stuck-2"]
+
+    async def test_reclaim_nothing_expired(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock
+    ) -> None:
+        """No script call is made when no lease has expired."""
+        mock_redis.zrangebyscore.return_value = []
+
+        assert await queue.reclaim_expired_leases() == {}
+        queue._reap_script.assert_not_awaited()
+
+    async def test_rebuild_lease_index(self, queue: OGxMessageQueue, mock_redis: AsyncMock) -> None:
+        """In-progress messages claimed before leases existed get a fresh lease."""
+
+        async def scan(_key):
+            yield "legacy", encode_message("legacy")
+
+        mock_redis.hscan_iter = MagicMock(side_effect=scan)
+        mock_redis.zadd.return_value = 1
+
+        assert await queue.rebuild_lease_index() == 1
+        key, mapping = mock_redis.zadd.await_args.args
+        assert key == queue.lease_index
+        assert mapping["legacy"] > time.time()
+        assert mock_redis.zadd.await_args.kwargs == {"nx": True}
+
+
+class TestDeadLetterReplay:
+    """Test scanning and replaying the dead letter queue."""
+
+    async def test_scan_applies_metadata(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """Scanned messages carry the error they were dead-lettered with."""
+        mock_redis.hscan.return_value = (0, {"dead-1": encode_message("dead-1")})
+        mock_pipeline.execute.return_value = [
+            [encode_message("dead-1")],
+            {"error": "Rate limit exceeded", "retry_count": "5"},
+        ]
+
+        chunks = [chunk async for chunk in queue.scan_dead_letters(count=10)]
+
+        assert [[m.message_id for m in chunk] for chunk in chunks] == [["dead-1"]]
+        assert chunks[0][0].error == "Rate limit exceeded"
+        mock_redis.hscan.assert_awaited_once_with(queue.dead_letter_queue, 0, count=10)
+
+    async def test_replay_runs_script(self, queue: OGxMessageQueue) -> None:
+        """Replays are moved by one script call with the pending limit."""
+        queue._replay_script.return_value = ["dead-1", "accepted", "dead-2", "missing"]
+
+        statuses = await queue.replay_dead_letters(["dead-1", "dead-2"])
+
+        assert statuses == {"dead-1": "accepted", "dead-2": "missing"}
+        kwargs = queue._replay_script.await_args.kwargs
+        assert kwargs["keys"] == [
+            queue.dead_letter_queue,
+            queue.pending_queue,
+            queue.expiry_index,
+            *(queue.pending_indexes[lane] for lane in LANES),
+            queue._metadata_key("dead-1"),
+            queue._metadata_key("dead-2"),
+        ]
+        assert kwargs["args"][:2] == [queue.max_submit_size, MessageState.ACCEPTED.value]
+        assert kwargs["args"][4:] == ["dead-1", "dead-2"]
+
+
+class TestReadyNotifications:
+    """Test worker wakeup on ready messages."""
+
+    @pytest.fixture
+    def subscription(self, mock_redis: AsyncMock) -> AsyncMock:
+        """Create a mock pub/sub subscription that waits out its timeout."""
+
+        async def get_message(timeout: float):
+            await asyncio.sleep(timeout)
+            return None
+
+        subscription = AsyncMock()
+        subscription.get_message.side_effect = get_message
+        mock_redis.pubsub = MagicMock(return_value=subscription)
+        return subscription
+
+    async def test_enqueue_notifies_only_accepted(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock
+    ) -> None:
+        """Workers are woken when a message is queued, not for duplicates."""
+        queue._enqueue_script.return_value = ["msg-1", "duplicate"]
+        await queue.enqueue_many([("msg-1", {})])
+        mock_redis.publish.assert_not_awaited()
+
+        queue._enqueue_script.return_value = ["msg-2", "accepted"]
+        await queue.enqueue_many([("msg-2", {})])
+        mock_redis.publish.assert_awaited_once_with(READY_CHANNEL, "1")
+
+    async def test_first_wait_subscribes_and_returns(
+        self, queue: OGxMessageQueue, subscription: AsyncMock
+    ) -> None:
+        """Subscribing returns at once so messages queued before it are fetched."""
+        assert await queue.wait_for_messages(60) is True
+
+        subscription.subscribe.assert_awaited_once_with(READY_CHANNEL)
+        subscription.get_message.assert_not_awaited()
+
+    async def test_notification_wakes_and_drains(
+        self, queue: OGxMessageQueue, subscription: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """One wakeup consumes every buffered notification."""
+        await queue.wait_for_messages(60)
+        mock_pipeline.execute.return_value = [[], [], []]
+        subscription.get_message.side_effect = [{"data": "1"}, {"data": "1"}, None]
+
+        assert await queue.wait_for_messages(60) is True
+        assert [c.kwargs["timeout"] for c in subscription.get_message.await_args_list][1:] == [
+            0.0,
+            0.0,
+        ]
+
+    async def test_wait_ends_when_retry_is_due(
+        self, queue: OGxMessageQueue, subscription: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """A scheduled retry shortens the wait to its due time."""
+        await queue.wait_for_messages(60)
+        mock_pipeline.execute.return_value = [[], [("msg-1", time.time() + 0.05)], []]
+        started = time.monotonic()
+
+        assert await queue.wait_for_messages(60) is False
+        assert time.monotonic() - started < 1
+
+
+class TestRetentionCleanup:
+    """Test index-driven retention cleanup."""
+
+    async def test_cleanup_deletes_expired_chunks(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """Expired IDs are removed from every queue in chunks until the index is drained."""
+        queue.cleanup_chunk_size = 2
+        mock_redis.zrangebyscore.side_effect = [["old-1", "old-2"], ["old-3"]]
+        mock_pipeline.execute.side_effect = [[0, 0, 2, 0] + [0] * 8, [1, 0, 0, 0] + [0] * 8]
+
+        assert await queue.cleanup_expired_messages() == 3
+
+        assert mock_redis.zrangebyscore.await_count == 2
+        assert mock_redis.zrangebyscore.await_args.kwargs == {"start": 0, "num": 2}
+        deleted_queues = [c.args[0] for c in mock_pipeline.hdel.await_args_list[:4]]
+        assert deleted_queues == queue._retained_queues()
+        mock_pipeline.zrem.assert_any_await(queue.expiry_index, "old-3")
+        mock_pipeline.delete.assert_any_await(queue._metadata_key("old-3"))
+        mock_redis.hgetall.assert_not_awaited()
+
+    async def test_cleanup_nothing_expired(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """No round trips beyond the index lookup when nothing has expired."""
+        mock_redis.zrangebyscore.return_value = []
+
+        assert await queue.cleanup_expired_messages() == 0
+        mock_pipeline.execute.assert_not_awaited()
+
+    async def test_initialize_rebuilds_missing_expiry_index(
+        self, queue: OGxMessageQueue, mock_redis: AsyncMock
+    ) -> None:
+        """Entries written before the expiry index existed are indexed on start."""
+
+        async def hscan_iter(key: str):
+            if key == queue.delivered_queue:
+                yield "legacy", encode_message("legacy", created_at=7.0)
+
+        mock_redis.hscan_iter = hscan_iter
+        mock_redis.exists.return_value = 0
+        mock_redis.zadd.return_value = 1
+
+        await queue.initialize()
+
+        mock_redis.zadd.assert_awaited_once_with(queue.expiry_index, {"legacy": 7.0}, nx=True)
+
+
+class TestLaneQuotas:
+    """Test weighted batch allocation between priority lanes."""
+
+    weights = {MessagePriority.HIGH: 6, MessagePriority.NORMAL: 3, MessagePriority.LOW: 1}
+
+    def test_split_by_weight(self) -> None:
+        """Busy lanes share the batch by weight."""
+        depths = {lane: 1000 for lane in LANES}
+
+        quotas = allocate_lane_quotas(depths, 100, self.weights)
+
+        assert quotas == {
+            MessagePriority.HIGH: 60,
+            MessagePriority.NORMAL: 30,
+            MessagePriority.LOW: 10,
+        }
+
+    def test_low_priority_not_starved(self) -> None:
+        """A non-empty low lane always gets a slot, even in small batches."""
+        depths = {lane: 1000 for lane in LANES}
+
+        quotas = allocate_lane_quotas(depths, 5, self.weights)
+
+        assert quotas[MessagePriority.LOW] == 1
+        assert sum(quotas.values()) == 5
+
+    def test_unused_share_redistributed(self) -> None:
+        """Slots a lane cannot fill go to the other lanes in priority order."""
+        depths = {MessagePriority.HIGH: 2, MessagePriority.NORMAL: 100, MessagePriority.LOW: 100}
+
+        quotas = allocate_lane_quotas(depths, 100, self.weights)
+
+        assert quotas[MessagePriority.HIGH] == 2
+        assert sum(quotas.values()) == 100
+        assert quotas[MessagePriority.NORMAL] > quotas[MessagePriority.LOW]
+
+    def test_batch_smaller_than_lanes(self) -> None:
+        """The lowest lanes give up their slot when the batch cannot hold every lane."""
+        depths = {lane: 10 for lane in LANES}
+
+        assert allocate_lane_quotas(depths, 1, self.weights) == {
+            MessagePriority.HIGH: 1,
+            MessagePriority.NORMAL: 0,
+            MessagePriority.LOW: 0,
+        }
+
+    def test_empty_lanes(self) -> None:
+        """No slots are allocated when every lane is empty."""
+        assert sum(allocate_lane_quotas({}, 10, self.weights).values()) == 0
+
+
+class TestQueuedMessage:
+    """Test queued message serialization."""
+
+    def test_round_trip(self) -> None:
+        """Encoded messages decode back to equivalent messages."""
+        message = QueuedMessage(
+            message_id="msg-1",
+            payload={"a": 1, "Name": "caf\u00e9"},
+            retry_count=2,
+            error="Timed out",
+            priority=MessagePriority.HIGH,
+            created_at=42.5,
+        )
+
+        entry = message.encode()
+        decoded = QueuedMessage.decode(entry)
+
+        assert entry.encode("latin-1")[0] == ENTRY_FORMAT_VERSION
+        assert decoded.message_id == "msg-1"
+        assert decoded.payload == {"a": 1, "Name": "caf\u00e9"}
+        assert decoded.retry_count == 2
+        assert decoded.error == "Timed out"
+        assert decoded.state == MessageState.ACCEPTED
+        assert decoded.priority == MessagePriority.HIGH
+        assert decoded.created_at == 42.5
+
+    def test_encoding_is_smaller_than_json(self) -> None:
+        """The binary entry is smaller than the JSON entry it replaces."""
+        message = QueuedMessage(message_id="msg-1", payload={"DestinationID": "01008988SKY5909"})
+
+        assert len(message.encode().encode()) < len(json.dumps(message.to_dict()))
+
+    def test_from_dict_keeps_created_at(self) -> None:
+        """Re-serializing a message does not reset its age."""
+        message = QueuedMessage(message_id="msg-1", payload={}, created_at=7.0)
+
+        assert QueuedMessage.from_dict(message.to_dict()).created_at == 7.0
+
+    def test_decode_legacy_json_entry(self) -> None:
+        """JSON entries written before the binary encoding still decode."""
+        decoded = QueuedMessage.decode(encode_message("msg-1", created_at=3.0, retry_count=1))
+
+        assert decoded.message_id == "msg-1"
+        assert decoded.retry_count == 1
+        assert decoded.created_at == 3.0
+
+    def test_legacy_entry_defaults_to_normal_priority(self) -> None:
+        """Entries written before priority lanes existed decode as normal priority."""
+        decoded = QueuedMessage.decode(encode_message("msg-1"))
+
+        assert decoded.priority == MessagePriority.NORMAL
+
+    @pytest.mark.parametrize("entry", ["\x02\x90", "\x01\x92\x01", "{}", ""])
+    def test_decode_rejects_malformed_entries(self, entry: str) -> None:
+        """Unknown versions and malformed entries raise ValueError."""
+        with pytest.raises(ValueError):
+            QueuedMessage.decode(entry)
@@ -0,0 +1,498 @@
+"""Unit tests for the outbound message worker."""
+
+import asyncio
+from typing import Dict, List
+from unittest.mock import AsyncMock, call, patch
+
+import pytest
+from redis.exceptions import RedisError
+
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import (
+    LANES,
+    QueueDepths,
+    QueuedMessage,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_message_worker import MessageWorker
+from Protexis_Command.core.settings.app_settings import Settings
+from Protexis_Command.protocols.ogx.constants.ogx_error_codes import GatewayErrorCode
+from Protexis_Command.protocols.ogx.constants.ogx_limits import MAX_CONCURRENT_REQUESTS
+
+WORKER = "Protexis_Command.api.protocols.ogx.services.ogx_message_worker"
+SUBMIT = f"{WORKER}.submit_OGx_message"
+SUBMIT_BATCH = f"{WORKER}.submit_OGx_messages"
+SLEEP = f"{WORKER}.asyncio.sleep"
+
+
+def queued(message_id: str, terminal_id: str) -> QueuedMessage:
+    """Build a queued message for a terminal."""
+    return QueuedMessage(message_id, {"DestinationID": terminal_id, "id": message_id})
+
+
+@pytest.fixture
+def settings() -> Settings:
+    """Create application settings for tests."""
+    return Settings(DATABASE_URL="sqlite://")
+
+
+@pytest.fixture
+def message_queue() -> AsyncMock:
+    """Create a mock message queue."""
+    return AsyncMock(partition=None)
+
+
+class TestLeaseReclaim:
+    """Test reclaiming messages whose claim expired."""
+
+    async def test_reclaim_records_targets(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """Reclaimed messages are counted and reported per target queue."""
+        metrics = AsyncMock()
+        worker = MessageWorker(settings, message_queue, metrics=metrics)
+        targets = {"msg-1": "pending", "msg-2": "dead_letter"}
+        message_queue.reclaim_expired_leases.return_value = targets
+
+        assert await worker.reclaim_expired_leases() == targets
+
+        assert worker.reclaimed_count == 2
+        assert worker.reclaimed_dead_letter_count == 1
+        metrics.record_messages_reclaimed.assert_awaited_once_with(
+            "outbound", targets, customer_id=settings.CUSTOMER_ID
+        )
+        health = worker.get_health_metrics()
+        assert health["reclaimed_count"] == 2
+
+    async def test_nothing_reclaimed(self, settings: Settings, message_queue: AsyncMock) -> None:
+        """No metrics are recorded when no lease expired."""
+        metrics = AsyncMock()
+        worker = MessageWorker(settings, message_queue, metrics=metrics)
+        message_queue.reclaim_expired_leases.return_value = {}
+
+        assert await worker.reclaim_expired_leases() == {}
+        metrics.record_messages_reclaimed.assert_not_awaited()
+
+
+class TestQueueMetrics:
+    """Test publishing queue depths."""
+
+    async def test_publish_queue_metrics(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """A snapshot is published as queue, lane, state and age gauges."""
+        metrics = AsyncMock()
+        worker = MessageWorker(settings, message_queue, metrics=metrics)
+        depths = QueueDepths(
+            lanes={lane: 1 for lane in LANES},
+            oldest_ages={lane: 10.0 for lane in LANES},
+            scheduled=2,
+            in_progress=4,
+        )
+        message_queue.get_queue_depths.return_value = depths
+
+        assert await worker.publish_queue_metrics() is depths
+
+        customer_id = settings.CUSTOMER_ID
+        metrics.update_queue_metrics.assert_awaited_once_with(
+            "outbound", 5, 4, customer_id=customer_id
+        )
+        metrics.update_lane_metrics.assert_awaited_once_with(
+            "outbound", {"high": 1, "normal": 1, "low": 1}, customer_id=customer_id
+        )
+        metrics.update_queue_depth_metrics.assert_awaited_once_with(
+            "outbound",
+            depths.states(),
+            {"high": 10.0, "normal": 10.0, "low": 10.0},
+            customer_id=customer_id,
+        )
+
+
+class TestIdleWakeup:
+    """Test waiting for messages when the queue is empty."""
+
+    async def test_idle_worker_waits_for_notification(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """An empty fetch waits on the queue's notification rather than sleeping."""
+        worker = MessageWorker(settings, message_queue)
+        message_queue.get_pending_messages.side_effect = [[], asyncio.CancelledError()]
+        worker.running = True
+
+        with patch(SLEEP, AsyncMock()) as sleep, pytest.raises(asyncio.CancelledError):
+            await worker._process_queue()
+
+        message_queue.wait_for_messages.assert_awaited_once_with(
+            settings.OGx_WORKER_IDLE_TIMEOUT_SECONDS
+        )
+        sleep.assert_not_awaited()
+
+    async def test_stop_drops_subscription(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """Stopping the worker closes its ready notification subscription."""
+        worker = MessageWorker(settings, message_queue)
+
+        await worker.stop()
+
+        message_queue.close_wakeup.assert_awaited_once()
+
+
+class TestConcurrentDispatch:
+    """Test bounded concurrent submission."""
+
+    async def run_batch(self, worker: MessageWorker, message_queue: AsyncMock, batch) -> None:
+        """Run the processing loop for one batch."""
+        message_queue.get_pending_messages.side_effect = [batch, asyncio.CancelledError()]
+        worker.running = True
+        with pytest.raises(asyncio.CancelledError):
+            await worker._process_queue()
+
+    async def test_concurrency_is_bounded_and_ordered_per_terminal(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """Terminals are dispatched in parallel up to the limit, each in queue order."""
+        worker = MessageWorker(settings, message_queue)
+        batch = [queued(f"{terminal}-{i}", terminal) for i in range(3) for terminal in "ABCDE"]
+        submitted: List[str] = []
+        peak = 0
+
+        async def submit(payload: Dict) -> Dict:
+            nonlocal peak
+            peak = max(peak, worker.in_flight_count)
+            await asyncio.sleep(0.01)
+            submitted.append(payload["id"])
+            return {"ErrorID": 0}
+
+        with patch(SUBMIT, side_effect=submit):
+            await self.run_batch(worker, message_queue, batch)
+
+        assert peak == MAX_CONCURRENT_REQUESTS
+        for terminal in "ABCDE":
+            assert [m for m in submitted if m[0] == terminal] == [
+                f"{terminal}-{i}" for i in range(3)
+            ]
+        assert worker.processed_count == 15
+        assert worker.in_flight_count == 0
+
+    async def test_serial_mode(self, message_queue: AsyncMock) -> None:
+        """A concurrency of 1 submits one message at a time."""
+        worker = MessageWorker(
+            Settings(DATABASE_URL="sqlite://", OGx_WORKER_CONCURRENCY=1), message_queue
+        )
+        peak = 0
+
+        async def submit(payload: Dict) -> Dict:
+            nonlocal peak
+            peak = max(peak, worker.in_flight_count)
+            await asyncio.sleep(0)
+            return {"ErrorID": 0}
+
+        with patch(SUBMIT, side_effect=submit):
+            await self.run_batch(worker, message_queue, [queued("A-0", "A"), queued("B-0", "B")])
+
+        assert peak == 1
+        assert worker.processed_count == 2
+
+    async def test_rate_limited_message_is_deferred(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """A rate limited message is deferred instead of failed, keeping its retries."""
+        worker = MessageWorker(settings, message_queue)
+        response = {"ErrorID": GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED, "RetryAfter": 12}
+
+        with patch(SUBMIT, AsyncMock(return_value=response)):
+            await self.run_batch(worker, message_queue, [queued("A-0", "A")])
+
+        message_queue.defer.assert_awaited_once_with("A-0", "Rate limited. Retry after 12s", 12)
+        message_queue.mark_failed.assert_not_awaited()
+        assert worker.retry_count == 1
+
+    async def test_saturated_terminal_holds_remaining_messages(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """Once a terminal is saturated, its later messages are held in order."""
+        limiter = AsyncMock()
+        limiter.acquire.side_effect = [True, False]
+        limiter.available.return_value = 0
+        message_queue.hold_messages.side_effect = lambda terminal, messages: messages
+        worker = MessageWorker(settings, message_queue, limiter=limiter)
+        batch = [queued(f"A-{i}", "A") for i in range(3)]
+
+        with patch(SUBMIT, AsyncMock(return_value={"ErrorID": 0, "MessageID": 1})):
+            await self.run_batch(worker, message_queue, batch)
+
+        assert limiter.acquire.await_count == 2
+        message_queue.hold_messages.assert_awaited_once_with("A", batch[1:])
+        assert worker.held_count == 2
+
+
+class TestBatchedSubmission:
+    """Test submitting many messages per OGx call."""
+
+    @pytest.fixture
+    def batch_settings(self) -> Settings:
+        """Settings with batching enabled and no linger."""
+        return Settings(DATABASE_URL="sqlite://", OGx_SUBMIT_BATCH_SIZE=100, OGx_SUBMIT_LINGER_MS=0)
+
+    async def run_batch(self, worker: MessageWorker, message_queue: AsyncMock, batch) -> None:
+        """Run the processing loop for one batch."""
+        message_queue.get_pending_messages.side_effect = [batch, asyncio.CancelledError()]
+        message_queue.mark_in_progress_many.side_effect = lambda ids: list(ids)
+        worker.running = True
+        with pytest.raises(asyncio.CancelledError):
+            await worker._process_queue()
+
+    async def test_submissions_map_to_messages(
+        self, batch_settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """One call carries the batch; each result drives its own message's transition."""
+        worker = MessageWorker(batch_settings, message_queue)
+        batch = [queued(f"msg-{i}", "A") for i in range(3)]
+        response = {
+            "ErrorID": 0,
+            "Submissions": [
+                {"ErrorID": 0, "ForwardMessageID": 11},
+                {"ErrorID": 12, "ForwardMessageID": None},
+                {"ErrorID": 0, "ForwardMessageID": 13},
+            ],
+        }
+
+        with patch(SUBMIT_BATCH, AsyncMock(return_value=response)) as submit:
+            await self.run_batch(worker, message_queue, batch)
+
+        submit.assert_awaited_once_with([m.payload for m in batch])
+        message_queue.mark_in_progress_many.assert_awaited_once_with(["msg-0", "msg-1", "msg-2"])
+        message_queue.mark_delivered_many.assert_awaited_once_with(["msg-0", "msg-2"])
+        message_queue.mark_failed_many.assert_awaited_once_with(
+            ["msg-1"], "Submission rejected with ErrorID 12"
+        )
+        assert (worker.processed_count, worker.error_count) == (2, 1)
+
+    async def test_rate_limited_batch_is_retried(
+        self, batch_settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """A rate limited call defers every message without using up a retry."""
+        worker = MessageWorker(batch_settings, message_queue)
+        response = {"ErrorID": GatewayErrorCode.SUBMIT_MESSAGE_RATE_EXCEEDED, "RetryAfter": 30}
+
+        with patch(SUBMIT_BATCH, AsyncMock(return_value=response)):
+            await self.run_batch(
+                worker, message_queue, [queued("msg-0", "A"), queued("msg-1", "B")]
+            )
+
+        message_queue.defer_many.assert_awaited_once_with(
+            ["msg-0", "msg-1"], "Rate limited. Retry after 30s", 30
+        )
+        message_queue.mark_failed_many.assert_not_awaited()
+        assert worker.retry_count == 2
+
+    async def test_linger_tops_up_partial_batch(self, message_queue: AsyncMock) -> None:
+        """A partial batch waits for the linger time and is topped up once."""
+        settings = Settings(
+            DATABASE_URL="sqlite://", OGx_SUBMIT_BATCH_SIZE=3, OGx_SUBMIT_LINGER_MS=200
+        )
+        worker = MessageWorker(settings, message_queue)
+        message_queue.get_pending_messages.side_effect = [
+            [queued("msg-0", "A")],
+            [queued("msg-1", "B"), queued("msg-2", "A")],
+        ]
+        message_queue.mark_in_progress_many.side_effect = lambda ids: list(ids)
+
+        with patch(SLEEP, AsyncMock()) as sleep:
+            fetched, batch = await worker._collect_batch()
+
+        sleep.assert_awaited_once_with(0.2)
+        assert message_queue.get_pending_messages.await_args_list[1].kwargs == {"batch_size": 2}
+        assert fetched == 3
+        assert [m.message_id for m in batch] == ["msg-0", "msg-1", "msg-2"]
+
+    async def test_saturated_terminal_stays_held_after_linger(
+        self, message_queue: AsyncMock
+    ) -> None:
+        """Messages read after the linger do not overtake a saturated terminal's held ones."""
+        settings = Settings(
+            DATABASE_URL="sqlite://", OGx_SUBMIT_BATCH_SIZE=3, OGx_SUBMIT_LINGER_MS=200
+        )
+        limiter = AsyncMock()
+        limiter.acquire.side_effect = [True, False, True]
+        limiter.available.return_value = 0
+        message_queue.hold_messages.side_effect = lambda terminal, messages: messages
+        message_queue.mark_in_progress_many.side_effect = lambda ids: list(ids)
+        worker = MessageWorker(settings, message_queue, limiter=limiter)
+        late = queued("A-2", "A")
+        message_queue.get_pending_messages.side_effect = [
+            [queued("A-0", "A"), queued("A-1", "A")],
+            [late, queued("B-0", "B")],
+        ]
+
+        with patch(SLEEP, AsyncMock()):
+            _, batch = await worker._collect_batch()
+
+        assert [m.message_id for m in batch] == ["A-0", "B-0"]
+        message_queue.hold_messages.assert_any_await("A", [late])
+
+    async def test_failed_claim_releases_slots(
+        self, batch_settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """Slots acquired for a batch are released if claiming it fails."""
+        limiter = AsyncMock()
+        limiter.acquire.return_value = True
+        worker = MessageWorker(batch_settings, message_queue, limiter=limiter)
+        message_queue.get_pending_messages.return_value = [queued("A-0", "A"), queued("B-0", "B")]
+        message_queue.mark_in_progress_many.side_effect = RedisError("Connection reset")
+
+        with pytest.raises(RedisError):
+            await worker._collect_batch()
+
+        assert limiter.release.await_args_list == [call("A", "A-0"), call("B", "B-0")]
+
+
+class TestProcessingLoop:
+    """Test how the processing loop survives errors."""
+
+    async def test_redis_error_backs_off(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """A Redis failure is logged and retried after a pause instead of ending the loop."""
+        worker = MessageWorker(settings, message_queue)
+        message_queue.get_pending_messages.side_effect = [
+            RedisError("Connection reset"),
+            asyncio.CancelledError(),
+        ]
+        worker.running = True
+
+        with patch(SLEEP, AsyncMock()) as sleep, pytest.raises(asyncio.CancelledError):
+            await worker._process_queue()
+
+        sleep.assert_awaited_once_with(5)
+        assert worker.error_count == 1
+
+
+class TestLeaderTerm:
+    """Test the fencing token check of a worker run under a lease."""
+
+    async def test_stale_term_stops_worker(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """A worker whose term has passed to another process claims nothing."""
+        worker = MessageWorker(settings, message_queue)
+        worker.fencing_token = 3
+        worker.is_current = AsyncMock(return_value=False)
+        worker.running = True
+
+        await worker._process_queue()
+
+        worker.is_current.assert_awaited_once_with(3)
+        assert not worker.running
+        message_queue.get_pending_messages.assert_not_awaited()
+        message_queue.mark_in_progress_many.assert_not_awaited()
+
+
+class TestDrain:
+    """Test draining the worker on shutdown."""
+
+    @pytest.fixture
+    def message_queue(self) -> AsyncMock:
+        """Create a mock message queue with no expired leases to reclaim."""
+        queue = AsyncMock(partition=None)
+        queue.reclaim_expired_leases.return_value = {}
+        return queue
+
+    async def test_idle_worker_drains_at_once(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """A worker waiting for messages stops without waiting for the deadline."""
+        waiting = asyncio.Event()
+
+        async def wait_for_messages(timeout: float) -> bool:
+            waiting.set()
+            await asyncio.sleep(3600)
+            return False
+
+        message_queue.get_pending_messages.return_value = []
+        message_queue.wait_for_messages.side_effect = wait_for_messages
+        worker = MessageWorker(settings, message_queue)
+        await worker.start()
+        await waiting.wait()
+
+        assert await worker.drain(timeout=60)
+        assert worker.get_drain_status()["drained"]
+        message_queue.mark_failed.assert_not_awaited()
+
+    async def test_in_flight_finishes_and_unstarted_return(self, message_queue: AsyncMock) -> None:
+        """The message in flight is delivered; the terminal's later ones go back unstarted."""
+        worker = MessageWorker(
+            Settings(DATABASE_URL="sqlite://", OGx_WORKER_CONCURRENCY=1), message_queue
+        )
+        batch = [queued(f"A-{i}", "A") for i in range(3)]
+        message_queue.get_pending_messages.return_value = batch
+        message_queue.mark_in_progress.return_value = True
+        submitting = asyncio.Event()
+
+        async def submit(payload: Dict) -> Dict:
+            submitting.set()
+            await asyncio.sleep(0.01)
+            return {"ErrorID": 0}
+
+        with patch(SUBMIT, side_effect=submit) as submitted:
+            await worker.start()
+            await submitting.wait()
+            assert await worker.drain(timeout=5)
+
+        submitted.assert_awaited_once_with(batch[0].payload)
+        message_queue.mark_delivered.assert_awaited_once_with("A-0")
+        message_queue.return_unsubmitted.assert_awaited_once_with(["A-1", "A-2"])
+        message_queue.mark_failed.assert_not_awaited()
+        assert worker.get_drain_status()["returned_count"] == 2
+        assert message_queue.get_pending_messages.await_count == 1
+
+    async def test_lingering_batch_is_returned(self, message_queue: AsyncMock) -> None:
+        """A batch claimed during the linger is returned rather than submitted."""
+        settings = Settings(
+            DATABASE_URL="sqlite://", OGx_SUBMIT_BATCH_SIZE=3, OGx_SUBMIT_LINGER_MS=200
+        )
+        worker = MessageWorker(settings, message_queue)
+        message_queue.get_pending_messages.side_effect = [[queued("msg-0", "A")], []]
+        message_queue.mark_in_progress_many.side_effect = lambda ids: list(ids)
+
+        async def linger(seconds: float) -> None:
+            worker.draining = True
+
+        worker.running = True
+        with patch(SLEEP, side_effect=linger), patch(SUBMIT_BATCH) as submit:
+            await worker._process_queue()
+
+        submit.assert_not_awaited()
+        message_queue.return_unsubmitted.assert_awaited_once_with(["msg-0"])
+        message_queue.wait_for_messages.assert_not_awaited()
+
+    async def test_deadline_cancels_in_flight(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """Submissions still running at the deadline are cancelled and retried."""
+        message_queue.get_pending_messages.return_value = [queued("A-0", "A")]
+        message_queue.mark_in_progress.return_value = True
+        worker = MessageWorker(settings, message_queue)
+        submitting = asyncio.Event()
+
+        async def submit(payload: Dict) -> Dict:
+            submitting.set()
+            await asyncio.sleep(3600)
+            return {"ErrorID": 0}
+
+        with patch(SUBMIT, side_effect=submit):
+            await worker.start()
+            await submitting.wait()
+            assert not await worker.drain(timeout=0.01)
+
+        message_queue.mark_failed.assert_awaited_once_with("A-0", "Processing cancelled")
+
+    async def test_drained_worker_does_not_restart(
+        self, settings: Settings, message_queue: AsyncMock
+    ) -> None:
+        """A new leader term does not start a drained worker again."""
+        worker = MessageWorker(settings, message_queue)
+        await worker.drain()
+
+        await worker.run(fencing_token=2)
+
+        message_queue.initialize.assert_not_awaited()
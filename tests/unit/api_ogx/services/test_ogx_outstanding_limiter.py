@@ -0,0 +1,206 @@
+"""Unit tests for the per-terminal outstanding message limiter.
+
+Covers the limiter's Redis bookkeeping and how MessageWorker uses it to hold
+messages for saturated terminals instead of submitting them.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import QueuedMessage
+from Protexis_Command.api.protocols.ogx.services.ogx_message_worker import MessageWorker
+from Protexis_Command.api.protocols.ogx.services.ogx_outstanding_limiter import (
+    TerminalOutstandingLimiter,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_status_tracker import (
+    MessageStatusTracker,
+)
+from Protexis_Command.core.settings.app_settings import Settings
+
+TERMINAL = "01008988SKY5909"
+
+
+@pytest.fixture
+def settings() -> Settings:
+    """Create application settings for tests."""
+    return Settings(DATABASE_URL="sqlite://")
+
+
+@pytest.fixture
+def mock_redis() -> AsyncMock:
+    """Create a mock Redis client."""
+    redis = AsyncMock()
+    redis.register_script = MagicMock(side_effect=lambda script: AsyncMock())
+    return redis
+
+
+@pytest.fixture
+def limiter(mock_redis: AsyncMock, settings: Settings) -> TerminalOutstandingLimiter:
+    """Create a limiter bound to the mock Redis client."""
+    return TerminalOutstandingLimiter(mock_redis, settings, limit=2)
+
+
+class TestTerminalOutstandingLimiter:
+    """Test outstanding slot bookkeeping."""
+
+    async def test_acquire_runs_script_for_terminal(
+        self, limiter: TerminalOutstandingLimiter
+    ) -> None:
+        """Acquiring checks and reserves a slot in one script call."""
+        limiter._acquire_script.return_value = 0
+
+        assert await limiter.acquire(TERMINAL, "msg-1") is False
+
+        kwargs = limiter._acquire_script.await_args.kwargs
+        assert kwargs["keys"] == [f"OGx:outstanding:{TERMINAL}"]
+        assert kwargs["args"][0] == 2
+        assert kwargs["args"][2] == limiter.stale_seconds
+        assert kwargs["args"][3] == "msg-1"
+
+    async def test_available_ignores_stale_slots(
+        self, limiter: TerminalOutstandingLimiter, mock_redis: AsyncMock
+    ) -> None:
+        """Only slots newer than the stale age count against the limit."""
+        mock_redis.zcount.return_value = 1
+
+        assert await limiter.available(TERMINAL) == 1
+        key, minimum, maximum = mock_redis.zcount.await_args.args
+        assert key == f"OGx:outstanding:{TERMINAL}"
+        assert maximum == "+inf"
+
+    async def test_final_status_releases_bound_slot(
+        self, limiter: TerminalOutstandingLimiter, mock_redis: AsyncMock
+    ) -> None:
+        """A final state consumes the forward binding and frees the slot."""
+        await limiter.bind(TERMINAL, "msg-1", 1234)
+        mock_redis.set.assert_awaited_once_with(
+            "OGx:outstanding:forward:1234", f"{TERMINAL} msg-1", ex=limiter.stale_seconds
+        )
+        mock_redis.getdel.return_value = f"{TERMINAL} msg-1"
+
+        assert await limiter.handle_status(1234, MessageState.RECEIVED) == TERMINAL
+        mock_redis.zrem.assert_awaited_once_with(f"OGx:outstanding:{TERMINAL}", "msg-1")
+
+    async def test_non_final_status_keeps_slot(
+        self, limiter: TerminalOutstandingLimiter, mock_redis: AsyncMock
+    ) -> None:
+        """Messages still on their way to the terminal keep their slot."""
+        assert await limiter.handle_status(1234, MessageState.SENDING.value) is None
+        mock_redis.getdel.assert_not_awaited()
+        mock_redis.zrem.assert_not_awaited()
+
+    async def test_unknown_forward_id_is_ignored(
+        self, limiter: TerminalOutstandingLimiter, mock_redis: AsyncMock
+    ) -> None:
+        """Repeated or unknown final updates do not release anything."""
+        mock_redis.getdel.return_value = None
+
+        assert await limiter.handle_status(1234, MessageState.TIMED_OUT) is None
+        mock_redis.zrem.assert_not_awaited()
+
+
+class TestWorkerOutstandingLimit:
+    """Test MessageWorker dispatch against the outstanding limit."""
+
+    @pytest.fixture
+    def message_queue(self) -> AsyncMock:
+        """Create a mock message queue."""
+        message_queue = AsyncMock()
+        message_queue.mark_in_progress.return_value = True
+        message_queue.hold_messages.side_effect = lambda terminal_id, messages: [
+            m.message_id for m in messages
+        ]
+        return message_queue
+
+    @pytest.fixture
+    def mock_limiter(self) -> AsyncMock:
+        """Create a limiter mock with one free slot."""
+        mock_limiter = AsyncMock(spec=TerminalOutstandingLimiter)
+        mock_limiter.acquire.side_effect = [True, False]
+        mock_limiter.available.return_value = 0
+        return mock_limiter
+
+    async def run_batch(self, worker: MessageWorker, messages) -> None:
+        """Run the worker loop for a single batch."""
+        worker.message_queue.get_pending_messages.side_effect = [
+            messages,
+            asyncio.CancelledError(),
+        ]
+        worker.running = True
+        with pytest.raises(asyncio.CancelledError):
+            await worker._process_queue()
+
+    async def test_saturated_terminal_messages_are_held(
+        self, settings: Settings, message_queue: AsyncMock, mock_limiter: AsyncMock
+    ) -> None:
+        """Messages beyond the limit are held rather than submitted."""
+        worker = MessageWorker(
+            settings,
+            message_queue,
+            mock_limiter,
+            status_tracker=AsyncMock(spec=MessageStatusTracker),
+        )
+        messages = [
+            QueuedMessage(message_id=f"msg-{i}", payload={"DestinationID": TERMINAL})
+            for i in range(2)
+        ]
+
+        with patch(
+            "Protexis_Command.api.protocols.ogx.services.ogx_message_worker.submit_OGx_message",
+            AsyncMock(return_value={"ErrorID": 0, "MessageID": 1234}),
+        ) as submit:
+            await self.run_batch(worker, messages)
+
+        submit.assert_awaited_once()
+        mock_limiter.bind.assert_awaited_once_with(TERMINAL, "msg-0", 1234)
+        mock_limiter.release.assert_not_awaited()
+        message_queue.hold_messages.assert_awaited_once_with(TERMINAL, [messages[1]])
+        message_queue.release_held.assert_not_awaited()
+        assert worker.held_count == 1
+
+    async def test_untracked_submission_frees_slot(
+        self, settings: Settings, message_queue: AsyncMock, mock_limiter: AsyncMock
+    ) -> None:
+        """Without a status tracker no final status is seen, so no slot stays outstanding."""
+        worker = MessageWorker(settings, message_queue, mock_limiter)
+        message = QueuedMessage(message_id="msg-0", payload={"DestinationID": TERMINAL})
+
+        with patch(
+            "Protexis_Command.api.protocols.ogx.services.ogx_message_worker.submit_OGx_message",
+            AsyncMock(return_value={"ErrorID": 0, "MessageID": 1234}),
+        ):
+            await self.run_batch(worker, [message])
+
+        mock_limiter.bind.assert_not_awaited()
+        mock_limiter.release.assert_awaited_once_with(TERMINAL, "msg-0")
+        message_queue.mark_delivered.assert_awaited_once_with("msg-0")
+
+    async def test_rejected_submission_frees_slot(
+        self, settings: Settings, message_queue: AsyncMock, mock_limiter: AsyncMock
+    ) -> None:
+        """Submissions OGx does not accept do not stay outstanding."""
+        worker = MessageWorker(settings, message_queue, mock_limiter)
+        message = QueuedMessage(message_id="msg-0", payload={"DestinationID": TERMINAL})
+
+        with patch(
+            "Protexis_Command.api.protocols.ogx.services.ogx_message_worker.submit_OGx_message",
+            AsyncMock(return_value={"ErrorID": 500, "ErrorMessage": "boom"}),
+        ):
+            await self.run_batch(worker, [message])
+
+        mock_limiter.release.assert_awaited_once_with(TERMINAL, "msg-0")
+        message_queue.mark_failed.assert_awaited_once_with("msg-0", "boom")
+
+    async def test_status_update_releases_held_messages(
+        self, settings: Settings, message_queue: AsyncMock, mock_limiter: AsyncMock
+    ) -> None:
+        """A final status returns held messages for the freed slots."""
+        worker = MessageWorker(settings, message_queue, mock_limiter)
+        mock_limiter.handle_status.return_value = TERMINAL
+        mock_limiter.available.return_value = 1
+
+        assert await worker.handle_status_update(1234, MessageState.RECEIVED) is True
+        message_queue.release_held.assert_awaited_once_with(TERMINAL, 1)
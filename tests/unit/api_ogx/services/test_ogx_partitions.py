@@ -0,0 +1,362 @@
+"""Unit tests for the partitioned outbound queue and worker pool."""
+
+import asyncio
+import time
+from typing import Dict, List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from redis.exceptions import RedisError
+
+from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.models.messages import MessagePriority
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import (
+    LANES,
+    OGxMessageQueue,
+    QueueDepths,
+    QueuedMessage,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_partitions import (
+    PartitionedMessageQueue,
+    partition_for,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_queue_factory import create_message_queue
+from Protexis_Command.api.protocols.ogx.services.ogx_stream_queue import OGxStreamMessageQueue
+from Protexis_Command.api.protocols.ogx.services.ogx_worker_pool import (
+    MEMBERS_KEY,
+    PartitionedWorkerPool,
+    fair_share,
+)
+from Protexis_Command.core.settings.app_settings import Settings
+
+POOL = "Protexis_Command.api.protocols.ogx.services.ogx_worker_pool"
+
+
+def terminal_in(partition: int, partitions: int) -> str:
+    """Find a terminal ID that hashes to a partition."""
+    return next(f"T{i}" for i in range(1000) if partition_for(f"T{i}", partitions) == partition)
+
+
+@pytest.fixture
+def settings() -> Settings:
+    """Create application settings for tests."""
+    return Settings(DATABASE_URL="sqlite://", OGx_QUEUE_PARTITIONS=2)
+
+
+@pytest.fixture
+def mock_redis() -> AsyncMock:
+    """Create a mock Redis client."""
+    redis = AsyncMock()
+    redis.register_script = MagicMock(side_effect=lambda script: AsyncMock())
+    return redis
+
+
+@pytest.fixture
+def partitions(mock_redis: AsyncMock) -> List[AsyncMock]:
+    """Create two mock partition queues."""
+    queues = []
+    for index in range(2):
+        queue = AsyncMock(partition=index, redis=mock_redis, ready_channel=f"ready:{index}")
+        queue.max_batch_size = 10
+        queue.max_submit_size = 100
+        queues.append(queue)
+    return queues
+
+
+@pytest.fixture
+def queue(partitions: List[AsyncMock], settings: Settings) -> PartitionedMessageQueue:
+    """Create a partitioned queue over the mock partitions."""
+    return PartitionedMessageQueue(partitions, settings)
+
+
+class TestPartitionKeys:
+    """Test terminal hashing and partition key layout."""
+
+    def test_partition_for_is_stable(self) -> None:
+        """A terminal always maps to the same partition within range."""
+        assert partition_for("01008988SKY5909", 8) == partition_for("01008988SKY5909", 8)
+        assert {partition_for(f"T{i}", 8) for i in range(200)} == set(range(8))
+        assert partition_for("01008988SKY5909", 1) == 0
+
+    def test_partition_zero_keeps_unpartitioned_keys(
+        self, mock_redis: AsyncMock, settings: Settings
+    ) -> None:
+        """Partition 0 uses the existing keys; other partitions get their own prefix."""
+        plain = OGxMessageQueue(mock_redis, settings)
+        first = OGxMessageQueue(mock_redis, settings, 0)
+        second = OGxMessageQueue(mock_redis, settings, 1)
+
+        assert first.pending_queue == plain.pending_queue == "OGx:messages:pending"
+        assert first.ready_channel == "OGx:messages:ready"
+        assert second.pending_queue == "OGx:messages:p1:pending"
+        assert second.pending_indexes[MessagePriority.HIGH] == "OGx:messages:p1:pending:index:high"
+        assert second.expiry_index == "OGx:messages:p1:expiry"
+        assert second.ready_channel == "OGx:messages:p1:ready"
+        assert second.metadata_prefix == plain.metadata_prefix
+
+    def test_stream_partition_keys(self, mock_redis: AsyncMock, settings: Settings) -> None:
+        """Stream partitions keep their streams under the partition prefix."""
+        second = OGxStreamMessageQueue(mock_redis, settings, 1)
+
+        assert second.streams[MessagePriority.NORMAL] == "OGx:messages:p1:stream"
+        assert second.dead_letter_queue == "OGx:messages:p1:dead_letter"
+
+    def test_factory_creates_partitions(self, mock_redis: AsyncMock, settings: Settings) -> None:
+        """Above one partition the factory returns a partitioned queue."""
+        queue = create_message_queue(mock_redis, settings)
+
+        assert isinstance(queue, PartitionedMessageQueue)
+        assert [p.partition for p in queue.partitions] == [0, 1]
+        assert create_message_queue(mock_redis, settings, 1).partition == 1
+
+    def test_factory_rejects_zero_partitions(self, mock_redis: AsyncMock) -> None:
+        """OGx_QUEUE_PARTITIONS must be positive."""
+        settings = Settings(DATABASE_URL="sqlite://", OGx_QUEUE_PARTITIONS=0)
+
+        with pytest.raises(ValueError, match="OGx_QUEUE_PARTITIONS"):
+            create_message_queue(mock_redis, settings)
+
+
+class TestPartitionedMessageQueue:
+    """Test routing between partitions."""
+
+    async def test_enqueue_routes_by_terminal(
+        self, queue: PartitionedMessageQueue, partitions: List[AsyncMock]
+    ) -> None:
+        """Each message is enqueued in its terminal's partition, statuses in batch order."""
+        first, second = terminal_in(0, 2), terminal_in(1, 2)
+        partitions[0].enqueue_many.return_value = {"m1": "accepted", "m3": "duplicate"}
+        partitions[1].enqueue_many.return_value = {"m2": "queue_full"}
+        messages = [
+            ("m1", {"DestinationID": first}),
+            ("m2", {"DestinationID": second}),
+            ("m3", {"DestinationID": first}),
+        ]
+
+        statuses = await queue.enqueue_many(messages, MessagePriority.HIGH)
+
+        assert list(statuses.items()) == [
+            ("m1", "accepted"),
+            ("m2", "queue_full"),
+            ("m3", "duplicate"),
+        ]
+        partitions[0].enqueue_many.assert_awaited_once_with(
+            [messages[0], messages[2]], MessagePriority.HIGH
+        )
+        partitions[1].enqueue_many.assert_awaited_once_with([messages[1]], MessagePriority.HIGH)
+
+    async def test_fetch_rotates_and_completes_in_owner(
+        self, queue: PartitionedMessageQueue, partitions: List[AsyncMock]
+    ) -> None:
+        """Batches are filled from each partition in turn and completed where fetched."""
+        partitions[0].get_pending_messages.return_value = [QueuedMessage("m1", {})]
+        partitions[1].get_pending_messages.return_value = [QueuedMessage("m2", {})]
+        partitions[0].mark_in_progress_many.return_value = ["m1"]
+        partitions[1].mark_in_progress_many.return_value = []
+
+        messages = await queue.get_pending_messages(batch_size=5)
+        assert [m.message_id for m in messages] == ["m1", "m2"]
+        partitions[1].get_pending_messages.assert_awaited_once_with(batch_size=4)
+
+        assert await queue.mark_in_progress_many(["m1", "m2"]) == ["m1"]
+        await queue.mark_delivered_many(["m1", "m2"])
+        partitions[0].mark_delivered_many.assert_awaited_once_with(["m1"])
+        # m2 was claimed elsewhere, so it is no longer completed through this queue
+        partitions[1].mark_delivered_many.assert_not_awaited()
+
+        # The next fetch starts from the second partition
+        partitions[1].get_pending_messages.return_value = [QueuedMessage("m3", {})] * 5
+        await queue.get_pending_messages(batch_size=5)
+        partitions[0].get_pending_messages.assert_awaited_once()
+
+    async def test_return_unsubmitted_in_owner(
+        self, queue: PartitionedMessageQueue, partitions: List[AsyncMock]
+    ) -> None:
+        """Unsubmitted messages are returned to the partition they were fetched from."""
+        partitions[0].get_pending_messages.return_value = [QueuedMessage("m1", {})]
+        partitions[1].get_pending_messages.return_value = [QueuedMessage("m2", {})]
+        partitions[1].return_unsubmitted.return_value = ["m2"]
+        await queue.get_pending_messages(batch_size=5)
+
+        assert await queue.return_unsubmitted(["m2"]) == ["m2"]
+        partitions[1].return_unsubmitted.assert_awaited_once_with(["m2"])
+        partitions[0].return_unsubmitted.assert_not_awaited()
+
+        # Returned messages are no longer completed through this queue
+        await queue.mark_delivered_many(["m2"])
+        partitions[1].mark_delivered_many.assert_not_awaited()
+
+    async def test_depths_are_summed(
+        self, queue: PartitionedMessageQueue, partitions: List[AsyncMock]
+    ) -> None:
+        """Counts add up across partitions and backlog age is the oldest of any."""
+        partitions[0].get_queue_depths.return_value = QueueDepths(
+            lanes={lane: 1 for lane in LANES}, oldest_ages={lane: 5.0 for lane in LANES}, held=1
+        )
+        partitions[1].get_queue_depths.return_value = QueueDepths(
+            lanes={lane: 2 for lane in LANES}, oldest_ages={lane: 9.0 for lane in LANES}, held=2
+        )
+
+        depths = await queue.get_queue_depths()
+
+        assert depths.lanes == {lane: 3 for lane in LANES}
+        assert depths.oldest_ages == {lane: 9.0 for lane in LANES}
+        assert depths.held == 3
+
+    async def test_state_from_any_partition(
+        self, queue: PartitionedMessageQueue, partitions: List[AsyncMock]
+    ) -> None:
+        """A message's state comes from the partition that knows it."""
+        partitions[0].get_message_state.return_value = None
+        partitions[1].get_message_state.return_value = MessageState.RECEIVED
+
+        assert await queue.get_message_state("m1") == MessageState.RECEIVED
+
+    async def test_replay_finds_owning_partition(
+        self, queue: PartitionedMessageQueue, partitions: List[AsyncMock]
+    ) -> None:
+        """Dead letters are replayed from whichever partition holds them."""
+        partitions[0].replay_dead_letters.return_value = {"m1": "missing", "m2": "accepted"}
+        partitions[1].replay_dead_letters.return_value = {"m1": "accepted", "m3": "missing"}
+        statuses = await queue.replay_dead_letters(["m1", "m2", "m3"])
+
+        assert statuses == {"m1": "accepted", "m2": "accepted", "m3": "missing"}
+        partitions[1].replay_dead_letters.assert_awaited_with(["m1", "m3"])
+
+    async def test_release_held_in_terminal_partition(
+        self, queue: PartitionedMessageQueue, partitions: List[AsyncMock]
+    ) -> None:
+        """Held messages are released in the terminal's partition."""
+        terminal = terminal_in(1, 2)
+        partitions[1].release_held.return_value = 2
+
+        assert await queue.release_held(terminal, 2) == 2
+        partitions[0].release_held.assert_not_awaited()
+
+    async def test_waits_on_every_partition(
+        self, queue: PartitionedMessageQueue, mock_redis: AsyncMock
+    ) -> None:
+        """Idle waits listen on every partition's ready channel."""
+        subscription = AsyncMock()
+        mock_redis.pubsub = MagicMock(return_value=subscription)
+
+        assert await queue.wait_for_messages(1.0)
+        subscription.subscribe.assert_awaited_once_with("ready:0", "ready:1")
+
+
+class TestPartitionedWorkerPool:
+    """Test sharing partitions between pools."""
+
+    @pytest.fixture
+    def pool(self, settings: Settings, queue: PartitionedMessageQueue) -> PartitionedWorkerPool:
+        """Create a pool whose workers do not touch Redis."""
+        pool = PartitionedWorkerPool(settings, queue)
+        pool.offset = 0
+        return pool
+
+    def lease_tokens(self, pool: PartitionedWorkerPool, tokens: Dict[int, object]) -> None:
+        """Make each partition's lease yield a token (None if held elsewhere)."""
+        for partition, lease in enumerate(pool.leases):
+            lease._acquire_script.return_value = tokens.get(partition)
+            lease._release_script.return_value = 1
+
+    def test_fair_share(self) -> None:
+        """Partitions are split as evenly as possible, rounding up."""
+        assert fair_share(8, 3) == 3
+        assert fair_share(8, 0) == 8
+        assert fair_share(2, 4) == 1
+
+    async def test_takes_free_partitions_up_to_share(self, pool: PartitionedWorkerPool) -> None:
+        """A pool alone in the membership set takes every free partition."""
+        pool._heartbeat_script.return_value = 1
+        self.lease_tokens(pool, {0: 4, 1: 9})
+
+        with patch(f"{POOL}.MessageWorker") as worker_class:
+            worker_class.side_effect = lambda *args: AsyncMock(
+                fencing_token=None, current_task=None
+            )
+            await pool.rebalance()
+
+        assert sorted(pool.workers) == [0, 1]
+        assert pool.workers[1].fencing_token == 9
+        assert pool.workers[1].is_current == pool.leases[1].is_current
+        pool.workers[0].start.assert_awaited_once()
+        assert pool._heartbeat_script.await_args.kwargs["keys"] == [MEMBERS_KEY]
+
+    async def test_releases_surplus_when_members_join(self, pool: PartitionedWorkerPool) -> None:
+        """A pool above its fair share hands the surplus to the newcomers."""
+        pool._heartbeat_script.return_value = 2
+        self.lease_tokens(pool, {0: 4, 1: 9})
+        workers = {
+            0: AsyncMock(fencing_token=4, current_task=None),
+            1: AsyncMock(fencing_token=9, current_task=None),
+        }
+        pool.workers = dict(workers)
+
+        await pool.rebalance()
+        assert sorted(pool.workers) == [0]
+        assert pool.draining_workers == {1: workers[1]}
+        await asyncio.gather(*pool._releases)
+
+        workers[1].drain.assert_awaited_once()
+        assert not pool.draining_workers
+        pool.leases[1]._release_script.assert_awaited_once()
+
+    async def test_stops_worker_of_lapsed_lease(self, pool: PartitionedWorkerPool) -> None:
+        """A worker whose lease passed to another pool is stopped."""
+        pool._heartbeat_script.return_value = 2
+        self.lease_tokens(pool, {0: None, 1: None})
+        worker = AsyncMock(fencing_token=4, current_task=None)
+        pool.workers = {0: worker}
+
+        await pool.rebalance()
+
+        assert not pool.workers
+        worker.stop.assert_awaited_once()
+        pool.leases[0]._release_script.assert_not_awaited()
+
+    async def test_failed_rebalance_keeps_workers_until_expiry(
+        self, pool: PartitionedWorkerPool
+    ) -> None:
+        """Workers keep running through failed rounds until their leases would expire."""
+        worker = AsyncMock(fencing_token=4, current_task=None)
+        pool.workers = {0: worker}
+        pool.rebalance_interval = 0.01
+        pool.leases_expire_at = time.monotonic() + 0.05
+
+        with patch.object(pool, "rebalance", AsyncMock(side_effect=RedisError("down"))):
+            loop = asyncio.create_task(pool._rebalance_loop())
+            await asyncio.sleep(0.02)
+            assert pool.workers == {0: worker}
+            await asyncio.sleep(0.06)
+            loop.cancel()
+
+        assert not pool.workers
+        worker.stop.assert_awaited_once()
+
+    async def test_stop_leaves_pool(
+        self, pool: PartitionedWorkerPool, mock_redis: AsyncMock
+    ) -> None:
+        """Stopping drains and releases every partition, then leaves the membership."""
+        self.lease_tokens(pool, {})
+        worker = AsyncMock(fencing_token=4, current_task=None)
+        pool.workers = {1: worker}
+
+        await pool.stop()
+
+        worker.drain.assert_awaited_once()
+        assert pool.draining and not pool.workers
+        pool.leases[1]._release_script.assert_awaited_once()
+        mock_redis.zrem.assert_awaited_once_with(MEMBERS_KEY, pool.holder)
+
+    async def test_status_update_releases_in_partition(
+        self, pool: PartitionedWorkerPool, partitions: List[AsyncMock]
+    ) -> None:
+        """A freed slot releases held messages in the terminal's partition."""
+        terminal = terminal_in(1, 2)
+        pool.limiter = AsyncMock()
+        pool.limiter.handle_status.return_value = terminal
+        pool.limiter.available.return_value = 1
+
+        assert await pool.handle_status_update(1234, MessageState.RECEIVED)
+        partitions[1].release_held.assert_awaited_once_with(terminal, 1)
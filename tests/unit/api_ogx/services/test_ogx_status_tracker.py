@@ -0,0 +1,334 @@
+"""Unit tests for batched forward message status tracking.
+
+Covers how the tracker chunks fw_statuses polls, applies their results and
+answers status checks from its local copy, and how MessageWorker hands it the
+forward IDs of accepted submissions.
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import QueuedMessage
+from Protexis_Command.api.protocols.ogx.services.ogx_message_worker import MessageWorker
+from Protexis_Command.api.protocols.ogx.services.ogx_status_tracker import (
+    MessageStatusTracker,
+    is_final,
+)
+from Protexis_Command.core.settings.app_settings import Settings
+from Protexis_Command.protocols.ogx.validation.ogx_validation_exceptions import (
+    OGxProtocolError,
+)
+
+TERMINAL = "01008988SKY5909"
+
+
+def statuses(ids: List[int], state: MessageState = MessageState.SENDING) -> Dict:
+    """Build a fw_statuses response reporting the same state for every ID."""
+    return {
+        "ErrorID": 0,
+        "Statuses": [
+            {"ID": i, "State": state.value, "IsClosed": state != MessageState.SENDING} for i in ids
+        ],
+    }
+
+
+@pytest.fixture
+def settings() -> Settings:
+    """Create application settings for tests."""
+    return Settings(DATABASE_URL="sqlite://", OGx_STATUS_LOOKUP_LINGER_MS=10)
+
+
+def shared(record: Dict, age: float = 0) -> str:
+    """Build a shared copy entry for a record fetched age seconds ago."""
+    return json.dumps({"record": record, "fetched_at": time.time() - age})
+
+
+@pytest.fixture
+def mock_pipeline() -> MagicMock:
+    """Create a mock Redis pipeline usable as an async context manager."""
+    pipe = MagicMock()
+    pipe.__aenter__ = AsyncMock(return_value=pipe)
+    pipe.__aexit__ = AsyncMock(return_value=None)
+    pipe.execute = AsyncMock(return_value=[])
+    return pipe
+
+
+@pytest.fixture
+def mock_redis(mock_pipeline: MagicMock) -> AsyncMock:
+    """Create a mock Redis client with an empty pending set and shared copy."""
+    redis = AsyncMock()
+    redis.smembers.return_value = set()
+    redis.mget.side_effect = lambda keys: [None] * len(keys)
+    redis.pipeline = MagicMock(return_value=mock_pipeline)
+    return redis
+
+
+@pytest.fixture
+def mock_client() -> AsyncMock:
+    """Create a mock OGx client echoing each requested ID as sending."""
+    client = AsyncMock()
+    client.get_message_status.side_effect = lambda ids: statuses(ids)
+    return client
+
+
+@pytest.fixture
+def state_store() -> AsyncMock:
+    """Create a mock state store."""
+    return AsyncMock()
+
+
+@pytest.fixture
+def tracker(
+    mock_client: AsyncMock, mock_redis: AsyncMock, settings: Settings, state_store: AsyncMock
+) -> MessageStatusTracker:
+    """Create a tracker with a final status callback."""
+    return MessageStatusTracker(
+        mock_client, mock_redis, settings, state_store, on_final=AsyncMock()
+    )
+
+
+class TestIsFinal:
+    """Test which status records stop being polled."""
+
+    def test_open_state_is_not_final(self) -> None:
+        """Accepted and sending messages are still polled."""
+        assert not is_final({"ID": 1, "State": 8, "IsClosed": False})
+
+    def test_closed_or_final_state_is_final(self) -> None:
+        """A closed message, or one in a final state, is not polled again."""
+        assert is_final({"ID": 1, "State": 0, "IsClosed": True})
+        assert is_final({"ID": 1, "State": 1})
+
+    def test_error_record_is_final(self) -> None:
+        """An ID OGx could not look up is not polled forever."""
+        assert is_final({"ID": 1, "ErrorID": 14})
+
+
+class TestPoll:
+    """Test polling the pending set."""
+
+    async def test_pending_ids_are_polled_in_chunks(
+        self, tracker: MessageStatusTracker, mock_client: AsyncMock, mock_redis: AsyncMock
+    ) -> None:
+        """250 pending messages take three calls of at most 100 IDs."""
+        mock_redis.smembers.return_value = {str(i) for i in range(1, 251)}
+
+        assert await tracker.poll() == 250
+
+        sizes = [len(call.args[0]) for call in mock_client.get_message_status.await_args_list]
+        assert sizes == [100, 100, 50]
+        assert tracker.request_count == 3
+
+    async def test_changed_states_are_stored_in_bulk(
+        self, tracker: MessageStatusTracker, mock_redis: AsyncMock, state_store: AsyncMock
+    ) -> None:
+        """Each chunk is one bulk store update, and unchanged states are not rewritten."""
+        mock_redis.smembers.return_value = {"1", "2"}
+
+        await tracker.poll()
+        state_store.update_states.assert_awaited_once()
+        updates = state_store.update_states.await_args.args[0]
+        assert {i: state for i, (state, _) in updates.items()} == {
+            1: MessageState.SENDING,
+            2: MessageState.SENDING,
+        }
+
+        state_store.update_states.reset_mock()
+        await tracker.poll()
+        state_store.update_states.assert_not_awaited()
+
+    async def test_polled_records_are_shared(
+        self, tracker: MessageStatusTracker, mock_client: AsyncMock, mock_redis: AsyncMock
+    ) -> None:
+        """Every process sees polled records; final ones are kept longer."""
+        mock_redis.smembers.return_value = {"1", "2"}
+        mock_client.get_message_status.side_effect = None
+        mock_client.get_message_status.return_value = {
+            "ErrorID": 0,
+            "Statuses": [
+                {"ID": 1, "State": 1, "IsClosed": True},
+                {"ID": 2, "State": 8, "IsClosed": False},
+            ],
+        }
+
+        await tracker.poll()
+
+        pipe = mock_redis.pipeline.return_value
+        writes = {
+            c.args[0]: (json.loads(c.args[1]), c.kwargs["ex"]) for c in pipe.set.call_args_list
+        }
+        assert writes["OGx:status:record:1"][0]["record"]["State"] == 1
+        assert writes["OGx:status:record:1"][1] == tracker.final_record_ttl
+        assert writes["OGx:status:record:2"][1] == 2 * tracker.poll_interval
+
+    async def test_final_states_leave_the_pending_set(
+        self, tracker: MessageStatusTracker, mock_client: AsyncMock, mock_redis: AsyncMock
+    ) -> None:
+        """Final messages stop being polled and are reported to the callback."""
+        mock_redis.smembers.return_value = {"1", "2"}
+        mock_client.get_message_status.side_effect = None
+        mock_client.get_message_status.return_value = {
+            "ErrorID": 0,
+            "Statuses": [
+                {"ID": 1, "State": 1, "IsClosed": True},
+                {"ID": 2, "State": 8, "IsClosed": False},
+            ],
+        }
+
+        await tracker.poll()
+
+        mock_redis.srem.assert_awaited_once_with("OGx:status:pending", 1)
+        tracker.on_final.assert_awaited_once_with(1, MessageState.RECEIVED)
+
+    async def test_failed_round_resumes_where_it_stopped(
+        self, tracker: MessageStatusTracker, mock_client: AsyncMock, mock_redis: AsyncMock
+    ) -> None:
+        """A round cut short by the throttle resumes with the IDs it did not reach."""
+        mock_redis.smembers.return_value = {str(i) for i in range(1, 151)}
+        mock_client.get_message_status.side_effect = [
+            statuses(list(range(1, 101))),
+            OGxProtocolError("Rate limit exceeded"),
+        ]
+
+        assert await tracker.poll() == 100
+
+        mock_client.get_message_status.side_effect = lambda ids: statuses(ids)
+        await tracker.poll()
+        resumed = mock_client.get_message_status.await_args_list[2].args[0]
+        assert resumed == list(range(101, 151)) + list(range(1, 51))
+
+
+class TestGetStatus:
+    """Test status checks."""
+
+    async def test_concurrent_checks_share_one_call(
+        self, tracker: MessageStatusTracker, mock_client: AsyncMock, mock_redis: AsyncMock
+    ) -> None:
+        """Checks made within the linger time are answered by one call."""
+        results = await asyncio.gather(*(tracker.get_status(i) for i in (1, 2, 3, 2)))
+
+        assert [r["ID"] for r in results] == [1, 2, 3, 2]
+        mock_client.get_message_status.assert_awaited_once()
+        assert sorted(mock_client.get_message_status.await_args.args[0]) == [1, 2, 3]
+        # Open messages are polled from then on
+        mock_redis.sadd.assert_awaited_once_with("OGx:status:pending", 1, 2, 3)
+
+    async def test_local_copy_answers_recent_and_final_statuses(
+        self, tracker: MessageStatusTracker, mock_client: AsyncMock
+    ) -> None:
+        """Final statuses, and ones fetched within the poll interval, need no call."""
+        await tracker.get_status(1)
+        await tracker.get_status(1)
+        mock_client.get_message_status.assert_awaited_once()
+
+        tracker.poll_interval = 0
+        await tracker.get_status(1)
+        assert mock_client.get_message_status.await_count == 2
+
+        mock_client.get_message_status.side_effect = lambda ids: statuses(
+            ids, MessageState.RECEIVED
+        )
+        await tracker.get_status(1)
+        await tracker.get_status(1)
+        assert mock_client.get_message_status.await_count == 3
+
+    async def test_shared_copy_answers_before_ogx(
+        self, tracker: MessageStatusTracker, mock_client: AsyncMock, mock_redis: AsyncMock
+    ) -> None:
+        """Records another process fetched are used; only the rest are fetched from OGx."""
+        mock_redis.mget.side_effect = lambda keys: [
+            shared({"ID": 1, "State": 8, "IsClosed": False}, age=5),
+            None,
+        ]
+
+        results = await asyncio.gather(tracker.get_status(1), tracker.get_status(2))
+
+        assert [r["ID"] for r in results] == [1, 2]
+        mock_redis.mget.assert_awaited_once_with(["OGx:status:record:1", "OGx:status:record:2"])
+        mock_client.get_message_status.assert_awaited_once_with([2])
+        # The shared record is kept locally with its age
+        assert time.monotonic() - tracker._statuses[1][1] >= 5
+
+    async def test_shared_copy_alone_needs_no_call(
+        self, tracker: MessageStatusTracker, mock_client: AsyncMock, mock_redis: AsyncMock
+    ) -> None:
+        """A process that does not poll answers from the poller's records."""
+        mock_redis.mget.side_effect = lambda keys: [shared({"ID": 1, "State": 1, "IsClosed": True})]
+
+        assert (await tracker.get_status(1))["State"] == 1
+        await tracker.get_status(1)
+
+        mock_client.get_message_status.assert_not_awaited()
+        mock_redis.mget.assert_awaited_once()
+
+    async def test_unknown_message_returns_none(
+        self, tracker: MessageStatusTracker, mock_client: AsyncMock
+    ) -> None:
+        """A message OGx returned no record for has no status."""
+        mock_client.get_message_status.side_effect = None
+        mock_client.get_message_status.return_value = {"ErrorID": 0, "Statuses": []}
+
+        assert await tracker.get_status(1) is None
+
+    async def test_failed_call_fails_every_check(
+        self, tracker: MessageStatusTracker, mock_client: AsyncMock
+    ) -> None:
+        """Every check sharing a failed call gets its error."""
+        mock_client.get_message_status.side_effect = OGxProtocolError("API error")
+
+        results = await asyncio.gather(
+            tracker.get_status(1), tracker.get_status(2), return_exceptions=True
+        )
+
+        assert all(isinstance(r, OGxProtocolError) for r in results)
+        mock_client.get_message_status.assert_awaited_once()
+
+    async def test_local_copy_is_bounded(self, tracker: MessageStatusTracker) -> None:
+        """The oldest statuses are dropped beyond max_entries."""
+        tracker.max_entries = 2
+
+        await asyncio.gather(*(tracker.get_status(i) for i in (1, 2, 3)))
+
+        assert list(tracker._statuses) == [2, 3]
+
+
+class TestWorkerTracking:
+    """Test that MessageWorker hands accepted messages to the tracker."""
+
+    async def test_accepted_submissions_are_tracked(self, settings: Settings) -> None:
+        """Forward IDs of accepted messages are tracked; rejected ones are not."""
+        status_tracker = AsyncMock(spec=MessageStatusTracker)
+        worker = MessageWorker(settings, AsyncMock(), status_tracker=status_tracker)
+        messages = [
+            QueuedMessage(message_id=f"msg-{i}", payload={"DestinationID": TERMINAL})
+            for i in range(2)
+        ]
+
+        await worker._apply_submissions(
+            messages,
+            [{"ErrorID": 0, "ForwardMessageID": 1234}, {"ErrorID": 14}],
+        )
+
+        status_tracker.track.assert_awaited_once_with([1234])
+
+    async def test_single_submission_is_tracked(self, settings: Settings) -> None:
+        """The forward ID of a message submitted on its own is tracked."""
+        status_tracker = AsyncMock(spec=MessageStatusTracker)
+        message_queue = AsyncMock()
+        message_queue.mark_in_progress.return_value = True
+        worker = MessageWorker(settings, message_queue, status_tracker=status_tracker)
+        message = QueuedMessage(message_id="msg-0", payload={"DestinationID": TERMINAL})
+
+        with patch(
+            "Protexis_Command.api.protocols.ogx.services.ogx_message_worker.submit_OGx_message",
+            AsyncMock(return_value={"ErrorID": 0, "MessageID": 1234}),
+        ):
+            await worker._dispatch(TERMINAL, message)
+
+        status_tracker.track.assert_awaited_once_with([1234])
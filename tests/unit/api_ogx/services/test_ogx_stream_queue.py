@@ -0,0 +1,500 @@
+"""Unit tests for the Redis Streams message queue backend and queue factory."""
+
+import time
+from typing import List
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import ResponseError
+
+from Protexis_Command.api.config import MessageState
+from Protexis_Command.api.protocols.ogx.models.messages import MessagePriority
+from Protexis_Command.api.protocols.ogx.services.ogx_idempotency import idempotency_key
+from Protexis_Command.api.protocols.ogx.services.ogx_message_queue import (
+    LANES,
+    OGxMessageQueue,
+    QueuedMessage,
+)
+from Protexis_Command.api.protocols.ogx.services.ogx_queue_factory import create_message_queue
+from Protexis_Command.api.protocols.ogx.services.ogx_stream_queue import OGxStreamMessageQueue
+from Protexis_Command.core.settings.app_settings import Settings
+
+NORMAL = MessagePriority.NORMAL
+NO_RECLAIM = [["0-0", [], []]] * len(LANES)
+
+
+def stream_entry(
+    entry_id: str,
+    message_id: str,
+    retry_count: int = 0,
+    priority: MessagePriority = MessagePriority.NORMAL,
+):
+    """Build a stream entry as returned by XREADGROUP."""
+    message = QueuedMessage(
+        message_id=message_id, payload={"Fields": []}, retry_count=retry_count, priority=priority
+    )
+    return entry_id, {"message_id": message_id, "entry": message.encode()}
+
+
+def track(
+    queue: OGxStreamMessageQueue, *entries, lane: MessagePriority = NORMAL
+) -> List[QueuedMessage]:
+    """Record entries as read by the queue's consumer."""
+    stream = queue.streams[lane]
+    return queue._track_entries([(stream, entry_id, fields) for entry_id, fields in entries])
+
+
+@pytest.fixture
+def stream_settings() -> Settings:
+    """Settings selecting the stream backend."""
+    return Settings(
+        DATABASE_URL="sqlite://",
+        OGx_QUEUE_BACKEND="stream",
+        OGx_QUEUE_CONSUMER_NAME="worker-1",
+    )
+
+
+@pytest.fixture
+def mock_pipeline() -> MagicMock:
+    """Create a mock Redis pipeline usable as an async context manager."""
+    pipe = MagicMock()
+    pipe.__aenter__ = AsyncMock(return_value=pipe)
+    pipe.__aexit__ = AsyncMock(return_value=None)
+    for command in (
+        "hset",
+        "hdel",
+        "zadd",
+        "zrem",
+        "xadd",
+        "xack",
+        "xdel",
+        "xlen",
+        "xtrim",
+        "xautoclaim",
+        "xclaim",
+        "xreadgroup",
+        "hexists",
+        "zscore",
+        "hlen",
+        "xinfo_groups",
+        "xrange",
+        "xpending_range",
+    ):
+        setattr(pipe, command, AsyncMock())
+    pipe.execute = AsyncMock(return_value=[])
+    return pipe
+
+
+@pytest.fixture
+def mock_redis(mock_pipeline: MagicMock) -> AsyncMock:
+    """Create a mock Redis client with no idle messages to reclaim."""
+    redis = AsyncMock()
+    redis.pipeline = MagicMock(return_value=mock_pipeline)
+    redis.register_script = MagicMock(side_effect=lambda script: AsyncMock())
+    return redis
+
+
+@pytest.fixture
+def queue(mock_redis: AsyncMock, stream_settings: Settings) -> OGxStreamMessageQueue:
+    """Create a stream queue bound to the mock Redis client."""
+    queue = OGxStreamMessageQueue(mock_redis, stream_settings)
+    queue._promote_script.return_value = 0
+    return queue
+
+
+class TestStreamQueue:
+    """Test consumer group reads and acknowledgements."""
+
+    async def test_initialize_ignores_existing_group(
+        self, queue: OGxStreamMessageQueue, mock_redis: AsyncMock
+    ) -> None:
+        """An existing consumer group is not an error."""
+        mock_redis.xgroup_create.side_effect = ResponseError(
+            "BUSYGROUP Consumer Group name already exists"
+        )
+
+        await queue.initialize()
+
+        assert mock_redis.xgroup_create.await_count == len(LANES)
+        mock_redis.xgroup_create.assert_any_await(
+            queue.streams[MessagePriority.HIGH], queue.group, id="0", mkstream=True
+        )
+
+    async def test_enqueue_many_appends_batch(self, queue: OGxStreamMessageQueue) -> None:
+        """A batch is appended by one script call with the capacity limit."""
+        queue._enqueue_script.return_value = ["msg-1", "accepted", "msg-2", "queue_full"]
+
+        statuses = await queue.enqueue_many([("msg-1", {}), ("msg-2", {})])
+
+        assert statuses == {"msg-1": "accepted", "msg-2": "queue_full"}
+        kwargs = queue._enqueue_script.await_args.kwargs
+        assert kwargs["keys"][:2] == [queue.streams[NORMAL], queue.expiry_index]
+        assert kwargs["keys"][2] == queue.held_queue
+        assert kwargs["keys"][3:9] == [
+            key for lane in LANES for key in (queue.streams[lane], queue.scheduled_indexes[lane])
+        ]
+        assert kwargs["keys"][9:] == [idempotency_key(queue.settings.CUSTOMER_ID, {})] * 2
+        assert kwargs["args"][0] == queue.max_submit_size
+        assert QueuedMessage.decode(kwargs["args"][2]).message_id == "msg-1"
+        assert kwargs["args"][5] == "msg-2"
+
+    async def test_get_queue_depths(
+        self, queue: OGxStreamMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """Ready counts exclude the group's pending entries; ages come from entry IDs."""
+        added_at = int((time.time() - 45) * 1000)
+        group = {"name": queue.group, "pending": 2, "last-delivered-id": "5-0"}
+        mock_pipeline.execute.side_effect = [
+            [3, [group], 0, [], 2, [{**group, "pending": 2}], 4, 1, 9, 0],
+            [[(f"{added_at}-0", {})]],
+        ]
+
+        depths = await queue.get_queue_depths()
+
+        assert depths.lanes == {MessagePriority.HIGH: 1, NORMAL: 0, MessagePriority.LOW: 0}
+        assert depths.in_progress == 4
+        assert depths.oldest_ages[MessagePriority.HIGH] == pytest.approx(45, abs=1)
+        assert depths.oldest_ages[MessagePriority.LOW] == 0
+        assert (depths.scheduled, depths.held, depths.delivered) == (4, 1, 9)
+        mock_pipeline.xrange.assert_awaited_once_with(
+            queue.streams[MessagePriority.HIGH], min="(5-0", count=1
+        )
+
+    async def test_get_message_state(
+        self, queue: OGxStreamMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """State is derived from the queue holding the message."""
+        mock_pipeline.execute.side_effect = [
+            [True, False, None],
+            [False, True, None],
+            [False, False, 1.0],
+            [False, False, None],
+        ]
+
+        states = [await queue.get_message_state("msg-1") for _ in range(4)]
+
+        assert states == [
+            MessageState.RECEIVED,
+            MessageState.TIMED_OUT,
+            MessageState.ACCEPTED,
+            None,
+        ]
+
+    async def test_enqueue_rejects_when_full(self, queue: OGxStreamMessageQueue) -> None:
+        """Enqueue enforces MAX_SUBMIT_MESSAGES."""
+        queue._enqueue_script.return_value = ["msg-1", "queue_full"]
+
+        with pytest.raises(ValueError):
+            await queue.enqueue_message("msg-1", {})
+
+    async def test_cleanup_trims_stream_and_expired_records(
+        self, queue: OGxStreamMessageQueue, mock_redis: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """Cleanup trims the stream and deletes expired records found via the index."""
+        mock_redis.zrangebyscore.side_effect = [["old-1", "old-2"]]
+        mock_pipeline.execute.side_effect = [[2, 0, 0], [1, 1, 0, 0, 0, 0, 0, 2]]
+
+        assert await queue.cleanup_expired_messages() == 4
+
+        assert mock_pipeline.xtrim.await_count == len(LANES)
+        assert mock_pipeline.xtrim.await_args.kwargs["minid"].endswith("-0")
+        hdel_keys = [c.args[0] for c in mock_pipeline.hdel.await_args_list]
+        assert hdel_keys == [
+            queue.delivered_queue,
+            queue.dead_letter_queue,
+            queue.scheduled_queue,
+            queue.held_queue,
+        ]
+
+    async def test_get_pending_reclaims_before_reading(
+        self, queue: OGxStreamMessageQueue, mock_redis: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """Idle messages are reclaimed and topped up with new reads."""
+        stream = queue.streams[NORMAL]
+        mock_pipeline.execute.side_effect = [
+            [["0-0", [], []], ["0-0", [stream_entry("1-0", "stale")], []], ["0-0", [], []]],
+            [[{"message_id": "1-0", "times_delivered": 2}]],
+            [0, 3, 0],
+            [[[stream, [stream_entry("2-0", "fresh")]]]],
+        ]
+
+        messages = await queue.get_pending_messages(batch_size=5)
+
+        assert [m.message_id for m in messages] == ["stale", "fresh"]
+        # The first delivery of the reclaimed entry was cut short by its consumer
+        assert messages[0].retry_count == 1
+        mock_pipeline.xpending_range.assert_awaited_once_with(
+            stream, queue.group, min="1-0", max="1-0", count=1
+        )
+        assert mock_pipeline.xreadgroup.await_args.kwargs["count"] == 3
+        # Reclaimed work is returned immediately rather than blocking for more
+        mock_redis.xreadgroup.assert_not_awaited()
+
+    async def test_get_pending_dead_letters_repeatedly_interrupted(
+        self, queue: OGxStreamMessageQueue, mock_redis: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """A reclaimed message whose consumers kept failing is not delivered again."""
+        stream = queue.streams[NORMAL]
+        mock_pipeline.execute.side_effect = [
+            [
+                ["0-0", [], []],
+                ["0-0", [stream_entry("1-0", "poison"), stream_entry("2-0", "stale")], []],
+                ["0-0", [], []],
+            ],
+            [
+                [{"message_id": "1-0", "times_delivered": queue.max_retries + 1}],
+                [{"message_id": "2-0", "times_delivered": 1}],
+            ],
+            [],
+            [0, 0, 0],
+        ]
+
+        messages = await queue.get_pending_messages(batch_size=2)
+
+        assert [(m.message_id, m.retry_count) for m in messages] == [("stale", 0)]
+        dead_letter_call = mock_pipeline.hset.await_args
+        assert dead_letter_call.args[:2] == (queue.dead_letter_queue, "poison")
+        mock_pipeline.xack.assert_awaited_once_with(stream, queue.group, "1-0")
+        assert "poison" not in queue._inflight
+
+    async def test_get_pending_weights_lanes(
+        self, queue: OGxStreamMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """Lanes are read by weight and returned highest priority first."""
+        high, low = queue.streams[MessagePriority.HIGH], queue.streams[MessagePriority.LOW]
+        mock_pipeline.execute.side_effect = [
+            NO_RECLAIM,
+            [100, 0, 100],
+            [
+                [[high, [stream_entry("1-0", "urgent", priority=MessagePriority.HIGH)]]],
+                [[low, [stream_entry("1-0", "bulk", priority=MessagePriority.LOW)]]],
+            ],
+        ]
+
+        messages = await queue.get_pending_messages(batch_size=7)
+
+        assert [m.message_id for m in messages] == ["urgent", "bulk"]
+        counts = {
+            next(iter(c.args[2])): c.kwargs["count"]
+            for c in mock_pipeline.xreadgroup.await_args_list
+        }
+        assert counts == {high: 6, low: 1}
+
+    async def test_get_pending_blocks_when_nothing_ready(
+        self, queue: OGxStreamMessageQueue, mock_redis: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """Empty lanes fall through to a blocking read across every lane."""
+        mock_pipeline.execute.side_effect = [NO_RECLAIM, [0, 0, 0]]
+        mock_redis.xreadgroup.return_value = []
+
+        assert await queue.get_pending_messages() == []
+        assert mock_redis.xreadgroup.await_args.kwargs["block"] == queue.block_ms
+        assert set(mock_redis.xreadgroup.await_args.args[2]) == set(queue.streams.values())
+
+    async def test_mark_in_progress_only_owned(self, queue: OGxStreamMessageQueue) -> None:
+        """Only messages read by this consumer can be started."""
+        track(queue, stream_entry("1-0", "msg-1"))
+
+        assert await queue.mark_in_progress_many(["msg-1", "other"]) == ["msg-1"]
+        _, _, message = queue._inflight["msg-1"]
+        assert message.retry_count == 1
+        assert message.state == MessageState.SENDING
+
+    async def test_mark_delivered_acks_entry(
+        self, queue: OGxStreamMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """Delivery records the message and acknowledges its stream entry."""
+        high = queue.streams[MessagePriority.HIGH]
+        track(queue, stream_entry("1-0", "msg-1"), lane=MessagePriority.HIGH)
+        await queue.mark_in_progress("msg-1")
+
+        await queue.mark_delivered("msg-1")
+
+        mock_pipeline.hset.assert_awaited_once()
+        assert mock_pipeline.hset.await_args.args[:2] == (queue.delivered_queue, "msg-1")
+        mock_pipeline.xack.assert_awaited_once_with(high, queue.group, "1-0")
+        mock_pipeline.xdel.assert_awaited_once_with(high, "1-0")
+        assert "msg-1" not in queue._inflight
+
+    async def test_return_unsubmitted_resets_idle_time(
+        self, queue: OGxStreamMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """Returned entries stay pending but are idle enough to be reclaimed at once."""
+        track(queue, stream_entry("1-0", "msg-1"))
+        await queue.mark_in_progress("msg-1")
+        mock_pipeline.execute.side_effect = [[[{"message_id": "1-0", "times_delivered": 3}]], []]
+
+        assert await queue.return_unsubmitted(["msg-1", "other"]) == ["msg-1"]
+
+        mock_pipeline.xclaim.assert_awaited_once_with(
+            queue.streams[NORMAL],
+            queue.group,
+            queue.consumer,
+            min_idle_time=0,
+            message_ids=["1-0"],
+            idle=queue.claim_idle_ms,
+            # The unstarted attempt is not counted as interrupted on reclaim
+            retrycount=2,
+            justid=True,
+        )
+        mock_pipeline.xack.assert_not_awaited()
+        assert "msg-1" not in queue._inflight
+
+    async def test_get_pending_promotes_due_retries(
+        self, queue: OGxStreamMessageQueue, mock_redis: AsyncMock, mock_pipeline: MagicMock
+    ) -> None:
+        """Due retries are re-added to their lane's stream before reading."""
+        mock_pipeline.execute.side_effect = [NO_RECLAIM, [0, 0, 0]]
+        mock_redis.xreadgroup.return_value = []
+
+        await queue.get_pending_messages(batch_size=5)
+
+        kwargs = queue._promote_script.await_args.kwargs
+        assert kwargs["keys"] == [
+            queue.scheduled_queue,
+            *(
+                key
+                for lane in LANES
+                for key in (queue.scheduled_indexes[lane], queue.streams[lane])
+            ),
+        ]
+        assert kwargs["args"][1] == 5
+
+    async def test_mark_failed_schedules_or_dead_letters(
+        self, queue: OGxStreamMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """Failures under max_retries are scheduled; exhausted ones are dead-lettered."""
+        track(
+            queue,
+            stream_entry("1-0", "retry", priority=MessagePriority.LOW),
+            stream_entry("2-0", "exhausted", retry_count=queue.max_retries - 1),
+        )
+        await queue.mark_in_progress_many(["retry", "exhausted"])
+
+        targets = await queue.mark_failed_many(["retry", "exhausted"], "Network error")
+
+        assert targets == {"retry": "scheduled", "exhausted": "dead_letter"}
+        parked_call, dead_letter_call = mock_pipeline.hset.await_args_list
+        assert parked_call.args[:2] == (queue.scheduled_queue, "retry")
+        parked = QueuedMessage.decode(parked_call.args[2])
+        assert parked.retry_count == 1
+        assert parked.error == "Network error"
+        key, mapping = mock_pipeline.zadd.await_args.args
+        # Retries are parked in the lane of the message's priority
+        assert key == queue.scheduled_indexes[MessagePriority.LOW]
+        assert mapping["retry"] >= time.time() + queue.retry_delay - 1
+        assert dead_letter_call.args[:2] == (queue.dead_letter_queue, "exhausted")
+        mock_pipeline.xadd.assert_not_awaited()
+        assert mock_pipeline.xack.await_count == 2
+
+    async def test_deferrals_do_not_use_up_retries(
+        self, queue: OGxStreamMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """A message deferred more than max_retries times is still scheduled, not dead."""
+        entry = stream_entry("1-0", "msg-1", priority=MessagePriority.HIGH)
+        for attempt in range(queue.max_retries + 2):
+            track(queue, entry)
+            await queue.mark_in_progress("msg-1")
+
+            assert await queue.defer_many(["msg-1"], "Rate limited", 30) == ["msg-1"]
+
+            parked = QueuedMessage.decode(mock_pipeline.hset.await_args.args[2])
+            entry = (f"{attempt + 2}-0", {"message_id": "msg-1", "entry": parked.encode()})
+        assert mock_pipeline.hset.await_args.args[:2] == (queue.scheduled_queue, "msg-1")
+        assert (parked.retry_count, parked.state) == (0, MessageState.ACCEPTED)
+        key, mapping = mock_pipeline.zadd.await_args.args
+        assert key == queue.scheduled_indexes[MessagePriority.HIGH]
+        assert mapping["msg-1"] >= time.time() + 29
+        assert "msg-1" not in queue._inflight
+
+    async def test_hold_messages_parks_and_acks(
+        self, queue: OGxStreamMessageQueue, mock_pipeline: MagicMock
+    ) -> None:
+        """Held messages leave the stream for the terminal's holding set."""
+        messages = track(queue, stream_entry("1-0", "msg-1", priority=MessagePriority.LOW))
+
+        assert await queue.hold_messages("TERM1", [*messages, QueuedMessage("other", {})]) == [
+            "msg-1"
+        ]
+
+        assert mock_pipeline.hset.await_args.args[:2] == (queue.held_queue, "msg-1")
+        key, _ = mock_pipeline.zadd.await_args.args
+        assert key == "OGx:messages:stream:held:TERM1:low"
+        mock_pipeline.xack.assert_awaited_once_with(queue.streams[NORMAL], queue.group, "1-0")
+        assert "msg-1" not in queue._inflight
+
+    async def test_release_held_re_adds_to_streams(self, queue: OGxStreamMessageQueue) -> None:
+        """Released messages are re-added to their lane's stream."""
+        queue._release_script.return_value = 1
+
+        assert await queue.release_held("TERM1", 2) == 1
+
+        kwargs = queue._release_script.await_args.kwargs
+        assert kwargs["keys"][:3] == [
+            queue.held_queue,
+            "OGx:messages:stream:held:TERM1:high",
+            queue.streams[MessagePriority.HIGH],
+        ]
+        assert kwargs["args"] == [2]
+
+    async def test_reclaim_expired_leases_is_noop(
+        self, queue: OGxStreamMessageQueue, mock_redis: AsyncMock
+    ) -> None:
+        """Idle stream entries are already reclaimed by XAUTOCLAIM on read."""
+        assert await queue.reclaim_expired_leases() == {}
+        mock_redis.zrangebyscore.assert_not_awaited()
+
+    async def test_replay_resets_retry_budget(
+        self, queue: OGxStreamMessageQueue, mock_redis: AsyncMock
+    ) -> None:
+        """Replayed entries are re-encoded with no retries and appended to their lane."""
+        dead = QueuedMessage(
+            message_id="dead-1",
+            payload={},
+            state=MessageState.TIMED_OUT,
+            retry_count=5,
+            error="boom",
+            priority=MessagePriority.HIGH,
+        )
+        mock_redis.hmget.return_value = [dead.encode(), None]
+        queue._replay_script.return_value = ["dead-1", "accepted"]
+
+        statuses = await queue.replay_dead_letters(["dead-1", "dead-2"])
+
+        assert statuses == {"dead-1": "accepted", "dead-2": "missing"}
+        kwargs = queue._replay_script.await_args.kwargs
+        assert kwargs["keys"][:3] == [queue.dead_letter_queue, queue.expiry_index, queue.held_queue]
+        message_id, entry, lane = kwargs["args"][2:]
+        replayed = QueuedMessage.decode(entry)
+        assert (message_id, lane) == ("dead-1", "high")
+        assert replayed.retry_count == 0
+        assert replayed.error is None
+        assert replayed.state == MessageState.ACCEPTED
+
+    def test_backoff(self, queue: OGxStreamMessageQueue) -> None:
+        """Backoff doubles per attempt up to the cap unless overridden."""
+        assert queue._backoff(1) == queue.retry_delay
+        assert queue._backoff(2) == queue.retry_delay * 2
+        assert queue._backoff(10) == queue.max_retry_delay
+        assert queue._backoff(3, retry_after=15) == 15
+
+
+class TestQueueFactory:
+    """Test backend selection from settings."""
+
+    def test_default_backend(self, mock_redis: AsyncMock) -> None:
+        """Hashes are the default backend."""
+        settings = Settings(DATABASE_URL="sqlite://")
+
+        assert isinstance(create_message_queue(mock_redis, settings), OGxMessageQueue)
+
+    def test_stream_backend(self, mock_redis: AsyncMock, stream_settings: Settings) -> None:
+        """The stream backend is selected by OGx_QUEUE_BACKEND."""
+        assert isinstance(create_message_queue(mock_redis, stream_settings), OGxStreamMessageQueue)
+
+    def test_unknown_backend(self, mock_redis: AsyncMock) -> None:
+        """Unknown backends are rejected."""
+        settings = Settings(DATABASE_URL="sqlite://", OGx_QUEUE_BACKEND="kafka")
+
+        with pytest.raises(ValueError):
+            create_message_queue(mock_redis, settings)
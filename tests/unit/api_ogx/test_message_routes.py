@@ -0,0 +1,107 @@
+"""Unit tests for the internal message submission route."""
+
+from typing import Iterator
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import HTTPException
+from httpx import ConnectError
+
+from Protexis_Command.api.internal.routes.messages import MessageRequest, submit_message
+from Protexis_Command.core.settings.app_settings import Settings
+from Protexis_Command.protocols.ogx.constants.ogx_message_states import MessageState
+
+ROUTES = "Protexis_Command.api.internal.routes.messages"
+
+REQUEST = MessageRequest(
+    DestinationID="01008988SKY5909",
+    UserMessageID=7,
+    Payload={"Name": "ping", "SIN": 16, "MIN": 2, "Fields": []},
+)
+
+
+@pytest.fixture
+def settings() -> Settings:
+    """Create application settings for tests."""
+    return Settings(DATABASE_URL="sqlite://")
+
+
+@pytest.fixture
+def idempotency() -> Iterator[AsyncMock]:
+    """Create an idempotency index that lets the submission through."""
+    index = AsyncMock()
+    index.claim.return_value = None
+    with (
+        patch(f"{ROUTES}.SubmissionIdempotencyIndex", return_value=index),
+        patch(f"{ROUTES}.get_redis_client", AsyncMock()),
+    ):
+        yield index
+
+
+@pytest.fixture
+def tracker() -> AsyncMock:
+    """Create a status tracker with no status recorded yet."""
+    status_tracker = AsyncMock()
+    status_tracker.get_status.return_value = None
+    return status_tracker
+
+
+class TestSubmitMessage:
+    """Test that a failed submission can be retried."""
+
+    async def test_accepted_submission_is_completed(
+        self, settings: Settings, idempotency: AsyncMock, tracker: AsyncMock
+    ) -> None:
+        """An accepted submission stores its response and keeps the claim."""
+        client = AsyncMock()
+        client.submit_message.return_value = {"ID": 1234, "DestinationID": "01008988SKY5909"}
+
+        response = await submit_message(REQUEST, client, settings, tracker)
+
+        assert response.id == 1234
+        idempotency.complete.assert_awaited_once_with(
+            REQUEST.model_dump(by_alias=True, exclude_none=True), 1234
+        )
+        idempotency.release.assert_not_awaited()
+
+    async def test_retry_reports_current_status(
+        self, settings: Settings, idempotency: AsyncMock, tracker: AsyncMock
+    ) -> None:
+        """A retried submission gets the first message ID with its current status."""
+        idempotency.claim.return_value = "1234"
+        tracker.get_status.return_value = {"ForwardMessageID": 1234, "State": 1}
+        client = AsyncMock()
+
+        response = await submit_message(REQUEST, client, settings, tracker)
+
+        assert response.id == 1234
+        assert response.state == MessageState.RECEIVED
+        tracker.get_status.assert_awaited_once_with("1234")
+        client.submit_message.assert_not_awaited()
+
+    async def test_http_failure_releases_claim(
+        self, settings: Settings, idempotency: AsyncMock, tracker: AsyncMock
+    ) -> None:
+        """A failed OGx call is reported and leaves the submission retryable."""
+        client = AsyncMock()
+        client.submit_message.side_effect = ConnectError("Connection refused")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await submit_message(REQUEST, client, settings, tracker)
+
+        assert exc_info.value.status_code == 500
+        idempotency.release.assert_awaited_once()
+        idempotency.complete.assert_not_awaited()
+
+    async def test_unexpected_failure_releases_claim(
+        self, settings: Settings, idempotency: AsyncMock, tracker: AsyncMock
+    ) -> None:
+        """Any other failure also leaves the submission retryable."""
+        client = AsyncMock()
+        client.submit_message.side_effect = KeyError("Submissions")
+
+        with pytest.raises(KeyError):
+            await submit_message(REQUEST, client, settings, tracker)
+
+        idempotency.release.assert_awaited_once()
+        idempotency.complete.assert_not_awaited()
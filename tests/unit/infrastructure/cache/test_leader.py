@@ -0,0 +1,143 @@
+"""Unit tests for Redis lease-based leader election."""
+
+import asyncio
+from typing import List
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from Protexis_Command.infrastructure.cache.leader import LeaderLease, SingletonTask
+
+TTL = 0.03
+
+
+@pytest.fixture
+def mock_redis() -> AsyncMock:
+    """Create a mock Redis client."""
+    redis = AsyncMock()
+    redis.register_script = MagicMock(side_effect=lambda script: AsyncMock())
+    return redis
+
+
+class TestLeaderLease:
+    """Test lease bookkeeping."""
+
+    async def test_acquire_runs_script(self, mock_redis: AsyncMock) -> None:
+        """Acquiring passes the holder and TTL and returns the fencing token."""
+        lease = LeaderLease(mock_redis, "loop", ttl_seconds=15, holder="host-1")
+        lease._acquire_script.return_value = 7
+
+        assert await lease.acquire() == 7
+
+        kwargs = lease._acquire_script.await_args.kwargs
+        assert kwargs["keys"] == ["leader:loop", "leader:loop:fence"]
+        assert kwargs["args"] == ["host-1", 15000]
+
+    async def test_acquire_held_elsewhere(self, mock_redis: AsyncMock) -> None:
+        """A lease held by another process yields no token."""
+        lease = LeaderLease(mock_redis, "loop")
+        lease._acquire_script.return_value = None
+
+        assert await lease.acquire() is None
+
+    async def test_is_current(self, mock_redis: AsyncMock) -> None:
+        """Only the latest term's token is current."""
+        lease = LeaderLease(mock_redis, "loop")
+        mock_redis.get.return_value = "8"
+
+        assert await lease.is_current(8)
+        assert not await lease.is_current(7)
+
+
+class TestSingletonTask:
+    """Test running a loop only while holding the lease."""
+
+    def singleton(self, mock_redis: AsyncMock, tokens: List) -> tuple:
+        """Create a singleton whose lease yields the given tokens, then the last one."""
+        terms: List[int] = []
+
+        async def run(token: int) -> None:
+            terms.append(token)
+            await asyncio.Event().wait()
+
+        task = SingletonTask(mock_redis, "loop", run, ttl_seconds=TTL)
+        task.lease._acquire_script.side_effect = tokens + [tokens[-1]] * 100
+        task.lease._release_script.return_value = 1
+        return task, terms
+
+    async def test_runs_loop_while_leader(self, mock_redis: AsyncMock) -> None:
+        """The loop starts once on election and stops with a released lease."""
+        task, terms = self.singleton(mock_redis, [None, 3])
+
+        await task.start()
+        await asyncio.sleep(TTL)
+
+        assert task.is_leader
+        assert terms == [3]
+        await task.stop()
+        assert not task.is_leader
+        task.lease._release_script.assert_awaited_once()
+
+    async def test_standby_never_runs(self, mock_redis: AsyncMock) -> None:
+        """A process that never gets the lease never runs the loop."""
+        task, terms = self.singleton(mock_redis, [None])
+
+        await task.start()
+        await asyncio.sleep(TTL)
+        await task.stop()
+
+        assert terms == []
+        task.lease._release_script.assert_not_awaited()
+
+    async def test_lost_lease_steps_down(self, mock_redis: AsyncMock) -> None:
+        """The loop is cancelled when the lease is lost and restarted in the next term."""
+        task, terms = self.singleton(mock_redis, [3, RedisConnectionError("down"), None, 5])
+
+        await task.start()
+        await asyncio.sleep(TTL * 2)
+
+        assert terms == [3, 5]
+        assert task.token == 5
+        await task.stop()
+
+    async def test_failed_renewal_keeps_term(self, mock_redis: AsyncMock) -> None:
+        """A failed renewal within the TTL does not interrupt the loop."""
+        task, terms = self.singleton(mock_redis, [3, RedisConnectionError("down"), 3])
+
+        await task.start()
+        await asyncio.sleep(TTL)
+
+        assert task.is_leader
+        assert terms == [3]
+        await task.stop()
+
+    async def test_failed_renewals_step_down_at_expiry(self, mock_redis: AsyncMock) -> None:
+        """The loop is cancelled once renewals have failed for the whole TTL."""
+        task, terms = self.singleton(mock_redis, [3, RedisConnectionError("down")])
+
+        await task.start()
+        await asyncio.sleep(TTL / 2)
+        assert task.is_leader
+        await asyncio.sleep(TTL)
+
+        assert not task.is_leader
+        assert terms == [3]
+        await task.stop()
+
+    async def test_exited_loop_is_restarted(self, mock_redis: AsyncMock) -> None:
+        """A loop that exits while leader is started again."""
+        runs: List[int] = []
+
+        async def run(token: int) -> None:
+            runs.append(token)
+
+        task = SingletonTask(mock_redis, "loop", run, ttl_seconds=TTL)
+        task.lease._acquire_script.return_value = 4
+
+        await task.start()
+        await asyncio.sleep(TTL)
+        await task.stop()
+
+        assert len(runs) >= 2
+        assert set(runs) == {4}
@@ -0,0 +1,98 @@
+"""Unit tests for the shared OGx HTTP client."""
+
+from typing import Iterator
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from Protexis_Command.core.settings.app_settings import Settings
+from Protexis_Command.infrastructure.http import client as http_client
+from Protexis_Command.infrastructure.http.client import (
+    close_http_client,
+    create_http_client,
+    get_http_client,
+)
+
+FIND_SPEC = "Protexis_Command.infrastructure.http.client.importlib.util.find_spec"
+
+
+@pytest.fixture
+def settings() -> Settings:
+    """Create settings for a local OGx."""
+    return Settings(
+        DATABASE_URL="sqlite://",
+        OGx_BASE_URL="https://ogx.test/api/v1.0",
+        OGx_HTTP_MAX_CONNECTIONS=8,
+        OGx_HTTP_CONNECT_TIMEOUT_SECONDS=2.0,
+    )
+
+
+@pytest.fixture(autouse=True)
+def shared_client(settings: Settings) -> Iterator[None]:
+    """Start each test without a shared client and configured from the test settings."""
+    http_client._http_client = None
+    with patch("Protexis_Command.infrastructure.http.client.get_settings", return_value=settings):
+        yield
+    http_client._http_client = None
+
+
+class TestCreateHttpClient:
+    """Test client configuration."""
+
+    async def test_configured_from_settings(self, settings: Settings) -> None:
+        """Pool limits, timeouts and the base URL come from settings."""
+        with patch("httpx.AsyncClient") as client_class:
+            create_http_client(settings)
+
+        kwargs = client_class.call_args.kwargs
+        assert kwargs["base_url"] == "https://ogx.test/api/v1.0"
+        assert kwargs["http2"] is False
+        assert kwargs["limits"].max_connections == 8
+        assert kwargs["timeout"].connect == 2.0
+        assert kwargs["timeout"].read == settings.OGx_HTTP_TIMEOUT_SECONDS
+
+    async def test_http2_falls_back_without_h2(self, settings: Settings) -> None:
+        """HTTP/2 is only used when the h2 package is installed."""
+        settings.OGx_HTTP2 = True
+        with patch("httpx.AsyncClient") as client_class, patch(FIND_SPEC, return_value=None):
+            create_http_client(settings)
+
+        assert client_class.call_args.kwargs["http2"] is False
+
+    async def test_relative_urls_use_base_url(self, settings: Settings) -> None:
+        """Endpoint paths resolve against the OGx base URL."""
+        client = create_http_client(settings)
+        try:
+            request = client.build_request("GET", "/info/service")
+        finally:
+            await client.aclose()
+
+        assert str(request.url) == "https://ogx.test/api/v1.0/info/service"
+
+
+class TestSharedClient:
+    """Test the process-wide client lifecycle."""
+
+    async def test_client_is_shared(self) -> None:
+        """Every caller gets the same client until it is closed."""
+        client = get_http_client()
+
+        assert get_http_client() is client
+        assert isinstance(client, httpx.AsyncClient)
+        await close_http_client()
+
+    async def test_close_releases_client(self) -> None:
+        """Closing shuts the client down and the next call creates a new one."""
+        client = get_http_client()
+
+        await close_http_client()
+
+        assert client.is_closed
+        assert get_http_client() is not client
+        await close_http_client()
+
+    async def test_close_without_client(self) -> None:
+        """Closing before first use is a no-op."""
+        await close_http_client()
+        assert http_client._http_client is None